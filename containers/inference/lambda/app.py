@@ -3,23 +3,38 @@ import json
 import math
 import os
 import re
+from typing import List
 import requests
 
 from darts.timeseries import TimeSeries
 import pandas as pd
-import s3fs
 
+from rlf.storage_backend import get_s3_filesystem
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
 from rlf.forecasting.data_fetching_utilities.level_provider.level_provider_nwis import LevelProviderNWIS
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.rate_limiter import RateLimiter
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.response_cache import ResponseCache
 from rlf.forecasting.data_fetching_utilities.weather_provider.api_weather_provider import APIWeatherProvider
+from rlf.forecasting.data_fetching_utilities.weather_provider.current_weather_buffer import CurrentWeatherBuffer
+from rlf.forecasting.data_fetching_utilities.weather_provider.grid_planner import GridPlanner
+from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.open_meteo_adapter import OpenMeteoAdapter
 from rlf.forecasting.catchment_data import CatchmentData
 from rlf.forecasting.inference_dataset import InferenceDataset
 from rlf.forecasting.inference_forecaster import InferenceForecaster
 
 
-s3 = s3fs.S3FileSystem(anon=False)
+# created once per container and reused by warm invocations
+s3 = get_s3_filesystem()
 s3_bucket = "s3://model-forecasts"
 
+# Weather for all points of a catchment is fetched concurrently, bounded by the Open-Meteo quota (600 queries per minute) shared by all catchments
+MAX_CONCURRENT_WEATHER_REQUESTS = 8
+weather_rate_limiter = RateLimiter.per_minute(600, burst=MAX_CONCURRENT_WEATHER_REQUESTS)
+# Forecasts only change with each model run, so warm invocations serve unchanged forecasts from /tmp (the only writable path in lambda)
+weather_api_adapter = OpenMeteoAdapter(response_cache=ResponseCache("/tmp/weather_response_cache"))
+# Warm invocations only fetch the last few days and the forecast, merged into the rolling window kept from earlier invocations
+current_weather_buffer = CurrentWeatherBuffer("/tmp/current_weather_buffer")
+
 flow_pattern = re.compile(r"(\d+\.?\d*)(k?cfs)")
 
 
@@ -123,10 +138,21 @@ def build_json_result(dataset: InferenceDataset, predictions: TimeSeries, target
     return json.dumps(complete_dict)
 
 
-def run_predictions_for_target(target: dict):
-    coordinates = [Coordinate(lon, lat) for lon, lat in target["geometry"]["coordinates"]]
+def target_coordinates(target: dict) -> List[Coordinate]:
+    return [Coordinate(lon, lat) for lon, lat in target["geometry"]["coordinates"]]
+
+
+def create_weather_planner() -> GridPlanner:
+    # adjacent catchments share many model cells, so each cell the API reported for them (recorded by the current buffer on earlier invocations) is fetched once and fanned out to every catchment using it
+    def create_provider(cells: List[Coordinate]) -> APIWeatherProvider:
+        return APIWeatherProvider(cells, api_adapter=weather_api_adapter, max_concurrent_requests=MAX_CONCURRENT_WEATHER_REQUESTS,
+                                  rate_limiter=weather_rate_limiter, current_buffer=current_weather_buffer)
+
+    return GridPlanner(create_provider, cell_lookup=current_weather_buffer.api_cell)
 
-    inference_weather_provider = APIWeatherProvider(coordinates)
+
+def run_predictions_for_target(target: dict, weather_planner: GridPlanner):
+    inference_weather_provider = weather_planner.provider(target_coordinates(target))
     inference_level_provider = LevelProviderNWIS(target["properties"]["gauge_id"])
     inference_catchment_data = CatchmentData(target["properties"]["gauge_id"], inference_weather_provider, inference_level_provider)
 
@@ -143,13 +169,19 @@ def handler(event, context):
     with open("data/catchments_short.json") as f:
         catchments = json.load(f)
 
-    for feature in catchments["features"]:
-        if os.path.exists(f"trained_models/{feature['properties']['gauge_id']}"):
-            try:
-                run_predictions_for_target(feature)
-            except Exception:
-                print(f"Unable to run predictions for {feature['properties']['gauge_id']}")
-                raise
+    targets = [feature for feature in catchments["features"] if os.path.exists(f"trained_models/{feature['properties']['gauge_id']}")]
+
+    # register every catchment up front, so the first fetch covers the coordinates of all of them
+    weather_planner = create_weather_planner()
+    for target in targets:
+        weather_planner.add(target_coordinates(target))
+
+    for target in targets:
+        try:
+            run_predictions_for_target(target, weather_planner)
+        except Exception:
+            print(f"Unable to run predictions for {target['properties']['gauge_id']}")
+            raise
 
     return
 
@@ -0,0 +1,77 @@
+# Benchmark for concurrent datum downloads in AWSWeatherProvider. Runs entirely locally: datums are written to a temporary directory and served through a local filesystem that injects a fixed latency on every object open, imitating S3 round trips.
+# Usage: python scripts/benchmarks/aws_download_benchmark.py [-n NUM_COORDINATES] [-l LATENCY_SECONDS] [-w WORKERS ...]
+import argparse
+import tempfile
+import time
+
+from fsspec.implementations.local import LocalFileSystem
+import numpy as np
+import pandas as pd
+
+from rlf.aws_dispatcher import AWSDispatcher
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.aws_weather_provider import AWSWeatherProvider
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import WeatherDatum
+from rlf.storage_backend import StorageBackend
+
+
+class LatencyFileSystem(LocalFileSystem):
+    """Local filesystem which sleeps for a fixed duration whenever a file is opened, standing in for S3 request latency."""
+
+    # fsspec caches filesystem instances by their arguments, which would share latency settings between benchmark runs
+    cachable = False
+
+    def __init__(self, latency: float, *args, **kwargs) -> None:
+        super().__init__(*args, auto_mkdir=True, **kwargs)
+        self.latency = latency
+
+    def _open(self, path, mode="rb", *args, **kwargs):
+        if "r" in mode:
+            time.sleep(self.latency)
+        return super()._open(path, mode, *args, **kwargs)
+
+
+COLUMNS = [f"parameter_{i}" for i in range(30)]
+
+
+def build_datum(coordinate: Coordinate, num_hours: int) -> WeatherDatum:
+    """A datum as fetched from a weather API: float64 columns with a UTC "time" index."""
+    index = pd.date_range("2021-01-01", periods=num_hours, freq="H", tz="UTC", name="time")
+    rng = np.random.default_rng(seed=1)
+    hourly_parameters = pd.DataFrame({column: rng.random(num_hours) for column in COLUMNS}, index=index)
+    return WeatherDatum(longitude=coordinate.lon, latitude=coordinate.lat, api_response_longitude=coordinate.lon + 0.01,
+                        api_response_latitude=coordinate.lat - 0.01, elevation=1000.0, utc_offset_seconds=0,
+                        timezone="GMT", hourly_units={column: "unit" for column in COLUMNS}, hourly_parameters=hourly_parameters)
+
+
+def build_dispatcher(root: str, latency: float) -> AWSDispatcher:
+    return AWSDispatcher(backend=StorageBackend(LatencyFileSystem(latency), root))
+
+
+def main(args: argparse.Namespace) -> None:
+    coordinates = [Coordinate(lon=-120.0 - i * 0.1, lat=44.0) for i in range(args.num_coordinates)]
+
+    with tempfile.TemporaryDirectory() as root:
+        dispatcher = build_dispatcher(root, latency=args.latency)
+        for coordinate in coordinates:
+            dispatcher.upload_datum(build_datum(coordinate, args.num_hours), "historical")
+
+        print(f"{len(coordinates)} coordinates, {args.latency * 1000:.0f}ms simulated latency per object")
+        baseline = None
+        for workers in args.workers:
+            weather_provider = AWSWeatherProvider(coordinates, dispatcher, max_concurrent_downloads=workers)
+            start = time.perf_counter()
+            weather_provider.download_datums_from_aws(dir_path="historical")
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"max_concurrent_downloads={workers:<3} {elapsed:7.2f}s  speedup x{baseline / elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--num_coordinates", type=int, default=60, help="number of coordinates (datums) to download")
+    parser.add_argument("-l", "--latency", type=float, default=0.05, help="simulated latency in seconds for each object fetched")
+    parser.add_argument("--num_hours", type=int, default=24 * 365, help="number of hourly rows stored per datum")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[1, 4, 16, 32], help="max_concurrent_downloads values to compare")
+
+    main(parser.parse_args())
@@ -17,7 +17,7 @@ except ImportError as e:
     exit(1)
 
 try:
-    from rlf.aws_dispatcher import AWSDispatcher
+    from rlf.aws_dispatcher import get_dispatcher
     from rlf.forecasting.catchment_data import CatchmentData
     from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
     from rlf.forecasting.data_fetching_utilities.level_provider.level_provider_nwis import LevelProviderNWIS
@@ -164,9 +164,10 @@ def get_training_data(
     Returns:
         TrainingDataset: A TrainingDataset instance for the specified gauge ID, coordinates and columns.
     """
+    # historical weather is read through the local disk cache, so grid search jobs on the same node share a single copy
     weather_provider = AWSWeatherProvider(
         coordinates,
-        AWSDispatcher("all-weather-data", "open-meteo")
+        get_dispatcher("all-weather-data", "open-meteo", use_cache=True, as_float32=True)
     )
     level_provider = LevelProviderNWIS(gauge_id)
     catchment_data = CatchmentData(
@@ -2,12 +2,13 @@ import argparse
 import pandas as pd
 
 try:
-    from rlf.aws_dispatcher import AWSDispatcher
+    from rlf.aws_dispatcher import AWSDispatcher, get_dispatcher
     from rlf.forecasting.catchment_data import CatchmentData
     from rlf.forecasting.data_fetching_utilities.level_provider.level_provider_nwis import LevelProviderNWIS
     from rlf.forecasting.data_fetching_utilities.weather_provider.aws_weather_provider import AWSWeatherProvider
     from rlf.forecasting.inference_forecaster import InferenceForecaster
-    from rlf.forecasting.training_helpers import get_columns, get_coordinates_for_catchment, get_recent_available_timestamps, get_level_true
+    from rlf.forecasting.training_helpers import get_columns, get_coordinates_for_catchment, get_recent_available_timestamps, get_level_true, MAX_CONCURRENT_DOWNLOADS
+    from rlf.storage_backend import StorageBackend
 except ImportError as e:
     print("Import error on rlf packages. Ensure rlf and its dependencies have been installed into the local environment.")
     print(e)
@@ -24,12 +25,15 @@ def main(args: argparse.Namespace) -> int:
         print(f"Unable to locate {args.gauge_id} in catchment data file.")
         return 1
 
-    # Create AWSDispatcher and load available timestamps
-    aws_dispatcher = AWSDispatcher("all-weather-data", "open-meteo")
-    timestamps = get_recent_available_timestamps(aws_dispatcher, args.num_inferences)
+    # Create AWSDispatcher and load available timestamps, skipping those with incomplete data for this catchment
+    if args.storage_path is None:
+        aws_dispatcher = get_dispatcher("all-weather-data", "open-meteo")
+    else:
+        aws_dispatcher = AWSDispatcher(backend=StorageBackend.local(args.storage_path))
+    timestamps = get_recent_available_timestamps(aws_dispatcher, args.num_inferences, coordinates)
 
     # Ceate weather and level providers for inference
-    inference_weather_provider = AWSWeatherProvider(coordinates, aws_dispatcher=aws_dispatcher)
+    inference_weather_provider = AWSWeatherProvider(coordinates, aws_dispatcher=aws_dispatcher, max_concurrent_downloads=MAX_CONCURRENT_DOWNLOADS)
     inference_level_provider = LevelProviderNWIS(args.gauge_id)
 
     level_true = get_level_true(timestamps, inference_level_provider, args.forecast_window)
@@ -53,7 +57,7 @@ def main(args: argparse.Namespace) -> int:
 
         except FileNotFoundError:
             # If data is not available for the current timestamp in AWS, skip it
-            # This occurs if data was not fully fetched properly
+            # This only occurs for timestamps uploaded before the current manifest existed
             skipped_timestamps.append(timestamp)
             continue
 
@@ -78,6 +82,7 @@ if __name__ == "__main__":
     parser.add_argument('-m', '--trained_model_dir', type=str, default='trained_models', help='directory containing trained_models')
     parser.add_argument('-i', '--num_inferences', type=int, default=5, help='the number of cached samples to run inference for')
     parser.add_argument('-w', '--forecast_window', type=int, default=96, help='the number of timesteps to predict at each inference')
+    parser.add_argument('-l', '--storage_path', type=str, default=None, help='local copy of the weather directory in AWS to read from instead of S3')
 
     args = parser.parse_args()
     exit(main(args))
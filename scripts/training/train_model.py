@@ -71,6 +71,13 @@ if __name__ == "__main__":
     parser.add_argument(
         "-b", "--test_stride", type=int, default=5, help="Stride for backtesting"
     )
+    parser.add_argument(
+        "-l",
+        "--storage_path",
+        type=str,
+        default=None,
+        help="Local copy of the weather directory in AWS to read from instead of S3",
+    )
 
     args = parser.parse_args()
     gauge_id = args.gauge_id
@@ -88,7 +95,7 @@ if __name__ == "__main__":
         exit(1)
 
     columns = get_columns(columns_file)
-    dataset = get_training_data(gauge_id, coordinates, columns)
+    dataset = get_training_data(gauge_id, coordinates, columns, storage_path=args.storage_path)
     model = build_model_for_dataset(
         dataset, epochs, combiner_holdout_size, train_stride
     )
@@ -3,7 +3,7 @@ from datetime import datetime
 import json
 import sys
 
-from rlf.aws_dispatcher import AWSDispatcher
+from rlf.aws_dispatcher import get_dispatcher
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
 from rlf.forecasting.data_fetching_utilities.weather_provider.api_weather_provider_ecmwf import APIWeatherProviderECMWF
 from rlf.forecasting.data_fetching_utilities.weather_provider.aws_weather_uploader import AWSWeatherUploader
@@ -19,6 +19,9 @@ else:
 
 # Tunable parameters
 SLEEP_DURATION = 0.2
+# Fetching workers each sleep SLEEP_DURATION between queries, so the API sees at most MAX_CONCURRENT_FETCHES / SLEEP_DURATION queries per second
+MAX_CONCURRENT_FETCHES = 2
+MAX_CONCURRENT_UPLOADS = 8
 BUCKET_NAME = "ecmwf-weather-data"
 AWS_DIR_NAME = "open-meteo"
 
@@ -43,8 +46,12 @@ dir_path = str(timestamp)
 
 # Instantiate an APIWeatherProvider, AWSDispatcher, and AWSWeatherUploader
 api_weather_provider = APIWeatherProviderECMWF(coordinates=coordinates)
-aws_dispatcher = AWSDispatcher(bucket_name=BUCKET_NAME, directory_name=AWS_DIR_NAME)
+aws_dispatcher = get_dispatcher(BUCKET_NAME, AWS_DIR_NAME)
 aws_weather_uploader = AWSWeatherUploader(weather_provider=api_weather_provider, aws_dispatcher=aws_dispatcher)
 
 # Upload current weather to AWS
-aws_weather_uploader.upload_current(dir_path=dir_path, sleep_duration=SLEEP_DURATION)
+upload_stats = aws_weather_uploader.upload_current(dir_path=dir_path,
+                                                   sleep_duration=SLEEP_DURATION,
+                                                   max_concurrent_fetches=MAX_CONCURRENT_FETCHES,
+                                                   max_concurrent_uploads=MAX_CONCURRENT_UPLOADS)
+print(f'Upload complete: {upload_stats.summary()}')
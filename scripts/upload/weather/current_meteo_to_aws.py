@@ -3,10 +3,13 @@ from datetime import datetime
 import json
 import sys
 
-from rlf.aws_dispatcher import AWSDispatcher
+from rlf.aws_dispatcher import get_dispatcher
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.response_cache import ResponseCache
 from rlf.forecasting.data_fetching_utilities.weather_provider.api_weather_provider import APIWeatherProvider
 from rlf.forecasting.data_fetching_utilities.weather_provider.aws_weather_uploader import AWSWeatherUploader
+from rlf.forecasting.data_fetching_utilities.weather_provider.current_weather_buffer import CurrentWeatherBuffer
+from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.open_meteo_adapter import OpenMeteoAdapter
 
 # Parse command line args
 args = [arg for arg in sys.argv[1:] if not arg.startswith("-")]
@@ -19,6 +22,9 @@ else:
 
 # Tunable parameters
 SLEEP_DURATION = 0.2
+# Fetching workers each sleep SLEEP_DURATION between queries, so the API sees at most MAX_CONCURRENT_FETCHES / SLEEP_DURATION queries per second
+MAX_CONCURRENT_FETCHES = 2
+MAX_CONCURRENT_UPLOADS = 8
 BUCKET_NAME = "all-weather-data"
 AWS_DIR_NAME = "open-meteo"
 
@@ -32,7 +38,8 @@ coordinates = []
 for coord in coordinates_raw:
     new_coord = Coordinate(lon=coord[0], lat=coord[1])
     coordinates.append(new_coord)
-coordinates = list(set(coordinates))
+# sorted so that batches, and so cached responses, are the same from run to run
+coordinates = sorted(set(coordinates))
 
 print(f'Uploading current weather data for {len(coordinates)} points')
 
@@ -42,9 +49,15 @@ timestamp = now.strftime("%y-%m-%d_%H-%M")
 dir_path = str(timestamp)
 
 # Instantiate an APIWeatherProvider, AWSDispatcher, and AWSWeatherUploader
-api_weather_provider = APIWeatherProvider(coordinates=coordinates)
-aws_dispatcher = AWSDispatcher(bucket_name=BUCKET_NAME, directory_name=AWS_DIR_NAME)
+# Forecasts only change with each model run, so runs within the same model cycle are served from the local response cache.
+# Runs following a recent one only fetch the last few days and the forecast, merged into the locally buffered window.
+api_weather_provider = APIWeatherProvider(coordinates=coordinates, api_adapter=OpenMeteoAdapter(response_cache=ResponseCache()), current_buffer=CurrentWeatherBuffer())
+aws_dispatcher = get_dispatcher(BUCKET_NAME, AWS_DIR_NAME)
 aws_weather_uploader = AWSWeatherUploader(weather_provider=api_weather_provider, aws_dispatcher=aws_dispatcher)
 
 # Upload current weather to AWS
-aws_weather_uploader.upload_current(dir_path=dir_path, sleep_duration=SLEEP_DURATION)
+upload_stats = aws_weather_uploader.upload_current(dir_path=dir_path,
+                                                   sleep_duration=SLEEP_DURATION,
+                                                   max_concurrent_fetches=MAX_CONCURRENT_FETCHES,
+                                                   max_concurrent_uploads=MAX_CONCURRENT_UPLOADS)
+print(f'Upload complete: {upload_stats.summary()}')
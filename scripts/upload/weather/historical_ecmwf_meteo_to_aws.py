@@ -2,7 +2,7 @@
 import json
 import sys
 
-from rlf.aws_dispatcher import AWSDispatcher
+from rlf.aws_dispatcher import ParquetEncoding, get_dispatcher
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
 from rlf.forecasting.data_fetching_utilities.weather_provider.api_weather_provider_ecmwf import APIWeatherProviderECMWF
 from rlf.forecasting.data_fetching_utilities.weather_provider.aws_weather_uploader import AWSWeatherUploader
@@ -38,7 +38,8 @@ print(f'Uploading historical weather data for {len(coordinates)} points')
 
 # Instantiate an APIWeatherProvider, AWSDispatcher, and AWSWeatherUploader
 api_weather_provider = APIWeatherProviderECMWF(coordinates=coordinates)
-aws_dispatcher = AWSDispatcher(bucket_name=BUCKET_NAME, directory_name=AWS_DIR_NAME)
+# historical data is written as compact float32 and zstd parquet. The providers already emit float32, which is also what is read back: only columns uploaded as float64 are widened again on read
+aws_dispatcher = get_dispatcher(BUCKET_NAME, AWS_DIR_NAME, encoding=ParquetEncoding())
 aws_weather_uploader = AWSWeatherUploader(weather_provider=api_weather_provider, aws_dispatcher=aws_dispatcher)
 
 # Upload historical weather to AWS
@@ -1,14 +1,18 @@
 # Helper script for uploading historical weather from OpenMeteo to AWS. Intended to be modified & run as needed to upload new historical datasets.
+# Pass --store to backfill the partitioned historical store (one file per coordinate and year) rather than one datum per coordinate. Store backfills are checkpointed in AWS, so an interrupted run can be resumed by rerunning with the same arguments.
+# Pass --append to extend the store up to END_DATE, fetching only data newer than what is stored for each point (START_DATE is only used for new points).
 import json
 import sys
 
-from rlf.aws_dispatcher import AWSDispatcher
+from rlf.aws_dispatcher import ParquetEncoding, get_dispatcher
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
 from rlf.forecasting.data_fetching_utilities.weather_provider.api_weather_provider import APIWeatherProvider
 from rlf.forecasting.data_fetching_utilities.weather_provider.aws_weather_uploader import AWSWeatherUploader
 
 # Parse command line args
 args = [arg for arg in sys.argv[1:] if not arg.startswith("-")]
+TO_STORE = "--store" in sys.argv[1:]
+APPEND = "--append" in sys.argv[1:]
 
 if len(args) == 3:
     CATCHMENT_FILEPATH = args[0]
@@ -19,6 +23,10 @@ else:
 
 # Tunable parameters
 SLEEP_DURATION = 5
+# Store backfills are paced by a shared rate limit instead of sleeping, so query latency overlaps across chunks.
+# The limit is in Open-Meteo's weighted API calls (a year of all variables for one location counts as dozens), kept within its 5000 per hour quota
+MAX_CONCURRENT_CHUNKS = 4
+REQUESTS_PER_SECOND = 5000 / 3600
 BUCKET_NAME = "all-weather-data"
 AWS_DIR_NAME = "open-meteo"
 
@@ -38,8 +46,22 @@ print(f'Uploading historical weather data for {len(coordinates)} points')
 
 # Instantiate an APIWeatherProvider, AWSDispatcher, and AWSWeatherUploader
 api_weather_provider = APIWeatherProvider(coordinates=coordinates)
-aws_dispatcher = AWSDispatcher(bucket_name=BUCKET_NAME, directory_name=AWS_DIR_NAME)
+# historical data is written as compact float32 and zstd parquet. The providers already emit float32, which is also what is read back: only columns uploaded as float64 are widened again on read
+aws_dispatcher = get_dispatcher(BUCKET_NAME, AWS_DIR_NAME, encoding=ParquetEncoding())
 aws_weather_uploader = AWSWeatherUploader(weather_provider=api_weather_provider, aws_dispatcher=aws_dispatcher)
 
 # Upload historical weather to AWS
-aws_weather_uploader.upload_historical(start_date=START_DATE, end_date=END_DATE, sleep_duration=SLEEP_DURATION)
+if APPEND:
+    upload_stats = aws_weather_uploader.append_historical(start_date=START_DATE,
+                                                          end_date=END_DATE,
+                                                          max_concurrent_chunks=MAX_CONCURRENT_CHUNKS,
+                                                          requests_per_second=REQUESTS_PER_SECOND)
+    print(f'Append complete: {upload_stats.summary()}')
+elif TO_STORE:
+    upload_stats = aws_weather_uploader.backfill_historical(start_date=START_DATE,
+                                                            end_date=END_DATE,
+                                                            max_concurrent_chunks=MAX_CONCURRENT_CHUNKS,
+                                                            requests_per_second=REQUESTS_PER_SECOND)
+    print(f'Backfill complete: {upload_stats.summary()}')
+else:
+    aws_weather_uploader.upload_historical(start_date=START_DATE, end_date=END_DATE, sleep_duration=SLEEP_DURATION)
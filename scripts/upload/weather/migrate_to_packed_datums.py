@@ -0,0 +1,20 @@
+# Helper script for rewriting datums stored in the legacy layout (meta.json, units.json, data.parquet) into the packed single object format (datum.parquet). Intended to be run once per AWS directory before switching uploads to pack_datums=True, which also makes downloads look for the packed format first.
+# Usage: python scripts/upload/weather/migrate_to_packed_datums.py [--remove-legacy] [DIR_PATH ...], where DIR_PATH defaults to "historical" and "current".
+import sys
+
+from rlf.aws_dispatcher import get_dispatcher
+
+# Parse command line args
+args = [arg for arg in sys.argv[1:] if not arg.startswith("-")]
+REMOVE_LEGACY = "--remove-legacy" in sys.argv[1:]
+DIR_PATHS = args if len(args) > 0 else ["historical", "current"]
+
+# Tunable parameters
+BUCKET_NAME = "all-weather-data"
+AWS_DIR_NAME = "open-meteo"
+
+aws_dispatcher = get_dispatcher(BUCKET_NAME, AWS_DIR_NAME)
+
+for dir_path in DIR_PATHS:
+    num_migrated = aws_dispatcher.migrate_to_packed(dir_path, remove_legacy=REMOVE_LEGACY)
+    print(f'Migrated {num_migrated} datums in {dir_path}')
@@ -0,0 +1,16 @@
+# Helper script for rebuilding the manifest of current weather uploads from a full listing of the "current" directory. Intended to be run once per AWS directory for timestamps uploaded before the manifest existed.
+# Usage: python scripts/upload/weather/rebuild_current_manifest.py [AWS_DIR_NAME], where AWS_DIR_NAME defaults to "open-meteo".
+import sys
+
+from rlf.aws_dispatcher import get_dispatcher
+
+# Parse command line args
+args = [arg for arg in sys.argv[1:] if not arg.startswith("-")]
+AWS_DIR_NAME = args[0] if len(args) > 0 else "open-meteo"
+
+# Tunable parameters
+BUCKET_NAME = "all-weather-data"
+
+aws_dispatcher = get_dispatcher(BUCKET_NAME, AWS_DIR_NAME)
+manifest = aws_dispatcher.rebuild_current_manifest()
+print(f'Recorded {len(manifest)} timestamps, {len(manifest.timestamps())} of them complete')
@@ -1,30 +1,458 @@
+from dataclasses import dataclass
+from datetime import datetime
+import io
 import json
-from typing import List
 import os
-
-from pandas import DataFrame
+import threading
+from typing import IO, Any, Dict, List, Tuple
+
+from fsspec import AbstractFileSystem
+from fsspec.implementations.local import LocalFileSystem
+from fsspec.parquet import open_parquet_file
+from pandas import DataFrame, Timestamp
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pa_fs
 import pyarrow.parquet as pq
-import s3fs
 
+from rlf.current_manifest import CurrentManifest
+from rlf.disk_cache import DEFAULT_CACHE_PATH, DiskCache
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
 from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import WeatherDatum
+from rlf.storage_backend import S3ConnectionConfig, StorageBackend, clear_s3_filesystems
 from typing import Optional
 
 
-DEFAULT_LOCAL_PATH = os.path.join("data", "aws_dispatch")
-os.makedirs(DEFAULT_LOCAL_PATH, exist_ok=True)
+DEFAULT_LOCAL_PATH = DEFAULT_CACHE_PATH
+
+# Number of rows per parquet row group for uploaded hourly data (about three months). Row group statistics on the time column let reads for a time range skip every other row group.
+HOURLY_ROW_GROUP_SIZE = 24 * 92
+
+# Packed datums store meta data, units and hourly data in a single parquet object. Meta data and units live in the parquet key-value metadata under PACKED_DATUM_METADATA_KEY.
+PACKED_DATUM_FILENAME = "datum"
+PACKED_DATUM_METADATA_KEY = b"rlf_weather_datum"
+PACKED_DATUM_FORMAT_VERSION = 1
+
+# Files written with a ParquetEncoding record the encoding version and the original column types in the parquet key-value metadata under PARQUET_ENCODING_METADATA_KEY.
+PARQUET_ENCODING_METADATA_KEY = b"rlf_encoding"
+PARQUET_ENCODING_VERSION = 1
+
+# Weather stores are hive partitioned parquet datasets keyed by coordinate and year, ie "<store>/coordinate=lon_-120.80_lat_44.20/year=2020/part-0.parquet".
+# Every file is a packed datum holding the rows of a single year.
+HISTORICAL_STORE_DIR = "historical_store"
+STORE_COORDINATE_FIELD = "coordinate"
+STORE_YEAR_FIELD = "year"
+
+# The manifest of "current" timestamps lives next to (not in) the "current" directory, so it never shows up as a timestamp when listing.
+CURRENT_MANIFEST_PATH = "current_manifest.json"
+
+
+def _time_range_filters(start: Optional[datetime] = None, end: Optional[datetime] = None) -> Optional[List[Tuple[str, str, Any]]]:
+    """Build pyarrow filters selecting rows of the time column within a range.
+
+    Args:
+        start (datetime, optional): Earliest time (inclusive). Defaults to None (no lower bound).
+        end (datetime, optional): Latest time (inclusive). Defaults to None (no upper bound).
+
+    Returns:
+        Optional[List[Tuple[str, str, Any]]]: Filters in the form accepted by pyarrow.parquet, or None if there are no bounds.
+    """
+    filters = []
+    if start is not None:
+        filters.append(("time", ">=", start))
+    if end is not None:
+        filters.append(("time", "<=", end))
+    return filters if len(filters) > 0 else None
+
+
+def _float32_schema(schema: pa.Schema) -> pa.Schema:
+    """Replace all floating point types of a schema with float32, keeping the metadata.
+
+    Args:
+        schema (pa.Schema): Schema to convert.
+
+    Returns:
+        pa.Schema: The converted schema.
+    """
+    for i, field in enumerate(schema):
+        if pa.types.is_floating(field.type) and not pa.types.is_float32(field.type):
+            schema = schema.set(i, field.with_type(pa.float32()))
+    return schema
+
+
+def cast_to_float32(table: pa.Table) -> pa.Table:
+    """Cast all floating point columns of a table to float32. Other columns (ie time) and the schema metadata are left untouched.
+
+    Converting the result to pandas yields a single contiguous float32 block for the weather parameters, half the size of the float64 data written by the adapters.
+
+    Args:
+        table (pa.Table): Table to cast.
+
+    Returns:
+        pa.Table: The cast table.
+    """
+    return table.cast(_float32_schema(table.schema))
+
+
+def _restored_schema(schema: pa.Schema) -> pa.Schema:
+    """Replace the types of columns stored by a ParquetEncoding with the types they were written with.
+
+    Args:
+        schema (pa.Schema): Schema as read from a file.
+
+    Raises:
+        ValueError: If the file was written by a newer encoding version.
+
+    Returns:
+        pa.Schema: The schema with the original column types. Unchanged if the file was not written with a ParquetEncoding.
+    """
+    schema_metadata = schema.metadata or {}
+    if PARQUET_ENCODING_METADATA_KEY not in schema_metadata:
+        return schema
+
+    encoding_metadata = json.loads(schema_metadata[PARQUET_ENCODING_METADATA_KEY])
+    if encoding_metadata["version"] > PARQUET_ENCODING_VERSION:
+        raise ValueError(f"Unsupported parquet encoding version: {encoding_metadata['version']}")
+
+    for name, type_name in encoding_metadata["types"].items():
+        i = schema.get_field_index(name)
+        if i >= 0:
+            schema = schema.set(i, schema.field(i).with_type(pa.type_for_alias(type_name)))
+    return schema
+
+
+def restore_types(table: pa.Table) -> pa.Table:
+    """Cast the columns of a table read from a file written with a ParquetEncoding back to the types they were uploaded with (ie float64 columns which were stored as float32). Columns uploaded as float32 are read back as float32.
+
+    Args:
+        table (pa.Table): Table read from a parquet file. May hold a subset of the stored columns.
+
+    Returns:
+        pa.Table: The table with the original column types. Unchanged if the file was not written with a ParquetEncoding.
+    """
+    schema = _restored_schema(table.schema)
+    return table if schema.equals(table.schema) else table.cast(schema)
+
+
+@dataclass(frozen=True)
+class ParquetEncoding:
+    """Compact parquet encoding for hourly weather data.
+
+    Weather parameters are low precision physical measurements, so they are stored as float32. Hourly timestamps differ by a constant step, which delta encoding reduces to almost nothing. The types the data was written with are recorded in the file metadata and restored on read (see restore_types).
+
+    Args:
+        float32 (bool): Whether floating point columns are stored as float32.
+        compression (str): Parquet compression codec.
+        compression_level (int, optional): Level of the compression codec. None uses the codec's default.
+        delta_time (bool): Whether the time column is delta encoded (instead of dictionary encoded).
+    """
+    float32: bool = True
+    compression: str = "zstd"
+    compression_level: Optional[int] = 9
+    delta_time: bool = True
+
+    def encode(self, table: pa.Table) -> pa.Table:
+        """Convert a table to the stored types, recording the original types in the schema metadata.
+
+        Args:
+            table (pa.Table): Table to encode.
+
+        Returns:
+            pa.Table: The encoded table.
+        """
+        schema = _float32_schema(table.schema) if self.float32 else table.schema
+        encoding_metadata = {
+            "version": PARQUET_ENCODING_VERSION,
+            "types": {field.name: str(field.type) for field, stored_field in zip(table.schema, schema) if field.type != stored_field.type}
+        }
+        schema_metadata = dict(schema.metadata or {})
+        schema_metadata[PARQUET_ENCODING_METADATA_KEY] = json.dumps(encoding_metadata).encode()
+        return table.cast(schema.with_metadata(schema_metadata))
+
+    def write_options(self, table: pa.Table) -> Dict[str, Any]:
+        """Build the options for pyarrow.parquet.write_table.
+
+        Args:
+            table (pa.Table): The (encoded) table to write.
+
+        Returns:
+            Dict[str, Any]: Keyword arguments for write_table.
+        """
+        options: Dict[str, Any] = {"compression": self.compression, "compression_level": self.compression_level}
+        if self.delta_time and "time" in table.column_names:
+            # delta encoding is not available for dictionary encoded columns
+            options["use_dictionary"] = [name for name in table.column_names if name != "time"]
+            options["column_encoding"] = {"time": "DELTA_BINARY_PACKED"}
+        return options
+
+
+def write_parquet(table: pa.Table, encoding: Optional[ParquetEncoding] = None, row_group_size: Optional[int] = HOURLY_ROW_GROUP_SIZE) -> bytes:
+    """Serialize a table to parquet.
+
+    Args:
+        table (pa.Table): Table to serialize.
+        encoding (ParquetEncoding, optional): Encoding to use. Defaults to None (pyarrow defaults, as written by pandas).
+        row_group_size (int, optional): Maximum number of rows per parquet row group. Defaults to HOURLY_ROW_GROUP_SIZE.
+
+    Returns:
+        bytes: Parquet file contents.
+    """
+    options: Dict[str, Any] = {}
+    if encoding is not None:
+        table = encoding.encode(table)
+        options = encoding.write_options(table)
+
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=row_group_size, **options)
+    return buffer.getvalue()
+
+
+def pack_datum(datum: WeatherDatum, encoding: Optional[ParquetEncoding] = None) -> bytes:
+    """Serialize a WeatherDatum into a single parquet file. Rows are sorted and row grouped by time.
+
+    Args:
+        datum (WeatherDatum): The datum to serialize.
+        encoding (ParquetEncoding, optional): Encoding to use. Defaults to None (pyarrow defaults).
+
+    Returns:
+        bytes: Parquet file contents. Meta data and units are stored in the file's key-value metadata.
+    """
+    table = pa.Table.from_pandas(datum.hourly_parameters.sort_index())
+    packed_metadata = {
+        "format_version": PACKED_DATUM_FORMAT_VERSION,
+        "meta_data": datum.meta_data,
+        "hourly_units": datum.hourly_units
+    }
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[PACKED_DATUM_METADATA_KEY] = json.dumps(packed_metadata).encode()
+    table = table.replace_schema_metadata(schema_metadata)
+
+    return write_parquet(table, encoding)
+
+
+def unpack_datum(table: pa.Table) -> WeatherDatum:
+    """Build a WeatherDatum from a table read out of a packed datum parquet file.
+
+    Args:
+        table (pa.Table): Table read from a packed datum file. May hold a subset of the stored columns.
+
+    Raises:
+        ValueError: If the table does not carry packed datum metadata, or was written by a newer format version.
+
+    Returns:
+        WeatherDatum: The unpacked datum. Units are limited to the columns present in the table.
+    """
+    schema_metadata = table.schema.metadata or {}
+    if PACKED_DATUM_METADATA_KEY not in schema_metadata:
+        raise ValueError("Parquet file does not contain packed datum metadata")
+
+    packed_metadata = json.loads(schema_metadata[PACKED_DATUM_METADATA_KEY])
+    if packed_metadata["format_version"] > PACKED_DATUM_FORMAT_VERSION:
+        raise ValueError(f"Unsupported packed datum format version: {packed_metadata['format_version']}")
+
+    hourly_parameters = table.to_pandas()
+    hourly_units = packed_metadata["hourly_units"]
+    if hourly_units is not None:
+        hourly_units = {key: value for key, value in hourly_units.items() if key in hourly_parameters.columns}
+
+    return WeatherDatum(hourly_units=hourly_units, hourly_parameters=hourly_parameters, **packed_metadata["meta_data"])
+
+
+# Process wide registry of dispatchers. Keyed by process id as well, since connection pools must not be shared with forked processes.
+_dispatchers: Dict[Tuple[Any, ...], "AWSDispatcher"] = {}
+_registry_lock = threading.Lock()
+
+
+def get_dispatcher(bucket_name: str, directory_name: str, connection_config: Optional[S3ConnectionConfig] = None, **kwargs: Any) -> "AWSDispatcher":
+    """Get the AWSDispatcher shared by everything in this process using the same bucket, directory and options. See AWSDispatcher for the options.
+
+    Shared dispatchers should be treated as read only, since changing an attribute (ie use_cache) affects every user.
+
+    Args:
+        bucket_name (str): The target bucket for dispatching.
+        directory_name (str): Directory name within the target bucket.
+        connection_config (S3ConnectionConfig, optional): Connection settings of the shared S3 filesystem. Defaults to None (S3ConnectionConfig()).
+        **kwargs: Further options passed to AWSDispatcher.
+
+    Returns:
+        AWSDispatcher: The shared dispatcher.
+    """
+    backend = StorageBackend.s3(bucket_name, directory_name, connection_config)
+    key = (os.getpid(), bucket_name, directory_name, connection_config, tuple(sorted(kwargs.items(), key=lambda item: item[0])))
+    with _registry_lock:
+        dispatcher = _dispatchers.get(key)
+        if dispatcher is None:
+            dispatcher = AWSDispatcher(backend=backend, **kwargs)
+            _dispatchers[key] = dispatcher
+    return dispatcher
+
+
+def clear_shared_connections() -> None:
+    """Forget all shared S3 filesystems and dispatchers, ie after credentials changed. Users holding on to them are unaffected."""
+    clear_s3_filesystems()
+    with _registry_lock:
+        _dispatchers.clear()
 
 
 class AWSDispatcher():
-    def __init__(self, bucket_name: str, directory_name: str) -> None:
-        """Create a new AWS Dispatcher instance.
+    def __init__(self,
+                 bucket_name: Optional[str] = None,
+                 directory_name: Optional[str] = None,
+                 pack_datums: bool = False,
+                 read_packed_first: Optional[bool] = None,
+                 use_cache: bool = False,
+                 cache: Optional[DiskCache] = None,
+                 as_float32: bool = False,
+                 backend: Optional[StorageBackend] = None,
+                 encoding: Optional[ParquetEncoding] = None) -> None:
+        """Create a new AWS Dispatcher instance. Use get_dispatcher to share a dispatcher within the process.
+
+        Data is stored in S3 unless another backend (ie StorageBackend.local or StorageBackend.memory) is given, in which case the bucket and directory names are not used.
+
+        Args:
+            bucket_name (str, optional): The target bucket for dispatching. MUST already exist in AWS. Required if no backend is given.
+            directory_name (str, optional): Directory name within the target bucket. Does not need to already exist. Required if no backend is given.
+            pack_datums (bool, optional): Whether datums are uploaded in the packed single object format rather than the legacy meta/units/data layout. Both layouts can always be downloaded. Defaults to False.
+            read_packed_first (bool, optional): Which layout downloads look for first: the packed format if True, the legacy layout if False. The other layout is only requested for datums missing from the first, ie those not yet migrated. Defaults to None (the layout uploaded, see pack_datums).
+            use_cache (bool, optional): Whether downloads are read through a local disk cache. Every read still validates the remote ETag, but unchanged files are only transferred once. May be toggled later through the use_cache attribute. Defaults to False.
+            cache (DiskCache, optional): The cache to use. Defaults to None (a DiskCache in DEFAULT_LOCAL_PATH is created on first use).
+            as_float32 (bool, optional): Whether downloaded datums hold their hourly parameters as float32 rather than the types they were uploaded with, ie float64 for legacy data. The parameters are cast in Arrow before conversion to pandas, so a single float32 block is built without an intermediate float64 copy. Defaults to False.
+            backend (StorageBackend, optional): The storage holding the data. Defaults to None (StorageBackend.s3 for the bucket and directory).
+            encoding (ParquetEncoding, optional): Encoding of uploaded parquet files, ie ParquetEncoding() for compact float32 and zstd files. Files are always read back with the types they were uploaded with, whatever their encoding. Defaults to None (pyarrow defaults).
+
+        Raises:
+            ValueError: If neither a backend nor a bucket and directory name are given.
+        """
+        if backend is None:
+            if bucket_name is None or directory_name is None:
+                raise ValueError("Either a backend or a bucket and directory name must be given")
+            backend = StorageBackend.s3(bucket_name, directory_name)
+        self.s3 = backend.filesystem
+        self.working_dir = backend.root
+        self.pack_datums = pack_datums
+        self.read_packed_first = read_packed_first if read_packed_first is not None else pack_datums
+        self.use_cache = use_cache
+        self._cache = cache
+        self.as_float32 = as_float32
+        self.encoding = encoding
+
+    @property
+    def cache(self) -> DiskCache:
+        """The local disk cache used when use_cache is enabled. Hit/miss statistics are available through cache.stats.
+
+        Returns:
+            DiskCache: The cache.
+        """
+        if self._cache is None:
+            self._cache = DiskCache(DEFAULT_LOCAL_PATH)
+        return self._cache
+
+    def _open_for_read(self, path: str) -> IO[bytes]:
+        """Open a remote file for reading, going through the local disk cache if it is enabled.
 
         Args:
-            bucket_name (str): The target bucket for dispatching. MUST already exist in AWS.
-            directory_name (str): Directory name within the target bucket. Does not need to already exist.
+            path (str): Full path of the file.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+
+        Returns:
+            IO[bytes]: Readable binary file object.
+        """
+        if not self.use_cache:
+            return self.s3.open(path, 'rb')
+        return open(self.cache.fetch(self.s3, path), 'rb')
+
+    def _resolve_read_paths(self, paths: List[str]) -> Tuple[AbstractFileSystem, List[str]]:
+        """Resolve remote files to the filesystem and paths they should be read from, fetching them into the local disk cache if it is enabled.
+
+        Args:
+            paths (List[str]): Full paths of the files.
+
+        Returns:
+            Tuple[AbstractFileSystem, List[str]]: The filesystem to read from and the corresponding paths on it.
+        """
+        if not self.use_cache:
+            return self.s3, paths
+        return LocalFileSystem(), [self.cache.fetch(self.s3, path) for path in paths]
+
+    def _open_parquet_for_read(self,
+                               path: str,
+                               columns: Optional[List[str]] = None,
+                               start: Optional[datetime] = None,
+                               end: Optional[datetime] = None) -> IO[bytes]:
+        """Open a remote parquet file such that only the byte ranges holding the requested columns and time range are transferred.
+
+        The footer is read first to find the row groups overlapping the time range (from statistics on the time column), then all needed column chunks are fetched in a single batch of concurrent range requests. Reads through the local disk cache always fetch whole files.
+
+        Args:
+            path (str): Full path of the file.
+            columns (list[str], optional): Columns which will be read. All columns if set to None. Defaults to None.
+            start (datetime, optional): Earliest time which will be read. Defaults to None (no lower bound).
+            end (datetime, optional): Latest time which will be read. Defaults to None (no upper bound).
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+
+        Returns:
+            IO[bytes]: Readable binary file object.
         """
-        self.s3 = s3fs.S3FileSystem(anon=False)
-        self.working_dir = f's3://{bucket_name}/{directory_name}'
+        if self.use_cache or (columns is None and start is None and end is None):
+            return self._open_for_read(path)
+
+        with self.s3.open(path, 'rb') as f:
+            metadata = pq.read_metadata(f)
+
+        row_groups = None
+        if (start is not None or end is not None) and "time" in metadata.schema.names:
+            time_index = metadata.schema.names.index("time")
+            row_groups = []
+            for i in range(metadata.num_row_groups):
+                statistics = metadata.row_group(i).column(time_index).statistics
+                if statistics is not None and statistics.has_min_max:
+                    if start is not None and statistics.max < start:
+                        continue
+                    if end is not None and statistics.min > end:
+                        continue
+                row_groups.append(i)
+
+        read_columns = None if columns is None else list(columns) + ["time"]
+        return open_parquet_file(path, fs=self.s3, columns=read_columns, row_groups=row_groups, engine="pyarrow")
+
+    def _read_parquet_table(self,
+                            path: str,
+                            columns: Optional[List[str]] = None,
+                            start: Optional[datetime] = None,
+                            end: Optional[datetime] = None,
+                            ignore_missing_columns: bool = False,
+                            as_float32: bool = False) -> pa.Table:
+        """Read a remote parquet file into a table. The time column (and the index described by any pandas metadata) is always read.
+
+        Args:
+            path (str): Full path of the file.
+            columns (list[str], optional): Columns to read. All available will be read if set to None. Defaults to None.
+            start (datetime, optional): Earliest time to read (inclusive). Expected to be timezone aware. Defaults to None (no lower bound).
+            end (datetime, optional): Latest time to read (inclusive). Expected to be timezone aware. Defaults to None (no upper bound).
+            ignore_missing_columns (bool, optional): Whether requested columns which are not in the file are skipped rather than raising an error. Defaults to False.
+            as_float32 (bool, optional): Whether floating point columns are cast to float32. Defaults to False.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+
+        Returns:
+            pa.Table: The table read.
+        """
+        with self._open_parquet_for_read(path, columns=columns, start=start, end=end) as f:
+            if columns is not None:
+                available_columns = pq.read_schema(f).names
+                f.seek(0)
+                if ignore_missing_columns:
+                    columns = [column for column in columns if column in available_columns]
+                if "time" in available_columns and "time" not in columns:
+                    columns = columns + ["time"]
+            table = pq.read_table(f, columns=columns, use_pandas_metadata=True, filters=_time_range_filters(start, end))
+        return cast_to_float32(table) if as_float32 else restore_types(table)
 
     def upload_as_json(self, dictionary: dict, folder_name: str, filename: str) -> None:
         """
@@ -57,36 +485,48 @@ class AWSDispatcher():
         """
         path = f'{self.working_dir}/{folder_name}/{filename}.json'
         try:
-            with self.s3.open(path, 'rb') as f:
+            with self._open_for_read(path) as f:
                 data = json.load(f)
         except FileNotFoundError:
             raise FileNotFoundError("Could not find a json file at path: " + path)
 
         return data
 
-    def upload_as_parquet(self, dataframe: DataFrame, folder_name: str, filename: str) -> None:
+    def upload_as_parquet(self, dataframe: DataFrame, folder_name: str, filename: str, row_group_size: Optional[int] = HOURLY_ROW_GROUP_SIZE) -> None:
         """
-        Pickle the given dictionary locally, and upload the file to AWS
+        Write the given DataFrame as parquet and upload the file to AWS. Rows are sorted by the index so that row group statistics can be used to skip data on time range reads. The file is written with the dispatcher's encoding.
 
         Args:
             dataframe (DataFrame): DataFrame to upload to S3.
             folder_name (str): desired folder for the file. Determines s3 folder name.
             filename (str): desired name for the file. Determines s3 file name.
+            row_group_size (int, optional): Maximum number of rows per parquet row group. Defaults to HOURLY_ROW_GROUP_SIZE.
         """
         path = f'{self.working_dir}/{folder_name}/{filename}.parquet'
 
         self.s3.write_bytes(
-            value=dataframe.to_parquet(),
+            value=write_parquet(pa.Table.from_pandas(dataframe.sort_index()), self.encoding, row_group_size),
             path=path
         )
 
-    def download_df_from_parquet(self, folder_name: str, filename: str, columns: Optional[List[str]] = None) -> DataFrame:
-        """Download a parquet file from AWS and parse it into a DataFRame
+    def download_df_from_parquet(self,
+                                 folder_name: str,
+                                 filename: str,
+                                 columns: Optional[List[str]] = None,
+                                 start: Optional[datetime] = None,
+                                 end: Optional[datetime] = None,
+                                 ignore_missing_columns: bool = False,
+                                 as_float32: bool = False) -> DataFrame:
+        """Download a parquet file from AWS and parse it into a DataFRame. Only the requested columns are transferred and decoded. Time bounds are pushed down to parquet, so row groups entirely outside of the range are neither transferred nor decoded.
 
         Args:
             folder_name (str): Folder of the file.
             filename (str): Name for the file.
             columns (list[str], optional): Columns to fetch. All available will be fetched if set to None. Defaults to None.
+            start (datetime, optional): Earliest time to fetch (inclusive). Expected to be timezone aware. Defaults to None (no lower bound).
+            end (datetime, optional): Latest time to fetch (inclusive). Expected to be timezone aware. Defaults to None (no upper bound).
+            ignore_missing_columns (bool, optional): Whether requested columns which are not in the file are skipped rather than raising an error. Defaults to False.
+            as_float32 (bool, optional): Whether floating point columns are read as float32. Defaults to False.
 
         Raises:
             FileNotFoundError: Raised if the file cannot be found at the expected path in AWS.
@@ -96,38 +536,126 @@ class AWSDispatcher():
         """
         path = f'{self.working_dir}/{folder_name}/{filename}.parquet'
         try:
-            dataset = pq.ParquetDataset(path, filesystem=self.s3)
-            if columns is not None and 'time' not in columns:
-                columns.append('time')
-            table = dataset.read(columns=columns)
+            table = self._read_parquet_table(path, columns=columns, start=start, end=end, ignore_missing_columns=ignore_missing_columns, as_float32=as_float32)
             df = table.to_pandas()
         except FileNotFoundError:
             raise FileNotFoundError("Could not find a parquet file at path: " + path)
         return df
 
-    def upload_datum(self, datum: WeatherDatum, dir_path: Optional[str] = None) -> None:
+    @staticmethod
+    def _datum_folder_name(longitude: float, latitude: float, dir_path: Optional[str] = None) -> str:
+        """Build the folder name (relative to the working directory) that holds the datum for a location.
+
+        Args:
+            longitude (float): Longitude of the datum.
+            latitude (float): Latitude of the datum.
+            dir_path (str, optional): Directory path containing the datum folder. Defaults to None.
+
+        Returns:
+            str: The datum folder name.
+        """
+        folder_name = f'lon_{longitude:.2f}_lat_{latitude:.2f}'
+        if dir_path is None:
+            return folder_name
+        return f'{dir_path}/{folder_name}'
+
+    def upload_datum(self, datum: WeatherDatum, dir_path: Optional[str] = None, packed: Optional[bool] = None) -> None:
         """Upload an entire WeatherDatum to S3.
 
         Args:
             datum (WeatherDatum): The Datum to upload.
             dir_path (str): Directory path to which datum should be uploaded.
+            packed (bool, optional): Whether to upload in the packed single object format. Defaults to None (use the dispatcher's pack_datums setting).
         """
-        if dir_path is None:
-            folder_name = f'lon_{datum.longitude:.2f}_lat_{datum.latitude:.2f}'
+        folder_name = self._datum_folder_name(datum.longitude, datum.latitude, dir_path)
+
+        if packed is None:
+            packed = self.pack_datums
+
+        if packed:
+            self.s3.write_bytes(
+                value=pack_datum(datum, self.encoding),
+                path=f'{self.working_dir}/{folder_name}/{PACKED_DATUM_FILENAME}.parquet'
+            )
         else:
-            folder_name = f'{dir_path}/lon_{datum.longitude:.2f}_lat_{datum.latitude:.2f}'
+            self.upload_as_json(datum.meta_data, folder_name, "meta")
+            self.upload_as_json(datum.hourly_units, folder_name, "units")
+            self.upload_as_parquet(datum.hourly_parameters, folder_name, "data")
+
+    def _download_packed_datum(self,
+                               folder_name: str,
+                               columns: Optional[List[str]] = None,
+                               start: Optional[datetime] = None,
+                               end: Optional[datetime] = None,
+                               ignore_missing_columns: bool = False) -> WeatherDatum:
+        """Download a datum stored in the packed single object format. Only a single object is fetched.
+
+        Args:
+            folder_name (str): Folder of the datum.
+            columns (list[str], optional): Columns to fetch. All available will be fetched if set to None. Defaults to None.
+            start (datetime, optional): Earliest time to fetch (inclusive). Defaults to None (no lower bound).
+            end (datetime, optional): Latest time to fetch (inclusive). Defaults to None (no upper bound).
+            ignore_missing_columns (bool, optional): Whether requested columns which are not stored are skipped rather than raising an error. Defaults to False.
+
+        Raises:
+            FileNotFoundError: Raised if there is no packed datum in the folder.
+
+        Returns:
+            WeatherDatum: Downloaded WeatherDatum
+        """
+        path = f'{self.working_dir}/{folder_name}/{PACKED_DATUM_FILENAME}.parquet'
+        try:
+            table = self._read_parquet_table(path, columns=columns, start=start, end=end, ignore_missing_columns=ignore_missing_columns,
+                                             as_float32=self.as_float32)
+        except FileNotFoundError:
+            raise FileNotFoundError("Could not find a packed datum at path: " + path)
+        return unpack_datum(table)
+
+    def _download_legacy_datum(self,
+                               folder_name: str,
+                               columns: Optional[List[str]] = None,
+                               start: Optional[datetime] = None,
+                               end: Optional[datetime] = None,
+                               ignore_missing_columns: bool = False) -> WeatherDatum:
+        """Download a datum stored in the legacy layout of separate meta, units and data objects.
+
+        Args:
+            folder_name (str): Folder of the datum.
+            columns (list[str], optional): Columns to fetch. All available will be fetched if set to None. Defaults to None.
+            start (datetime, optional): Earliest time to fetch (inclusive). Defaults to None (no lower bound).
+            end (datetime, optional): Latest time to fetch (inclusive). Defaults to None (no upper bound).
+            ignore_missing_columns (bool, optional): Whether requested columns which are not stored are skipped rather than raising an error. Defaults to False.
 
-        self.upload_as_json(datum.meta_data, folder_name, "meta")
-        self.upload_as_json(datum.hourly_units, folder_name, "units")
-        self.upload_as_parquet(datum.hourly_parameters, folder_name, "data")
+        Raises:
+            FileNotFoundError: Raised if any of the needed files cannot be found.
 
-    def download_datum(self, coordinate: Coordinate, columns: Optional[List[str]] = None,  dir_path: Optional[str] = None) -> WeatherDatum:
-        """Download an entire WeatherDatum from S3.
+        Returns:
+            WeatherDatum: Downloaded WeatherDatum
+        """
+        meta_data = self.download_dict_from_json(folder_name, "meta")
+        hourly_units = self.download_dict_from_json(folder_name, "units")
+        hourly_parameters = self.download_df_from_parquet(folder_name, "data", columns=columns, start=start, end=end, ignore_missing_columns=ignore_missing_columns,
+                                                          as_float32=self.as_float32)
+        if columns is not None:
+            hourly_units = dict((key, hourly_units[key]) for key in columns if key in hourly_parameters.columns)
+        return WeatherDatum(hourly_units=hourly_units, hourly_parameters=hourly_parameters, **meta_data)
+
+    def download_datum(self,
+                       coordinate: Coordinate,
+                       columns: Optional[List[str]] = None,
+                       dir_path: Optional[str] = None,
+                       start: Optional[datetime] = None,
+                       end: Optional[datetime] = None,
+                       ignore_missing_columns: bool = False) -> WeatherDatum:
+        """Download an entire WeatherDatum from S3. Datums in the packed format are fetched with a single request, otherwise the legacy layout is read. The layout given by read_packed_first is requested first, so that datums in that layout never cost a failed request for the other.
 
         Args:
             coordinate (Coordinate): Coordinate to fetch Datum for.
             columns (list[str], optional): Columns to fetch. All available will be fetched if set to None. Defaults to None.
             dir_path (str): Directory path to which datum should be uploaded.
+            start (datetime, optional): Earliest time to fetch (inclusive). Expected to be timezone aware. Defaults to None (no lower bound).
+            end (datetime, optional): Latest time to fetch (inclusive). Expected to be timezone aware. Defaults to None (no upper bound).
+            ignore_missing_columns (bool, optional): Whether requested columns which are not stored are skipped rather than raising an error. Useful when requesting several possible names for a parameter. Defaults to False.
 
         Raises:
             FileNotFoundError: Raised if any needed files cannot be found at the expected paths in AWS.
@@ -135,17 +663,307 @@ class AWSDispatcher():
         Returns:
             WeatherDatum: Downloaded WeatherDatum
         """
-        folder_name = f'{dir_path}/lon_{coordinate.lon:.2f}_lat_{coordinate.lat:.2f}'
+        folder_name = self._datum_folder_name(coordinate.lon, coordinate.lat, dir_path)
+        layouts = [self._download_packed_datum, self._download_legacy_datum]
+        if not self.read_packed_first:
+            layouts.reverse()
         try:
-            meta_data = self.download_dict_from_json(folder_name, "meta")
-            hourly_units = self.download_dict_from_json(folder_name, "units")
-            if columns is not None:
-                hourly_units = dict((key, hourly_units[key]) for key in columns)
-            hourly_parameters = self.download_df_from_parquet(folder_name, "data", columns=columns)
+            return layouts[0](folder_name, columns=columns, start=start, end=end, ignore_missing_columns=ignore_missing_columns)
+        except FileNotFoundError:
+            pass
+
+        try:
+            return layouts[1](folder_name, columns=columns, start=start, end=end, ignore_missing_columns=ignore_missing_columns)
         except FileNotFoundError:
             raise FileNotFoundError("Error occured while fetching saved datum from AWS for coordinate: " + str(coordinate) + ". Expected datum folder was " + folder_name)
-        datum = WeatherDatum(hourly_units=hourly_units, hourly_parameters=hourly_parameters, **meta_data)
-        return datum
+
+    def migrate_to_packed(self, dir_path: str, remove_legacy: bool = False) -> int:
+        """Rewrite all legacy layout datums below a directory in the packed format. Directories are walked recursively, so both "historical" and "current" (with its timestamp subdirectories) may be given. Datums which are already packed are skipped.
+
+        Args:
+            dir_path (str): Directory path, relative to the working directory, to migrate.
+            remove_legacy (bool, optional): Whether to delete the legacy meta, units and data objects once the packed datum is written. Defaults to False.
+
+        Raises:
+            ValueError: If the dispatcher reads datums as float32, since migrating would lose precision.
+
+        Returns:
+            int: The number of datums migrated.
+        """
+        if self.as_float32:
+            raise ValueError("Cannot migrate datums with a dispatcher which reads them as float32")
+
+        root = self.s3._strip_protocol(self.working_dir)
+        num_migrated = 0
+        for path in self.s3.ls(f'{self.working_dir}/{dir_path}', detail=False):
+            name = path.rstrip("/").split("/")[-1]
+            if not self.s3.isdir(path):
+                continue
+            folder_name = path[len(root):].strip("/")
+            if not name.startswith("lon_"):
+                num_migrated += self.migrate_to_packed(folder_name, remove_legacy=remove_legacy)
+                continue
+
+            legacy_paths = [f'{self.working_dir}/{folder_name}/{filename}' for filename in ("meta.json", "units.json", "data.parquet")]
+            if self.s3.exists(f'{self.working_dir}/{folder_name}/{PACKED_DATUM_FILENAME}.parquet') or not self.s3.exists(legacy_paths[0]):
+                continue
+
+            datum = self._download_legacy_datum(folder_name)
+            self.s3.write_bytes(
+                value=pack_datum(datum, self.encoding),
+                path=f'{self.working_dir}/{folder_name}/{PACKED_DATUM_FILENAME}.parquet'
+            )
+            if remove_legacy:
+                self.s3.rm(legacy_paths)
+            num_migrated += 1
+
+        return num_migrated
+
+    @staticmethod
+    def _store_coordinate_key(longitude: float, latitude: float) -> str:
+        """Build the value of the coordinate partition for a location in a weather store.
+
+        Args:
+            longitude (float): Longitude of the location.
+            latitude (float): Latitude of the location.
+
+        Returns:
+            str: The partition value.
+        """
+        return f'lon_{longitude:.2f}_lat_{latitude:.2f}'
+
+    def upload_datum_to_store(self, datum: WeatherDatum, store_name: str = HISTORICAL_STORE_DIR, part_name: str = "part-0") -> None:
+        """Upload a WeatherDatum to a weather store, writing one packed parquet file per calendar year of data. Files with the same part name are overwritten.
+
+        Args:
+            datum (WeatherDatum): The Datum to upload.
+            store_name (str, optional): Directory of the store, relative to the working directory. Defaults to HISTORICAL_STORE_DIR.
+            part_name (str, optional): Name of the file written within each year partition. Defaults to "part-0".
+        """
+        coordinate_key = self._store_coordinate_key(datum.longitude, datum.latitude)
+        hourly_parameters = datum.hourly_parameters.sort_index()
+
+        for year, yearly_parameters in hourly_parameters.groupby(hourly_parameters.index.year):
+            yearly_datum = WeatherDatum(hourly_units=datum.hourly_units, hourly_parameters=yearly_parameters, **datum.meta_data)
+            path = f'{self.working_dir}/{store_name}/{STORE_COORDINATE_FIELD}={coordinate_key}/{STORE_YEAR_FIELD}={year}/{part_name}.parquet'
+            self.s3.write_bytes(value=pack_datum(yearly_datum, self.encoding), path=path)
+
+    @staticmethod
+    def _store_file_year(path: str) -> int:
+        """Parse the year partition of a file in a weather store.
+
+        Args:
+            path (str): Path of the file.
+
+        Returns:
+            int: The year.
+        """
+        return int(path.split(f'{STORE_YEAR_FIELD}=')[-1].split("/")[0])
+
+    def _list_store_files(self, coordinate_key: str, store_name: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[str]:
+        """List the files of a single coordinate in a weather store, pruning year partitions which fall outside of the requested time range.
+
+        Args:
+            coordinate_key (str): Value of the coordinate partition.
+            store_name (str): Directory of the store, relative to the working directory.
+            start (datetime, optional): Earliest time needed. Defaults to None (no lower bound).
+            end (datetime, optional): Latest time needed. Defaults to None (no upper bound).
+
+        Returns:
+            List[str]: Paths of all files which may hold data for the requested range.
+        """
+        paths = []
+        for path in self.s3.find(f'{self.working_dir}/{store_name}/{STORE_COORDINATE_FIELD}={coordinate_key}'):
+            year = self._store_file_year(path)
+            if start is not None and year < start.year:
+                continue
+            if end is not None and year > end.year:
+                continue
+            paths.append(path)
+        return paths
+
+    def _latest_time_in_file(self, path: str) -> Optional[Timestamp]:
+        """Find the latest time held by a parquet file. Only the footer is read when the time column has row group statistics.
+
+        Args:
+            path (str): Full path of the file.
+
+        Returns:
+            Optional[Timestamp]: The latest time, or None if the file holds no rows.
+        """
+        with self.s3.open(path, 'rb') as f:
+            metadata = pq.read_metadata(f)
+
+        time_index = metadata.schema.names.index("time")
+        latest = None
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            if row_group.num_rows == 0:
+                continue
+            statistics = row_group.column(time_index).statistics
+            if statistics is None or not statistics.has_min_max:
+                # fall back to reading the time column alone
+                with self._open_parquet_for_read(path, columns=[]) as f:
+                    times = pq.read_table(f, columns=["time"])["time"]
+                return Timestamp(pc.max(times).as_py()) if len(times) > 0 else None
+            latest = statistics.max if latest is None else max(latest, statistics.max)
+        return latest
+
+    def latest_time_in_store(self, coordinate: Coordinate, store_name: str = HISTORICAL_STORE_DIR) -> Optional[Timestamp]:
+        """Find the latest time stored for a coordinate in a weather store, without downloading the data. Only the parquet footers of the latest year partition are read.
+
+        Args:
+            coordinate (Coordinate): The coordinate to check.
+            store_name (str, optional): Directory of the store, relative to the working directory. Defaults to HISTORICAL_STORE_DIR.
+
+        Returns:
+            Optional[Timestamp]: The latest stored time (timezone aware), or None if the store holds no data for the coordinate.
+        """
+        paths = self._list_store_files(self._store_coordinate_key(coordinate.lon, coordinate.lat), store_name)
+        for year in sorted({self._store_file_year(path) for path in paths}, reverse=True):
+            file_latest_times = [self._latest_time_in_file(path) for path in paths if self._store_file_year(path) == year]
+            latest_times = [latest_time for latest_time in file_latest_times if latest_time is not None]
+            if len(latest_times) > 0:
+                return max(latest_times)
+        return None
+
+    def download_datums_from_store(self,
+                                   coordinates: List[Coordinate],
+                                   store_name: str = HISTORICAL_STORE_DIR,
+                                   columns: Optional[List[str]] = None,
+                                   start: Optional[datetime] = None,
+                                   end: Optional[datetime] = None,
+                                   ignore_missing_columns: bool = False) -> List[WeatherDatum]:
+        """Download WeatherDatums for many coordinates from a weather store with a single dataset scan.
+
+        Year partitions outside of the requested range are never read, the time range is pushed down to parquet row group statistics, and only the requested columns are decoded.
+
+        Args:
+            coordinates (List[Coordinate]): Coordinates to fetch datums for.
+            store_name (str, optional): Directory of the store, relative to the working directory. Defaults to HISTORICAL_STORE_DIR.
+            columns (list[str], optional): Columns to fetch. All available will be fetched if set to None. Defaults to None.
+            start (datetime, optional): Earliest time to fetch (inclusive). Expected to be timezone aware. Defaults to None (no lower bound).
+            end (datetime, optional): Latest time to fetch (inclusive). Expected to be timezone aware. Defaults to None (no upper bound).
+            ignore_missing_columns (bool, optional): Whether requested columns which are not stored are skipped rather than raising an error. Defaults to False.
+
+        Raises:
+            FileNotFoundError: Raised if the store has no data in the requested range for any of the coordinates.
+
+        Returns:
+            List[WeatherDatum]: One datum per coordinate, in the same order as coordinates.
+        """
+        if len(coordinates) == 0:
+            return []
+
+        coordinate_keys = [self._store_coordinate_key(coordinate.lon, coordinate.lat) for coordinate in coordinates]
+
+        paths_by_key: Dict[str, List[str]] = {}
+        for coordinate, coordinate_key in zip(coordinates, coordinate_keys):
+            paths = self._list_store_files(coordinate_key, store_name, start, end)
+            if len(paths) == 0:
+                raise FileNotFoundError(f"Could not find data in store {store_name} for coordinate: {coordinate}")
+            filesystem, paths_by_key[coordinate_key] = self._resolve_read_paths(paths)
+
+        # the coordinate partition is attached to each file explicitly so that files may be read from the local cache, where the hive directory names are not kept
+        paths = [path for coordinate_key in coordinate_keys for path in paths_by_key[coordinate_key]]
+        partitions = [ds.field(STORE_COORDINATE_FIELD) == coordinate_key for coordinate_key in coordinate_keys for _ in paths_by_key[coordinate_key]]
+        pa_filesystem = pa_fs.PyFileSystem(pa_fs.FSSpecHandler(filesystem))
+        # files of a store may be written with different encodings, so all of them are read as the types requested, or else the types they were uploaded with
+        schema = pq.read_schema(paths[0], filesystem=pa_filesystem)
+        schema = _float32_schema(schema) if self.as_float32 else _restored_schema(schema)
+        schema = schema.append(pa.field(STORE_COORDINATE_FIELD, pa.string()))
+        dataset = ds.FileSystemDataset.from_paths(paths, schema=schema, format=ds.ParquetFileFormat(), filesystem=pa_filesystem, partitions=partitions)
+
+        expression = ds.field(STORE_COORDINATE_FIELD).isin(coordinate_keys)
+        if start is not None:
+            expression = expression & (ds.field("time") >= start)
+        if end is not None:
+            expression = expression & (ds.field("time") <= end)
+
+        scan_columns = None
+        if columns is not None:
+            if ignore_missing_columns:
+                columns = [column for column in columns if column in schema.names]
+            scan_columns = [column for column in columns if column != "time"] + ["time", STORE_COORDINATE_FIELD]
+        table = dataset.to_table(columns=scan_columns, filter=expression)
+
+        datums = []
+        for coordinate_key in coordinate_keys:
+            coordinate_table = table.filter(pc.equal(table[STORE_COORDINATE_FIELD], coordinate_key))
+            coordinate_table = coordinate_table.drop([STORE_COORDINATE_FIELD])
+            coordinate_table = coordinate_table.sort_by("time")
+
+            # meta data differs between coordinates, so the pandas and packed datum metadata are read from the footer of one of the coordinate's own files
+            packed_metadata = pq.read_schema(paths_by_key[coordinate_key][0], filesystem=pa_filesystem).metadata
+            coordinate_table = coordinate_table.replace_schema_metadata(packed_metadata)
+
+            datums.append(unpack_datum(coordinate_table))
+
+        return datums
+
+    def download_current_manifest(self) -> CurrentManifest:
+        """Download the manifest of the timestamps uploaded to "current". A single small object is read, the "current" directory is never listed.
+
+        Returns:
+            CurrentManifest: The manifest. Empty if none has been written yet.
+        """
+        path = f'{self.working_dir}/{CURRENT_MANIFEST_PATH}'
+        try:
+            with self.s3.open(path, 'rb') as f:
+                return CurrentManifest.from_dict(json.load(f))
+        except FileNotFoundError:
+            return CurrentManifest()
+
+    def upload_current_manifest(self, manifest: CurrentManifest) -> None:
+        """Upload the manifest of the timestamps uploaded to "current", replacing the previous one with a single write so readers never see a partial manifest.
+
+        Args:
+            manifest (CurrentManifest): The manifest.
+        """
+        self.s3.pipe_file(f'{self.working_dir}/{CURRENT_MANIFEST_PATH}', json.dumps(manifest.to_dict()).encode())
+
+    def record_current_timestamp(self, timestamp: str, coordinates: List[Coordinate], uploaded_coordinates: List[Coordinate]) -> None:
+        """Record an upload to "current" in the manifest. Expects a single uploader per working directory, since the manifest is read, updated and written back.
+
+        Args:
+            timestamp (str): The timestamp directory within "current".
+            coordinates (List[Coordinate]): All coordinates which should have been uploaded.
+            uploaded_coordinates (List[Coordinate]): The coordinates which were uploaded successfully.
+        """
+        manifest = self.download_current_manifest()
+        manifest.add_timestamp(timestamp, coordinates, uploaded_coordinates)
+        self.upload_current_manifest(manifest)
+
+    def rebuild_current_manifest(self) -> CurrentManifest:
+        """Rebuild the manifest of "current" from a full listing of the directory, ie for timestamps uploaded before the manifest existed. This is slow and only needed once.
+
+        Every datum folder found in a timestamp is expected, and counts as uploaded if its data object (packed or legacy) exists.
+
+        Returns:
+            CurrentManifest: The rebuilt manifest, which is also uploaded.
+        """
+        root = self.s3._strip_protocol(f'{self.working_dir}/current')
+        found: Dict[str, Dict[Coordinate, bool]] = {}
+        for path in self.s3.find(root):
+            parts = path[len(root):].strip("/").split("/")
+            if len(parts) != 3 or not parts[1].startswith("lon_"):
+                continue
+            timestamp, folder_name, filename = parts
+            _, lon, _, lat = folder_name.split("_")
+            coordinate = Coordinate(lon=float(lon), lat=float(lat))
+            has_data = filename in (f'{PACKED_DATUM_FILENAME}.parquet', "data.parquet")
+            coordinates = found.setdefault(timestamp, {})
+            coordinates[coordinate] = coordinates.get(coordinate, False) or has_data
+
+        manifest = CurrentManifest()
+        for timestamp, coordinates in found.items():
+            try:
+                manifest.add_timestamp(timestamp, list(coordinates), [coordinate for coordinate, has_data in coordinates.items() if has_data])
+            except ValueError:
+                # not a timestamp directory
+                continue
+        self.upload_current_manifest(manifest)
+        return manifest
 
     def list_files(self, folder_name: str) -> List[str]:
         """List all files in a given folder.
@@ -157,4 +975,4 @@ class AWSDispatcher():
             List[str]: List of file names.
         """
         path = f'{self.working_dir}/{folder_name}'
-        return self.s3.ls(path)
+        return self.s3.ls(path, detail=False)
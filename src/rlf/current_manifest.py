@@ -0,0 +1,134 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+
+
+# Format of the timestamp directories within "current", ie "23-01-31_07-42" (UTC).
+CURRENT_TIMESTAMP_FORMAT = "%y-%m-%d_%H-%M"
+CURRENT_MANIFEST_FORMAT_VERSION = 1
+
+
+def _coordinate_key(coordinate: Coordinate) -> Tuple[float, float]:
+    """Identify a coordinate at the precision datums are stored at (see AWSDispatcher datum folder names).
+
+    Args:
+        coordinate (Coordinate): The coordinate.
+
+    Returns:
+        Tuple[float, float]: Longitude and latitude rounded to two decimals.
+    """
+    return (round(coordinate.lon, 2), round(coordinate.lat, 2))
+
+
+class CurrentManifest:
+    """Index of the timestamp directories of current weather in AWS, recording which coordinates were uploaded for each timestamp.
+
+    Reading the manifest replaces listing the ever growing "current" directory. Timestamps are always returned in chronological order. Sets of coordinates are stored once and shared by all timestamps uploaded for them, which keeps the manifest compact.
+    """
+
+    def __init__(self) -> None:
+        """Create a new, empty CurrentManifest instance."""
+        self._coordinate_sets: List[List[Tuple[float, float]]] = []
+        self._entries: Dict[str, dict] = {}
+
+    def __len__(self) -> int:
+        """Number of timestamps in the manifest.
+
+        Returns:
+            int: The number of timestamps.
+        """
+        return len(self._entries)
+
+    def add_timestamp(self, timestamp: str, coordinates: List[Coordinate], uploaded_coordinates: Iterable[Coordinate]) -> None:
+        """Record the upload of a timestamp, replacing any previous record of it.
+
+        Args:
+            timestamp (str): The timestamp directory, in CURRENT_TIMESTAMP_FORMAT.
+            coordinates (List[Coordinate]): All coordinates which should have been uploaded.
+            uploaded_coordinates (Iterable[Coordinate]): The coordinates which were uploaded successfully.
+
+        Raises:
+            ValueError: If the timestamp is not in CURRENT_TIMESTAMP_FORMAT.
+        """
+        datetime.strptime(timestamp, CURRENT_TIMESTAMP_FORMAT)
+
+        coordinate_set = sorted({_coordinate_key(coordinate) for coordinate in coordinates})
+        if coordinate_set not in self._coordinate_sets:
+            self._coordinate_sets.append(coordinate_set)
+        uploaded = {_coordinate_key(coordinate) for coordinate in uploaded_coordinates}
+        missing = [key for key in coordinate_set if key not in uploaded]
+
+        self._entries[timestamp] = {
+            "coordinate_set": self._coordinate_sets.index(coordinate_set),
+            "complete": len(missing) == 0,
+            "missing": missing
+        }
+
+    def is_complete(self, timestamp: str, coordinates: Optional[List[Coordinate]] = None) -> bool:
+        """Check whether all data was uploaded for a timestamp.
+
+        Args:
+            timestamp (str): The timestamp directory.
+            coordinates (List[Coordinate], optional): Only check these coordinates. Defaults to None (all coordinates of the upload).
+
+        Returns:
+            bool: True if the timestamp is in the manifest and every (requested) coordinate was uploaded.
+        """
+        entry = self._entries.get(timestamp)
+        if entry is None:
+            return False
+        if coordinates is None:
+            return entry["complete"]
+
+        coordinate_set = self._coordinate_sets[entry["coordinate_set"]]
+        missing = entry["missing"]
+        return all(key in coordinate_set and key not in missing for key in map(_coordinate_key, coordinates))
+
+    def timestamps(self, coordinates: Optional[List[Coordinate]] = None, complete_only: bool = True) -> List[str]:
+        """List timestamps in chronological order.
+
+        Args:
+            coordinates (List[Coordinate], optional): Only consider these coordinates when checking completeness. Defaults to None (all coordinates of each upload).
+            complete_only (bool, optional): Whether to skip timestamps with missing data. Defaults to True.
+
+        Returns:
+            List[str]: The timestamps, oldest first.
+        """
+        timestamps = sorted(self._entries, key=lambda timestamp: datetime.strptime(timestamp, CURRENT_TIMESTAMP_FORMAT))
+        if complete_only:
+            timestamps = [timestamp for timestamp in timestamps if self.is_complete(timestamp, coordinates)]
+        return timestamps
+
+    def to_dict(self) -> dict:
+        """Serialize the manifest.
+
+        Returns:
+            dict: JSON serializable representation.
+        """
+        return {
+            "format_version": CURRENT_MANIFEST_FORMAT_VERSION,
+            "coordinate_sets": [[list(key) for key in coordinate_set] for coordinate_set in self._coordinate_sets],
+            "timestamps": {timestamp: {**entry, "missing": [list(key) for key in entry["missing"]]} for timestamp, entry in self._entries.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CurrentManifest":
+        """Deserialize a manifest.
+
+        Args:
+            data (dict): Representation created by to_dict.
+
+        Raises:
+            ValueError: If the manifest was written by a newer format version.
+
+        Returns:
+            CurrentManifest: The manifest.
+        """
+        if data["format_version"] > CURRENT_MANIFEST_FORMAT_VERSION:
+            raise ValueError(f"Unsupported current manifest format version: {data['format_version']}")
+
+        manifest = cls()
+        manifest._coordinate_sets = [[tuple(key) for key in coordinate_set] for coordinate_set in data["coordinate_sets"]]  # type: ignore[misc]
+        manifest._entries = {timestamp: {**entry, "missing": [tuple(key) for key in entry["missing"]]} for timestamp, entry in data["timestamps"].items()}
+        return manifest
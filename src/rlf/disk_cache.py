@@ -0,0 +1,192 @@
+from dataclasses import dataclass
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Optional
+
+from fsspec import AbstractFileSystem
+
+
+DEFAULT_CACHE_PATH = os.path.join("data", "aws_dispatch")
+DEFAULT_MAX_CACHE_BYTES = 20 * 2**30
+
+
+@dataclass
+class CacheStats:
+    """Counters describing how a DiskCache has been used by the current process.
+
+    Args:
+        hits (int): Number of reads served from the local cache.
+        misses (int): Number of reads which had to be downloaded.
+        evictions (int): Number of cached files removed to stay within the size limit.
+        bytes_from_cache (int): Total bytes served from the local cache.
+        bytes_downloaded (int): Total bytes downloaded into the local cache.
+    """
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    bytes_from_cache: int = 0
+    bytes_downloaded: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of reads served from the local cache.
+
+        Returns:
+            float: Hits divided by total reads. 0.0 if there have been no reads.
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+
+class DiskCache:
+    """Persistent read-through cache of remote files on local disk.
+
+    Cached files are named by a hash of their remote path and version (ETag), so a file that changes remotely is never served stale. Least recently used files are evicted once the cache grows beyond max_bytes. Writes are atomic, so several processes on the same machine may share a single cache directory.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_CACHE_BYTES) -> None:
+        """Create a new DiskCache instance.
+
+        Args:
+            cache_dir (str, optional): Local directory to store cached files in. Created if it does not exist. Defaults to DEFAULT_CACHE_PATH.
+            max_bytes (int, optional): Maximum total size of the cached files. Defaults to DEFAULT_MAX_CACHE_BYTES (20 GiB).
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def version_of(info: dict) -> str:
+        """Find a string identifying the version of a remote file.
+
+        Args:
+            info (dict): File info as returned by an fsspec filesystem's info method.
+
+        Returns:
+            str: The ETag if available (S3), otherwise a combination of size and modification time.
+        """
+        etag = info.get("ETag", info.get("etag"))
+        if etag is not None:
+            return str(etag).strip('"')
+        return f'{info.get("size")}-{info.get("mtime", info.get("LastModified", info.get("created")))}'
+
+    def _local_path(self, path: str, version: str) -> str:
+        """Local path at which a given version of a remote file is cached.
+
+        Args:
+            path (str): Remote path.
+            version (str): Remote version (ETag).
+
+        Returns:
+            str: The local path.
+        """
+        key = hashlib.sha256(f'{path}\n{version}'.encode()).hexdigest()
+        extension = os.path.splitext(path)[1]
+        return os.path.join(self.cache_dir, key + extension)
+
+    def get(self, path: str, version: str) -> Optional[str]:
+        """Look up a cached file, marking it as recently used.
+
+        Args:
+            path (str): Remote path.
+            version (str): Remote version (ETag).
+
+        Returns:
+            Optional[str]: Local path of the cached file, or None if it is not cached.
+        """
+        local_path = self._local_path(path, version)
+        try:
+            os.utime(local_path)
+            size = os.path.getsize(local_path)
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            self.stats.hits += 1
+            self.stats.bytes_from_cache += size
+        return local_path
+
+    def put(self, path: str, version: str, data: bytes) -> str:
+        """Store the contents of a remote file, evicting old files if the cache has grown too large.
+
+        Args:
+            path (str): Remote path.
+            version (str): Remote version (ETag).
+            data (bytes): File contents.
+
+        Returns:
+            str: Local path of the cached file.
+        """
+        local_path = self._local_path(path, version)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, local_path)
+
+        with self._lock:
+            self.stats.misses += 1
+            self.stats.bytes_downloaded += len(data)
+        self.evict(keep=local_path)
+        return local_path
+
+    def fetch(self, filesystem: AbstractFileSystem, path: str) -> str:
+        """Get a local copy of a remote file. The remote version is always validated; the file is only downloaded if that version is not cached yet.
+
+        Args:
+            filesystem (AbstractFileSystem): Filesystem holding the remote file.
+            path (str): Remote path.
+
+        Raises:
+            FileNotFoundError: If the remote file does not exist.
+
+        Returns:
+            str: Local path of the cached file.
+        """
+        version = self.version_of(filesystem.info(path))
+        local_path = self.get(path, version)
+        if local_path is None:
+            local_path = self.put(path, version, filesystem.cat_file(path))
+        return local_path
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Remove least recently used files until the cache is within its size limit.
+
+        Args:
+            keep (str, optional): Local path which should never be evicted (ie the file that was just written). Defaults to None.
+        """
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # another process sharing the cache already removed it
+                pass
+            total_bytes -= size
+            with self._lock:
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all cached files."""
+        for entry in os.scandir(self.cache_dir):
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
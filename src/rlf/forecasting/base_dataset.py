@@ -4,7 +4,8 @@ from typing import Dict, List, Optional, Sequence, Tuple
 
 from darts import TimeSeries
 from darts.timeseries import concatenate
-from pandas import DataFrame, Timestamp
+import numpy as np
+from pandas import DataFrame, DatetimeIndex, Series, Timestamp
 
 from rlf.forecasting.catchment_data import CatchmentData
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
@@ -65,7 +66,8 @@ class BaseDataset(ABC):
 
         if X_concatenated.time_index[0] > first_date:
             first_date = X_concatenated.time_index[0]
-        X_concatenated = X_concatenated.astype("float32")
+        if X_concatenated.dtype != np.float32:
+            X_concatenated = X_concatenated.astype("float32")
 
         y = TimeSeries.from_dataframe(y).slice(first_date, last_date)
         y = y.astype("float32")
@@ -79,6 +81,8 @@ class BaseDataset(ABC):
         NaNs that are not trailing will be linearly interpolated.
         The subsets attribute will be updated with the generated prefix for this datum.
 
+        All processing happens on a single 2-D array which backs the resulting TimeSeries, so no intermediate DataFrames are built. The array is float32 if the datum holds float32 data (see AWSDispatcher's as_float32 option) and float64 otherwise.
+
         Args:
             datum (WeatherDatum): Datum to process.
             first_date (Timestamp): First allowed date for the time index. Any dates prior to this should be dropped.
@@ -91,23 +95,20 @@ class BaseDataset(ABC):
             TimeSeries: Processed datum.
         """
         X = datum.hourly_parameters
+        X = X.iloc[:self._count_rows_to_last_valid(X)]
 
-        X = self._strip_trailing_nans(X)
-
-        X.interpolate(limit_direction="both", inplace=True)
-
-        X = self._add_engineered_features(X)
+        values, times, columns = self._build_feature_block(X, interpolate=True)
 
         prefix = f"{datum.longitude:.2f}_{datum.latitude:.2f}_"
         if prefix not in self.subsets:
-            X.columns = [prefix + c for c in X.columns]
+            columns = [prefix + c for c in columns]
             self.subsets[prefix] = Coordinate(lon=datum.longitude, lat=datum.latitude)
         else:
             raise ValueError(f"Prefix will be represented twice in the global X set: {prefix}")
 
-        logging.log(logging.INFO, f"Datum processed with length: {len(X)}")
+        logging.log(logging.INFO, f"Datum processed with length: {len(values)}")
 
-        X = TimeSeries.from_dataframe(X)
+        X = TimeSeries.from_times_and_values(times, values, columns=columns)
 
         if last_date is not None:
             X = X.slice(first_date, last_date)
@@ -119,6 +120,19 @@ class BaseDataset(ABC):
 
         return X
 
+    @staticmethod
+    def _count_rows_to_last_valid(df: DataFrame) -> int:
+        """Count the rows up to and including the latest row with a non-NaN value in any column.
+
+        Args:
+            df (DataFrame): DataFrame to check.
+
+        Returns:
+            int: Number of rows remaining once trailing NaNs are removed.
+        """
+        valid_positions = [np.flatnonzero(df[column].notna().to_numpy()) for column in df.columns]
+        return max((positions[-1] + 1 for positions in valid_positions if len(positions) > 0), default=0)
+
     @staticmethod
     def _strip_trailing_nans(df: DataFrame) -> DataFrame:
         """Strip out the trailing NaNs that can be found in WeatherProvider data.
@@ -131,34 +145,67 @@ class BaseDataset(ABC):
         Returns:
             DataFrame: DataFrame with trailing NaNs removed.
         """
-        last_date = df.apply(lambda x: x.last_valid_index()).max()
-        df = df[df.index.to_series() <= last_date].copy()
-        return df
+        return df.iloc[:BaseDataset._count_rows_to_last_valid(df)].copy()
 
-    def _add_engineered_features(self, df: DataFrame) -> DataFrame:
-        """
-        Generate and add engineered features.
+    def _build_feature_block(self, df: DataFrame, interpolate: bool = False) -> Tuple[np.ndarray, DatetimeIndex, List[str]]:
+        """Build a single 2-D array holding the data and all engineered features. Rows containing any NaN are dropped.
+
+        Columns are copied into the array one at a time, and rolling features are computed from the array's own columns, so at most one extra column is held in memory at once.
 
         Args:
             df (DataFrame): Data from which features should be engineered.
+            interpolate (bool, optional): Whether NaNs in the data are linearly interpolated (in both directions) before features are engineered. Defaults to False.
 
         Returns:
-            DataFrame: Data including new features.
+            tuple[np.ndarray, DatetimeIndex, list[str]]: (values, time index, column names). Values are float32 if all data is float32 and float64 otherwise.
         """
-        df['day_of_year'] = df.index.day_of_year
-
+        base_columns = list(df.columns)
+        rolling_features = []
         for window_size in self.rolling_window_sizes:
             for rolling_sum_col in self.rolling_sum_columns:
-                new_col_name = f"{rolling_sum_col}_sum_{window_size}"
-                df[new_col_name] = df[rolling_sum_col].rolling(window=window_size).sum()
+                rolling_features.append((f"{rolling_sum_col}_sum_{window_size}", rolling_sum_col, "sum", window_size))
 
             for rolling_mean_col in self.rolling_mean_columns:
-                new_col_name = f"{rolling_mean_col}_mean_{window_size}"
-                df[new_col_name] = df[rolling_mean_col].rolling(window=window_size).mean()
+                rolling_features.append((f"{rolling_mean_col}_mean_{window_size}", rolling_mean_col, "mean", window_size))
+        columns = base_columns + ["day_of_year"] + [feature[0] for feature in rolling_features]
+
+        dtype = np.result_type(np.float32, *df.dtypes)
+        values = np.empty((len(df), len(columns)), dtype=dtype)
+        for i, column in enumerate(base_columns):
+            values[:, i] = df[column].to_numpy()
+            if interpolate:
+                values[:, i] = Series(values[:, i]).interpolate(limit_direction="both").to_numpy()
+
+        values[:, len(base_columns)] = df.index.day_of_year
+
+        for i, (_, column, how, window_size) in enumerate(rolling_features, start=len(base_columns) + 1):
+            rolling = Series(values[:, base_columns.index(column)]).rolling(window=window_size)
+            values[:, i] = (rolling.sum() if how == "sum" else rolling.mean()).to_numpy()
+
+        times = df.index
+        valid_rows = np.flatnonzero(~np.isnan(values).any(axis=1))
+        if len(valid_rows) < len(values):
+            if len(valid_rows) > 0 and valid_rows[-1] - valid_rows[0] + 1 == len(valid_rows):
+                # the NaNs introduced by rolling windows are leading, so usually the valid rows can be kept as a view
+                rows = slice(valid_rows[0], valid_rows[-1] + 1)
+                values, times = values[rows], times[rows]
+            else:
+                values, times = values[valid_rows], times[valid_rows]
+
+        return values, times, columns
+
+    def _add_engineered_features(self, df: DataFrame) -> DataFrame:
+        """
+        Generate and add engineered features.
 
-        df.dropna(inplace=True)
+        Args:
+            df (DataFrame): Data from which features should be engineered.
 
-        return df
+        Returns:
+            DataFrame: Data including new features.
+        """
+        values, times, columns = self._build_feature_block(df)
+        return DataFrame(values, index=times, columns=columns)
 
     @staticmethod
     def _find_timestamp_boundaries(Xs: List[DataFrame], y: DataFrame) -> Tuple[Timestamp, Timestamp]:
@@ -0,0 +1,227 @@
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.exceptions import RestInvokerException
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.models import Response
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.rate_limiter import RateLimiter
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.response_cache import ResponseCache
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.rest_invoker import (
+    DEFAULT_RETRY_POLICY, DEFAULT_TIMEOUT, USER_AGENT, RetryPolicy, Timeout
+)
+
+
+# Requests in flight at once per host. Enough to keep a whole set of catchments in flight, while staying polite to a single host.
+DEFAULT_MAX_CONCURRENT_REQUESTS = 32
+
+
+class AsyncRestInvoker():
+    """Invoke a REST API from an event loop
+    """
+
+    def __init__(self,
+                 protocol: Optional[str] = None,
+                 hostname: Optional[str] = None,
+                 version: Optional[str] = None,
+                 ssl_verify: bool = True,
+                 timeout: Timeout = DEFAULT_TIMEOUT,
+                 max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+                 session: Optional[Any] = None,
+                 cache: Optional[ResponseCache] = None) -> None:
+        """Invoke a REST API using aiohttp. The asynchronous counterpart of RestInvoker.
+
+        Requests are made through a session per event loop, created on first use in the running loop, so connections to the host are kept alive and reused. An invoker may therefore be shared by threads which each run their own event loop (ie behind SyncWeatherProvider). The rate at which requests start is limited per invoker, so one invoker per host limits each host independently; the number of requests in flight is limited per invoker and event loop.
+
+        Args:
+            protocol (str, optional): The protocol to use. Defaults to None.
+            hostname (str, optional): The hostname to use. Defaults to None.
+            version (str, optional): The version to use. Defaults to None.
+            ssl_verify (bool, optional):  Option to verify the SSL certificate. Defaults to True.
+            timeout (Timeout, optional): (connect, read) timeouts in seconds for each attempt. Defaults to DEFAULT_TIMEOUT.
+            max_concurrent_requests (int, optional): Maximum number of requests to the host in flight at once from each event loop. Defaults to DEFAULT_MAX_CONCURRENT_REQUESTS.
+            rate_limiter (RateLimiter, optional): Limits how often requests to the host start, including retries, ie RateLimiter.per_minute for the API's quota. Defaults to None (no limit).
+            retry_policy (RetryPolicy, optional): How throttled and failed requests are retried. Defaults to DEFAULT_RETRY_POLICY.
+            session (aiohttp.ClientSession, optional): Session to make requests with, from every event loop. Defaults to None (a new pooled session per event loop, closed by close).
+            cache (ResponseCache, optional): Cache for GET responses, eg of forecasts which only change with each model run. Defaults to None (no caching).
+
+        Raises:
+            ValueError: If max_concurrent_requests is less than 1.
+        """
+        if max_concurrent_requests < 1:
+            raise ValueError("max_concurrent_requests must be at least 1")
+
+        self._protocol = protocol
+        self._hostname = hostname
+        self._version = version
+        self._ssl_verify = ssl_verify
+        self.timeout = timeout
+        self.max_concurrent_requests = max_concurrent_requests
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.cache = cache
+        self._session = session
+        # sessions and semaphores are bound to the event loop they were created in, so each running loop gets its own
+        self._sessions: Dict[asyncio.AbstractEventLoop, Any] = {}
+        self._semaphores: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def _get_session(self) -> Any:
+        """Get the session of the running event loop, creating it on first use.
+
+        Returns:
+            aiohttp.ClientSession: The session. Retries are handled by the invoker rather than aiohttp.
+        """
+        if self._session is not None:
+            return self._session
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._sessions:
+                connector = aiohttp.TCPConnector(limit_per_host=self.max_concurrent_requests, ssl=self._ssl_verify)
+                self._sessions[loop] = aiohttp.ClientSession(connector=connector, headers={"User-Agent": USER_AGENT})
+            return self._sessions[loop]
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Get the semaphore bounding requests in flight from the running event loop, creating it on first use.
+
+        Returns:
+            asyncio.Semaphore: The semaphore.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._semaphores:
+                self._semaphores[loop] = asyncio.Semaphore(self.max_concurrent_requests)
+            return self._semaphores[loop]
+
+    async def close(self) -> None:
+        """Close the pooled connections of the running event loop. Requests from other event loops are unaffected, and the invoker may be used again afterwards."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            session = self._sessions.pop(loop, None)
+            self._semaphores.pop(loop, None)
+        if session is not None:
+            await session.close()
+
+    def _url(self, path: Optional[str]) -> str:
+        """Build the URL of a path on the host.
+
+        Args:
+            path (str, optional): The path.
+
+        Returns:
+            str: The URL.
+        """
+        url: str = f"{self._protocol}://"
+        if self._hostname is not None:
+            url += f"{self._hostname}/"
+        if self._version is not None:
+            url += f"{self._version}/"
+        if path is not None:
+            url += f"{path}"
+        return url
+
+    @staticmethod
+    def _query(parameters: Optional[dict]) -> Optional[List[Tuple[str, str]]]:
+        """Encode query parameters the way requests does, which aiohttp does not do by itself: list values become repeated keys.
+
+        Args:
+            parameters (dict, optional): The parameters.
+
+        Returns:
+            Optional[list[tuple[str, str]]]: The encoded (key, value) pairs.
+        """
+        if parameters is None:
+            return None
+        return [(key, str(item)) for key, value in parameters.items() for item in (value if isinstance(value, (list, tuple)) else [value])]
+
+    async def _apiCall(self,
+                       method: str,
+                       path: str,
+                       parameters: Optional[dict] = None,
+                       data: Optional[dict] = None,
+                       headers: Optional[Dict[str, str]] = None,
+                       weight: float = 1.0) -> Response:
+        """Perform an HTTP request, retrying according to the retry policy.
+
+        Args:
+            method (str): The HTTP method to use
+            path (str): The path to use
+            parameters (dict, optional): The parameters to use. Defaults to None.
+            data (dict, optional): The data to use. Defaults to None.
+            headers (dict[str, str], optional): Extra headers to send. If they make the request conditional, a 304 Not Modified response (without data) is returned rather than raised. Defaults to None.
+            weight (float, optional): Cost of each attempt against the rate limiter, ie the API's weighted calls. Defaults to 1.0.
+
+        Raises:
+            RestInvokerException: If the request fails
+
+        Returns:
+            Response: The response object from the REST API containing response body, headers, status code
+        """
+        url = self._url(path)
+        session = self._get_session()
+        timeout = aiohttp.ClientTimeout(sock_connect=self.timeout[0], sock_read=self.timeout[1])
+
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async(weight)
+            try:
+                async with self._get_semaphore():
+                    async with session.request(method, url, params=self._query(parameters), json=data, headers=headers, timeout=timeout) as response:
+                        status = response.status
+                        response_headers = dict(response.headers)
+                        if status == 200:
+                            try:
+                                body = await response.json(content_type=None)
+                            except ValueError as e:
+                                raise RestInvokerException(f"Error decoding the API response: {e}") from e
+                            return Response(status_code=status, url=str(response.url), message=response.reason, headers=response_headers, data=body)
+                        if status == 304 and headers:
+                            return Response(status_code=status, url=str(response.url), message=response.reason, headers=response_headers)
+                        detail = await response.text()
+                        reason = response.reason
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.retry_policy.max_attempts:
+                    raise RestInvokerException("Error: {}".format(e)) from e
+                await asyncio.sleep(self.retry_policy.delay(attempt))
+                continue
+            except aiohttp.ClientError as e:
+                raise RestInvokerException("Error: {}".format(e)) from e
+
+            if status in self.retry_policy.retry_statuses and attempt < self.retry_policy.max_attempts:
+                # the wait happens outside the semaphore, so a throttled request does not hold up requests which are ready to go
+                await asyncio.sleep(self.retry_policy.delay(attempt, response_headers.get("Retry-After")))
+                continue
+
+            raise RestInvokerException(f"Error calling the API: {reason} ({status}) \n {detail}")
+
+    async def get(self, path: str, parameters: Optional[dict] = None, weight: float = 1.0) -> Response:
+        """Perform a GET request. With a cache, fresh cached responses are served without contacting the API, and stale ones are revalidated with a conditional request.
+
+        Args:
+            path (str): The path to use
+            parameters (dict, optional): The parameters to use. Defaults to None.
+            weight (float, optional): Cost of each attempt against the rate limiter, ie the API's weighted calls. Defaults to 1.0.
+
+        Returns:
+            Response: The response object from the REST API containing response body, headers, status code
+        """
+        if self.cache is None:
+            return await self._apiCall(method="GET", path=path, parameters=parameters, weight=weight)
+
+        key = self.cache.key(self._url(path), parameters)
+        cached = self.cache.get(key)
+        if cached is not None and cached.is_fresh():
+            return self.cache.hit(key, cached)
+
+        conditional_headers = cached.conditional_headers() if cached is not None else {}
+        response = await self._apiCall(method="GET", path=path, parameters=parameters, headers=conditional_headers or None, weight=weight)
+        if response.status_code == 304 and cached is not None:
+            return self.cache.hit(key, cached, revalidated=True)
+        self.cache.put(key, response)
+        return response
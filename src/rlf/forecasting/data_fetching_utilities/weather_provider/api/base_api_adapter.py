@@ -8,6 +8,10 @@ from rlf.forecasting.data_fetching_utilities.weather_provider.api.models import
 class BaseAPIAdapter(ABC):
     """Abstract base class for APIAdapter objects"""
 
+    # Maximum number of coordinates per request of get_historical_batch and get_current_batch. Adapters for APIs which accept several locations per request raise them.
+    max_historical_batch_size: int = 1
+    max_current_batch_size: int = 1
+
     @abstractmethod
     def get_historical(self,
                        coordinate: Coordinate,
@@ -46,6 +50,70 @@ class BaseAPIAdapter(ABC):
         """
         raise NotImplementedError
 
+    def get_historical_batch(self,
+                             coordinates: List[Coordinate],
+                             start_date: str,
+                             end_date: str,
+                             columns: Optional[List[str]] = None) -> List[Response]:
+        """Get historical/archived data for several coordinates. Sends one request per coordinate, unless overridden by an adapter for an API which accepts several locations per request.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for. At most max_historical_batch_size.
+            start_date (str): The starting date for the requested data. In the format "YYYY-MM-DD".
+            end_date (str): The ending date for the requested data. In the format "YYYY-MM-DD".
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            list[Response]: One response payload per coordinate, in the same order as the coordinates.
+        """
+        return [self.get_historical(coordinate=coordinate, start_date=start_date, end_date=end_date, columns=columns) for coordinate in coordinates]
+
+    def get_current_batch(self,
+                          coordinates: List[Coordinate],
+                          past_days: int = 92,
+                          forecast_days: int = 16,
+                          columns: Optional[List[str]] = None) -> List[Response]:
+        """Get current/forecasted data for several coordinates. Sends one request per coordinate, unless overridden by an adapter for an API which accepts several locations per request.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for. At most max_current_batch_size.
+            past_days (int, optional): How many days into the past to fetch data for. Defaults to 92 (OpenMeteo max value).
+            forecast_days (int, optional): How many days into the future to fetch data for. Defaults to 16 (OpenMeteo max value).
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            list[Response]: One response payload per coordinate, in the same order as the coordinates.
+        """
+        return [self.get_current(coordinate=coordinate, past_days=past_days, forecast_days=forecast_days, columns=columns) for coordinate in coordinates]
+
+    def historical_request_weight(self, num_coordinates: int, start_date: str, end_date: str, columns: Optional[List[str]] = None) -> float:
+        """Cost of a historical/archived data request against the API's quota, as charged to a RateLimiter.
+
+        Args:
+            num_coordinates (int): Number of locations requested.
+            start_date (str): The starting date for the requested data. In the format "YYYY-MM-DD".
+            end_date (str): The ending date for the requested data. In the format "YYYY-MM-DD".
+            columns (list[str], optional): The subset of columns requested. None for all columns. Defaults to None.
+
+        Returns:
+            float: The cost. One per location, unless overridden by an adapter for an API which weighs requests differently.
+        """
+        return float(num_coordinates)
+
+    def current_request_weight(self, num_coordinates: int, past_days: int = 92, forecast_days: int = 16, columns: Optional[List[str]] = None) -> float:
+        """Cost of a current/forecasted data request against the API's quota, as charged to a RateLimiter.
+
+        Args:
+            num_coordinates (int): Number of locations requested.
+            past_days (int, optional): How many days into the past are requested. Defaults to 92.
+            forecast_days (int, optional): How many days into the future are requested. Defaults to 16.
+            columns (list[str], optional): The subset of columns requested. None for all columns. Defaults to None.
+
+        Returns:
+            float: The cost. One per location, unless overridden by an adapter for an API which weighs requests differently.
+        """
+        return float(num_coordinates)
+
     @abstractmethod
     def get_index_parameter(self) -> str:
         """Get the index parameter which is a field in the hourly section of the response that can be used as an index in a DataFrame (must be in ISO date format).
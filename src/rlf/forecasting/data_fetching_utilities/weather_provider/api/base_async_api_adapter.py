@@ -0,0 +1,92 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.models import Response
+
+
+class BaseAsyncAPIAdapter(ABC):
+    """Abstract base class for asynchronous APIAdapter objects, the event loop counterpart of BaseAPIAdapter"""
+
+    # Maximum number of coordinates per request of get_historical_batch and get_current_batch.
+    max_historical_batch_size: int = 1
+    max_current_batch_size: int = 1
+
+    @abstractmethod
+    async def get_historical_batch(self,
+                                   coordinates: List[Coordinate],
+                                   start_date: str,
+                                   end_date: str,
+                                   columns: Optional[List[str]] = None) -> List[Response]:
+        """Get historical/archived data for several coordinates.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for. At most max_historical_batch_size.
+            start_date (str): The starting date for the requested data. In the format "YYYY-MM-DD".
+            end_date (str): The ending date for the requested data. In the format "YYYY-MM-DD".
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            list[Response]: One response payload per coordinate, in the same order as the coordinates.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_current_batch(self,
+                                coordinates: List[Coordinate],
+                                past_days: int = 92,
+                                forecast_days: int = 16,
+                                columns: Optional[List[str]] = None) -> List[Response]:
+        """Get current/forecasted data for several coordinates.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for. At most max_current_batch_size.
+            past_days (int, optional): How many days into the past to fetch data for. Defaults to 92 (OpenMeteo max value).
+            forecast_days (int, optional): How many days into the future to fetch data for. Defaults to 16 (OpenMeteo max value).
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            list[Response]: One response payload per coordinate, in the same order as the coordinates.
+        """
+        raise NotImplementedError
+
+    def historical_request_weight(self, num_coordinates: int, start_date: str, end_date: str, columns: Optional[List[str]] = None) -> float:
+        """Cost of a historical/archived data request against the API's quota, as charged to a RateLimiter.
+
+        Args:
+            num_coordinates (int): Number of locations requested.
+            start_date (str): The starting date for the requested data. In the format "YYYY-MM-DD".
+            end_date (str): The ending date for the requested data. In the format "YYYY-MM-DD".
+            columns (list[str], optional): The subset of columns requested. None for all columns. Defaults to None.
+
+        Returns:
+            float: The cost. One per location, unless overridden by an adapter for an API which weighs requests differently.
+        """
+        return float(num_coordinates)
+
+    def current_request_weight(self, num_coordinates: int, past_days: int = 92, forecast_days: int = 16, columns: Optional[List[str]] = None) -> float:
+        """Cost of a current/forecasted data request against the API's quota, as charged to a RateLimiter.
+
+        Args:
+            num_coordinates (int): Number of locations requested.
+            past_days (int, optional): How many days into the past are requested. Defaults to 92.
+            forecast_days (int, optional): How many days into the future are requested. Defaults to 16.
+            columns (list[str], optional): The subset of columns requested. None for all columns. Defaults to None.
+
+        Returns:
+            float: The cost. One per location, unless overridden by an adapter for an API which weighs requests differently.
+        """
+        return float(num_coordinates)
+
+    @abstractmethod
+    def get_index_parameter(self) -> str:
+        """Get the temporal index parameter of the hourly data.
+
+        Returns:
+            str: The name of the index parameter.
+        """
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        """Close any connections held by the adapter. Must be awaited in the event loop which made the requests."""
+        pass
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """Token bucket limiting how often an operation (ie a query to a weather API) may run. Safe to share between threads, and between threads and event loops.
+
+    Tokens accumulate at a fixed rate up to a maximum burst size. Each operation takes one token by default, or its weight for APIs whose quota counts some requests as several (ie Open-Meteo's weighted calls), waiting for enough tokens to become available if needed. An operation weighing more than the burst size runs once the bucket is full, and the excess is paid off before the next operation may run.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        """Create a new RateLimiter instance. The bucket starts full.
+
+        Args:
+            rate (float): Sustained number of operations allowed per second.
+            burst (int, optional): Maximum number of operations which may run back to back after a pause. Defaults to 1.
+
+        Raises:
+            ValueError: If rate is not positive or burst is less than 1.
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests: int, burst: int = 1) -> "RateLimiter":
+        """Create a RateLimiter from a quota given per minute, as API quotas usually are.
+
+        Args:
+            requests (int): Number of operations allowed per minute.
+            burst (int, optional): Maximum number of operations which may run back to back after a pause. Defaults to 1.
+
+        Returns:
+            RateLimiter: The rate limiter.
+        """
+        return cls(requests / 60, burst)
+
+    def _take(self, weight: float) -> float:
+        """Take tokens if enough are available.
+
+        Args:
+            weight (float): Number of tokens to take.
+
+        Returns:
+            float: 0.0 if the tokens were taken, otherwise the seconds until enough become available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            # heavier operations than the bucket holds go into debt rather than waiting forever
+            needed = min(weight, self.burst)
+            if self._tokens >= needed:
+                self._tokens -= weight
+                return 0.0
+            return (needed - self._tokens) / self.rate
+
+    def acquire(self, weight: float = 1.0) -> None:
+        """Take tokens, blocking until enough are available.
+
+        Args:
+            weight (float, optional): Cost of the operation in tokens. Defaults to 1.0.
+        """
+        while (wait := self._take(weight)) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, weight: float = 1.0) -> None:
+        """Take tokens, waiting without blocking the event loop until enough are available.
+
+        Args:
+            weight (float, optional): Cost of the operation in tokens. Defaults to 1.0.
+        """
+        while (wait := self._take(weight)) > 0:
+            await asyncio.sleep(wait)
@@ -0,0 +1,279 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, Optional
+
+from rlf.disk_cache import CacheStats
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.models import Response
+
+
+DEFAULT_RESPONSE_CACHE_PATH = os.path.join("data", "response_cache")
+# GFS and ECMWF IFS forecasts are both run four times a day
+DEFAULT_UPDATE_INTERVAL = timedelta(hours=6)
+# a GFS run only reaches the API a few hours after its nominal (00, 06, 12, 18 UTC) time
+DEFAULT_PUBLICATION_DELAY = timedelta(hours=4)
+
+
+def next_forecast_update(now: Optional[datetime] = None,
+                         update_interval: timedelta = DEFAULT_UPDATE_INTERVAL,
+                         publication_delay: timedelta = DEFAULT_PUBLICATION_DELAY) -> datetime:
+    """Find when the next forecast model run is due to be published, assuming runs are aligned to multiples of the update interval since midnight UTC.
+
+    Args:
+        now (datetime, optional): The current time. Defaults to None (the system time).
+        update_interval (timedelta, optional): Time between model runs. Defaults to DEFAULT_UPDATE_INTERVAL.
+        publication_delay (timedelta, optional): Time from the nominal time of a run until the API serves it. Defaults to DEFAULT_PUBLICATION_DELAY.
+
+    Returns:
+        datetime: The (UTC) time the next model run is published, strictly after now.
+    """
+    now = now if now is not None else datetime.now(timezone.utc)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    # the latest run served is the latest nominal run at least publication_delay ago
+    run_time = now.astimezone(timezone.utc) - publication_delay
+    midnight = run_time.replace(hour=0, minute=0, second=0, microsecond=0)
+    runs = (run_time - midnight) // update_interval + 1
+    return midnight + runs * update_interval + publication_delay
+
+
+@dataclass
+class CachedResponse:
+    """A response stored by a ResponseCache.
+
+    Args:
+        response (Response): The response.
+        fresh_until (datetime): When the next model run is due. Until then the response is served without contacting the API.
+        etag (str, optional): The response's ETag header, used to revalidate it once stale. Defaults to None.
+        last_modified (str, optional): The response's Last-Modified header, used to revalidate it once stale. Defaults to None.
+    """
+    response: Response
+    fresh_until: datetime
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def is_fresh(self, now: Optional[datetime] = None) -> bool:
+        """Whether the response may be served without contacting the API.
+
+        Args:
+            now (datetime, optional): The current time. Defaults to None (the system time).
+
+        Returns:
+            bool: True if the model run the response belongs to is still the latest.
+        """
+        now = now if now is not None else datetime.now(timezone.utc)
+        return now < self.fresh_until
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers asking the API to answer 304 Not Modified if the response has not changed.
+
+        Returns:
+            dict[str, str]: If-None-Match and/or If-Modified-Since headers. Empty if the response had no validators.
+        """
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def to_dict(self) -> dict:
+        """Serialize the cached response.
+
+        Returns:
+            dict: JSON compatible representation.
+        """
+        return {
+            "status_code": self.response.status_code,
+            "url": self.response.url,
+            "message": self.response.message,
+            "headers": dict(self.response.headers),
+            "data": self.response.data,
+            "fresh_until": self.fresh_until.isoformat(),
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "CachedResponse":
+        """Deserialize a cached response.
+
+        Args:
+            d (dict): As returned by to_dict.
+
+        Returns:
+            CachedResponse: The cached response.
+        """
+        response = Response(status_code=d["status_code"], url=d["url"], message=d["message"], headers=d["headers"], data=d["data"])
+        return cls(response=response, fresh_until=datetime.fromisoformat(d["fresh_until"]), etag=d["etag"], last_modified=d["last_modified"])
+
+
+class ResponseCache:
+    """Persistent cache of API responses for forecast data on local disk.
+
+    Responses are keyed by request (host, path and parameters, so coordinates and parameter set). A response stays fresh until the next model run is due to be published, and is served without contacting the API until then. Stale responses are revalidated with a conditional request when the API sent validators, so an unchanged forecast (ie a run published late) only costs a round trip. Writes are atomic, so several processes may share a cache directory.
+
+    Responses which have not been written for a whole update interval after going stale belong to an outdated run and are pruned when storing responses, so the cache stays bounded by the requests of about one run (ie in a lambda's /tmp).
+    """
+
+    def __init__(self,
+                 cache_dir: str = DEFAULT_RESPONSE_CACHE_PATH,
+                 update_interval: timedelta = DEFAULT_UPDATE_INTERVAL,
+                 publication_delay: timedelta = DEFAULT_PUBLICATION_DELAY) -> None:
+        """Create a new ResponseCache instance.
+
+        Args:
+            cache_dir (str, optional): Local directory to store responses in. Created if it does not exist. Defaults to DEFAULT_RESPONSE_CACHE_PATH.
+            update_interval (timedelta, optional): Time between runs of the forecast model. Defaults to DEFAULT_UPDATE_INTERVAL.
+            publication_delay (timedelta, optional): Time from the nominal time of a run until the API serves it. Defaults to DEFAULT_PUBLICATION_DELAY.
+        """
+        self.cache_dir = cache_dir
+        self.update_interval = update_interval
+        self.publication_delay = publication_delay
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._pruned_at: Optional[datetime] = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _next_update(self, now: Optional[datetime] = None) -> datetime:
+        """Find when the next model run is due to be published.
+
+        Args:
+            now (datetime, optional): The current time. Defaults to None (the system time).
+
+        Returns:
+            datetime: The (UTC) time, strictly after now.
+        """
+        return next_forecast_update(now, self.update_interval, self.publication_delay)
+
+    @staticmethod
+    def key(url: str, parameters: Optional[dict] = None) -> str:
+        """Identify a request.
+
+        Args:
+            url (str): The URL requested.
+            parameters (dict, optional): The query parameters. Defaults to None.
+
+        Returns:
+            str: A key which is equal for equal requests.
+        """
+        request = json.dumps([url, parameters or {}], sort_keys=True, default=str)
+        return hashlib.sha256(request.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        """Local path of a cached response.
+
+        Args:
+            key (str): The request key.
+
+        Returns:
+            str: The path.
+        """
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Look up a cached response, fresh or not.
+
+        Args:
+            key (str): The request key.
+
+        Returns:
+            Optional[CachedResponse]: The cached response, or None if the request was never cached.
+        """
+        try:
+            with open(self._path(key)) as f:
+                return CachedResponse.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, cached: CachedResponse) -> None:
+        """Atomically store a cached response.
+
+        Args:
+            key (str): The request key.
+            cached (CachedResponse): The cached response.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(cached.to_dict(), f)
+        os.replace(temp_path, self._path(key))
+
+    def put(self, key: str, response: Response, now: Optional[datetime] = None) -> CachedResponse:
+        """Store a response downloaded from the API, fresh until the next model run.
+
+        Args:
+            key (str): The request key.
+            response (Response): The response.
+            now (datetime, optional): The current time. Defaults to None (the system time).
+
+        Returns:
+            CachedResponse: The stored response.
+        """
+        cached = CachedResponse(response=response,
+                                fresh_until=self._next_update(now),
+                                etag=response.headers.get("ETag"),
+                                last_modified=response.headers.get("Last-Modified"))
+        self._write(key, cached)
+        with self._lock:
+            self.stats.misses += 1
+        self.prune(now)
+        return cached
+
+    def hit(self, key: str, cached: CachedResponse, revalidated: bool = False, now: Optional[datetime] = None) -> Response:
+        """Serve a cached response.
+
+        Args:
+            key (str): The request key.
+            cached (CachedResponse): The cached response.
+            revalidated (bool, optional): Whether the API just confirmed the stale response is unchanged, in which case it is fresh until the next model run. Defaults to False.
+            now (datetime, optional): The current time. Defaults to None (the system time).
+
+        Returns:
+            Response: The response.
+        """
+        if revalidated:
+            cached.fresh_until = self._next_update(now)
+            self._write(key, cached)
+        with self._lock:
+            self.stats.hits += 1
+        return cached.response
+
+    def prune(self, now: Optional[datetime] = None, force: bool = False) -> int:
+        """Remove responses which have not been written for two update intervals. Responses are fresh for at most one update interval after being written, so these have been stale for a whole interval, during which a newer run has been published.
+
+        Args:
+            now (datetime, optional): The current time. Defaults to None (the system time).
+            force (bool, optional): Prune even if the cache was pruned less than an update interval ago. Defaults to False (scan the cache directory at most once per update interval).
+
+        Returns:
+            int: The number of responses removed.
+        """
+        now = now if now is not None else datetime.now(timezone.utc)
+        with self._lock:
+            if not force and self._pruned_at is not None and now - self._pruned_at < self.update_interval:
+                return 0
+            self._pruned_at = now
+
+        expired_before = (now - 2 * self.update_interval).timestamp()
+        removed = 0
+        for entry in os.scandir(self.cache_dir):
+            try:
+                # also removes temporary files left behind by interrupted writes
+                if entry.stat().st_mtime < expired_before:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def clear(self) -> None:
+        """Remove all cached responses."""
+        for entry in os.scandir(self.cache_dir):
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
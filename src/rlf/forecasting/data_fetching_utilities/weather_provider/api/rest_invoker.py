@@ -1,42 +1,156 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import time
+from typing import Callable, Dict, Optional, Tuple
+
 import requests
-from typing import Optional
+from requests.adapters import HTTPAdapter
 
 from rlf.forecasting.data_fetching_utilities.weather_provider.api.models import Response
 from rlf.forecasting.data_fetching_utilities.weather_provider.api.exceptions import RestInvokerException
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.response_cache import ResponseCache
+
+
+# (connect, read) timeouts in seconds
+Timeout = Tuple[float, float]
+
+DEFAULT_TIMEOUT: Timeout = (5.0, 30.0)
+DEFAULT_POOL_SIZE = 16
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/107.0.0.0 Safari/537.36 Edg/107.0.1418.52"
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How a RestInvoker retries requests which were throttled, failed on the server or failed to connect.
+
+    Args:
+        max_attempts (int, optional): Maximum number of attempts per request, including the first. Defaults to 5.
+        backoff_factor (float, optional): The n-th retry waits backoff_factor * 2 ** (n - 1) seconds, unless the server asks for longer with a Retry-After header. Defaults to 0.5.
+        max_backoff (float, optional): Upper bound on the wait between attempts, including waits requested by the server. Defaults to 60.0.
+        retry_statuses (tuple[int, ...], optional): HTTP status codes which are retried. Defaults to (429, 500, 502, 503, 504).
+    """
+    max_attempts: int = 5
+    backoff_factor: float = 0.5
+    max_backoff: float = 60.0
+    retry_statuses: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+        """Parse the value of a Retry-After header.
+
+        Args:
+            value (str, optional): The header value, either a number of seconds or an HTTP date.
+            now (datetime, optional): The current time, used for HTTP dates. Defaults to None (the system time).
+
+        Returns:
+            Optional[float]: Seconds to wait, or None if the header is missing or malformed.
+        """
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        now = now if now is not None else datetime.now(timezone.utc)
+        return max(0.0, (retry_at - now).total_seconds())
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before retrying.
+
+        Args:
+            attempt (int): Number of attempts made so far (1 after the first failure).
+            retry_after (str, optional): Value of the failed response's Retry-After header. Defaults to None.
+
+        Returns:
+            float: The wait, at most max_backoff.
+        """
+        requested = self.parse_retry_after(retry_after)
+        backoff = self.backoff_factor * 2 ** (attempt - 1)
+        if requested is not None:
+            backoff = max(backoff, requested)
+        return min(backoff, self.max_backoff)
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
 
 
 class RestInvoker():
     """Invoke a REST API
     """
 
-    def __init__(self, protocol: Optional[str] = None, hostname: Optional[str] = None, version: Optional[str] = None, ssl_verify: bool = True) -> None:
-        """Invoke a REST API using the requests library
+    def __init__(self,
+                 protocol: Optional[str] = None,
+                 hostname: Optional[str] = None,
+                 version: Optional[str] = None,
+                 ssl_verify: bool = True,
+                 timeout: Timeout = DEFAULT_TIMEOUT,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+                 session: Optional[requests.Session] = None,
+                 sleep: Callable[[float], None] = time.sleep,
+                 cache: Optional[ResponseCache] = None) -> None:
+        """Invoke a REST API using the requests library.
+
+        Requests are made through a single session, so that connections to the host are kept alive and reused instead of performing a TCP/TLS handshake per request. The invoker may be shared between threads.
 
         Args:
             protocol (str, optional): The protocol to use. Defaults to None.
             hostname (str, optional): The hostname to use. Defaults to None.
             version (str, optional): The version to use. Defaults to None.
             ssl_verify (bool, optional):  Option to verify the SSL certificate. Defaults to True.
+            timeout (Timeout, optional): (connect, read) timeouts in seconds for each attempt. Defaults to DEFAULT_TIMEOUT.
+            pool_size (int, optional): Maximum number of connections kept open to the host. Should be at least the number of threads sharing the invoker. Defaults to DEFAULT_POOL_SIZE.
+            retry_policy (RetryPolicy, optional): How throttled and failed requests are retried. Defaults to DEFAULT_RETRY_POLICY.
+            session (requests.Session, optional): Session to make requests with. Defaults to None (a new pooled session).
+            sleep (Callable[[float], None], optional): Function used to wait between attempts. Defaults to time.sleep.
+            cache (ResponseCache, optional): Cache for GET responses, eg of forecasts which only change with each model run. Defaults to None (no caching).
         """
         self._protocol = protocol
         self._hostname = hostname
         self._version = version
         self._ssl_verify = ssl_verify
+        self.timeout = timeout
+        self.retry_policy = retry_policy
+        self._sleep = sleep
+        self.cache = cache
+        self._session = session if session is not None else self._create_session(pool_size)
 
-    def _apiCall(self, method: str, path: str, parameters: Optional[dict] = None, data: Optional[dict] = None) -> Response:
-        """Perform an HTTP request
+    @staticmethod
+    def _create_session(pool_size: int) -> requests.Session:
+        """Create a session keeping up to pool_size connections alive.
 
         Args:
-            method (str): The HTTP method to use
-            path (str): The path to use
-            parameters (dict, optional): The parameters to use. Defaults to None.
-            data (dict, optional): The data to use. Defaults to None.
+            pool_size (int): Maximum number of pooled connections per host.
 
-        Raises:
-            RestInvokerException: If the request fails
+        Returns:
+            requests.Session: The session. Retries are handled by the invoker rather than urllib3.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"User-Agent": USER_AGENT, "Connection": "keep-alive"})
+        return session
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self._session.close()
+
+    def _url(self, path: Optional[str]) -> str:
+        """Build the URL of a path on the host.
+
+        Args:
+            path (str, optional): The path.
 
         Returns:
-            Response: The response object from the REST API containing response body, headers, status code
+            str: The URL.
         """
         url: str = f"{self._protocol}://"
         if self._hostname is not None:
@@ -45,31 +159,86 @@ class RestInvoker():
             url += f"{self._version}/"
         if path is not None:
             url += f"{path}"
+        return url
+
+    @staticmethod
+    def _error_detail(response: requests.Response) -> str:
+        """Describe the body of a failed response.
+
+        Args:
+            response (requests.Response): The response.
 
+        Returns:
+            str: The JSON body, or the raw text if the body is not JSON.
+        """
         try:
-            response = requests.request(
-                method=method,
-                url=url,
-                verify=self._ssl_verify,
-                params=parameters,
-                json=data,
-                timeout=5,
-                headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/107.0.0.0 Safari/537.36 Edg/107.0.1418.52"})
+            return str(response.json())
+        except ValueError:
+            return response.text
+
+    def _apiCall(self, method: str, path: str, parameters: Optional[dict] = None, data: Optional[dict] = None, headers: Optional[Dict[str, str]] = None) -> Response:
+        """Perform an HTTP request, retrying according to the retry policy.
+
+        Args:
+            method (str): The HTTP method to use
+            path (str): The path to use
+            parameters (dict, optional): The parameters to use. Defaults to None.
+            data (dict, optional): The data to use. Defaults to None.
+            headers (dict[str, str], optional): Extra headers to send. If they make the request conditional, a 304 Not Modified response (without data) is returned rather than raised. Defaults to None.
+
+        Raises:
+            RestInvokerException: If the request fails
+
+        Returns:
+            Response: The response object from the REST API containing response body, headers, status code
+        """
+        url = self._url(path)
+
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = self._session.request(
+                    method=method,
+                    url=url,
+                    verify=self._ssl_verify,
+                    params=parameters,
+                    json=data,
+                    headers=headers,
+                    timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= self.retry_policy.max_attempts:
+                    raise RestInvokerException("Error: {}".format(e)) from e
+                self._sleep(self.retry_policy.delay(attempt))
+                continue
+            except requests.exceptions.RequestException as e:
+                raise RestInvokerException("Error: {}".format(e)) from e
+
             if response.status_code == 200:
+                try:
+                    return Response(status_code=response.status_code,
+                                    url=response.url,
+                                    message=response.reason,
+                                    headers=response.headers,
+                                    data=response.json())
+                except ValueError as e:
+                    raise RestInvokerException(f"Error decoding the API response: {e}") from e
+
+            if response.status_code == 304 and headers:
                 return Response(status_code=response.status_code,
                                 url=response.url,
                                 message=response.reason,
-                                headers=response.headers,
-                                data=response.json())
-            else:
-                raise RestInvokerException(
-                    f"Error calling the API: {response.reason} ({response.status_code}) \n {response.json()}")
+                                headers=response.headers)
 
-        except requests.exceptions.RequestException as e:
-            raise RestInvokerException("Error: {}".format(e)) from e
+            if response.status_code in self.retry_policy.retry_statuses and attempt < self.retry_policy.max_attempts:
+                self._sleep(self.retry_policy.delay(attempt, response.headers.get("Retry-After")))
+                continue
+
+            raise RestInvokerException(
+                f"Error calling the API: {response.reason} ({response.status_code}) \n {self._error_detail(response)}")
 
     def get(self, path: str, parameters: Optional[dict] = None) -> Response:
-        """Perform a GET request
+        """Perform a GET request. With a cache, fresh cached responses are served without contacting the API, and stale ones are revalidated with a conditional request.
 
         Args:
             path (str): The path to use
@@ -78,4 +247,17 @@ class RestInvoker():
         Returns:
             Response: The response object from the REST API containing response body, headers, status code
         """
-        return self._apiCall(method="GET", path=path, parameters=parameters)
+        if self.cache is None:
+            return self._apiCall(method="GET", path=path, parameters=parameters)
+
+        key = self.cache.key(self._url(path), parameters)
+        cached = self.cache.get(key)
+        if cached is not None and cached.is_fresh():
+            return self.cache.hit(key, cached)
+
+        conditional_headers = cached.conditional_headers() if cached is not None else {}
+        response = self._apiCall(method="GET", path=path, parameters=parameters, headers=conditional_headers or None)
+        if response.status_code == 304 and cached is not None:
+            return self.cache.hit(key, cached, revalidated=True)
+        self.cache.put(key, response)
+        return response
@@ -1,19 +1,23 @@
-from datetime import datetime
+from datetime import datetime, timezone
 import logging
-import time
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence
 
+import numpy as np
+import pandas as pd
 from pandas import DataFrame
-import pytz
 
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
 from rlf.forecasting.data_fetching_utilities.weather_provider.api.base_api_adapter import (
     BaseAPIAdapter
 )
 from rlf.forecasting.data_fetching_utilities.weather_provider.api.models import Response
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.rate_limiter import RateLimiter
 from rlf.forecasting.data_fetching_utilities.weather_provider.base_weather_provider import (
     BaseWeatherProvider
 )
+from rlf.forecasting.data_fetching_utilities.weather_provider.current_weather_buffer import (
+    CurrentWeatherBuffer
+)
 from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.open_meteo_adapter import (
     OpenMeteoAdapter
 )
@@ -28,27 +32,180 @@ DEFAULT_END_DATE = datetime.now().strftime("%Y-%m-%d")
 RESPONSE_TOLERANCE = 0.05
 
 
+def parse_time_index(times: Sequence, tz: str) -> pd.DatetimeIndex:
+    """Convert the time values of a response to a UTC index in bulk.
+
+    Args:
+        times (Sequence): Either unix timestamps in seconds, or ISO 8601 local times in the timezone tz.
+        tz (str): The timezone of ISO 8601 times, ie the response's "timezone". Unix timestamps are always UTC.
+
+    Returns:
+        pd.DatetimeIndex: The times in UTC.
+    """
+    values = np.asarray(times)
+    if np.issubdtype(values.dtype, np.number):
+        return pd.to_datetime(values, unit="s", utc=True)
+    return pd.DatetimeIndex(pd.to_datetime(values)).tz_localize(tz, ambiguous="infer", nonexistent="shift_forward").tz_convert("UTC")
+
+
+def build_hourly_parameters_from_response(hourly_parameters_response: dict, tz: str, index_parameter: str = "time") -> DataFrame:
+    """Build the hourly parameters of a datum from the "hourly" section of a response.
+
+    Args:
+        hourly_parameters_response (dict): The hourly section, holding a list of values per parameter.
+        tz (str): The timezone of the response.
+        index_parameter (str, optional): The parameter holding the time of each value. Defaults to "time".
+
+    Returns:
+        DataFrame: The values as float32 columns, indexed by UTC time.
+    """
+    index = parse_time_index(hourly_parameters_response[index_parameter], tz).rename(index_parameter)
+    columns = [column for column in hourly_parameters_response if column != index_parameter]
+    # missing values (null) become NaN
+    values = np.array([hourly_parameters_response[column] for column in columns], dtype=np.float32).reshape(len(columns), len(index))
+    # the transpose is a view, so the frame holds the values as a single float32 block without copying
+    return DataFrame(values.T, index=index, columns=columns, copy=False)
+
+
+def build_datum_from_response(response: Response, coordinate: Coordinate, index_parameter: str = "time", precision: int = 5) -> WeatherDatum:
+    """Construct a WeatherDatum from a Response.
+
+    Args:
+        response (Response): The Response to draw data from.
+        coordinate (Coordinate): The coordinate that is requested by the user.
+        index_parameter (str, optional): The parameter of the hourly section holding the time of each value. Defaults to "time".
+        precision (int): The precision to round the response coordinates to. Defaults to 5 decimal places.
+
+    Returns:
+        WeatherDatum: The constructed WeatherDatum instance.
+    """
+    assert response.data is not None
+
+    requested_lon = coordinate.lon
+    requested_lat = coordinate.lat
+
+    response_lon = response.data.get("longitude", None)
+    response_lat = response.data.get("latitude", None)
+
+    response_rounded_lon = round(response_lon, precision)
+    response_rounded_lat = round(response_lat, precision)
+
+    difference_rounded_lon = response_rounded_lon - requested_lon
+    difference_rounded_lat = response_rounded_lat - requested_lat
+
+    if abs(difference_rounded_lon) > RESPONSE_TOLERANCE or abs(difference_rounded_lat) > RESPONSE_TOLERANCE:
+        logging.error(
+            "The API responded with a location outside the requested location tolerance. "
+            f"The requested location is ({requested_lon}, {requested_lat}) vs. the response location ({response_lon}, {response_lat}). "
+            f"The difference in longitude is {difference_rounded_lon} and the difference in latitude is {difference_rounded_lat}. "
+            "To change the tolerance, change the RESPONSE_TOLERANCE constant in the APIWeatherProvider class. "
+            "To change the rounding precision, change the precision argument in the build_datum_from_response method.")
+
+    elif abs(difference_rounded_lon) <= RESPONSE_TOLERANCE or abs(difference_rounded_lat) <= RESPONSE_TOLERANCE:
+        logging.warning(
+            "The API responded with a location within the requested location tolerance, but not equal. "
+            f"The requested location is ({requested_lon}, {requested_lat}) vs. the response location ({response_lon}, {response_lat}). "
+            f"The difference in longitude is {difference_rounded_lon} and the difference in latitude is {difference_rounded_lat}. "
+            "To change the tolerance, change the RESPONSE_TOLERANCE constant in the APIWeatherProvider class. "
+            "To change the rounding precision, change the precision argument in the build_datum_from_response method.")
+    else:
+        pass
+
+    datum = WeatherDatum(
+        longitude=requested_lon,
+        latitude=requested_lat,
+        api_response_longitude=response_lon,
+        api_response_latitude=response_lat,
+        elevation=response.data.get(
+            "elevation", None),
+        utc_offset_seconds=response.data.get(
+            "utc_offset_seconds", None),
+        timezone=response.data.get(
+            "timezone", None),
+        hourly_units=response.data.get(
+            "hourly_units", None),
+        hourly_parameters=build_hourly_parameters_from_response(
+            response.data.get("hourly", None), response.data["timezone"], index_parameter))
+
+    return datum
+
+
 class APIWeatherProvider(BaseWeatherProvider):
     """Provides a historical of forecasted weather for a given location and time period."""
 
     def __init__(self,
                  coordinates: List[Coordinate],
-                 api_adapter: BaseAPIAdapter = OpenMeteoAdapter()) -> None:
+                 api_adapter: BaseAPIAdapter = OpenMeteoAdapter(),
+                 max_concurrent_requests: int = 1,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 current_buffer: Optional[CurrentWeatherBuffer] = None) -> None:
         """Create an APIWeatherProvider for the given list of coordinates.
 
         Args:
             coordinates (list[Coordinate(longitude: float, latitude: float)]): Named tuple WSG84 coordinates: (longitude, latitude).
             api_adapter (BaseAPIAdapter, optional): An adapter for a weather API. Defaults to OpenMeteoAdapter().
+            max_concurrent_requests (int, optional): Maximum number of queries to the API in flight at once when fetching all coordinates. Each query fetches up to max_historical_batch_size or max_current_batch_size coordinates. Defaults to 1 (serial queries).
+            rate_limiter (RateLimiter, optional): Limits how often queries are sent when fetching all coordinates, ie RateLimiter.per_minute for the API's quota. Each query is charged its weight, see historical_request_weight and current_request_weight. Defaults to None (no limit).
+            current_buffer (CurrentWeatherBuffer, optional): Enables incremental current fetches: coordinates with a recent enough buffer only request the last few days and the forecast, which are merged into the buffer. Defaults to None (always fetch the full window).
+
+        Raises:
+            ValueError: If max_concurrent_requests is less than 1.
         """
+        if max_concurrent_requests < 1:
+            raise ValueError("max_concurrent_requests must be at least 1")
+
         self.coordinates = coordinates
         self.api_adapter = api_adapter
+        self.max_concurrent_requests = max_concurrent_requests
+        self.rate_limiter = rate_limiter
+        self.current_buffer = current_buffer
+
+    @property
+    def max_historical_batch_size(self) -> int:
+        """Maximum number of coordinates fetched with a single historical query, as supported by the API adapter.
+
+        Returns:
+            int: The batch size.
+        """
+        return self.api_adapter.max_historical_batch_size
+
+    @property
+    def max_current_batch_size(self) -> int:
+        """Maximum number of coordinates fetched with a single current query, as supported by the API adapter.
+
+        Returns:
+            int: The batch size.
+        """
+        return self.api_adapter.max_current_batch_size
+
+    def historical_request_weight(self, num_coordinates: int, start_date: str, end_date: str, columns: Optional[List[str]] = None) -> float:
+        """How much a query for historical data counts against the API's quota, as counted by the API adapter.
+
+        Args:
+            num_coordinates (int): Number of locations queried.
+            start_date (str): iso8601 format YYYY-MM-DD.
+            end_date (str): iso8601 format YYYY-MM-DD.
+            columns (list[str], optional): The columns/parameters queried. None for all columns. Defaults to None.
+
+        Returns:
+            float: The weight.
+        """
+        return self.api_adapter.historical_request_weight(num_coordinates, start_date, end_date, columns=columns)
+
+    def current_request_weight(self, num_coordinates: int, columns: Optional[List[str]] = None) -> float:
+        """How much a query for current data counts against the API's quota, as counted by the API adapter. Queries are charged for the full window, even when a current buffer shortens them.
+
+        Args:
+            num_coordinates (int): Number of locations queried.
+            columns (list[str], optional): The columns/parameters queried. None for all columns. Defaults to None.
+
+        Returns:
+            float: The weight.
+        """
+        return self.api_adapter.current_request_weight(num_coordinates, columns=columns)
 
     def _build_hourly_parameters_from_response(self, hourly_parameters_response: dict, tz: str) -> DataFrame:
-        index_parameter = self.api_adapter.get_index_parameter()
-        df = DataFrame(hourly_parameters_response)
-        df.index = df[index_parameter].map(lambda x: datetime.fromisoformat(x).replace(tzinfo=pytz.timezone(tz)).astimezone(pytz.timezone("UTC")))
-        df.drop(columns=[index_parameter], inplace=True)
-        return df
+        return build_hourly_parameters_from_response(hourly_parameters_response, tz, self.api_adapter.get_index_parameter())
 
     def build_datum_from_response(self, response: Response, coordinate: Coordinate, precision: int = 5) -> WeatherDatum:
         """Construct a WeatherDatum from a Response.
@@ -61,55 +218,7 @@ class APIWeatherProvider(BaseWeatherProvider):
         Returns:
             WeatherDatum: The constructed WeatherDatum instance.
         """
-        assert response.data is not None
-
-        requested_lon = coordinate.lon
-        requested_lat = coordinate.lat
-
-        response_lon = response.data.get("longitude", None)
-        response_lat = response.data.get("latitude", None)
-
-        response_rounded_lon = round(response_lon, precision)
-        response_rounded_lat = round(response_lat, precision)
-
-        difference_rounded_lon = response_rounded_lon - requested_lon
-        difference_rounded_lat = response_rounded_lat - requested_lat
-
-        if abs(difference_rounded_lon) > RESPONSE_TOLERANCE or abs(difference_rounded_lat) > RESPONSE_TOLERANCE:
-            logging.error(
-                "The API responded with a location outside the requested location tolerance. "
-                f"The requested location is ({requested_lon}, {requested_lat}) vs. the response location ({response_lon}, {response_lat}). "
-                f"The difference in longitude is {difference_rounded_lon} and the difference in latitude is {difference_rounded_lat}. "
-                "To change the tolerance, change the RESPONSE_TOLERANCE constant in the APIWeatherProvider class. "
-                "To change the rounding precision, change the precision argument in the build_datum_from_response method.")
-
-        elif abs(difference_rounded_lon) <= RESPONSE_TOLERANCE or abs(difference_rounded_lat) <= RESPONSE_TOLERANCE:
-            logging.warning(
-                "The API responded with a location within the requested location tolerance, but not equal. "
-                f"The requested location is ({requested_lon}, {requested_lat}) vs. the response location ({response_lon}, {response_lat}). "
-                f"The difference in longitude is {difference_rounded_lon} and the difference in latitude is {difference_rounded_lat}. "
-                "To change the tolerance, change the RESPONSE_TOLERANCE constant in the APIWeatherProvider class. "
-                "To change the rounding precision, change the precision argument in the build_datum_from_response method.")
-        else:
-            pass
-
-        datum = WeatherDatum(
-            longitude=requested_lon,
-            latitude=requested_lat,
-            api_response_longitude=response_lon,
-            api_response_latitude=response_lat,
-            elevation=response.data.get(
-                "elevation", None),
-            utc_offset_seconds=response.data.get(
-                "utc_offset_seconds", None),
-            timezone=response.data.get(
-                "timezone", None),
-            hourly_units=response.data.get(
-                "hourly_units", None),
-            hourly_parameters=self._build_hourly_parameters_from_response(
-                response.data.get("hourly", None), response.data["timezone"]))
-
-        return datum
+        return build_datum_from_response(response, coordinate, self.api_adapter.get_index_parameter(), precision)
 
     def fetch_historical_datum(self,
                                coordinate: Coordinate,
@@ -128,13 +237,37 @@ class APIWeatherProvider(BaseWeatherProvider):
         Returns:
             WeatherDatum: A Datum object containing the weather data and metadata about a coordinate.
         """
-        response = self.api_adapter.get_historical(coordinate=coordinate, start_date=start_date, end_date=end_date, columns=columns)
+        return self.fetch_historical_datums([coordinate], start_date=start_date, end_date=end_date, columns=columns)[0]
+
+    def fetch_historical_datums(self,
+                                coordinates: List[Coordinate],
+                                start_date: str = DEFAULT_START_DATE,
+                                end_date: str = DEFAULT_END_DATE,
+                                columns: Optional[List[str]] = None) -> List[WeatherDatum]:
+        """
+        Fetch historical weather for a batch of at most max_historical_batch_size coordinates with a single query.
 
-        datum = self.build_datum_from_response(response, coordinate)
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for.
+            start_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_START_DATE.
+            end_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_END_DATE.
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
 
-        datum.hourly_parameters.columns = self._remap_historical_parameters_from_adapter(datum.hourly_parameters.columns)
+        Returns:
+            list[WeatherDatum]: One datum per coordinate, in the same order as the coordinates.
+        """
+        if columns:
+            columns = self._remap_historical_parameters_to_adapter(columns)
 
-        return datum
+        responses = self.api_adapter.get_historical_batch(coordinates=coordinates, start_date=start_date, end_date=end_date, columns=columns)
+
+        datums = []
+        for response, coordinate in zip(responses, coordinates):
+            datum = self.build_datum_from_response(response, coordinate)
+            datum.hourly_parameters.columns = self._remap_historical_parameters_from_adapter(datum.hourly_parameters.columns)
+            datums.append(datum)
+
+        return datums
 
     def fetch_historical(self,
                          columns: Optional[List[str]] = None,
@@ -147,23 +280,17 @@ class APIWeatherProvider(BaseWeatherProvider):
             columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
             start_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_START_DATE.
             end_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_END_DATE.
-            sleep_duration (float, optional): How many seconds to sleep after each query. Helps prevent throttling. Defaults to 0.0.
+            sleep_duration (float, optional): How many seconds each worker sleeps after each query. Prefer a rate_limiter, which does not slow down fetches below the limit. Defaults to 0.0.
 
         Returns:
             list[WeatherDatum]: A list of WeatherDatum objects containing the weather data and metadata about the locations.
         """
-        datums = {}
-
-        if columns:
-            columns = self._remap_historical_parameters_to_adapter(columns)
-
-        for coordinate in self.coordinates:
-            datum = self.fetch_historical_datum(coordinate=coordinate, start_date=start_date, end_date=end_date, columns=columns)
-            coord = Coordinate(datum.longitude, datum.latitude)
-            if coord not in datums:
-                datums[coord] = datum
-            time.sleep(sleep_duration)
-        return list(datums.values())
+        # datums are keyed by the requested coordinate, so duplicate coordinates are only fetched once
+        coordinates = list(dict.fromkeys(self.coordinates))
+        return self._fetch_for_coordinates(
+            lambda batch: self.fetch_historical_datums(batch, start_date=start_date, end_date=end_date, columns=columns),
+            coordinates, batch_size=self.max_historical_batch_size, max_concurrent_requests=self.max_concurrent_requests, rate_limiter=self.rate_limiter,
+            weight=lambda batch: self.historical_request_weight(len(batch), start_date, end_date, columns=columns), sleep_duration=sleep_duration)
 
     def fetch_current_datum(self, coordinate: Coordinate, columns: Optional[List[str]] = None) -> WeatherDatum:
         """Fetch current weather for a single coordinate.
@@ -175,31 +302,82 @@ class APIWeatherProvider(BaseWeatherProvider):
         Returns:
             WeatherDatum: A Datum object containing the weather data and metadata about a coordinate
         """
-        response = self.api_adapter.get_current(coordinate=coordinate, columns=columns)
+        return self.fetch_current_datums([coordinate], columns=columns)[0]
+
+    def fetch_current_datums(self, coordinates: List[Coordinate], columns: Optional[List[str]] = None) -> List[WeatherDatum]:
+        """Fetch current weather for a batch of at most max_current_batch_size coordinates with a single query.
+
+        With a current buffer, coordinates whose buffer is recent enough are fetched with a second, much smaller query for the last few days and the forecast only, and merged into their buffers. Coordinates without a buffer, or with a stale one, are fetched in full.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for.
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+
+        Returns:
+            list[WeatherDatum]: One datum per coordinate, in the same order as the coordinates.
+        """
+        if self.current_buffer is None:
+            return self._request_current_datums(coordinates, columns)
 
-        datum = self.build_datum_from_response(response, coordinate)
+        now = datetime.now(timezone.utc)
+        buffered: Dict[Coordinate, WeatherDatum] = {}
+        for coordinate in coordinates:
+            loaded = self.current_buffer.load(coordinate, columns)
+            if loaded is not None and not self.current_buffer.is_stale(loaded[1], now):
+                buffered[coordinate] = loaded[0]
 
-        datum.hourly_parameters.columns = self._remap_current_parameters_from_adapter(datum.hourly_parameters.columns)
+        full = [coordinate for coordinate in coordinates if coordinate not in buffered]
+        delta = [coordinate for coordinate in coordinates if coordinate in buffered]
 
-        return datum
+        datums: Dict[Coordinate, WeatherDatum] = {}
+        if len(full) > 0:
+            datums.update(zip(full, self._request_current_datums(full, columns)))
+        if len(delta) > 0:
+            delta_datums = self._request_current_datums(delta, columns, past_days=self.current_buffer.delta_past_days)
+            datums.update((coordinate, self.current_buffer.merge(buffered[coordinate], datum, now)) for coordinate, datum in zip(delta, delta_datums))
 
-    def fetch_current(self, columns: Optional[List[str]] = None, sleep_duration: float = 0.0) -> List[WeatherDatum]:
-        """Fetch current weather for all coordinates.
+        for coordinate in coordinates:
+            self.current_buffer.save(datums[coordinate], now, columns)
+        return [datums[coordinate] for coordinate in coordinates]
+
+    def _request_current_datums(self, coordinates: List[Coordinate], columns: Optional[List[str]] = None, past_days: Optional[int] = None) -> List[WeatherDatum]:
+        """Query the API for current weather of a batch of coordinates.
 
         Args:
+            coordinates (list[Coordinate]): The locations to fetch data for.
             columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
-            sleep_duration (float, optional): How many seconds to sleep after each query. Helps prevent throttling. Defaults to 0.0.
+            past_days (int, optional): Days of past data to request. Defaults to None (the adapter's default, the full window).
 
         Returns:
-            list[WeatherDatum]: A list of WeatherDatums containing the weather data about the location.
+            list[WeatherDatum]: One datum per coordinate, in the same order as the coordinates.
         """
-        datums = []
-
         if columns:
             columns = self._remap_current_parameters_to_adapter(columns)
 
-        for coordinate in self.coordinates:
-            datum = self.fetch_current_datum(coordinate=coordinate, columns=columns)
+        if past_days is None:
+            responses = self.api_adapter.get_current_batch(coordinates=coordinates, columns=columns)
+        else:
+            responses = self.api_adapter.get_current_batch(coordinates=coordinates, past_days=past_days, columns=columns)
+
+        datums = []
+        for response, coordinate in zip(responses, coordinates):
+            datum = self.build_datum_from_response(response, coordinate)
+            datum.hourly_parameters.columns = self._remap_current_parameters_from_adapter(datum.hourly_parameters.columns)
             datums.append(datum)
-            time.sleep(sleep_duration)
+
         return datums
+
+    def fetch_current(self, columns: Optional[List[str]] = None, sleep_duration: float = 0.0) -> List[WeatherDatum]:
+        """Fetch current weather for all coordinates.
+
+        Args:
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+            sleep_duration (float, optional): How many seconds each worker sleeps after each query. Prefer a rate_limiter, which does not slow down fetches below the limit. Defaults to 0.0.
+
+        Returns:
+            list[WeatherDatum]: A list of WeatherDatums containing the weather data about the location.
+        """
+        return self._fetch_for_coordinates(
+            lambda batch: self.fetch_current_datums(batch, columns=columns),
+            self.coordinates, batch_size=self.max_current_batch_size, max_concurrent_requests=self.max_concurrent_requests, rate_limiter=self.rate_limiter,
+            weight=lambda batch: self.current_request_weight(len(batch), columns=columns), sleep_duration=sleep_duration)
@@ -3,16 +3,17 @@ import logging
 from openmeteo_sdk import (
     WeatherApiResponse, VariablesWithTime, Unit
 )
+import numpy as np
 from pandas import (
-    DataFrame, to_datetime, Index, date_range, Timedelta
+    DataFrame, DatetimeIndex, to_datetime
 )
-import time
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
 from rlf.forecasting.data_fetching_utilities.weather_provider.api.base_api_adapter import (
     BaseAPIAdapter
 )
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.rate_limiter import RateLimiter
 from rlf.forecasting.data_fetching_utilities.weather_provider.base_weather_provider import (
     BaseWeatherProvider
 )
@@ -30,74 +31,171 @@ DEFAULT_END_DATE = datetime.now().strftime("%Y-%m-%d")
 
 RESPONSE_TOLERANCE = 0.5
 
+# reverse lookup of the unit enum, from code to name
+UNIT_NAMES: Dict[int, str] = {value: name for name, value in vars(Unit.Unit).items() if not name.startswith("_")}
+UNKNOWN_UNIT = "Unknown Unit"
+
+
+def hourly_time_index(hourly: VariablesWithTime, name: str = "time") -> DatetimeIndex:
+    """Build the UTC index of a VariablesWithTime from its start, end and interval.
+
+    Args:
+        hourly (VariablesWithTime): The hourly variables of a response.
+        name (str, optional): Name of the index. Defaults to "time".
+
+    Returns:
+        DatetimeIndex: The times of the values, end exclusive.
+    """
+    seconds = np.arange(hourly.Time(), hourly.TimeEnd(), hourly.Interval(), dtype=np.int64)
+    return DatetimeIndex(to_datetime(seconds, unit="s", utc=True), name=name)
+
+
+def decode_hourly_values(hourly: VariablesWithTime, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Copy the values of every variable straight from the flatbuffer into one float32 array.
+
+    Args:
+        hourly (VariablesWithTime): The hourly variables of a response.
+        out (np.ndarray, optional): Preallocated (variables, times) float32 array to write into. Defaults to None (a new array).
+
+    Raises:
+        ValueError: If out does not have the shape of the response.
+
+    Returns:
+        np.ndarray: The (variables, times) values.
+    """
+    num_variables = hourly.VariablesLength()
+    num_times = len(range(hourly.Time(), hourly.TimeEnd(), hourly.Interval()))
+    if out is None:
+        out = np.empty((num_variables, num_times), dtype=np.float32)
+    elif out.shape != (num_variables, num_times):
+        raise ValueError(f"Expected an array of shape {(num_variables, num_times)}, got {out.shape}")
+
+    for i in range(num_variables):
+        out[i] = hourly.Variables(i).ValuesAsNumpy()
+    return out
+
 
 class APIWeatherProviderECMWF(BaseWeatherProvider):
     """Provides a historical or forecasted weather for a given location and time period."""
 
     def __init__(self,
                  coordinates: List[Coordinate],
-                 api_adapter: BaseAPIAdapter = OpenMeteoECMWFAdapter()) -> None:
+                 api_adapter: BaseAPIAdapter = OpenMeteoECMWFAdapter(),
+                 max_concurrent_requests: int = 1,
+                 rate_limiter: Optional[RateLimiter] = None) -> None:
         """Create an APIWeatherProvider for the given list of coordinates.
 
         Args:
             coordinates (list[Coordinate(longitude: float, latitude: float)]): Named tuple WSG84 coordinates: (longitude, latitude).
             api_adapter (BaseAPIAdapter, optional): An adapter for a weather API. Defaults to OpenMeteoECMWFAdapter().
+            max_concurrent_requests (int, optional): Maximum number of queries to the API in flight at once when fetching all coordinates. Each query fetches up to max_historical_batch_size or max_current_batch_size coordinates. Defaults to 1 (serial queries).
+            rate_limiter (RateLimiter, optional): Limits how often queries are sent when fetching all coordinates, ie RateLimiter.per_minute for the API's quota. Each query is charged its weight, see historical_request_weight and current_request_weight. Defaults to None (no limit).
+
+        Raises:
+            ValueError: If max_concurrent_requests is less than 1.
         """
+        if max_concurrent_requests < 1:
+            raise ValueError("max_concurrent_requests must be at least 1")
+
         self.coordinates = coordinates
         self.api_adapter = api_adapter
+        self.max_concurrent_requests = max_concurrent_requests
+        self.rate_limiter = rate_limiter
+
+    @property
+    def max_historical_batch_size(self) -> int:
+        """Maximum number of coordinates fetched with a single historical query, as supported by the API adapter.
+
+        Returns:
+            int: The batch size.
+        """
+        return self.api_adapter.max_historical_batch_size
+
+    @property
+    def max_current_batch_size(self) -> int:
+        """Maximum number of coordinates fetched with a single current query, as supported by the API adapter.
+
+        Returns:
+            int: The batch size.
+        """
+        return self.api_adapter.max_current_batch_size
+
+    def historical_request_weight(self, num_coordinates: int, start_date: str, end_date: str, columns: Optional[List[str]] = None) -> float:
+        """How much a query for historical data counts against the API's quota, as counted by the API adapter.
+
+        Args:
+            num_coordinates (int): Number of locations queried.
+            start_date (str): iso8601 format YYYY-MM-DD.
+            end_date (str): iso8601 format YYYY-MM-DD.
+            columns (list[str], optional): The columns/parameters queried. None for all columns. Defaults to None.
+
+        Returns:
+            float: The weight.
+        """
+        return self.api_adapter.historical_request_weight(num_coordinates, start_date, end_date, columns=columns)
+
+    def current_request_weight(self, num_coordinates: int, columns: Optional[List[str]] = None) -> float:
+        """How much a query for current data counts against the API's quota, as counted by the API adapter. Queries are charged for the full window, even when a current buffer shortens them.
+
+        Args:
+            num_coordinates (int): Number of locations queried.
+            columns (list[str], optional): The columns/parameters queried. None for all columns. Defaults to None.
+
+        Returns:
+            float: The weight.
+        """
+        return self.api_adapter.current_request_weight(num_coordinates, columns=columns)
 
     def _build_units_dict_from_response(self, hourly_parameters_response: VariablesWithTime, columns: Optional[List[str]] = get_hourly_parameters("ecmwf_shared")) -> dict:
         if columns is None:
             columns = get_hourly_parameters("ecmwf_shared")
 
-        def unit_code_to_name(code):
-            for name, value in Unit.Unit.__dict__.items():
-                if value == code:
-                    return name
-            return "Unknown Unit"
-
-        unit_ids = []
-        units = {}
-        for i in range(hourly_parameters_response.VariablesLength()):
-            unit_id = hourly_parameters_response.Variables(i).Unit()
-            unit_ids.append(unit_id)
-            units[columns[i]] = unit_code_to_name(unit_id)
+        return {columns[i]: UNIT_NAMES.get(hourly_parameters_response.Variables(i).Unit(), UNKNOWN_UNIT)
+                for i in range(hourly_parameters_response.VariablesLength())}
 
-        return units
-
-    def _build_hourly_parameters_from_response(self, hourly_parameters_response: VariablesWithTime, columns: Optional[List[str]] = get_hourly_parameters("ecmwf_shared")) -> DataFrame:
+    def _build_hourly_parameters_from_response(self, hourly_parameters_response: VariablesWithTime, columns: Optional[List[str]] = get_hourly_parameters("ecmwf_shared"), out: Optional[np.ndarray] = None) -> DataFrame:
         """Construct a WeatherDatum from a Response.
 
         Args:
             hourly_parameters_response (Response): The Response to draw data from.
             columns (List): List of columns, defaults to all shared parameters
+            out (np.ndarray, optional): Preallocated (variables, times) float32 array to decode the values into. Defaults to None.
 
         Returns:
             df: The constructed dataframe, with index column: time
         """
         if columns is None:
             columns = get_hourly_parameters("ecmwf_shared")
-        index_parameter = self.api_adapter.get_index_parameter()
-
-        hourly_data = {}
+        index = hourly_time_index(hourly_parameters_response, name=self.api_adapter.get_index_parameter())
+        values = decode_hourly_values(hourly_parameters_response, out=out)
+        # the transpose is a view, so the frame holds the decoded values as a single block without copying
+        return DataFrame(values.T, index=index, columns=columns[:len(values)], copy=False)
 
-        for i in range(hourly_parameters_response.VariablesLength()):
-            hourly_data[columns[i]] = hourly_parameters_response.Variables(i).ValuesAsNumpy()
+    def _check_response_location(self, response: WeatherApiResponse, coordinate: Coordinate, precision: int = 5) -> None:
+        """Log an error if the API responded with a location outside RESPONSE_TOLERANCE of the requested coordinate.
 
-        hourly_data[index_parameter] = date_range(
-            start=to_datetime(hourly_parameters_response.Time(), unit="s"),
-            end=to_datetime(hourly_parameters_response.TimeEnd(), unit="s"),
-            freq=Timedelta(seconds=hourly_parameters_response.Interval()),
-            inclusive="left",
-            tz='utc'
-        )
+        Args:
+            response (WeatherApiResponse): The response.
+            coordinate (Coordinate): The coordinate that is requested by the user.
+            precision (int): The precision to round the response coordinates to. Defaults to 5 decimal places.
+        """
+        requested_lon = coordinate.lon
+        requested_lat = coordinate.lat
 
-        df = DataFrame(hourly_data)
+        response_lon = response.Longitude()
+        response_lat = response.Latitude()
 
-        df.index = Index(df[index_parameter])
+        difference_rounded_lon = round(response_lon, precision) - requested_lon
+        difference_rounded_lat = round(response_lat, precision) - requested_lat
 
-        df.drop(columns=[index_parameter], inplace=True)
-        return df
+        # Outside Response Tolerance (Not Tolerated). Responses within the tolerance are expected, the API snaps to its grid
+        if abs(difference_rounded_lon) > RESPONSE_TOLERANCE or abs(difference_rounded_lat) > RESPONSE_TOLERANCE:
+            logging.error(
+                "The API responded with a location outside the requested location tolerance. "
+                f"The requested location is ({requested_lon}, {requested_lat}) vs. the response location ({response_lon}, {response_lat}). "
+                f"The difference in longitude is {difference_rounded_lon} and the difference in latitude is {difference_rounded_lat}. "
+                "To change the tolerance, change the RESPONSE_TOLERANCE constant in the APIWeatherProvider class. "
+                "To change the rounding precision, change the precision argument in the build_datum_from_response method.")
 
     def build_datum_from_response(self, response: WeatherApiResponse, coordinate: Coordinate, columns: Optional[List[str]] = get_hourly_parameters("ecmwf_shared"), precision: int = 5) -> WeatherDatum:
         """Construct a WeatherDatum from a Response.
@@ -111,51 +209,61 @@ class APIWeatherProviderECMWF(BaseWeatherProvider):
         Returns:
             WeatherDatum: The constructed WeatherDatum instance.
         """
-        assert response.Hourly().VariablesLength() > 0
+        return self.build_datums_from_responses([response], [coordinate], columns=columns, precision=precision)[0]
 
-        requested_lon = coordinate.lon
-        requested_lat = coordinate.lat
+    def build_datums_from_responses(self,
+                                    responses: List[WeatherApiResponse],
+                                    coordinates: List[Coordinate],
+                                    columns: Optional[List[str]] = get_hourly_parameters("ecmwf_shared"),
+                                    precision: int = 5) -> List[WeatherDatum]:
+        """Construct WeatherDatums from the responses to a multi-location request.
 
-        response_lon = response.Longitude()
-        response_lat = response.Latitude()
+        The values of all responses sharing the same variables and times are decoded into one preallocated (locations, variables, times) float32 array, which the datums' frames are views of.
 
-        response_rounded_lon = round(response_lon, precision)
-        response_rounded_lat = round(response_lat, precision)
+        Args:
+            responses (list[WeatherApiResponse]): The responses, one per coordinate.
+            coordinates (list[Coordinate]): The coordinates that are requested by the user, in the same order as the responses.
+            columns (List): List of columns, defaults to all shared parameters
+            precision (int): The precision to round the response coordinates to. Defaults to 5 decimal places.
 
-        difference_rounded_lon = response_rounded_lon - requested_lon
-        difference_rounded_lat = response_rounded_lat - requested_lat
+        Raises:
+            ValueError: If the number of responses and coordinates differ.
 
-        # Outside Response Tolerance (Not Tolerated)
-        if abs(difference_rounded_lon) > RESPONSE_TOLERANCE or abs(difference_rounded_lat) > RESPONSE_TOLERANCE:
-            logging.error(
-                "The API responded with a location outside the requested location tolerance. "
-                f"The requested location is ({requested_lon}, {requested_lat}) vs. the response location ({response_lon}, {response_lat}). "
-                f"The difference in longitude is {difference_rounded_lon} and the difference in latitude is {difference_rounded_lat}. "
-                "To change the tolerance, change the RESPONSE_TOLERANCE constant in the APIWeatherProvider class. "
-                "To change the rounding precision, change the precision argument in the build_datum_from_response method.")
+        Returns:
+            list[WeatherDatum]: The constructed WeatherDatum instances, in the same order as the coordinates.
+        """
+        if len(responses) != len(coordinates):
+            raise ValueError(f"Got {len(responses)} responses for {len(coordinates)} coordinates")
+        if columns is None:
+            columns = get_hourly_parameters("ecmwf_shared")
+
+        hourly_responses = [response.Hourly() for response in responses]
+        for hourly in hourly_responses:
+            assert hourly.VariablesLength() > 0
+
+        # a single allocation for the common case where every location shares the same variables and times
+        shapes = {(hourly.VariablesLength(), hourly.Time(), hourly.TimeEnd(), hourly.Interval()) for hourly in hourly_responses}
+        block: Optional[np.ndarray] = None
+        if len(shapes) == 1:
+            first = hourly_responses[0]
+            num_times = len(range(first.Time(), first.TimeEnd(), first.Interval()))
+            block = np.empty((len(responses), first.VariablesLength(), num_times), dtype=np.float32)
+
+        datums = []
+        for i, (response, hourly, coordinate) in enumerate(zip(responses, hourly_responses, coordinates)):
+            self._check_response_location(response, coordinate, precision)
+            datums.append(WeatherDatum(
+                longitude=coordinate.lon,
+                latitude=coordinate.lat,
+                api_response_longitude=response.Longitude(),
+                api_response_latitude=response.Latitude(),
+                elevation=response.Elevation(),
+                utc_offset_seconds=response.UtcOffsetSeconds(),
+                timezone=response.Timezone(),
+                hourly_units=self._build_units_dict_from_response(hourly, columns),
+                hourly_parameters=self._build_hourly_parameters_from_response(hourly, columns, out=block[i] if block is not None else None)))
 
-        # Exactly Equal (Ideal)
-        elif abs(difference_rounded_lon) == 0 and abs(difference_rounded_lat) == 0:
-            pass
-
-        # Not Equal but within Response Tolerance (Not Ideal but Tolerated)
-        else:
-            pass
-
-        datum = WeatherDatum(
-            longitude=requested_lon,
-            latitude=requested_lat,
-            api_response_longitude=response_lon,
-            api_response_latitude=response_lat,
-            elevation=response.Elevation(),
-            utc_offset_seconds=response.UtcOffsetSeconds(),
-            timezone=response.Timezone(),
-            hourly_units=self._build_units_dict_from_response(
-                response.Hourly(), columns),
-            hourly_parameters=self._build_hourly_parameters_from_response(
-                response.Hourly(), columns))
-
-        return datum
+        return datums
 
     def fetch_historical_datum(self,
                                coordinate: Coordinate,
@@ -174,14 +282,31 @@ class APIWeatherProviderECMWF(BaseWeatherProvider):
         Returns:
             WeatherDatum: A Datum object containing the weather data and metadata about a coordinate.
         """
+        return self.fetch_historical_datums([coordinate], start_date=start_date, end_date=end_date, columns=columns)[0]
+
+    def fetch_historical_datums(self,
+                                coordinates: List[Coordinate],
+                                start_date: str = DEFAULT_START_DATE,
+                                end_date: str = DEFAULT_END_DATE,
+                                columns: Optional[List[str]] = get_hourly_parameters("ecmwf_shared")) -> List[WeatherDatum]:
+        """
+        Fetch historical weather for a batch of at most max_historical_batch_size coordinates with a single query.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for.
+            start_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_START_DATE.
+            end_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_END_DATE.
+            columns (List): List of columns, defaults to all shared parameters
+
+        Returns:
+            list[WeatherDatum]: One datum per coordinate, in the same order as the coordinates.
+        """
         if columns is None:
             columns = get_hourly_parameters("ecmwf_shared")
 
-        response = self.api_adapter.get_historical(coordinate=coordinate, start_date=start_date, end_date=end_date, columns=columns)
-
-        datum = self.build_datum_from_response(response, coordinate, columns)
+        responses = self.api_adapter.get_historical_batch(coordinates=coordinates, start_date=start_date, end_date=end_date, columns=columns)
 
-        return datum
+        return self.build_datums_from_responses(responses, coordinates, columns)
 
     def fetch_historical(self,
                          columns: Optional[List[str]] = get_hourly_parameters("ecmwf_shared"),
@@ -194,20 +319,17 @@ class APIWeatherProviderECMWF(BaseWeatherProvider):
             columns (List): List of columns, defaults to all shared parameters
             start_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_START_DATE.
             end_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_END_DATE.
-            sleep_duration (float, optional): How many seconds to sleep after each query. Helps prevent throttling. Defaults to 0.0.
+            sleep_duration (float, optional): How many seconds each worker sleeps after each query. Prefer a rate_limiter, which does not slow down fetches below the limit. Defaults to 0.0.
 
         Returns:
             list[WeatherDatum]: A list of WeatherDatum objects containing the weather data and metadata about the locations.
         """
-        datums = {}
-
-        for coordinate in self.coordinates:
-            datum = self.fetch_historical_datum(coordinate=coordinate, start_date=start_date, end_date=end_date, columns=columns)
-            coord = Coordinate(datum.longitude, datum.latitude)
-            if coord not in datums:
-                datums[coord] = datum
-            time.sleep(sleep_duration)
-        return list(datums.values())
+        # datums are keyed by the requested coordinate, so duplicate coordinates are only fetched once
+        coordinates = list(dict.fromkeys(self.coordinates))
+        return self._fetch_for_coordinates(
+            lambda batch: self.fetch_historical_datums(batch, start_date=start_date, end_date=end_date, columns=columns),
+            coordinates, batch_size=self.max_historical_batch_size, max_concurrent_requests=self.max_concurrent_requests, rate_limiter=self.rate_limiter,
+            weight=lambda batch: self.historical_request_weight(len(batch), start_date, end_date, columns=columns), sleep_duration=sleep_duration)
 
     def fetch_current_datum(self, coordinate: Coordinate, columns: Optional[List[str]] = get_hourly_parameters("ecmwf_shared")) -> WeatherDatum:
         """Fetch current weather for a single coordinate.
@@ -219,29 +341,36 @@ class APIWeatherProviderECMWF(BaseWeatherProvider):
         Returns:
             WeatherDatum: A Datum object containing the weather data and metadata about a coordinate
         """
+        return self.fetch_current_datums([coordinate], columns=columns)[0]
+
+    def fetch_current_datums(self, coordinates: List[Coordinate], columns: Optional[List[str]] = get_hourly_parameters("ecmwf_shared")) -> List[WeatherDatum]:
+        """Fetch current weather for a batch of at most max_current_batch_size coordinates with a single query.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for.
+            columns (List): List of columns, defaults to all shared parameters
+
+        Returns:
+            list[WeatherDatum]: One datum per coordinate, in the same order as the coordinates.
+        """
         if columns is None:
             columns = get_hourly_parameters("ecmwf_shared")
 
-        response = self.api_adapter.get_current(coordinate=coordinate, columns=columns)
-
-        datum = self.build_datum_from_response(response, coordinate, columns)
+        responses = self.api_adapter.get_current_batch(coordinates=coordinates, columns=columns)
 
-        return datum
+        return self.build_datums_from_responses(responses, coordinates, columns)
 
     def fetch_current(self, columns: Optional[List[str]] = get_hourly_parameters("ecmwf_shared"), sleep_duration: float = 0.0) -> List[WeatherDatum]:
         """Fetch current weather for all coordinates.
 
         Args:
             columns (List): List of columns, defaults to all shared parameters
-            sleep_duration (float, optional): How many seconds to sleep after each query. Helps prevent throttling. Defaults to 0.0.
+            sleep_duration (float, optional): How many seconds each worker sleeps after each query. Prefer a rate_limiter, which does not slow down fetches below the limit. Defaults to 0.0.
 
         Returns:
             list[WeatherDatum]: A list of WeatherDatums containing the weather data about the location.
         """
-        datums = []
-
-        for coordinate in self.coordinates:
-            datum = self.fetch_current_datum(coordinate=coordinate, columns=columns)
-            datums.append(datum)
-            time.sleep(sleep_duration)
-        return datums
+        return self._fetch_for_coordinates(
+            lambda batch: self.fetch_current_datums(batch, columns=columns),
+            self.coordinates, batch_size=self.max_current_batch_size, max_concurrent_requests=self.max_concurrent_requests, rate_limiter=self.rate_limiter,
+            weight=lambda batch: self.current_request_weight(len(batch), columns=columns), sleep_duration=sleep_duration)
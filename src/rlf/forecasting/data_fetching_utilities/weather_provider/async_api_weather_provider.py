@@ -0,0 +1,157 @@
+import asyncio
+from typing import List, Optional
+
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.base_async_api_adapter import (
+    BaseAsyncAPIAdapter
+)
+from rlf.forecasting.data_fetching_utilities.weather_provider.api_weather_provider import (
+    build_datum_from_response
+)
+from rlf.forecasting.data_fetching_utilities.weather_provider.async_base_weather_provider import (
+    AsyncBaseWeatherProvider
+)
+from rlf.forecasting.data_fetching_utilities.weather_provider.base_weather_provider import (
+    DEFAULT_END_DATE, DEFAULT_START_DATE
+)
+from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.async_open_meteo_adapter import (
+    AsyncOpenMeteoAdapter
+)
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import (
+    WeatherDatum
+)
+
+
+class AsyncAPIWeatherProvider(AsyncBaseWeatherProvider):
+    """Provides a historical of forecasted weather for a given location and time period from an event loop. The asynchronous counterpart of APIWeatherProvider."""
+
+    def __init__(self, coordinates: List[Coordinate], api_adapter: Optional[BaseAsyncAPIAdapter] = None) -> None:
+        """Create an AsyncAPIWeatherProvider for the given list of coordinates.
+
+        All batches of coordinates are queried at once. The adapter bounds how many queries are in flight and how often they start for each host, so several providers sharing an adapter (ie one per catchment) share its limits.
+
+        Args:
+            coordinates (list[Coordinate(longitude: float, latitude: float)]): Named tuple WSG84 coordinates: (longitude, latitude).
+            api_adapter (BaseAsyncAPIAdapter, optional): An asynchronous adapter for a weather API. Defaults to None (a new AsyncOpenMeteoAdapter).
+        """
+        super().__init__(coordinates)
+        self.api_adapter = api_adapter if api_adapter is not None else AsyncOpenMeteoAdapter()
+
+    @property
+    def max_historical_batch_size(self) -> int:
+        """Maximum number of coordinates fetched with a single historical query, as supported by the API adapter.
+
+        Returns:
+            int: The batch size.
+        """
+        return self.api_adapter.max_historical_batch_size
+
+    @property
+    def max_current_batch_size(self) -> int:
+        """Maximum number of coordinates fetched with a single current query, as supported by the API adapter.
+
+        Returns:
+            int: The batch size.
+        """
+        return self.api_adapter.max_current_batch_size
+
+    @staticmethod
+    def _batches(coordinates: List[Coordinate], batch_size: int) -> List[List[Coordinate]]:
+        """Split coordinates into batches.
+
+        Args:
+            coordinates (list[Coordinate]): The coordinates.
+            batch_size (int): Maximum number of coordinates per batch.
+
+        Returns:
+            list[list[Coordinate]]: The batches, in order.
+        """
+        return [coordinates[i:i + batch_size] for i in range(0, len(coordinates), batch_size)]
+
+    async def fetch_historical_datums(self,
+                                      coordinates: List[Coordinate],
+                                      start_date: str = DEFAULT_START_DATE,
+                                      end_date: str = DEFAULT_END_DATE,
+                                      columns: Optional[List[str]] = None) -> List[WeatherDatum]:
+        """Fetch historical weather for a batch of at most max_historical_batch_size coordinates with a single query.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for.
+            start_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_START_DATE.
+            end_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_END_DATE.
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+
+        Returns:
+            list[WeatherDatum]: One datum per coordinate, in the same order as the coordinates.
+        """
+        if columns:
+            columns = self._remap_historical_parameters_to_adapter(columns)
+
+        responses = await self.api_adapter.get_historical_batch(coordinates=coordinates, start_date=start_date, end_date=end_date, columns=columns)
+
+        datums = []
+        for response, coordinate in zip(responses, coordinates):
+            datum = build_datum_from_response(response, coordinate, self.api_adapter.get_index_parameter())
+            datum.hourly_parameters.columns = self._remap_historical_parameters_from_adapter(datum.hourly_parameters.columns)
+            datums.append(datum)
+
+        return datums
+
+    async def fetch_current_datums(self, coordinates: List[Coordinate], columns: Optional[List[str]] = None) -> List[WeatherDatum]:
+        """Fetch current weather for a batch of at most max_current_batch_size coordinates with a single query.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for.
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+
+        Returns:
+            list[WeatherDatum]: One datum per coordinate, in the same order as the coordinates.
+        """
+        if columns:
+            columns = self._remap_current_parameters_to_adapter(columns)
+
+        responses = await self.api_adapter.get_current_batch(coordinates=coordinates, columns=columns)
+
+        datums = []
+        for response, coordinate in zip(responses, coordinates):
+            datum = build_datum_from_response(response, coordinate, self.api_adapter.get_index_parameter())
+            datum.hourly_parameters.columns = self._remap_current_parameters_from_adapter(datum.hourly_parameters.columns)
+            datums.append(datum)
+
+        return datums
+
+    async def fetch_historical(self,
+                               columns: Optional[List[str]] = None,
+                               start_date: str = DEFAULT_START_DATE,
+                               end_date: str = DEFAULT_END_DATE) -> List[WeatherDatum]:
+        """Fetch historical weather for all coordinates, querying all batches at once.
+
+        Args:
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+            start_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_START_DATE.
+            end_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_END_DATE.
+
+        Returns:
+            list[WeatherDatum]: A list of WeatherDatum objects containing the weather data and metadata about the locations.
+        """
+        # datums are keyed by the requested coordinate, so duplicate coordinates are only fetched once
+        coordinates = list(dict.fromkeys(self.coordinates))
+        results = await asyncio.gather(*(self.fetch_historical_datums(batch, start_date=start_date, end_date=end_date, columns=columns)
+                                         for batch in self._batches(coordinates, self.max_historical_batch_size)))
+        return [datum for datums in results for datum in datums]
+
+    async def fetch_current(self, columns: Optional[List[str]] = None) -> List[WeatherDatum]:
+        """Fetch current weather for all coordinates, querying all batches at once.
+
+        Args:
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+
+        Returns:
+            list[WeatherDatum]: A list of WeatherDatums containing the weather data about the location.
+        """
+        results = await asyncio.gather(*(self.fetch_current_datums(batch, columns=columns) for batch in self._batches(self.coordinates, self.max_current_batch_size)))
+        return [datum for datums in results for datum in datums]
+
+    async def close(self) -> None:
+        """Close the connections of the API adapter."""
+        await self.api_adapter.close()
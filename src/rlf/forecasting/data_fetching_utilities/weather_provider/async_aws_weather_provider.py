@@ -0,0 +1,93 @@
+import asyncio
+import functools
+from typing import Callable, List, Optional
+
+from rlf.aws_dispatcher import AWSDispatcher
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.async_base_weather_provider import (
+    AsyncBaseWeatherProvider
+)
+from rlf.forecasting.data_fetching_utilities.weather_provider.aws_weather_provider import (
+    AWSWeatherProvider
+)
+from rlf.forecasting.data_fetching_utilities.weather_provider.base_weather_provider import (
+    DEFAULT_END_DATE, DEFAULT_START_DATE
+)
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import (
+    WeatherDatum
+)
+
+
+class AsyncAWSWeatherProvider(AsyncBaseWeatherProvider):
+    """Provides a historical of forecasted weather for a given location and time period from an event loop. Backed by AWS. The asynchronous counterpart of AWSWeatherProvider.
+
+    The AWS dispatcher is synchronous, so downloads run on the event loop's default executor without blocking it; up to max_concurrent_downloads datums are downloaded at once by each fetch.
+    """
+
+    def __init__(self,
+                 coordinates: List[Coordinate],
+                 aws_dispatcher: AWSDispatcher,
+                 current_timestamp: Optional[str] = None,
+                 max_concurrent_downloads: int = 1,
+                 use_historical_store: bool = False) -> None:
+        """Create an AsyncAWSWeatherProvider for the given list of coordinates.
+
+        Args:
+            coordinates (list[Coordinate(longitude: float, latitude: float)]): Named tuple WSG84 coordinates: (longitude, latitude).
+            aws_dispatcher (AWSDispatcher): The AWSDispatcher instance from which data will be drawn.
+            current_timestamp (str): The 'current' timestamp for which current data will be fetched. Expected in the form "YY-mm-DD_HH-MM" in UTC. Expected to match a directory in the current weather dir for the AWSProvider.
+            max_concurrent_downloads (int, optional): Maximum number of datums to download from AWS at once. Defaults to 1 (serial downloads).
+            use_historical_store (bool, optional): Whether historical data is read from the partitioned historical store with a single scan. Defaults to False.
+
+        Raises:
+            ValueError: If max_concurrent_downloads is less than 1.
+        """
+        super().__init__(coordinates)
+        self.provider = AWSWeatherProvider(coordinates, aws_dispatcher, current_timestamp=current_timestamp,
+                                           max_concurrent_downloads=max_concurrent_downloads, use_historical_store=use_historical_store)
+
+    async def _run_in_executor(self, fetch: Callable[[], List[WeatherDatum]]) -> List[WeatherDatum]:
+        """Run a blocking fetch on the event loop's default executor.
+
+        Args:
+            fetch (Callable[[], List[WeatherDatum]]): The fetch.
+
+        Returns:
+            list[WeatherDatum]: The result of the fetch.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, fetch)
+
+    async def fetch_historical(self,
+                               columns: Optional[List[str]] = None,
+                               start_date: str = DEFAULT_START_DATE,
+                               end_date: str = DEFAULT_END_DATE) -> List[WeatherDatum]:
+        """Fetch historical weather for all coordinates.
+
+        Args:
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+            start_date (str, optional): The starting date for the requested data. In the format "YYYY-MM-DD". Defaults to DEFAULT_START_DATE.
+            end_date (str, optional): The ending date for the requested data. In the format "YYYY-MM-DD". Defaults to DEFAULT_END_DATE.
+
+        Returns:
+            list[WeatherDatum]: A list of WeatherDatums containing the weather data about the location.
+        """
+        return await self._run_in_executor(functools.partial(self.provider.fetch_historical, columns=columns, start_date=start_date, end_date=end_date))
+
+    async def fetch_current(self, columns: Optional[List[str]] = None) -> List[WeatherDatum]:
+        """Fetch current weather for all coordinates.
+
+        Args:
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+
+        Returns:
+            list[WeatherDatum]: A list of WeatherDatums containing the weather data about the location.
+        """
+        return await self._run_in_executor(functools.partial(self.provider.fetch_current, columns=columns))
+
+    def set_timestamp(self, new_timestamp: str) -> None:
+        """Set the current timestamp for the weather provider. Fetched "current" weather will be relative to this point in time. Expected to be a valid directory in AWS.
+
+        Args:
+            new_timestamp (str): Timestamp in the format "YY-mm-DD_HH-MM" in UTC. Expected to match a directory in the current weather dir for the AWSProvider.
+        """
+        self.provider.set_timestamp(new_timestamp)
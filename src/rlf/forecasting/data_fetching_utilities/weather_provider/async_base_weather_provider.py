@@ -0,0 +1,158 @@
+from abc import ABC, abstractmethod
+import asyncio
+import copy
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.base_weather_provider import (
+    DEFAULT_END_DATE, DEFAULT_START_DATE, BaseWeatherProvider, ParameterRemapMixin
+)
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import (
+    WeatherDatum
+)
+
+T = TypeVar("T")
+
+
+class AsyncBaseWeatherProvider(ParameterRemapMixin, ABC):
+    """Provides historical and forecasted weather for a given set of locations from an event loop. The asynchronous counterpart of BaseWeatherProvider: many providers (ie one per catchment) can share one event loop, keeping all of their queries in flight at once."""
+
+    def __init__(self, coordinates: List[Coordinate]) -> None:
+        """Create an AsyncWeatherProvider for the given list of coordinates.
+
+        Args:
+            coordinates (list[Coordinate(longitude: float, latitude: float)]): Named tuple WSG84 coordinates: (longitude, latitude).
+        """
+        self.coordinates = coordinates
+
+    @abstractmethod
+    async def fetch_historical(self,
+                               columns: Optional[List[str]] = None,
+                               start_date: str = DEFAULT_START_DATE,
+                               end_date: str = DEFAULT_END_DATE) -> List[WeatherDatum]:
+        """Fetch historical weather for all coordinates.
+
+        Args:
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+            start_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_START_DATE.
+            end_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_END_DATE.
+
+        Returns:
+            list[WeatherDatum]: A list of WeatherDatums containing the weather data about the location.
+        """
+        pass
+
+    @abstractmethod
+    async def fetch_current(self, columns: Optional[List[str]] = None) -> List[WeatherDatum]:
+        """Fetch current weather for all coordinates.
+
+        Args:
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+
+        Returns:
+            list[WeatherDatum]: A list of WeatherDatums containing the weather data about the location.
+        """
+        pass
+
+    async def close(self) -> None:
+        """Close any connections held by the provider. Must be awaited in the event loop which made the requests."""
+        pass
+
+
+async def fetch_current_for_all(providers: List[AsyncBaseWeatherProvider], columns: Optional[List[str]] = None) -> List[List[WeatherDatum]]:
+    """Fetch current weather for several providers at once, ie one per catchment. Providers sharing an adapter share its per host limits.
+
+    Args:
+        providers (list[AsyncBaseWeatherProvider]): The providers.
+        columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+
+    Returns:
+        list[list[WeatherDatum]]: The datums of each provider, in the same order as the providers. The first failure is re-raised.
+    """
+    return list(await asyncio.gather(*(provider.fetch_current(columns=columns) for provider in providers)))
+
+
+class SyncWeatherProvider(BaseWeatherProvider):
+    """Synchronous facade over an AsyncBaseWeatherProvider, so that it can be used wherever a BaseWeatherProvider is expected (ie by CatchmentData).
+
+    Each fetch runs the asynchronous provider in a new event loop, and closes its connections before returning. Fetches may run from several threads at once (ie AWSWeatherUploader.upload_current with max_concurrent_fetches > 1): invokers keep their connections per event loop, so each fetch only uses and closes those of its own loop. Cannot be used from a running event loop; await the asynchronous provider directly instead.
+    """
+
+    def __init__(self, async_provider: AsyncBaseWeatherProvider) -> None:
+        """Create a SyncWeatherProvider.
+
+        Args:
+            async_provider (AsyncBaseWeatherProvider): The provider to run.
+        """
+        super().__init__(async_provider.coordinates)
+        self.async_provider = async_provider
+
+    def _with_coordinates(self, coordinates: List[Coordinate]) -> "SyncWeatherProvider":
+        """Get a facade over a copy of the asynchronous provider for other coordinates, sharing its adapter.
+
+        Args:
+            coordinates (list[Coordinate]): The coordinates.
+
+        Returns:
+            SyncWeatherProvider: The facade.
+        """
+        async_provider = copy.copy(self.async_provider)
+        async_provider.coordinates = coordinates
+        return SyncWeatherProvider(async_provider)
+
+    def _run(self, fetch: Callable[[], Awaitable[T]]) -> T:
+        """Run a fetch to completion in a new event loop.
+
+        Args:
+            fetch (Callable[[], Awaitable[T]]): Starts the fetch.
+
+        Returns:
+            T: The result of the fetch.
+        """
+        async def run() -> T:
+            try:
+                return await fetch()
+            finally:
+                await self.async_provider.close()
+
+        return asyncio.run(run())
+
+    def fetch_historical(self,
+                         columns: Optional[List[str]] = None,
+                         start_date: str = DEFAULT_START_DATE,
+                         end_date: str = DEFAULT_END_DATE,
+                         sleep_duration: float = 0.0) -> List[WeatherDatum]:
+        """Fetch historical weather for all coordinates.
+
+        Args:
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+            start_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_START_DATE.
+            end_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_END_DATE.
+            sleep_duration (float, optional): Not supported, asynchronous providers limit queries per host instead. Defaults to 0.0.
+
+        Raises:
+            ValueError: If sleep_duration is not 0.0.
+
+        Returns:
+            list[WeatherDatum]: A list of WeatherDatums containing the weather data about the location.
+        """
+        if sleep_duration != 0.0:
+            raise ValueError("sleep_duration is not supported by asynchronous weather providers, which limit queries per host instead")
+        return self._run(lambda: self.async_provider.fetch_historical(columns=columns, start_date=start_date, end_date=end_date))
+
+    def fetch_current(self, columns: Optional[List[str]] = None, sleep_duration: float = 0.0) -> List[WeatherDatum]:
+        """Fetch current weather for all coordinates.
+
+        Args:
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+            sleep_duration (float, optional): Not supported, asynchronous providers limit queries per host instead. Defaults to 0.0.
+
+        Raises:
+            ValueError: If sleep_duration is not 0.0.
+
+        Returns:
+            list[WeatherDatum]: A list of WeatherDatums containing the weather data about the location.
+        """
+        if sleep_duration != 0.0:
+            raise ValueError("sleep_duration is not supported by asynchronous weather providers, which limit queries per host instead")
+        return self._run(lambda: self.async_provider.fetch_current(columns=columns))
@@ -1,5 +1,6 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Optional
+from typing import Callable, List, Optional
 
 import pytz
 
@@ -23,24 +24,46 @@ class AWSWeatherProvider(BaseWeatherProvider):
     def __init__(self,
                  coordinates: List[Coordinate],
                  aws_dispatcher: AWSDispatcher,
-                 current_timestamp: Optional[str] = None) -> None:
+                 current_timestamp: Optional[str] = None,
+                 max_concurrent_downloads: int = 1,
+                 use_historical_store: bool = False) -> None:
         """Create an APIWeatherProvider for the given list of coordinates.
 
         Args:
             coordinates (list[Coordinate(longitude: float, latitude: float)]): Named tuple WSG84 coordinates: (longitude, latitude).
             aws_dispatcher (AWSDispatcher): The AWSDispatcher instance from which data will be drawn.
             current_timestamp (str): The 'current' timestamp for which current data will be fetched. Expected in the form "YY-mm-DD_HH-MM" in UTC. Expected to match a directory in the current weather dir for the AWSProvider.
+            max_concurrent_downloads (int, optional): Maximum number of datums to download from AWS at once. Values greater than 1 download datums in parallel from a bounded thread pool. Defaults to 1 (serial downloads).
+            use_historical_store (bool, optional): Whether historical data is read from the partitioned historical store (see AWSDispatcher.download_datums_from_store) with a single scan, rather than one datum folder per coordinate. Defaults to False.
+
+        Raises:
+            ValueError: If max_concurrent_downloads is less than 1.
         """
+        if max_concurrent_downloads < 1:
+            raise ValueError("max_concurrent_downloads must be at least 1")
+
         self.coordinates = coordinates
         self.aws_dispatcher = aws_dispatcher
         self.current_timestamp = current_timestamp
-
-    def download_datums_from_aws(self, dir_path: str, columns: Optional[List[str]] = None) -> List[WeatherDatum]:
+        self.max_concurrent_downloads = max_concurrent_downloads
+        self.use_historical_store = use_historical_store
+
+    def download_datums_from_aws(self,
+                                 dir_path: str,
+                                 columns: Optional[List[str]] = None,
+                                 start: Optional[datetime] = None,
+                                 end: Optional[datetime] = None,
+                                 ignore_missing_columns: bool = False) -> List[WeatherDatum]:
         """Download datums from AWS. Assumes datums exist in expected location.
 
+        Up to max_concurrent_downloads datums are in flight at once. Datums are always returned in the same order as self.coordinates.
+
         Args:
             dir_path (str): The directory path relative to the working directory of the aws_dispatcher.
             columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+            start (datetime, optional): Earliest time to fetch (inclusive). Defaults to None (no lower bound).
+            end (datetime, optional): Latest time to fetch (inclusive). Defaults to None (no upper bound).
+            ignore_missing_columns (bool, optional): Whether requested columns which are not stored are skipped rather than raising an error. Defaults to False.
 
         Raises:
             FileNotFoundError: If no datum can be found at the provided weather
@@ -48,12 +71,32 @@ class AWSWeatherProvider(BaseWeatherProvider):
         Returns:
             list[WeatherDatum]: A list of WeatherDatum objects containing the weather data and metadata about the locations.
         """
-        datums = []
-        for coordinate in self.coordinates:
-            datum = self.aws_dispatcher.download_datum(
-                coordinate, columns=columns, dir_path=dir_path)
-            datums.append(datum)
-        return datums
+        def download(coordinate: Coordinate) -> WeatherDatum:
+            return self.aws_dispatcher.download_datum(coordinate, columns=columns, dir_path=dir_path, start=start, end=end,
+                                                      ignore_missing_columns=ignore_missing_columns)
+
+        if self.max_concurrent_downloads == 1 or len(self.coordinates) <= 1:
+            return [download(coordinate) for coordinate in self.coordinates]
+
+        num_workers = min(self.max_concurrent_downloads, len(self.coordinates))
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            # executor.map yields results in input order and re-raises the first failure (ie FileNotFoundError)
+            return list(executor.map(download, self.coordinates))
+
+    @staticmethod
+    def _stored_columns(columns: Optional[List[str]], remap_to_adapter: Callable[[List[str]], List[str]]) -> Optional[List[str]]:
+        """Find the columns to download from AWS for the requested columns, covering both the consistent and the adapter's parameter names.
+
+        Args:
+            columns (list[str], optional): The requested columns/parameters. None to fetch all available.
+            remap_to_adapter (Callable[[List[str]], List[str]]): Remapping from the consistent names to the adapter's names.
+
+        Returns:
+            Optional[List[str]]: The requested columns followed by any of their adapter names (without duplicates), or None if all columns are requested.
+        """
+        if not columns:
+            return None
+        return list(dict.fromkeys(list(columns) + remap_to_adapter(list(columns))))
 
     def fetch_historical(self,
                          columns: Optional[List[str]] = None,
@@ -74,9 +117,6 @@ class AWSWeatherProvider(BaseWeatherProvider):
         if sleep_duration != 0.0:
             raise ValueError("sleep_duration is not supported (and generally not needed) for aws_weather_provider")
 
-        # don't use the AWS dispatcher to filter columns since the remappings can be an issue
-        datums = self.download_datums_from_aws(dir_path="historical", columns=None)
-
         if start_date is not None:
             start_dt = datetime.strptime(
                 start_date, '%Y-%m-%d').replace(tzinfo=pytz.UTC)
@@ -87,6 +127,16 @@ class AWSWeatherProvider(BaseWeatherProvider):
                 end_date, '%Y-%m-%d').replace(tzinfo=pytz.UTC)
         else:
             end_dt = None
+
+        # stored datums may use either the adapter's or the consistent parameter names, so both are requested and whichever is missing is skipped
+        stored_columns = self._stored_columns(columns, self._remap_historical_parameters_to_adapter)
+        if self.use_historical_store:
+            datums = self.aws_dispatcher.download_datums_from_store(self.coordinates, columns=stored_columns, start=start_dt, end=end_dt,
+                                                                    ignore_missing_columns=True)
+        else:
+            datums = self.download_datums_from_aws(dir_path="historical", columns=stored_columns, start=start_dt, end=end_dt,
+                                                   ignore_missing_columns=True)
+
         for datum in datums:
             if columns:
                 datum.hourly_parameters.columns = self._remap_historical_parameters_from_adapter(datum.hourly_parameters.columns)
@@ -115,7 +165,8 @@ class AWSWeatherProvider(BaseWeatherProvider):
             raise ValueError("Cannot fetch current data without a timestamp.")
 
         dir_path = f'current/{self.current_timestamp}'
-        datums = self.download_datums_from_aws(dir_path=dir_path, columns=None)
+        stored_columns = self._stored_columns(columns, self._remap_current_parameters_to_adapter)
+        datums = self.download_datums_from_aws(dir_path=dir_path, columns=stored_columns, ignore_missing_columns=True)
 
         for datum in datums:
             datum.hourly_parameters.columns = self._remap_current_parameters_from_adapter(datum.hourly_parameters.columns)
@@ -1,17 +1,173 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, NamedTuple, Optional, Set, Tuple
 
+from fsspec import AbstractFileSystem
+from fsspec.implementations.local import LocalFileSystem
 import pandas as pd
 import pytz
 
-from rlf.aws_dispatcher import AWSDispatcher
+from rlf.aws_dispatcher import AWSDispatcher, HISTORICAL_STORE_DIR
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.rate_limiter import RateLimiter
 from rlf.forecasting.data_fetching_utilities.weather_provider.base_weather_provider import (
     BaseWeatherProvider
 )
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import (
+    WeatherDatum
+)
 
 DEFAULT_START_DATE = "2022-01-01"
 DEFAULT_END_DATE = datetime.now().strftime("%Y-%m-%d")
 
+# Default number of fetched datums which may wait for upload at once. Bounds memory use when fetching outpaces uploading.
+DEFAULT_UPLOAD_QUEUE_SIZE = 16
+
+
+@dataclass
+class StageStats:
+    """Throughput of a single stage of the upload pipeline.
+
+    Args:
+        items (int): Number of datums completed by the stage.
+        busy_seconds (float): Time spent working on datums, summed over all workers of the stage.
+        first_start (float, optional): Monotonic time at which the stage started its first datum.
+        last_end (float, optional): Monotonic time at which the stage completed its last datum.
+    """
+    items: int = 0
+    busy_seconds: float = 0.0
+    first_start: Optional[float] = None
+    last_end: Optional[float] = None
+
+    def record(self, start: float, end: float, items: int = 1) -> None:
+        """Record completed datums. Not thread safe, callers are expected to hold a lock.
+
+        Args:
+            start (float): Monotonic time at which work on the datums started.
+            end (float): Monotonic time at which work on the datums ended.
+            items (int, optional): Number of datums completed together, eg by a batched query. Defaults to 1.
+        """
+        self.items += items
+        self.busy_seconds += end - start
+        self.first_start = start if self.first_start is None else min(self.first_start, start)
+        self.last_end = end if self.last_end is None else max(self.last_end, end)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        """Wall clock time between the start of the stage's first datum and the end of its last.
+
+        Returns:
+            float: Elapsed seconds. 0.0 if no datums were completed.
+        """
+        if self.first_start is None or self.last_end is None:
+            return 0.0
+        return self.last_end - self.first_start
+
+    @property
+    def throughput(self) -> float:
+        """Datums completed per second of elapsed time.
+
+        Returns:
+            float: Datums per second. 0.0 if no time has elapsed.
+        """
+        return self.items / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+
+@dataclass
+class UploadStats:
+    """Per stage throughput of a pipelined upload.
+
+    Args:
+        fetch (StageStats): Stats of fetching datums from the weather provider.
+        upload (StageStats): Stats of uploading datums to AWS.
+        wall_seconds (float): Total wall clock time of the upload.
+    """
+    fetch: StageStats = field(default_factory=StageStats)
+    upload: StageStats = field(default_factory=StageStats)
+    wall_seconds: float = 0.0
+
+    def summary(self) -> str:
+        """Human readable summary of the stats.
+
+        Returns:
+            str: Summary.
+        """
+        return (f"fetched {self.fetch.items} datums at {self.fetch.throughput:.2f}/s ({self.fetch.busy_seconds:.1f}s busy), "
+                f"uploaded {self.upload.items} datums at {self.upload.throughput:.2f}/s ({self.upload.busy_seconds:.1f}s busy), "
+                f"{self.wall_seconds:.1f}s total")
+
+
+class HistoricalChunk(NamedTuple):
+    """A unit of work of a historical upload: one coordinate over a range of days.
+
+    Args:
+        coordinate (Coordinate): The location to fetch.
+        start_date (str): iso8601 format YYYY-MM-DD.
+        end_date (str): iso8601 format YYYY-MM-DD (inclusive).
+        after (pd.Timestamp, optional): If set, only rows after this time are stored. Defaults to None.
+    """
+    coordinate: Coordinate
+    start_date: str
+    end_date: str
+    after: Optional[pd.Timestamp] = None
+
+    @property
+    def key(self) -> str:
+        """Key identifying the chunk in a BackfillCheckpoint.
+
+        Returns:
+            str: The key.
+        """
+        return f'{self.coordinate.lon},{self.coordinate.lat},{self.start_date},{self.end_date}'
+
+
+class BackfillCheckpoint:
+    """Record of the completed units of work of a historical backfill, persisted as a small JSON file on S3 or local disk so that an interrupted backfill can resume where it stopped."""
+
+    def __init__(self, path: str, filesystem: Optional[AbstractFileSystem] = None) -> None:
+        """Create a new BackfillCheckpoint instance, loading any previously completed work from path.
+
+        Args:
+            path (str): Path of the checkpoint file.
+            filesystem (AbstractFileSystem, optional): Filesystem holding the checkpoint (ie an AWSDispatcher's s3). Defaults to None (local disk).
+        """
+        self.path = path
+        self.filesystem = filesystem if filesystem is not None else LocalFileSystem(auto_mkdir=True)
+        self._lock = threading.Lock()
+        self._completed: Set[str] = set()
+        if self.filesystem.exists(path):
+            with self.filesystem.open(path, "rb") as f:
+                self._completed = set(json.load(f)["completed"])
+
+    def is_complete(self, key: str) -> bool:
+        """Check whether a unit of work has been completed.
+
+        Args:
+            key (str): Key of the unit of work.
+
+        Returns:
+            bool: True if the unit has been marked complete.
+        """
+        with self._lock:
+            return key in self._completed
+
+    def mark_complete(self, key: str) -> None:
+        """Mark a unit of work complete and persist the checkpoint.
+
+        Args:
+            key (str): Key of the unit of work.
+        """
+        with self._lock:
+            self._completed.add(key)
+            contents = json.dumps({"completed": sorted(self._completed)}).encode()
+            self.filesystem.pipe_file(self.path, contents)
+
 
 class AWSWeatherUploader():
     """Utility for fetching and storing data from some WeatherProvider into AWS. Generally used to make data accessible to AWSWeatherProvider instances"""
@@ -34,8 +190,10 @@ class AWSWeatherUploader():
                           end_date: str = DEFAULT_END_DATE,
                           columns: Optional[List[str]] = None,
                           years_per_query: int = 2,
-                          sleep_duration: int = 0) -> None:
-        """Refetch historical datums and store this updated data in AWS. This will overwrite whatever data was previously stored for the current river.
+                          sleep_duration: int = 0,
+                          to_store: bool = False,
+                          incremental: bool = False) -> None:
+        """Refetch historical datums and store this updated data in AWS. This will overwrite whatever data was previously stored for the current river, unless incremental is set.
 
         Args:
             start_date (str, optional): iso8601 format YYYY-MM-DD. Expected in UTC. Defaults to DEFAULT_START_DATE.
@@ -43,7 +201,22 @@ class AWSWeatherUploader():
             columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
             years_per_query (int, optional): How many years to fetch in a single query. Defaults to 2.
             sleep_duration (int, optional): How long to sleep after each query. Helps prevent throttling. Defaults to 0.
+            to_store (bool, optional): Whether to write the data to the partitioned historical store (one file per coordinate and year) instead of a single datum per coordinate in "historical". If set, the upload runs as a resumable backfill (see backfill_historical). Defaults to False.
+            incremental (bool, optional): Whether to only fetch and append the data after what is already stored for each coordinate (see append_historical), rather than overwriting it. start_date is then only used for coordinates without any stored data. Requires to_store. Defaults to False.
+
+        Raises:
+            ValueError: If incremental is set without to_store.
         """
+        if incremental:
+            if not to_store:
+                raise ValueError("Incremental uploads are only supported by the historical store")
+            self.append_historical(end_date=end_date, columns=columns, start_date=start_date, years_per_query=years_per_query, sleep_duration=sleep_duration)
+            return
+
+        if to_store:
+            self.backfill_historical(start_date=start_date, end_date=end_date, columns=columns, years_per_query=years_per_query, sleep_duration=sleep_duration)
+            return
+
         start_datetime = datetime.strptime(start_date, "%Y-%m-%d").replace(tzinfo=pytz.UTC)
         end_datetime = datetime.strptime(end_date, "%Y-%m-%d").replace(tzinfo=pytz.UTC)
 
@@ -79,25 +252,314 @@ class AWSWeatherUploader():
         for datum in datums:
             self.aws_dispatcher.upload_datum(datum, "historical")
 
+    @staticmethod
+    def _historical_chunks(start_date: str, end_date: str, years_per_query: int) -> List[Tuple[str, str]]:
+        """Split a date range into consecutive, non overlapping chunks of at most years_per_query years.
+
+        Args:
+            start_date (str): iso8601 format YYYY-MM-DD.
+            end_date (str): iso8601 format YYYY-MM-DD (inclusive).
+            years_per_query (int): Length of each chunk in years.
+
+        Returns:
+            List[Tuple[str, str]]: (start date, end date) of each chunk, both inclusive and in iso8601 format YYYY-MM-DD.
+        """
+        chunk_start = pd.Timestamp(start_date)
+        end = pd.Timestamp(end_date)
+        chunks = []
+        while chunk_start <= end:
+            next_chunk_start = chunk_start + pd.DateOffset(years=years_per_query)
+            chunk_end = min(next_chunk_start - pd.Timedelta(days=1), end)
+            chunks.append((chunk_start.strftime("%Y-%m-%d"), chunk_end.strftime("%Y-%m-%d")))
+            chunk_start = next_chunk_start
+        return chunks
+
+    def backfill_historical(self,
+                            start_date: str = DEFAULT_START_DATE,
+                            end_date: str = DEFAULT_END_DATE,
+                            columns: Optional[List[str]] = None,
+                            years_per_query: int = 2,
+                            sleep_duration: float = 0.0,
+                            max_concurrent_chunks: int = 1,
+                            requests_per_second: Optional[float] = None,
+                            checkpoint: Optional[BackfillCheckpoint] = None,
+                            store_name: str = HISTORICAL_STORE_DIR) -> UploadStats:
+        """Fetch historical datums and write them into the partitioned historical store as a resumable backfill.
+
+        Every (coordinate, chunk of years_per_query years) is an independent unit of work: it is fetched, written straight to the store as its own part files, and then recorded in the checkpoint. Units recorded in the checkpoint are skipped, so rerunning an interrupted backfill only fetches the missing chunks. Only the chunks in flight are held in memory.
+
+        Chunk boundaries depend on start_date and years_per_query, so a backfill should be resumed with the same arguments, and should not be run into a store which already holds differently chunked parts for the same range.
+
+        Args:
+            start_date (str, optional): iso8601 format YYYY-MM-DD. Expected in UTC. Defaults to DEFAULT_START_DATE.
+            end_date (str, optional): iso8601 format YYYY-MM-DD (inclusive). Expected in UTC. Defaults to DEFAULT_END_DATE.
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+            years_per_query (int, optional): How many years to fetch in a single query. Defaults to 2.
+            sleep_duration (float, optional): How long each worker sleeps after each query. Defaults to 0.0.
+            max_concurrent_chunks (int, optional): Maximum number of chunks fetched and written at once. Defaults to 1.
+            requests_per_second (float, optional): Maximum sustained rate of queries to the weather provider, shared by all workers. Each query is charged the provider's historical_request_weight, so for Open-Meteo this is the rate of weighted API calls. Defaults to None (no limit).
+            checkpoint (BackfillCheckpoint, optional): Record of completed chunks. Defaults to None (a checkpoint file named after the date range in the store's "_checkpoints" directory).
+            store_name (str, optional): Directory of the store, relative to the dispatcher's working directory. Defaults to HISTORICAL_STORE_DIR.
+
+        Raises:
+            ValueError: If max_concurrent_chunks or years_per_query is less than 1.
+
+        Returns:
+            UploadStats: Throughput of fetching from the provider and writing to the store, for the chunks processed by this run.
+        """
+        if max_concurrent_chunks < 1 or years_per_query < 1:
+            raise ValueError("max_concurrent_chunks and years_per_query must be at least 1")
+
+        if checkpoint is None:
+            checkpoint_path = f'{self.aws_dispatcher.working_dir}/{store_name}/_checkpoints/backfill_{start_date}_{end_date}.json'
+            checkpoint = BackfillCheckpoint(checkpoint_path, filesystem=self.aws_dispatcher.s3)
+
+        chunks = []
+        for coordinate in self.weather_provider.coordinates:
+            for chunk_start, chunk_end in self._historical_chunks(start_date, end_date, years_per_query):
+                chunk = HistoricalChunk(coordinate, chunk_start, chunk_end)
+                if not checkpoint.is_complete(chunk.key):
+                    chunks.append(chunk)
+
+        stats = self._upload_historical_chunks(chunks,
+                                               columns=columns,
+                                               sleep_duration=sleep_duration,
+                                               max_concurrent_chunks=max_concurrent_chunks,
+                                               requests_per_second=requests_per_second,
+                                               store_name=store_name,
+                                               on_complete=lambda chunk: checkpoint.mark_complete(chunk.key))
+
+        logging.info(f"Backfilled {len(chunks)} historical chunks into {store_name}: {stats.summary()}")
+        return stats
+
+    def append_historical(self,
+                          end_date: str = DEFAULT_END_DATE,
+                          columns: Optional[List[str]] = None,
+                          start_date: str = DEFAULT_START_DATE,
+                          years_per_query: int = 2,
+                          sleep_duration: float = 0.0,
+                          max_concurrent_chunks: int = 1,
+                          requests_per_second: Optional[float] = None,
+                          store_name: str = HISTORICAL_STORE_DIR) -> UploadStats:
+        """Extend the partitioned historical store up to end_date, fetching only the data newer than what is already stored for each coordinate.
+
+        The latest stored time of each coordinate is read from parquet statistics in the store (see AWSDispatcher.latest_time_in_store), so no stored data is downloaded. The missing range is fetched and appended as new part files, existing files are never rewritten. Trailing rows without any data (ie days the archive has not published yet) are not stored, so the next append fetches them again.
+
+        Columns should match those already in the store.
+
+        Args:
+            end_date (str, optional): iso8601 format YYYY-MM-DD (inclusive). Expected in UTC. Defaults to DEFAULT_END_DATE.
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+            start_date (str, optional): iso8601 format YYYY-MM-DD. Start of the data fetched for coordinates which have nothing stored yet. Defaults to DEFAULT_START_DATE.
+            years_per_query (int, optional): How many years to fetch in a single query. Defaults to 2.
+            sleep_duration (float, optional): How long each worker sleeps after each query. Defaults to 0.0.
+            max_concurrent_chunks (int, optional): Maximum number of chunks fetched and written at once. Defaults to 1.
+            requests_per_second (float, optional): Maximum sustained rate of queries to the weather provider, shared by all workers. Each query is charged the provider's historical_request_weight, so for Open-Meteo this is the rate of weighted API calls. Defaults to None (no limit).
+            store_name (str, optional): Directory of the store, relative to the dispatcher's working directory. Defaults to HISTORICAL_STORE_DIR.
+
+        Raises:
+            ValueError: If max_concurrent_chunks or years_per_query is less than 1.
+
+        Returns:
+            UploadStats: Throughput of fetching from the provider and writing to the store.
+        """
+        if max_concurrent_chunks < 1 or years_per_query < 1:
+            raise ValueError("max_concurrent_chunks and years_per_query must be at least 1")
+
+        def latest_time(coordinate: Coordinate) -> Optional[pd.Timestamp]:
+            return self.aws_dispatcher.latest_time_in_store(coordinate, store_name=store_name)
+
+        with ThreadPoolExecutor(max_workers=max_concurrent_chunks) as executor:
+            latest_times = list(executor.map(latest_time, self.weather_provider.coordinates))
+
+        chunks = []
+        for coordinate, latest in zip(self.weather_provider.coordinates, latest_times):
+            # queries are by day, so the day of the latest stored time is fetched again and its stored rows dropped
+            coordinate_start_date = start_date if latest is None else latest.strftime("%Y-%m-%d")
+            for chunk_start, chunk_end in self._historical_chunks(coordinate_start_date, end_date, years_per_query):
+                chunks.append(HistoricalChunk(coordinate, chunk_start, chunk_end, after=latest))
+
+        stats = self._upload_historical_chunks(chunks,
+                                               columns=columns,
+                                               sleep_duration=sleep_duration,
+                                               max_concurrent_chunks=max_concurrent_chunks,
+                                               requests_per_second=requests_per_second,
+                                               store_name=store_name)
+
+        logging.info(f"Appended {len(chunks)} historical chunks to {store_name}: {stats.summary()}")
+        return stats
+
+    def _upload_historical_chunks(self,
+                                  chunks: List["HistoricalChunk"],
+                                  columns: Optional[List[str]],
+                                  sleep_duration: float,
+                                  max_concurrent_chunks: int,
+                                  requests_per_second: Optional[float],
+                                  store_name: str,
+                                  on_complete: Optional[Callable[["HistoricalChunk"], None]] = None) -> UploadStats:
+        """Fetch chunks of historical data and write each straight into the partitioned historical store.
+
+        Args:
+            chunks (List[HistoricalChunk]): The chunks to fetch.
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if None.
+            sleep_duration (float): How long each worker sleeps after each query.
+            max_concurrent_chunks (int): Maximum number of chunks fetched and written at once.
+            requests_per_second (float, optional): Maximum sustained rate of queries to the weather provider, shared by all workers. Each query is charged the provider's historical_request_weight, so for Open-Meteo this is the rate of weighted API calls. No limit if None.
+            store_name (str): Directory of the store, relative to the dispatcher's working directory.
+            on_complete (Callable[[HistoricalChunk], None], optional): Called once a chunk has been written. Defaults to None.
+
+        Returns:
+            UploadStats: Throughput of fetching from the provider and writing to the store.
+        """
+        rate_limiter = RateLimiter(requests_per_second) if requests_per_second is not None else None
+        stats = UploadStats()
+        stats_lock = threading.Lock()
+
+        def process(chunk: HistoricalChunk) -> None:
+            if rate_limiter is not None:
+                rate_limiter.acquire(self.weather_provider.historical_request_weight(1, chunk.start_date, chunk.end_date, columns=columns))
+
+            fetch_start = time.monotonic()
+            datum = self.weather_provider.fetch_historical_datum(coordinate=chunk.coordinate, start_date=chunk.start_date, end_date=chunk.end_date, columns=columns)
+            fetch_end = time.monotonic()
+
+            hourly_parameters = datum.hourly_parameters
+            if chunk.after is not None:
+                hourly_parameters = hourly_parameters[hourly_parameters.index > chunk.after]
+            has_data = hourly_parameters.notna().any(axis=1).to_numpy()
+            hourly_parameters = hourly_parameters.iloc[:has_data.nonzero()[0][-1] + 1] if has_data.any() else hourly_parameters.iloc[:0]
+
+            if len(hourly_parameters) > 0:
+                datum.hourly_parameters = hourly_parameters
+                # part files are named after their first row, so chunks sharing a year never overwrite each other's data while a rerun of the same chunk does
+                part_name = f'part-{hourly_parameters.index.min():%Y-%m-%dT%H}'
+                self.aws_dispatcher.upload_datum_to_store(datum, store_name=store_name, part_name=part_name)
+            upload_end = time.monotonic()
+
+            if on_complete is not None:
+                on_complete(chunk)
+            with stats_lock:
+                stats.fetch.record(fetch_start, fetch_end)
+                stats.upload.record(fetch_end, upload_end)
+            time.sleep(sleep_duration)
+
+        start = time.monotonic()
+        if max_concurrent_chunks == 1:
+            for chunk in chunks:
+                process(chunk)
+        else:
+            with ThreadPoolExecutor(max_workers=max_concurrent_chunks) as executor:
+                # the other chunks still run (and are completed) when one fails, the first failure is re-raised afterwards
+                list(executor.map(process, chunks))
+        stats.wall_seconds = time.monotonic() - start
+        return stats
+
     def upload_current(self,
                        columns: Optional[List[str]] = None,
                        sleep_duration: float = 0.0,
-                       dir_path: Optional[str] = None) -> None:
+                       dir_path: Optional[str] = None,
+                       max_concurrent_fetches: int = 1,
+                       max_concurrent_uploads: int = 1,
+                       queue_size: int = DEFAULT_UPLOAD_QUEUE_SIZE) -> UploadStats:
         """Refetch current datums and store this updated data in AWS. This will overwrite whatever data was previously stored for the current river.
 
+        Fetching and uploading are pipelined: datums are fetched in batches of the weather provider's max_current_batch_size coordinates and handed to the uploaders through a bounded queue, so uploads overlap with the following fetches. Once the queue is full, fetching waits for the uploaders to catch up.
+
         Args:
             columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
-            sleep_duration (float, optional): How long to sleep after each query. Helps prevent throttling. Defaults to 0.0.
-            dir_path (str, optional): The subdir (within 'current') to store datums. Generally set equal to the timestamp of collection. Defaults to None.
+            sleep_duration (float, optional): How long each fetching worker sleeps after each query. Helps prevent throttling. Defaults to 0.0.
+            dir_path (str, optional): The subdir (within 'current') to store datums. Generally set equal to the timestamp of collection, in which case the upload (and whether it completed) is recorded in the current manifest. Defaults to None.
+            max_concurrent_fetches (int, optional): Maximum number of queries to the weather provider in flight at once. Defaults to 1.
+            max_concurrent_uploads (int, optional): Maximum number of datums uploading to AWS at once. Defaults to 1.
+            queue_size (int, optional): Maximum number of fetched datums waiting for upload. Defaults to DEFAULT_UPLOAD_QUEUE_SIZE.
+
+        Raises:
+            ValueError: If any of the concurrency limits or the queue size is less than 1.
+
+        Returns:
+            UploadStats: Throughput of the fetch and upload stages. Also logged once the upload completes.
         """
+        if max_concurrent_fetches < 1 or max_concurrent_uploads < 1 or queue_size < 1:
+            raise ValueError("max_concurrent_fetches, max_concurrent_uploads and queue_size must be at least 1")
+
+        timestamp = dir_path
         if dir_path is None:
             dir_path = "current"
         else:
             dir_path = f'current/{dir_path}'
 
-        datums = self.weather_provider.fetch_current(
-            columns=columns,
-            sleep_duration=sleep_duration)
+        stats = UploadStats()
+        uploaded_coordinates: List[Coordinate] = []
+        stats_lock = threading.Lock()
+        errors: List[BaseException] = []
+        # stops the fetchers early once an upload has failed
+        failed = threading.Event()
+        datum_queue: "queue.Queue[Optional[WeatherDatum]]" = queue.Queue(maxsize=queue_size)
 
-        for datum in datums:
-            self.aws_dispatcher.upload_datum(datum, dir_path=dir_path)
+        def fetch(batch: List[Coordinate]) -> None:
+            if failed.is_set():
+                return
+            start = time.monotonic()
+            datums = self.weather_provider.fetch_current_datums(batch, columns=columns)
+            end = time.monotonic()
+            with stats_lock:
+                stats.fetch.record(start, end, items=len(datums))
+            for datum in datums:
+                datum_queue.put(datum)
+            time.sleep(sleep_duration)
+
+        def upload() -> None:
+            while True:
+                datum = datum_queue.get()
+                if datum is None:
+                    return
+                if failed.is_set():
+                    # keep draining so that blocked fetchers can finish
+                    continue
+                try:
+                    start = time.monotonic()
+                    self.aws_dispatcher.upload_datum(datum, dir_path=dir_path)
+                    end = time.monotonic()
+                except Exception as e:
+                    failed.set()
+                    with stats_lock:
+                        errors.append(e)
+                    continue
+                with stats_lock:
+                    stats.upload.record(start, end)
+                    uploaded_coordinates.append(Coordinate(datum.longitude, datum.latitude))
+
+        pipeline_start = time.monotonic()
+        uploaders = [threading.Thread(target=upload, daemon=True) for _ in range(max_concurrent_uploads)]
+        for uploader in uploaders:
+            uploader.start()
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_concurrent_fetches) as executor:
+                coordinates = self.weather_provider.coordinates
+                batch_size = self.weather_provider.max_current_batch_size
+                batches = [coordinates[i:i + batch_size] for i in range(0, len(coordinates), batch_size)]
+                futures = [executor.submit(fetch, batch) for batch in batches]
+                for future in futures:
+                    error = future.exception()
+                    if error is not None:
+                        failed.set()
+                        with stats_lock:
+                            errors.append(error)
+        finally:
+            for _ in uploaders:
+                datum_queue.put(None)
+            for uploader in uploaders:
+                uploader.join()
+
+        stats.wall_seconds = time.monotonic() - pipeline_start
+        logging.info(f"Uploaded current weather to {dir_path}: {stats.summary()}")
+
+        # recorded even if the upload failed, so that readers can skip the incomplete timestamp without listing it
+        if timestamp is not None:
+            self.aws_dispatcher.record_current_timestamp(timestamp, self.weather_provider.coordinates, uploaded_coordinates)
+
+        if len(errors) > 0:
+            raise errors[0]
+
+        return stats
@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import copy
 from datetime import datetime
-from typing import List, Optional
+import time
+from typing import Callable, List, Optional
 
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.rate_limiter import RateLimiter
 from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import (
     WeatherDatum
 )
@@ -37,7 +41,55 @@ historical_parameter_remaps_from_adapter = {
 historical_parameter_remaps_to_adapter = {value: key for key, value in historical_parameter_remaps_from_adapter.items()}
 
 
-class BaseWeatherProvider(ABC):
+class ParameterRemapMixin:
+    """Remapping of parameter names between the consistent names used by the models and the names of the weather adapter, shared by synchronous and asynchronous weather providers."""
+
+    def _remap_current_parameters_to_adapter(self, params: List[str]) -> List[str]:
+        """Remap the parameter names for current data from the consistent names to the adapter's actual names.
+
+        Args:
+            params (List[str]): Initial list of params to remap.
+
+        Returns:
+            List[str]: New list with param names either remapped or left alone (maintains order).
+        """
+        return [current_parameter_remaps_to_adapter.get(param, param) for param in params]
+
+    def _remap_current_parameters_from_adapter(self, params: List[str]) -> List[str]:
+        """Remap the parameter names for current data from the adapter's actual name to the consistent names.
+
+        Args:
+            params (List[str]): Initial list of params to remap.
+
+        Returns:
+            List[str]: New list with param names either remapped or left alone (maintains order).
+        """
+        return [current_parameter_remaps_from_adapter.get(param, param) for param in params]
+
+    def _remap_historical_parameters_to_adapter(self, params: List[str]) -> List[str]:
+        """Remap the parameter names for historical data from the consistent names to the adapter's actual names.
+
+        Args:
+            params (List[str]): Initial list of params to remap.
+
+        Returns:
+            List[str]: New list with param names either remapped or left alone (maintains order).
+        """
+        return [historical_parameter_remaps_to_adapter.get(param, param) for param in params]
+
+    def _remap_historical_parameters_from_adapter(self, params: List[str]) -> List[str]:
+        """Remap the parameter names for historical data from the adapter's actual names to the consistent names.
+
+        Args:
+            params (List[str]): Initial list of params to remap.
+
+        Returns:
+            List[str]: New list with param names either remapped or left alone (maintains order).
+        """
+        return [historical_parameter_remaps_from_adapter.get(param, param) for param in params]
+
+
+class BaseWeatherProvider(ParameterRemapMixin, ABC):
     """Provides historical and forecasted weather for a given set of locations. WeatherProviders exist at a single moment in time. Relative to that moment, they provide access to current (recent + forecasted) weather data as well as historical (beginning of collection to some point in the past) weather data."""
 
     def __init__(self, coordinates: List[Coordinate]) -> None:
@@ -82,46 +134,149 @@ class BaseWeatherProvider(ABC):
         """
         pass
 
-    def _remap_current_parameters_to_adapter(self, params: List[str]) -> List[str]:
-        """Remap the parameter names for current data from the consistent names to the adapter's actual names.
+    def fetch_historical_datum(self,
+                               coordinate: Coordinate,
+                               start_date: str = DEFAULT_START_DATE,
+                               end_date: str = DEFAULT_END_DATE,
+                               columns: Optional[List[str]] = None) -> WeatherDatum:
+        """Fetch historical weather for a single coordinate. Allows coordinates and date ranges to be fetched independently of each other (ie concurrently by AWSWeatherUploader).
 
         Args:
-            params (List[str]): Initial list of params to remap.
+            coordinate (Coordinate): The location to fetch data for.
+            start_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_START_DATE.
+            end_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_END_DATE.
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
 
         Returns:
-            List[str]: New list with param names either remapped or left alone (maintains order).
+            WeatherDatum: A Datum object containing the weather data and metadata about a coordinate.
         """
-        return [current_parameter_remaps_to_adapter.get(param, param) for param in params]
+        return self.fetch_historical_datums([coordinate], start_date=start_date, end_date=end_date, columns=columns)[0]
 
-    def _remap_current_parameters_from_adapter(self, params: List[str]) -> List[str]:
-        """Remap the parameter names for current data from the adapter's actual name to the consistent names.
+    def _with_coordinates(self, coordinates: List[Coordinate]) -> "BaseWeatherProvider":
+        """Get a provider for other coordinates, sharing this provider's configuration and connections (ie its adapter or planner), so that a subset of coordinates can be fetched with fetch_historical or fetch_current.
 
         Args:
-            params (List[str]): Initial list of params to remap.
+            coordinates (list[Coordinate]): The coordinates.
 
         Returns:
-            List[str]: New list with param names either remapped or left alone (maintains order).
+            BaseWeatherProvider: A shallow copy of this provider for the coordinates. Providers which do not fetch self.coordinates must override this.
         """
-        return [current_parameter_remaps_from_adapter.get(param, param) for param in params]
+        provider = copy.copy(self)
+        provider.coordinates = coordinates
+        return provider
 
-    def _remap_historical_parameters_to_adapter(self, params: List[str]) -> List[str]:
-        """Remap the parameter names for historical data from the consistent names to the adapter's actual names.
+    @property
+    def max_historical_batch_size(self) -> int:
+        """Maximum number of coordinates fetch_historical_datums fetches with a single query.
+
+        Returns:
+            int: The batch size. 1 unless the provider can query several locations at once.
+        """
+        return 1
+
+    @property
+    def max_current_batch_size(self) -> int:
+        """Maximum number of coordinates fetch_current_datums fetches with a single query.
+
+        Returns:
+            int: The batch size. 1 unless the provider can query several locations at once.
+        """
+        return 1
+
+    def historical_request_weight(self, num_coordinates: int, start_date: str, end_date: str, columns: Optional[List[str]] = None) -> float:
+        """How much a query for historical data counts against the API's quota, for rate limiting.
 
         Args:
-            params (List[str]): Initial list of params to remap.
+            num_coordinates (int): Number of locations queried.
+            start_date (str): iso8601 format YYYY-MM-DD.
+            end_date (str): iso8601 format YYYY-MM-DD.
+            columns (list[str], optional): The columns/parameters queried. None for all columns. Defaults to None.
 
         Returns:
-            List[str]: New list with param names either remapped or left alone (maintains order).
+            float: The weight. One per location unless the provider knows how its API counts queries.
         """
-        return [historical_parameter_remaps_to_adapter.get(param, param) for param in params]
+        return float(num_coordinates)
 
-    def _remap_historical_parameters_from_adapter(self, params: List[str]) -> List[str]:
-        """Remap the parameter names for historical data from the adapter's actual names to the consistent names.
+    def current_request_weight(self, num_coordinates: int, columns: Optional[List[str]] = None) -> float:
+        """How much a query for current data counts against the API's quota, for rate limiting.
 
         Args:
-            params (List[str]): Initial list of params to remap.
+            num_coordinates (int): Number of locations queried.
+            columns (list[str], optional): The columns/parameters queried. None for all columns. Defaults to None.
 
         Returns:
-            List[str]: New list with param names either remapped or left alone (maintains order).
+            float: The weight. One per location unless the provider knows how its API counts queries.
         """
-        return [historical_parameter_remaps_from_adapter.get(param, param) for param in params]
+        return float(num_coordinates)
+
+    def fetch_historical_datums(self,
+                                coordinates: List[Coordinate],
+                                start_date: str = DEFAULT_START_DATE,
+                                end_date: str = DEFAULT_END_DATE,
+                                columns: Optional[List[str]] = None) -> List[WeatherDatum]:
+        """Fetch historical weather for a batch of at most max_historical_batch_size coordinates. Fetches them with fetch_historical of a provider for just these coordinates, unless overridden by a provider which can query a batch directly.
+
+        Args:
+            coordinates (List[Coordinate]): The locations to fetch data for.
+            start_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_START_DATE.
+            end_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_END_DATE.
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+
+        Returns:
+            List[WeatherDatum]: One datum per coordinate, in the same order as the coordinates.
+        """
+        unique_coordinates = list(dict.fromkeys(coordinates))
+        provider = self._with_coordinates(unique_coordinates)
+        datums = dict(zip(unique_coordinates, provider.fetch_historical(columns=columns, start_date=start_date, end_date=end_date)))
+        return [datums[coordinate] for coordinate in coordinates]
+
+    def fetch_current_datums(self, coordinates: List[Coordinate], columns: Optional[List[str]] = None) -> List[WeatherDatum]:
+        """Fetch current weather for a batch of at most max_current_batch_size coordinates. Fetches them with fetch_current of a provider for just these coordinates, unless overridden by a provider which can query a batch directly.
+
+        Args:
+            coordinates (List[Coordinate]): The locations to fetch data for.
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+
+        Returns:
+            List[WeatherDatum]: One datum per coordinate, in the same order as the coordinates.
+        """
+        unique_coordinates = list(dict.fromkeys(coordinates))
+        datums = dict(zip(unique_coordinates, self._with_coordinates(unique_coordinates).fetch_current(columns=columns)))
+        return [datums[coordinate] for coordinate in coordinates]
+
+    def _fetch_for_coordinates(self,
+                               fetch_batch: Callable[[List[Coordinate]], List[WeatherDatum]],
+                               coordinates: List[Coordinate],
+                               batch_size: int = 1,
+                               max_concurrent_requests: int = 1,
+                               rate_limiter: Optional[RateLimiter] = None,
+                               weight: Optional[Callable[[List[Coordinate]], float]] = None,
+                               sleep_duration: float = 0.0) -> List[WeatherDatum]:
+        """Fetch a datum for each of the given coordinates in batches, optionally from a bounded thread pool.
+
+        Args:
+            fetch_batch (Callable[[List[Coordinate]], List[WeatherDatum]]): Fetches the datums of a batch of coordinates with a single query (ie fetch_current_datums).
+            coordinates (List[Coordinate]): The coordinates to fetch.
+            batch_size (int, optional): Maximum number of coordinates per query, ie max_current_batch_size. Defaults to 1.
+            max_concurrent_requests (int, optional): Maximum number of queries in flight at once. Defaults to 1 (serial queries).
+            rate_limiter (RateLimiter, optional): Limits how often queries start, across all workers. Defaults to None (no limit).
+            weight (Callable[[List[Coordinate]], float], optional): How much the query of a batch is charged to the rate limiter, ie current_request_weight. Defaults to None (one per coordinate).
+            sleep_duration (float, optional): How many seconds each worker sleeps after each query. Defaults to 0.0.
+
+        Returns:
+            List[WeatherDatum]: The datums, in the same order as the coordinates. The first failed query is re-raised.
+        """
+        def fetch_one(batch: List[Coordinate]) -> List[WeatherDatum]:
+            if rate_limiter is not None:
+                rate_limiter.acquire(weight(batch) if weight is not None else len(batch))
+            datums = fetch_batch(batch)
+            time.sleep(sleep_duration)
+            return datums
+
+        batches = [coordinates[i:i + batch_size] for i in range(0, len(coordinates), batch_size)]
+        if max_concurrent_requests == 1 or len(batches) <= 1:
+            return [datum for batch in batches for datum in fetch_one(batch)]
+
+        with ThreadPoolExecutor(max_workers=min(max_concurrent_requests, len(batches))) as executor:
+            # executor.map yields results in input order and re-raises the first failure
+            return [datum for datums in executor.map(fetch_one, batches) for datum in datums]
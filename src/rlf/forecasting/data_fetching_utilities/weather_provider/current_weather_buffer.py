@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
+import os
+import tempfile
+from typing import List, Optional, Tuple
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from rlf.aws_dispatcher import pack_datum, unpack_datum
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import WeatherDatum
+
+
+DEFAULT_BUFFER_PATH = os.path.join("data", "current_buffer")
+# OpenMeteo max value, the window of past data that current datums hold
+FULL_PAST_DAYS = 92
+# past days requested by a delta fetch, enough to cover the hours observed since the previous fetch plus any late corrections
+DELTA_PAST_DAYS = 2
+
+
+class CurrentWeatherBuffer:
+    """Rolling window of current weather per coordinate, persisted on local disk.
+
+    Once a coordinate has been fetched in full, later refreshes only need to request the last few days plus the forecast: the newly observed hours and the refreshed forecast replace the tail of the buffer, while older hours are kept from earlier fetches. A buffer which is too old to be extended by a delta fetch without leaving a gap is stale, and has to be refetched in full.
+    """
+
+    def __init__(self, buffer_dir: str = DEFAULT_BUFFER_PATH, past_days: int = FULL_PAST_DAYS, delta_past_days: int = DELTA_PAST_DAYS) -> None:
+        """Create a new CurrentWeatherBuffer instance.
+
+        Args:
+            buffer_dir (str, optional): Local directory to persist buffers in. Created if it does not exist. Defaults to DEFAULT_BUFFER_PATH.
+            past_days (int, optional): Days of past data kept in each buffer. Defaults to FULL_PAST_DAYS.
+            delta_past_days (int, optional): Days of past data requested by a delta fetch. Defaults to DELTA_PAST_DAYS.
+
+        Raises:
+            ValueError: If delta_past_days is not between 1 and past_days.
+        """
+        if not 1 <= delta_past_days <= past_days:
+            raise ValueError("delta_past_days must be between 1 and past_days")
+
+        self.buffer_dir = buffer_dir
+        self.past_days = past_days
+        self.delta_past_days = delta_past_days
+        os.makedirs(self.buffer_dir, exist_ok=True)
+
+    def _path(self, coordinate: Coordinate, columns: Optional[List[str]]) -> str:
+        """Local path of the buffer for a coordinate and set of columns, without extension.
+
+        Args:
+            coordinate (Coordinate): The location.
+            columns (list[str], optional): The columns fetched. None for all available columns.
+
+        Returns:
+            str: The path.
+        """
+        key = json.dumps([coordinate.lon, coordinate.lat, sorted(columns) if columns is not None else None])
+        return os.path.join(self.buffer_dir, hashlib.sha256(key.encode()).hexdigest())
+
+    def load(self, coordinate: Coordinate, columns: Optional[List[str]] = None) -> Optional[Tuple[WeatherDatum, datetime]]:
+        """Load the buffer of a coordinate.
+
+        Args:
+            coordinate (Coordinate): The location.
+            columns (list[str], optional): The columns fetched. None for all available columns. Defaults to None.
+
+        Returns:
+            Optional[tuple[WeatherDatum, datetime]]: The buffered datum and when it was last fetched, or None if there is no buffer.
+        """
+        path = self._path(coordinate, columns)
+        try:
+            with open(path + ".json") as f:
+                fetched_at = datetime.fromisoformat(json.load(f)["fetched_at"])
+            datum = unpack_datum(pq.read_table(path + ".parquet"))
+        except FileNotFoundError:
+            return None
+        return datum, fetched_at
+
+    def api_cell(self, coordinate: Coordinate, columns: Optional[List[str]] = None) -> Optional[Tuple[float, float, float]]:
+        """Look up the model cell the API answered the last fetch of a coordinate with, without loading its data.
+
+        Args:
+            coordinate (Coordinate): The location.
+            columns (list[str], optional): The columns fetched. None for all available columns. Defaults to None.
+
+        Returns:
+            Optional[tuple[float, float, float]]: The cell (see WeatherDatum.api_cell), or None if there is no buffer or it predates cells being recorded.
+        """
+        try:
+            with open(self._path(coordinate, columns) + ".json") as f:
+                api_cell = json.load(f).get("api_cell")
+        except FileNotFoundError:
+            return None
+        return (api_cell[0], api_cell[1], api_cell[2]) if api_cell is not None else None
+
+    def save(self, datum: WeatherDatum, fetched_at: datetime, columns: Optional[List[str]] = None) -> None:
+        """Persist the buffer of a coordinate. Writes are atomic.
+
+        Args:
+            datum (WeatherDatum): The buffered datum.
+            fetched_at (datetime): When the datum was last fetched.
+            columns (list[str], optional): The columns fetched. None for all available columns. Defaults to None.
+        """
+        path = self._path(Coordinate(datum.longitude, datum.latitude), columns)
+        metadata = {"fetched_at": fetched_at.isoformat(), "api_cell": list(datum.api_cell)}
+        for extension, data in ((".parquet", pack_datum(datum)), (".json", json.dumps(metadata).encode())):
+            fd, temp_path = tempfile.mkstemp(dir=self.buffer_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path + extension)
+
+    def is_stale(self, fetched_at: datetime, now: Optional[datetime] = None) -> bool:
+        """Whether a buffer is too old to be extended by a delta fetch without leaving a gap.
+
+        Args:
+            fetched_at (datetime): When the buffer was last fetched.
+            now (datetime, optional): The current time. Defaults to None (the system time).
+
+        Returns:
+            bool: True if the buffer must be refetched in full.
+        """
+        now = now if now is not None else datetime.now(timezone.utc)
+        return fetched_at < now - timedelta(days=self.delta_past_days)
+
+    def merge(self, buffered: WeatherDatum, delta: WeatherDatum, now: Optional[datetime] = None) -> WeatherDatum:
+        """Extend a buffer with a delta fetch. The delta replaces every buffered hour it covers, including the previous forecast, and hours older than past_days are dropped.
+
+        Args:
+            buffered (WeatherDatum): The buffered datum.
+            delta (WeatherDatum): The datum returned by a delta fetch.
+            now (datetime, optional): The current time. Defaults to None (the system time).
+
+        Returns:
+            WeatherDatum: The delta datum, holding the merged hourly parameters.
+        """
+        now = now if now is not None else datetime.now(timezone.utc)
+        cutoff = pd.Timestamp(now).tz_convert("UTC").floor("D") - pd.Timedelta(days=self.past_days)
+
+        old = buffered.hourly_parameters
+        new = delta.hourly_parameters
+        kept = old[(old.index >= cutoff) & (old.index < new.index.min())]
+        delta.hourly_parameters = pd.concat([kept.astype({column: dtype for column, dtype in new.dtypes.items() if column in kept.columns}), new])
+        return delta
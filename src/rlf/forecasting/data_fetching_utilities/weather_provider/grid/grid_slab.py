@@ -0,0 +1,213 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import WeatherDatum
+
+
+@dataclass(frozen=True)
+class ModelGrid:
+    """A regular latitude/longitude grid on which a weather model publishes its output.
+
+    Args:
+        name (str): Name of the model.
+        resolution (float): Spacing of the grid in degrees, in both latitude and longitude.
+    """
+    name: str
+    resolution: float
+
+
+# the global GFS grid. Open-Meteo's "gfs" endpoint blends in finer models (ie HRRR over CONUS), so a 0.25 degree spacing only holds outside of those
+GFS_GRID = ModelGrid("gfs", 0.25)
+ERA5_GRID = ModelGrid("era5", 0.25)
+ECMWF_GRID = ModelGrid("ecmwf_ifs", 0.25)
+
+
+class BoundingBox(NamedTuple):
+    """A rectangular region in WGS84 degrees. Must not span the antimeridian, as for LocationGenerator."""
+    lon_min: float
+    lat_min: float
+    lon_max: float
+    lat_max: float
+
+    @classmethod
+    def around(cls, coordinates: List[Coordinate], padding: float = 0.0) -> "BoundingBox":
+        """Find the smallest bounding box containing coordinates.
+
+        Args:
+            coordinates (list[Coordinate]): The coordinates. At least one.
+            padding (float, optional): Degrees added on every side, ie half a grid cell so that the cells nearest to the outermost coordinates are included. Defaults to 0.0.
+
+        Returns:
+            BoundingBox: The bounding box.
+        """
+        lons = [coordinate.lon for coordinate in coordinates]
+        lats = [coordinate.lat for coordinate in coordinates]
+        return cls(lon_min=min(lons) - padding, lat_min=max(min(lats) - padding, -90.0),
+                   lon_max=max(lons) + padding, lat_max=min(max(lats) + padding, 90.0))
+
+
+@dataclass
+class GridSlab:
+    """Gridded model output for a region: hourly values of several variables at each cell the model answered with.
+
+    Cells are kept as a flat list rather than a regular latitude/longitude grid, since endpoints such as Open-Meteo's "gfs" blend models of different resolutions and projections, so every cell has its own latitude and longitude.
+
+    Args:
+        lons (np.ndarray): Longitude of each cell, shaped (cells,).
+        lats (np.ndarray): Latitude of each cell, shaped (cells,).
+        times (pd.DatetimeIndex): UTC times of the values.
+        variables (dict[str, np.ndarray]): float32 values of each variable, shaped (times, cells). Missing values are NaN.
+        units (dict[str, str], optional): Units of the variables. Defaults to no units.
+        elevation (np.ndarray, optional): Elevation of each cell, shaped (cells,). Defaults to None (unknown).
+    """
+    lons: np.ndarray
+    lats: np.ndarray
+    times: pd.DatetimeIndex
+    variables: Dict[str, np.ndarray]
+    units: Dict[str, str] = field(default_factory=dict)
+    elevation: Optional[np.ndarray] = None
+
+    def __post_init__(self) -> None:
+        if self.lons.shape != self.lats.shape or self.lons.ndim != 1:
+            raise ValueError(f"Longitudes {self.lons.shape} and latitudes {self.lats.shape} must both be shaped (cells,)")
+        shape = (len(self.times), len(self.lons))
+        for name, values in self.variables.items():
+            if values.shape != shape:
+                raise ValueError(f"Variable {name} has shape {values.shape}, expected (times, cells) = {shape}")
+
+    @classmethod
+    def from_grid(cls,
+                  lons: np.ndarray,
+                  lats: np.ndarray,
+                  times: pd.DatetimeIndex,
+                  variables: Dict[str, np.ndarray],
+                  units: Optional[Dict[str, str]] = None,
+                  elevation: Optional[np.ndarray] = None) -> "GridSlab":
+        """Create a slab from values on a regular latitude/longitude grid, ie fixtures.
+
+        Args:
+            lons (np.ndarray): Longitudes of the grid columns.
+            lats (np.ndarray): Latitudes of the grid rows.
+            times (pd.DatetimeIndex): UTC times of the values.
+            variables (dict[str, np.ndarray]): float32 values of each variable, shaped (times, lats, lons).
+            units (dict[str, str], optional): Units of the variables. Defaults to None (no units).
+            elevation (np.ndarray, optional): Elevation of each cell, shaped (lats, lons). Defaults to None (unknown).
+
+        Returns:
+            GridSlab: The slab, with cells in row-major (lat, lon) order.
+        """
+        grid_lons, grid_lats = np.meshgrid(lons, lats)
+        num_cells = grid_lons.size
+        return cls(lons=grid_lons.ravel(),
+                   lats=grid_lats.ravel(),
+                   times=times,
+                   variables={name: np.ascontiguousarray(values).reshape(len(times), num_cells) for name, values in variables.items()},
+                   units=dict(units) if units is not None else {},
+                   elevation=np.asarray(elevation).ravel() if elevation is not None else None)
+
+    @property
+    def bounding_box(self) -> BoundingBox:
+        """The region spanned by the cell centres.
+
+        Returns:
+            BoundingBox: The bounding box.
+        """
+        return BoundingBox(lon_min=float(self.lons.min()), lat_min=float(self.lats.min()), lon_max=float(self.lons.max()), lat_max=float(self.lats.max()))
+
+    def _distances(self, lon: float, lat: float) -> np.ndarray:
+        """Approximate the distance from a point to each cell, in degrees of latitude. Longitudes are scaled by the cosine of the latitude, which is accurate over the extent of a region.
+
+        Args:
+            lon (float): Longitude of the point.
+            lat (float): Latitude of the point.
+
+        Returns:
+            np.ndarray: The distance to each cell, shaped (cells,).
+        """
+        return np.hypot((self.lons - lon) * np.cos(np.radians(lat)), self.lats - lat)
+
+    def index_of(self, coordinate: Coordinate) -> int:
+        """Find the cell nearest to a coordinate, as a weather API answering a point query would.
+
+        Args:
+            coordinate (Coordinate): The coordinate.
+
+        Raises:
+            ValueError: If the coordinate lies further outside the cells than half the spacing of its nearest cell.
+
+        Returns:
+            int: The index of the cell.
+        """
+        distances = self._distances(coordinate.lon, coordinate.lat)
+        index = int(np.argmin(distances))
+        # the spacing of a single cell is unknown, so it is taken to cover any coordinate
+        if len(distances) > 1:
+            spacings = self._distances(float(self.lons[index]), float(self.lats[index]))
+            spacings[index] = np.inf
+            neighbour = int(np.argmin(spacings))
+            # in degrees on each axis, as the bounding box of the cells is
+            half_spacing = max(abs(self.lons[neighbour] - self.lons[index]), abs(self.lats[neighbour] - self.lats[index])) / 2 + 1e-6
+            box = self.bounding_box
+            if not (box.lon_min - half_spacing <= coordinate.lon <= box.lon_max + half_spacing
+                    and box.lat_min - half_spacing <= coordinate.lat <= box.lat_max + half_spacing):
+                raise ValueError(f"{coordinate} lies outside the slab {box}")
+        return index
+
+    def datum_at(self, coordinate: Coordinate) -> WeatherDatum:
+        """Derive the datum of a coordinate from its nearest cell.
+
+        Args:
+            coordinate (Coordinate): The coordinate.
+
+        Returns:
+            WeatherDatum: The datum, with the cell's values as a single float32 block.
+        """
+        index = self.index_of(coordinate)
+        columns = list(self.variables)
+        values = np.empty((len(self.times), len(columns)), dtype=np.float32)
+        for k, column in enumerate(columns):
+            values[:, k] = self.variables[column][:, index]
+        hourly_parameters = pd.DataFrame(values, index=self.times.rename("time"), columns=columns, copy=False)
+        return WeatherDatum(longitude=coordinate.lon,
+                            latitude=coordinate.lat,
+                            api_response_longitude=float(self.lons[index]),
+                            api_response_latitude=float(self.lats[index]),
+                            elevation=float(self.elevation[index]) if self.elevation is not None else float("nan"),
+                            utc_offset_seconds=0,
+                            timezone="GMT",
+                            hourly_units=dict(self.units),
+                            hourly_parameters=hourly_parameters)
+
+    def select(self, bounding_box: BoundingBox, columns: Optional[List[str]] = None, start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None) -> "GridSlab":
+        """Select the cells within a region, a subset of the variables and a period.
+
+        Args:
+            bounding_box (BoundingBox): The region.
+            columns (list[str], optional): The variables to keep. Defaults to None (all variables).
+            start (pd.Timestamp, optional): Earliest time to keep (inclusive). Defaults to None (no lower bound).
+            end (pd.Timestamp, optional): Latest time to keep (exclusive). Defaults to None (no upper bound).
+
+        Raises:
+            KeyError: If a variable is not in the slab.
+            ValueError: If no cells lie within the region.
+
+        Returns:
+            GridSlab: The selected slab. Only the selected cells and period are read from this slab's values.
+        """
+        cells = np.flatnonzero((self.lons >= bounding_box.lon_min) & (self.lons <= bounding_box.lon_max)
+                               & (self.lats >= bounding_box.lat_min) & (self.lats <= bounding_box.lat_max))
+        if len(cells) == 0:
+            raise ValueError(f"No cells of the slab {self.bounding_box} lie within {bounding_box}")
+        time_slice = slice(int(self.times.searchsorted(start, side="left")) if start is not None else None,
+                           int(self.times.searchsorted(end, side="left")) if end is not None else None)
+        columns = columns if columns is not None else list(self.variables)
+        return GridSlab(lons=self.lons[cells],
+                        lats=self.lats[cells],
+                        times=self.times[time_slice],
+                        variables={column: self.variables[column][time_slice][:, cells] for column in columns},
+                        units={column: self.units[column] for column in columns if column in self.units},
+                        elevation=self.elevation[cells] if self.elevation is not None else None)
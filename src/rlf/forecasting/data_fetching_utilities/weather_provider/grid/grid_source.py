@@ -0,0 +1,245 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.exceptions import RestInvokerException
+from rlf.forecasting.data_fetching_utilities.weather_provider.api_weather_provider import parse_time_index
+from rlf.forecasting.data_fetching_utilities.weather_provider.grid.grid_slab import ERA5_GRID, GFS_GRID, BoundingBox, GridSlab, ModelGrid
+from rlf.forecasting.data_fetching_utilities.weather_provider.grid.grid_store import read_slab
+from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.open_meteo_adapter import OpenMeteoAdapter
+
+
+class BaseGridSource(ABC):
+    """Abstract base class for sources of gridded model output, which answer a query for a whole region at once."""
+
+    @property
+    @abstractmethod
+    def grid(self) -> ModelGrid:
+        """The grid of the model served for current/forecasted data. Regions are padded by half a cell so that the cells nearest to their edges are included.
+
+        Returns:
+            ModelGrid: The grid.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def fetch_historical(self, bounding_box: BoundingBox, start_date: str, end_date: str, columns: Optional[List[str]] = None) -> GridSlab:
+        """Fetch historical/archived data for every cell of a region.
+
+        Args:
+            bounding_box (BoundingBox): The region.
+            start_date (str): The starting date for the requested data. In the format "YYYY-MM-DD".
+            end_date (str): The ending date for the requested data (inclusive). In the format "YYYY-MM-DD".
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            GridSlab: The slab.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def fetch_current(self, bounding_box: BoundingBox, columns: Optional[List[str]] = None) -> GridSlab:
+        """Fetch current/forecasted data for every cell of a region.
+
+        Args:
+            bounding_box (BoundingBox): The region.
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            GridSlab: The slab.
+        """
+        raise NotImplementedError
+
+
+def slab_from_results(results: List[dict], index_parameter: str = "time") -> GridSlab:
+    """Assemble the per cell results of an API query for a region into a slab.
+
+    Args:
+        results (list[dict]): One result per cell, as returned by Open-Meteo for a multi-location query. All results must hold the same times and parameters.
+        index_parameter (str, optional): The parameter of the hourly section holding the time of each value. Defaults to "time".
+
+    Raises:
+        RestInvokerException: If there are no results.
+
+    Returns:
+        GridSlab: The slab, with the cells in the order of the results.
+    """
+    if len(results) == 0:
+        raise RestInvokerException("The API returned no cells for the region")
+
+    # each cell keeps its own coordinates: they only form a regular grid where a single model answers
+    lons = np.array([result["longitude"] for result in results], dtype=np.float64)
+    lats = np.array([result["latitude"] for result in results], dtype=np.float64)
+    hourly = results[0]["hourly"]
+    times = parse_time_index(hourly[index_parameter], results[0]["timezone"])
+    columns = [column for column in hourly if column != index_parameter]
+
+    variables = {column: np.empty((len(times), len(results)), dtype=np.float32) for column in columns}
+    for k, result in enumerate(results):
+        for column in columns:
+            # missing values (null) become NaN
+            variables[column][:, k] = np.array(result["hourly"][column], dtype=np.float32)
+    elevation = np.array([result.get("elevation", np.nan) for result in results], dtype=np.float32)
+
+    units = {column: unit for column, unit in results[0].get("hourly_units", {}).items() if column != index_parameter}
+    return GridSlab(lons=lons, lats=lats, times=times, variables=variables, units=units, elevation=elevation)
+
+
+class OpenMeteoGridSource(BaseGridSource):
+    """Fetches regions from the Open-Meteo API with a single bounding box query each, rather than one query per point."""
+
+    def __init__(self, api_adapter: Optional[OpenMeteoAdapter] = None, forecast_grid: ModelGrid = GFS_GRID, archive_grid: ModelGrid = ERA5_GRID) -> None:
+        """Create a new OpenMeteoGridSource instance.
+
+        Args:
+            api_adapter (OpenMeteoAdapter, optional): Adapter whose hosts, paths, parameters and pooled invokers are used. Defaults to None (a new OpenMeteoAdapter).
+            forecast_grid (ModelGrid, optional): The grid of the adapter's forecast model. Defaults to GFS_GRID.
+            archive_grid (ModelGrid, optional): The grid of the adapter's archive model. Defaults to ERA5_GRID.
+        """
+        self.api_adapter = api_adapter if api_adapter is not None else OpenMeteoAdapter()
+        self.forecast_grid = forecast_grid
+        self.archive_grid = archive_grid
+
+    @property
+    def grid(self) -> ModelGrid:
+        """The grid of the forecast model. Open-Meteo's archive (ERA5) and forecast (GFS) grids share a resolution.
+
+        Returns:
+            ModelGrid: The grid.
+        """
+        return self.forecast_grid
+
+    @staticmethod
+    def _bounding_box_parameter(bounding_box: BoundingBox) -> str:
+        """Format a bounding box as Open-Meteo's bounding_box query parameter.
+
+        Args:
+            bounding_box (BoundingBox): The region.
+
+        Returns:
+            str: "lat_min,lon_min,lat_max,lon_max".
+        """
+        return f"{bounding_box.lat_min},{bounding_box.lon_min},{bounding_box.lat_max},{bounding_box.lon_max}"
+
+    def _query(self, hostname: str, path: str, parameters: dict) -> GridSlab:
+        """Query a region and assemble the result into a slab.
+
+        Args:
+            hostname (str): The host.
+            path (str): The path of the model.
+            parameters (dict): The query parameters.
+
+        Returns:
+            GridSlab: The slab.
+        """
+        response = self.api_adapter.invoker(hostname).get(path=path, parameters={**parameters, "timeformat": "unixtime"})
+        results = response.data if isinstance(response.data, list) else [response.data] if response.data else []
+        return slab_from_results(results, self.api_adapter.get_index_parameter())
+
+    def fetch_historical(self, bounding_box: BoundingBox, start_date: str, end_date: str, columns: Optional[List[str]] = None) -> GridSlab:
+        """Fetch historical/archived data for every cell of a region with a single query.
+
+        Args:
+            bounding_box (BoundingBox): The region.
+            start_date (str): The starting date for the requested data. In the format "YYYY-MM-DD".
+            end_date (str): The ending date for the requested data (inclusive). In the format "YYYY-MM-DD".
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            GridSlab: The slab.
+        """
+        parameters = {
+            "bounding_box": self._bounding_box_parameter(bounding_box),
+            "start_date": start_date,
+            "end_date": end_date,
+            "hourly": columns if columns is not None else self.api_adapter.archive_hourly_parameters,
+        }
+        return self._query(self.api_adapter.archive_hostname, self.api_adapter.archive_path, parameters)
+
+    def fetch_current(self, bounding_box: BoundingBox, columns: Optional[List[str]] = None) -> GridSlab:
+        """Fetch current/forecasted data for every cell of a region with a single query.
+
+        Args:
+            bounding_box (BoundingBox): The region.
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            GridSlab: The slab.
+        """
+        parameters = {
+            "bounding_box": self._bounding_box_parameter(bounding_box),
+            # OpenMeteo max values, as for point queries
+            "past_days": 92,
+            "forecast_days": 16,
+            "hourly": columns if columns is not None else self.api_adapter.forecast_hourly_parameters,
+        }
+        return self._query(self.api_adapter.forecast_hostname, self.api_adapter.forecast_path, parameters)
+
+
+class LocalGridSource(BaseGridSource):
+    """Serves regions from slabs on local disk (see write_slab), ie fixture files standing in for the remote grid source in tests."""
+
+    def __init__(self, historical_path: str, current_path: Optional[str] = None, grid: ModelGrid = GFS_GRID) -> None:
+        """Create a new LocalGridSource instance.
+
+        Args:
+            historical_path (str): Directory of the slab serving historical data.
+            current_path (str, optional): Directory of the slab serving current data. Defaults to None (the historical slab).
+            grid (ModelGrid, optional): The grid of the slabs. Defaults to GFS_GRID.
+        """
+        self.historical_path = historical_path
+        self.current_path = current_path if current_path is not None else historical_path
+        self._grid = grid
+        # every query reads the slab, so that the number of reads can be compared to the number of remote queries
+        self.num_reads = 0
+
+    @property
+    def grid(self) -> ModelGrid:
+        """The grid of the slabs.
+
+        Returns:
+            ModelGrid: The grid.
+        """
+        return self._grid
+
+    def _read(self, path: str) -> GridSlab:
+        """Read a slab.
+
+        Args:
+            path (str): Directory of the slab.
+
+        Returns:
+            GridSlab: The slab.
+        """
+        self.num_reads += 1
+        return read_slab(path)
+
+    def fetch_historical(self, bounding_box: BoundingBox, start_date: str, end_date: str, columns: Optional[List[str]] = None) -> GridSlab:
+        """Select historical data for every cell of a region from the historical slab.
+
+        Args:
+            bounding_box (BoundingBox): The region.
+            start_date (str): The starting date for the requested data. In the format "YYYY-MM-DD".
+            end_date (str): The ending date for the requested data (inclusive). In the format "YYYY-MM-DD".
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            GridSlab: The slab.
+        """
+        start = pd.Timestamp(start_date, tz="UTC")
+        end = pd.Timestamp(end_date, tz="UTC") + pd.Timedelta(days=1)
+        return self._read(self.historical_path).select(bounding_box, columns, start=start, end=end)
+
+    def fetch_current(self, bounding_box: BoundingBox, columns: Optional[List[str]] = None) -> GridSlab:
+        """Select current data for every cell of a region from the current slab.
+
+        Args:
+            bounding_box (BoundingBox): The region.
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            GridSlab: The slab.
+        """
+        return self._read(self.current_path).select(bounding_box, columns)
@@ -0,0 +1,209 @@
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from rlf.forecasting.data_fetching_utilities.weather_provider.grid.grid_slab import GridSlab
+
+
+DEFAULT_GRID_STORE_PATH = os.path.join("data", "grid_store")
+METADATA_FILE = "slab.json"
+# when a stored slab expires, written next to the slab's own files
+EXPIRY_FILE = "expires.json"
+# slabs which are not read for this long are pruned, ie historical slabs of date ranges no longer requested
+DEFAULT_MAX_IDLE = timedelta(days=7)
+DEFAULT_PRUNE_INTERVAL = timedelta(hours=1)
+
+
+def write_slab(slab: GridSlab, path: str) -> None:
+    """Write a slab to a directory, one .npy array per axis and variable plus a JSON metadata file, in the spirit of a Zarr store.
+
+    Args:
+        slab (GridSlab): The slab.
+        path (str): The directory. Created if it does not exist.
+    """
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "lons.npy"), np.asarray(slab.lons, dtype=np.float64))
+    np.save(os.path.join(path, "lats.npy"), np.asarray(slab.lats, dtype=np.float64))
+    np.save(os.path.join(path, "time.npy"), slab.times.tz_convert("UTC").tz_localize(None).values.astype("datetime64[ns]"))
+    if slab.elevation is not None:
+        np.save(os.path.join(path, "elevation.npy"), np.asarray(slab.elevation, dtype=np.float32))
+    for name, values in slab.variables.items():
+        np.save(os.path.join(path, f"{name}.npy"), np.asarray(values, dtype=np.float32))
+    with open(os.path.join(path, METADATA_FILE), "w") as f:
+        json.dump({"variables": list(slab.variables), "units": slab.units, "has_elevation": slab.elevation is not None}, f)
+
+
+def read_slab(path: str) -> GridSlab:
+    """Read a slab written by write_slab. Variables are memory mapped, so looking up a few cells only reads those cells from disk.
+
+    Args:
+        path (str): The directory.
+
+    Raises:
+        FileNotFoundError: If there is no slab at the path.
+
+    Returns:
+        GridSlab: The slab.
+    """
+    with open(os.path.join(path, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    times = pd.DatetimeIndex(np.load(os.path.join(path, "time.npy"))).tz_localize("UTC")
+    return GridSlab(lons=np.load(os.path.join(path, "lons.npy")),
+                    lats=np.load(os.path.join(path, "lats.npy")),
+                    times=times,
+                    variables={name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in metadata["variables"]},
+                    units=metadata["units"],
+                    elevation=np.load(os.path.join(path, "elevation.npy")) if metadata["has_elevation"] else None)
+
+
+class GridStore:
+    """Persistent store of gridded slabs on local disk, so that a region is only downloaded once per request.
+
+    Slabs are keyed by request (region, variables and period). Writes are atomic, so several processes may share a store directory.
+
+    A slab may be stored with an expiry time (ie current slabs, until the next model run is published), after which it is no longer served. Expired slabs, and slabs which have not been read for max_idle, are pruned when storing slabs, so the store stays bounded by the requests in use.
+    """
+
+    def __init__(self,
+                 store_dir: str = DEFAULT_GRID_STORE_PATH,
+                 max_idle: Optional[timedelta] = DEFAULT_MAX_IDLE,
+                 prune_interval: timedelta = DEFAULT_PRUNE_INTERVAL) -> None:
+        """Create a new GridStore instance.
+
+        Args:
+            store_dir (str, optional): Local directory to store slabs in. Created if it does not exist. Defaults to DEFAULT_GRID_STORE_PATH.
+            max_idle (timedelta, optional): Time after which slabs which have not been read are pruned. Defaults to DEFAULT_MAX_IDLE. None keeps slabs until they expire.
+            prune_interval (timedelta, optional): Minimum time between scans of the store directory for slabs to prune. Defaults to DEFAULT_PRUNE_INTERVAL.
+        """
+        self.store_dir = store_dir
+        self.max_idle = max_idle
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._pruned_at: Optional[datetime] = None
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    @staticmethod
+    def key(*request: Any) -> str:
+        """Identify a request.
+
+        Args:
+            *request (Any): JSON serializable description of the request, ie the bounding box, columns and dates.
+
+        Returns:
+            str: A key which is equal for equal requests.
+        """
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def _expires(path: str) -> Optional[datetime]:
+        """Read when a stored slab expires.
+
+        Args:
+            path (str): Directory of the slab.
+
+        Raises:
+            FileNotFoundError: If there is no slab at the path.
+
+        Returns:
+            Optional[datetime]: The (UTC) expiry time, or None if the slab does not expire.
+        """
+        with open(os.path.join(path, EXPIRY_FILE)) as f:
+            expires = json.load(f)["expires"]
+        return datetime.fromisoformat(expires) if expires is not None else None
+
+    def get(self, key: str, now: Optional[datetime] = None) -> Optional[GridSlab]:
+        """Look up a stored slab.
+
+        Args:
+            key (str): The request key.
+            now (datetime, optional): The current time. Defaults to None (the system time).
+
+        Returns:
+            Optional[GridSlab]: The slab, or None if the request was never stored or its slab expired.
+        """
+        now = now if now is not None else datetime.now(timezone.utc)
+        path = os.path.join(self.store_dir, key)
+        try:
+            expires = self._expires(path)
+            if expires is not None and expires <= now:
+                return None
+            slab = read_slab(path)
+            # reading marks the slab as used, so that only idle slabs are pruned
+            os.utime(path)
+        except FileNotFoundError:
+            # never stored, or pruned while being read
+            return None
+        return slab
+
+    def put(self, key: str, slab: GridSlab, expires: Optional[datetime] = None, now: Optional[datetime] = None) -> None:
+        """Atomically store a slab.
+
+        Args:
+            key (str): The request key.
+            slab (GridSlab): The slab.
+            expires (datetime, optional): When the slab stops being served, ie the publication of the next model run. Defaults to None (never).
+            now (datetime, optional): The current time. Defaults to None (the system time).
+        """
+        temp_dir = tempfile.mkdtemp(dir=self.store_dir, suffix=".tmp")
+        write_slab(slab, temp_dir)
+        with open(os.path.join(temp_dir, EXPIRY_FILE), "w") as f:
+            json.dump({"expires": expires.isoformat() if expires is not None else None}, f)
+        path = os.path.join(self.store_dir, key)
+        try:
+            os.replace(temp_dir, path)
+        except OSError:
+            # another process already stored the same request, unless an expired slab is left over from an earlier one
+            if self.get(key, now) is None:
+                shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.replace(temp_dir, path)
+            except OSError:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+        self.prune(now)
+
+    def prune(self, now: Optional[datetime] = None, force: bool = False) -> int:
+        """Remove expired slabs, slabs which have not been read for max_idle, and temporary directories left behind by interrupted writes.
+
+        Args:
+            now (datetime, optional): The current time. Defaults to None (the system time).
+            force (bool, optional): Prune even if the store was pruned less than prune_interval ago. Defaults to False (scan the store directory at most once per prune_interval).
+
+        Returns:
+            int: The number of directories removed.
+        """
+        now = now if now is not None else datetime.now(timezone.utc)
+        with self._lock:
+            if not force and self._pruned_at is not None and now - self._pruned_at < self.prune_interval:
+                return 0
+            self._pruned_at = now
+
+        removed = 0
+        for entry in os.scandir(self.store_dir):
+            try:
+                idle_since = datetime.fromtimestamp(entry.stat().st_mtime, timezone.utc)
+                if entry.name.endswith(".tmp"):
+                    # writes still in progress have been modified within the last prune interval
+                    expired = now - idle_since > self.prune_interval
+                else:
+                    expires = self._expires(entry.path)
+                    expired = (expires is not None and expires <= now) or (self.max_idle is not None and now - idle_since > self.max_idle)
+            except FileNotFoundError:
+                # removed by another process
+                continue
+            if expired:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def clear(self) -> None:
+        """Remove all stored slabs."""
+        for entry in os.scandir(self.store_dir):
+            shutil.rmtree(entry.path, ignore_errors=True)
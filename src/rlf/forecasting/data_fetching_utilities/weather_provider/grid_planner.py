@@ -0,0 +1,242 @@
+from dataclasses import replace
+import threading
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.base_weather_provider import (
+    DEFAULT_END_DATE, DEFAULT_START_DATE, BaseWeatherProvider
+)
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import (
+    WeatherDatum
+)
+
+# the model cell an API answered a request with, see WeatherDatum.api_cell
+ApiCell = Tuple[float, float, float]
+
+
+def fan_out(datum: WeatherDatum, coordinate: Coordinate) -> WeatherDatum:
+    """Make the datum fetched for one coordinate into the datum of another coordinate answered with the same API cell.
+
+    Args:
+        datum (WeatherDatum): The datum fetched.
+        coordinate (Coordinate): The requested coordinate.
+
+    Returns:
+        WeatherDatum: A datum for the requested coordinate. The hourly parameters are a shallow copy, so renaming or selecting columns does not affect other coordinates sharing the cell.
+    """
+    return replace(datum, longitude=coordinate.lon, latitude=coordinate.lat, hourly_parameters=datum.hourly_parameters.copy(deep=False))
+
+
+class GridPlanner:
+    """Plans weather fetches for many sets of coordinates (ie one per catchment) sharing a run, so that each cell of the weather model is only fetched once.
+
+    Cells are never derived from an assumed model grid: endpoints such as Open-Meteo's "gfs" blend models of different resolutions, so only the cell the API reports for a coordinate (WeatherDatum.api_cell) is trusted. The planner learns the cell of every coordinate it fetches, and may be given the cells reported by earlier runs (ie those recorded by a CurrentWeatherBuffer). A fetch then requests a single representative coordinate per known cell, plus every coordinate whose cell is unknown, and fans the datum of each cell out to all coordinates the API answered with it. Known cells are only hints: coordinates whose representative is answered with another cell are fetched themselves.
+    """
+
+    def __init__(self,
+                 provider_factory: Callable[[List[Coordinate]], BaseWeatherProvider],
+                 cell_lookup: Optional[Callable[[Coordinate, Optional[List[str]]], Optional[ApiCell]]] = None) -> None:
+        """Create a new GridPlanner instance.
+
+        Args:
+            provider_factory (Callable[[List[Coordinate]], BaseWeatherProvider]): Creates a provider for a list of coordinates, ie an APIWeatherProvider sharing an adapter and rate limiter.
+            cell_lookup (Callable[[Coordinate, Optional[List[str]]], Optional[ApiCell]], optional): Looks up the cell reported for a coordinate and set of current columns by an earlier run, ie CurrentWeatherBuffer.api_cell. Defaults to None (cells are only learned during the run).
+        """
+        self.provider_factory = provider_factory
+        self.cell_lookup = cell_lookup
+        self._coordinates: Dict[Coordinate, None] = {}
+        # cells reported for each coordinate, by endpoint and columns
+        self._cells: Dict[Hashable, Dict[Coordinate, ApiCell]] = {}
+        # datums by cell, for each set of fetch arguments
+        self._fetched: Dict[Hashable, Dict[ApiCell, WeatherDatum]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, coordinates: List[Coordinate]) -> None:
+        """Register coordinates which will be fetched during the run.
+
+        Args:
+            coordinates (list[Coordinate]): The coordinates.
+        """
+        with self._lock:
+            self._coordinates.update(dict.fromkeys(coordinates))
+
+    @property
+    def coordinates(self) -> List[Coordinate]:
+        """The unique registered coordinates.
+
+        Returns:
+            list[Coordinate]: The coordinates, in the order they were first registered.
+        """
+        with self._lock:
+            return list(self._coordinates)
+
+    def provider(self, coordinates: List[Coordinate]) -> "PlannedWeatherProvider":
+        """Register coordinates and get a provider fetching them through the planner, ie for a catchment's CatchmentData.
+
+        Args:
+            coordinates (list[Coordinate]): The coordinates.
+
+        Returns:
+            PlannedWeatherProvider: The provider.
+        """
+        self.add(coordinates)
+        return PlannedWeatherProvider(coordinates, self)
+
+    def _unresolved(self, cells: Dict[Coordinate, ApiCell], fetched: Dict[ApiCell, WeatherDatum]) -> List[Coordinate]:
+        """Find the registered coordinates without a fetched datum.
+
+        Args:
+            cells (dict[Coordinate, ApiCell]): Known cells by coordinate.
+            fetched (dict[ApiCell, WeatherDatum]): Fetched datums by cell.
+
+        Returns:
+            list[Coordinate]: The coordinates whose cell is unknown or not fetched.
+        """
+        return [coordinate for coordinate in self._coordinates if cells.get(coordinate) not in fetched]
+
+    def _learn(self, coordinates: List[Coordinate], datums: List[WeatherDatum], cells: Dict[Coordinate, ApiCell], fetched: Dict[ApiCell, WeatherDatum]) -> None:
+        """Record the cells reported for fetched coordinates, and their datums.
+
+        Args:
+            coordinates (list[Coordinate]): The fetched coordinates.
+            datums (list[WeatherDatum]): Their datums, in the same order.
+            cells (dict[Coordinate, ApiCell]): Known cells by coordinate, updated.
+            fetched (dict[ApiCell, WeatherDatum]): Fetched datums by cell, updated.
+        """
+        for coordinate, datum in zip(coordinates, datums):
+            cells[coordinate] = datum.api_cell
+            fetched.setdefault(datum.api_cell, datum)
+
+    def _fetch(self,
+               key: Hashable,
+               cells_key: Hashable,
+               coordinates: List[Coordinate],
+               fetch: Callable[[BaseWeatherProvider], List[WeatherDatum]],
+               lookup: Optional[Callable[[Coordinate], Optional[ApiCell]]] = None) -> List[WeatherDatum]:
+        """Fetch datums for coordinates, fetching all registered coordinates which have not been fetched with the same arguments yet, once per known cell.
+
+        Args:
+            key (Hashable): Identifies the fetch arguments.
+            cells_key (Hashable): Identifies the arguments which determine the cell the API answers with (endpoint and columns).
+            coordinates (list[Coordinate]): The requested coordinates. Registered if they were not already.
+            fetch (Callable[[BaseWeatherProvider], List[WeatherDatum]]): Fetches the datums of all coordinates of a provider.
+            lookup (Callable[[Coordinate], Optional[ApiCell]], optional): Looks up the cell reported by an earlier run for coordinates without a known cell. Defaults to None.
+
+        Returns:
+            list[WeatherDatum]: One datum per requested coordinate, in the same order.
+        """
+        self.add(coordinates)
+        with self._lock:
+            fetched = self._fetched.setdefault(key, {})
+            cells = self._cells.setdefault(cells_key, {})
+            if lookup is not None:
+                for coordinate in self._coordinates:
+                    if coordinate not in cells:
+                        cell = lookup(coordinate)
+                        if cell is not None:
+                            cells[coordinate] = cell
+
+            # a representative per known cell, and every coordinate with an unknown cell
+            representatives: Dict[Hashable, Coordinate] = {}
+            for coordinate in self._unresolved(cells, fetched):
+                representatives.setdefault(cells.get(coordinate, coordinate), coordinate)
+            if len(representatives) > 0:
+                requested = list(representatives.values())
+                self._learn(requested, fetch(self.provider_factory(requested)), cells, fetched)
+
+            # coordinates whose known cell was not the one reported for their representative
+            unresolved = self._unresolved(cells, fetched)
+            if len(unresolved) > 0:
+                self._learn(unresolved, fetch(self.provider_factory(unresolved)), cells, fetched)
+
+            return [fan_out(fetched[cells[coordinate]], coordinate) for coordinate in coordinates]
+
+    def fetch_current(self, coordinates: List[Coordinate], columns: Optional[List[str]] = None) -> List[WeatherDatum]:
+        """Fetch current weather for coordinates, fetching each known cell at most once per set of columns.
+
+        Args:
+            coordinates (list[Coordinate]): The requested coordinates.
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+
+        Returns:
+            list[WeatherDatum]: One datum per requested coordinate, in the same order.
+        """
+        key = ("current", tuple(columns) if columns is not None else None)
+        cell_lookup = self.cell_lookup
+        lookup = (lambda coordinate: cell_lookup(coordinate, columns)) if cell_lookup is not None else None
+        return self._fetch(key, key, coordinates, lambda provider: provider.fetch_current(columns=columns), lookup)
+
+    def fetch_historical(self,
+                         coordinates: List[Coordinate],
+                         columns: Optional[List[str]] = None,
+                         start_date: str = DEFAULT_START_DATE,
+                         end_date: str = DEFAULT_END_DATE) -> List[WeatherDatum]:
+        """Fetch historical weather for coordinates, fetching each known cell at most once per set of columns and dates.
+
+        Args:
+            coordinates (list[Coordinate]): The requested coordinates.
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+            start_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_START_DATE.
+            end_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_END_DATE.
+
+        Returns:
+            list[WeatherDatum]: One datum per requested coordinate, in the same order.
+        """
+        cells_key = ("historical", tuple(columns) if columns is not None else None)
+        key = (*cells_key, start_date, end_date)
+        return self._fetch(key, cells_key, coordinates, lambda provider: provider.fetch_historical(columns=columns, start_date=start_date, end_date=end_date))
+
+
+class PlannedWeatherProvider(BaseWeatherProvider):
+    """Provides weather for a set of coordinates (ie a catchment) through a GridPlanner shared with other sets of coordinates."""
+
+    def __init__(self, coordinates: List[Coordinate], planner: GridPlanner) -> None:
+        """Create a PlannedWeatherProvider. Prefer GridPlanner.provider, which registers the coordinates ahead of time.
+
+        Args:
+            coordinates (list[Coordinate(longitude: float, latitude: float)]): Named tuple WSG84 coordinates: (longitude, latitude).
+            planner (GridPlanner): The planner.
+        """
+        super().__init__(coordinates)
+        self.planner = planner
+
+    def fetch_historical(self,
+                         columns: Optional[List[str]] = None,
+                         start_date: str = DEFAULT_START_DATE,
+                         end_date: str = DEFAULT_END_DATE,
+                         sleep_duration: float = 0.0) -> List[WeatherDatum]:
+        """Fetch historical weather for all coordinates.
+
+        Args:
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+            start_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_START_DATE.
+            end_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_END_DATE.
+            sleep_duration (float, optional): Not supported, the providers created by the planner limit their queries instead. Defaults to 0.0.
+
+        Raises:
+            ValueError: If sleep_duration is not 0.0.
+
+        Returns:
+            list[WeatherDatum]: A list of WeatherDatums containing the weather data about the location.
+        """
+        if sleep_duration != 0.0:
+            raise ValueError("sleep_duration is not supported by planned weather providers")
+        # datums are keyed by the requested coordinate, as by the other providers
+        return self.planner.fetch_historical(list(dict.fromkeys(self.coordinates)), columns=columns, start_date=start_date, end_date=end_date)
+
+    def fetch_current(self, columns: Optional[List[str]] = None, sleep_duration: float = 0.0) -> List[WeatherDatum]:
+        """Fetch current weather for all coordinates.
+
+        Args:
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+            sleep_duration (float, optional): Not supported, the providers created by the planner limit their queries instead. Defaults to 0.0.
+
+        Raises:
+            ValueError: If sleep_duration is not 0.0.
+
+        Returns:
+            list[WeatherDatum]: A list of WeatherDatums containing the weather data about the location.
+        """
+        if sleep_duration != 0.0:
+            raise ValueError("sleep_duration is not supported by planned weather providers")
+        return self.planner.fetch_current(self.coordinates, columns=columns)
@@ -0,0 +1,153 @@
+import threading
+from typing import Dict, List, Optional
+
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.async_rest_invoker import DEFAULT_MAX_CONCURRENT_REQUESTS, AsyncRestInvoker
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.base_async_api_adapter import BaseAsyncAPIAdapter
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.models import Response
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.rate_limiter import RateLimiter
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.response_cache import ResponseCache
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.rest_invoker import DEFAULT_RETRY_POLICY, DEFAULT_TIMEOUT, RetryPolicy, Timeout
+from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.open_meteo_adapter import (
+    DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_BATCH_SIZES, DEFAULT_TIMEOUTS, current_query_parameters, historical_query_parameters, num_days_between,
+    request_weight, split_batch_response
+)
+from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.parameters import get_hourly_parameters
+
+
+class AsyncOpenMeteoAdapter(BaseAsyncAPIAdapter):
+    """Adapts the OpenMeteo API to be used from an event loop. The asynchronous counterpart of OpenMeteoAdapter."""
+
+    def __init__(self,
+                 protocol: str = "https",
+                 archive_hostname: str = "archive-api.open-meteo.com",
+                 forecast_hostname: str = "api.open-meteo.com",
+                 version: str = "v1",
+                 archive_path: str = "era5",
+                 forecast_path: str = "gfs",
+                 archive_hourly_parameters: Optional[List[str]] = None,
+                 forecast_hourly_parameters: Optional[List[str]] = None,
+                 max_batch_sizes: Optional[Dict[str, int]] = None,
+                 timeouts: Optional[Dict[str, Timeout]] = None,
+                 max_concurrent_requests: Optional[Dict[str, int]] = None,
+                 rate_limiters: Optional[Dict[str, RateLimiter]] = None,
+                 retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+                 response_cache: Optional[ResponseCache] = None) -> None:
+        """
+        Adapts the OpenMeteo API to be used from an event loop. Each host gets its own invoker, so concurrency and rate limits apply to each host independently.
+
+        Args:
+            protocol (str, optional): The protocol to use. Defaults to "https".
+            archive_hostname (str, optional): The hostname to use for archived/historical data. Defaults to "archive-api.open-meteo.com".
+            forecast_hostname (str, optional): The hostname to use for current/forecasted data. Defaults to "api.open-meteo.com".
+            version (str, optional): The version of the API to use. Defaults to "v1".
+            archive_path (str, optional): The path to use for archived/historical data. Defaults to "era5".
+            forecast_path (str, optional): The path to use for current/forecasted data. Defaults to "gfs".
+            archive_hourly_parameters (list[str], optional): Which parameters to fetch for archived/historical queries. Defaults to None.
+            forecast_hourly_parameters (list[str], optional): Which parameters to fetch for current/forecasted queries. Defaults to None.
+            max_batch_sizes (dict[str, int], optional): Maximum number of coordinates per request by hostname, overriding DEFAULT_MAX_BATCH_SIZES. Hosts which are not listed allow DEFAULT_MAX_BATCH_SIZE. Defaults to None.
+            timeouts (dict[str, Timeout], optional): (connect, read) timeouts by hostname, overriding DEFAULT_TIMEOUTS. Defaults to None.
+            max_concurrent_requests (dict[str, int], optional): Maximum number of requests in flight at once by hostname. Hosts which are not listed allow DEFAULT_MAX_CONCURRENT_REQUESTS. Defaults to None.
+            rate_limiters (dict[str, RateLimiter], optional): Limits how often requests start by hostname, ie RateLimiter.per_minute for each host's quota. Each request is charged its weight in Open-Meteo API calls. Hosts which are not listed are not limited. Defaults to None.
+            retry_policy (RetryPolicy, optional): How throttled and failed requests are retried. Defaults to DEFAULT_RETRY_POLICY.
+            response_cache (ResponseCache, optional): Cache for current/forecasted responses, refreshed with each model run. Defaults to None (no caching).
+        """
+        self.protocol = protocol
+        self.archive_hostname = archive_hostname
+        self.forecast_hostname = forecast_hostname
+        self.version = version
+        self.archive_path = archive_path
+        self.forecast_path = forecast_path
+        self.archive_hourly_parameters = archive_hourly_parameters if archive_hourly_parameters is not None else get_hourly_parameters(archive_path)
+        self.forecast_hourly_parameters = forecast_hourly_parameters if forecast_hourly_parameters is not None else get_hourly_parameters(forecast_path)
+        self.max_batch_sizes = {**DEFAULT_MAX_BATCH_SIZES, **(max_batch_sizes or {})}
+        self.max_historical_batch_size = self.max_batch_sizes.get(archive_hostname, DEFAULT_MAX_BATCH_SIZE)
+        self.max_current_batch_size = self.max_batch_sizes.get(forecast_hostname, DEFAULT_MAX_BATCH_SIZE)
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.max_concurrent_requests = max_concurrent_requests or {}
+        self.rate_limiters = rate_limiters or {}
+        self.retry_policy = retry_policy
+        self.response_cache = response_cache
+        self._invokers: Dict[str, AsyncRestInvoker] = {}
+        # the adapter may be shared by threads each running their own event loop
+        self._invokers_lock = threading.Lock()
+
+    def invoker(self, hostname: str) -> AsyncRestInvoker:
+        """Get the invoker for a host, creating it on first use. Every request to the host shares its connections and limits. Only the forecast host's invoker uses the response cache.
+
+        Args:
+            hostname (str): The host.
+
+        Returns:
+            AsyncRestInvoker: The invoker.
+        """
+        with self._invokers_lock:
+            if hostname not in self._invokers:
+                self._invokers[hostname] = AsyncRestInvoker(protocol=self.protocol,
+                                                            hostname=hostname,
+                                                            version=self.version,
+                                                            timeout=self.timeouts.get(hostname, DEFAULT_TIMEOUT),
+                                                            max_concurrent_requests=self.max_concurrent_requests.get(hostname, DEFAULT_MAX_CONCURRENT_REQUESTS),
+                                                            rate_limiter=self.rate_limiters.get(hostname),
+                                                            retry_policy=self.retry_policy,
+                                                            cache=self.response_cache if hostname == self.forecast_hostname else None)
+            return self._invokers[hostname]
+
+    async def close(self) -> None:
+        """Close the connections of all invokers in the running event loop."""
+        for invoker in self._invokers.values():
+            await invoker.close()
+
+    async def get_historical_batch(self,
+                                   coordinates: List[Coordinate],
+                                   start_date: str,
+                                   end_date: str,
+                                   columns: Optional[List[str]] = None) -> List[Response]:
+        """Make a single GET request to the Open Meteo API for historical/archived data of several locations.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for. At most max_historical_batch_size.
+            start_date (str): The starting date for the requested data. In the format "YYYY-MM-DD".
+            end_date (str): The ending date for the requested data. In the format "YYYY-MM-DD".
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            list[Response]: One response per coordinate, in the same order as the coordinates.
+        """
+        hourly_params = columns if columns is not None else self.archive_hourly_parameters
+        parameters = historical_query_parameters(coordinates, start_date, end_date, hourly_params)
+
+        weight = request_weight(len(coordinates), num_days_between(start_date, end_date), len(hourly_params))
+        response = await self.invoker(self.archive_hostname).get(path=self.archive_path, parameters=parameters, weight=weight)
+        return split_batch_response(response, len(coordinates))
+
+    async def get_current_batch(self,
+                                coordinates: List[Coordinate],
+                                past_days: int = 92,
+                                forecast_days: int = 16,
+                                columns: Optional[List[str]] = None) -> List[Response]:
+        """Make a single GET request to the Open Meteo API for current/forecasted data of several locations.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for. At most max_current_batch_size.
+            past_days (int, optional): How many days into the past to fetch data for. Defaults to 92 (OpenMeteo max value).
+            forecast_days (int, optional): How many days into the future to fetch data for. Defaults to 16 (OpenMeteo max value).
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            list[Response]: One response per coordinate, in the same order as the coordinates.
+        """
+        hourly_params = columns if columns is not None else self.forecast_hourly_parameters
+        parameters = current_query_parameters(coordinates, past_days, forecast_days, hourly_params)
+
+        weight = request_weight(len(coordinates), past_days + forecast_days, len(hourly_params))
+        response = await self.invoker(self.forecast_hostname).get(path=self.forecast_path, parameters=parameters, weight=weight)
+        return split_batch_response(response, len(coordinates))
+
+    def get_index_parameter(self) -> str:
+        """Temporal index parameter for OpenMeteo hourly data is "time".
+
+        Returns:
+            str: "time"
+        """
+        return "time"
@@ -1,27 +1,130 @@
-from typing import List, Optional
+from datetime import timedelta
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from rlf.disk_cache import CacheStats
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
 from rlf.forecasting.data_fetching_utilities.weather_provider.api.base_api_adapter import BaseAPIAdapter
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.exceptions import RestInvokerException
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.response_cache import next_forecast_update
+from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.open_meteo_adapter import (
+    DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_BATCH_SIZES, coordinate_parameters, num_days_between, request_weight
+)
 from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.parameters import get_hourly_parameters
 import openmeteo_requests
 from retry_requests import retry
 import requests_cache
+from requests_cache import ExpirationTime, NEVER_EXPIRE
 from openmeteo_sdk import WeatherApiResponse
 
 
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+FORECAST_URL = "https://api.open-meteo.com/v1/ecmwf"
+DEFAULT_CACHE_NAME = ".cache"
+# ECMWF IFS forecasts are run four times a day, and its open data reaches the API most of a run interval later
+ECMWF_UPDATE_INTERVAL = timedelta(hours=6)
+ECMWF_PUBLICATION_DELAY = timedelta(hours=8)
+
+
+class ExpiringCacheSession:
+    """Wraps a shared CachedSession for an openmeteo_requests.Client, choosing the expiration of each cached response and counting cache hits."""
+
+    def __init__(self, session: requests_cache.CachedSession, expire_after: Callable[[], ExpirationTime], stats: CacheStats, lock: threading.Lock) -> None:
+        """Create a new ExpiringCacheSession.
+
+        Args:
+            session (requests_cache.CachedSession): The shared session.
+            expire_after (Callable[[], ExpirationTime]): Called before each request to find the expiration of a newly cached response.
+            stats (CacheStats): Counters to update, may be shared with other sessions.
+            lock (threading.Lock): Lock guarding the counters.
+        """
+        self.session = session
+        self.expire_after = expire_after
+        self.stats = stats
+        self._lock = lock
+
+    def get(self, url: str, params: Any = None) -> Any:
+        """Perform a cached GET request.
+
+        Args:
+            url (str): The URL.
+            params (Any, optional): The query parameters. Defaults to None.
+
+        Returns:
+            Any: The (possibly cached) response.
+        """
+        response = self.session.get(url, params=params, expire_after=self.expire_after())
+        with self._lock:
+            if getattr(response, "from_cache", False):
+                self.stats.hits += 1
+                self.stats.bytes_from_cache += len(response.content)
+            else:
+                self.stats.misses += 1
+                self.stats.bytes_downloaded += len(response.content)
+        return response
+
+    def close(self) -> None:
+        """Close the shared session."""
+        self.session.close()
+
+
 class OpenMeteoECMWFAdapter(BaseAPIAdapter):
     """Adapts the OpenMeteo API to be used by the RequestBuilder"""
 
     def __init__(self, archive_hourly_parameters: Optional[List[str]] = None,
-                 forecast_hourly_parameters: Optional[List[str]] = None) -> None:
+                 forecast_hourly_parameters: Optional[List[str]] = None,
+                 max_batch_sizes: Optional[Dict[str, int]] = None,
+                 cache_name: str = DEFAULT_CACHE_NAME,
+                 forecast_update_interval: timedelta = ECMWF_UPDATE_INTERVAL,
+                 forecast_publication_delay: timedelta = ECMWF_PUBLICATION_DELAY,
+                 session: Optional[requests_cache.CachedSession] = None) -> None:
         """
         Adapts the OpenMeteo API to be used by the RequestBuilder
 
+        Responses are cached: archived data never expires, while current data expires when the next forecast model run is due to be published.
+
         Args:
             archive_hourly_parameters (list[str], optional): Which parameters to fetch for archived/historical queries. Defaults to None.
             forecast_hourly_parameters (list[str], optional): Which parameters to fetch for current/forecasted queries. Defaults to None.
+            max_batch_sizes (dict[str, int], optional): Maximum number of coordinates per request by hostname, overriding DEFAULT_MAX_BATCH_SIZES. Hosts which are not listed allow DEFAULT_MAX_BATCH_SIZE. Defaults to None.
+            cache_name (str, optional): Name of the SQLite response cache. Defaults to DEFAULT_CACHE_NAME.
+            forecast_update_interval (timedelta, optional): Time between forecast model runs. Defaults to ECMWF_UPDATE_INTERVAL.
+            forecast_publication_delay (timedelta, optional): Time from the nominal time of a forecast model run until the API serves it. Defaults to ECMWF_PUBLICATION_DELAY.
+            session (requests_cache.CachedSession, optional): Cached session to use instead of opening cache_name. Defaults to None.
         """
         self.archive_hourly_parameters = archive_hourly_parameters if archive_hourly_parameters is not None else get_hourly_parameters("ecmwf_shared")
         self.forecast_hourly_parameters = forecast_hourly_parameters if forecast_hourly_parameters is not None else get_hourly_parameters("ecmwf_shared")
+        self.max_batch_sizes = {**DEFAULT_MAX_BATCH_SIZES, **(max_batch_sizes or {})}
+        self.max_historical_batch_size = self.max_batch_sizes.get(urlparse(ARCHIVE_URL).hostname or "", DEFAULT_MAX_BATCH_SIZE)
+        self.max_current_batch_size = self.max_batch_sizes.get(urlparse(FORECAST_URL).hostname or "", DEFAULT_MAX_BATCH_SIZE)
+        self.cache_name = cache_name
+        self.forecast_update_interval = forecast_update_interval
+        self.forecast_publication_delay = forecast_publication_delay
+        self.cache_stats = CacheStats()
+        self._session = session
+        self._archive_client: Optional[openmeteo_requests.Client] = None
+        self._forecast_client: Optional[openmeteo_requests.Client] = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def _clients(self) -> Tuple[openmeteo_requests.Client, openmeteo_requests.Client]:
+        """Get the archive and forecast clients, creating them on first use. Both share one cached session, and so its connection pool.
+
+        Returns:
+            tuple[openmeteo_requests.Client, openmeteo_requests.Client]: The archive and forecast clients.
+        """
+        with self._lock:
+            if self._archive_client is None or self._forecast_client is None:
+                if self._session is None:
+                    self._session = requests_cache.CachedSession(self.cache_name)
+                # Setup the cached session to retry on error
+                session = retry(self._session, retries=5, backoff_factor=0.2)
+                self._archive_client = openmeteo_requests.Client(
+                    session=ExpiringCacheSession(session, lambda: NEVER_EXPIRE, self.cache_stats, self._stats_lock))
+                self._forecast_client = openmeteo_requests.Client(
+                    session=ExpiringCacheSession(session, lambda: next_forecast_update(update_interval=self.forecast_update_interval, publication_delay=self.forecast_publication_delay), self.cache_stats, self._stats_lock))
+            return self._archive_client, self._forecast_client
 
     def get_historical(self,
                        coordinate: Coordinate,
@@ -39,18 +142,32 @@ class OpenMeteoECMWFAdapter(BaseAPIAdapter):
         Returns:
             response: The WeatherApiResponse object from open meteo, containing Hourly Variables, Longitude, Latitude, etc.
         """
-        # Setup the Open-Meteo API client with cache and retry on error
-        cache_session = requests_cache.CachedSession('.cache', expire_after=-1)
-        retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-        openmeteo = openmeteo_requests.Client(session=retry_session)
+        return self.get_historical_batch([coordinate], start_date=start_date, end_date=end_date, columns=columns)[0]
+
+    def get_historical_batch(self,
+                             coordinates: List[Coordinate],
+                             start_date: str,
+                             end_date: str,
+                             columns: Optional[List[str]] = None) -> List[WeatherApiResponse]:
+        """Make a single GET request to the Open Meteo API for historical/archived data of several locations.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for. At most max_historical_batch_size.
+            start_date (str): The starting date for the requested data. In the format "YYYY-MM-DD".
+            end_date (str): The ending date for the requested data. In the format "YYYY-MM-DD".
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            list[WeatherApiResponse]: One response per coordinate, in the same order as the coordinates.
+        """
+        openmeteo, _ = self._clients()
 
         hourly_params = columns if columns is not None else self.archive_hourly_parameters
         # Make sure all required weather variables are listed here
         # The order of variables in hourly or daily is important to assign them correctly below
-        url = "https://archive-api.open-meteo.com/v1/archive"
+        url = ARCHIVE_URL
         params = {
-            "latitude": coordinate.lat,
-            "longitude": coordinate.lon,
+            **coordinate_parameters(coordinates),
             "start_date": start_date,
             "end_date": end_date,
             "hourly": hourly_params,
@@ -58,7 +175,7 @@ class OpenMeteoECMWFAdapter(BaseAPIAdapter):
             "models": "ecmwf_ifs"
         }
 
-        return openmeteo.weather_api(url, params=params)[0]
+        return self._check_batch_responses(openmeteo.weather_api(url, params=params), len(coordinates))
 
     def get_current(self,
                     coordinate: Coordinate,
@@ -76,22 +193,84 @@ class OpenMeteoECMWFAdapter(BaseAPIAdapter):
         Returns:
             response: The WeatherApiResponse object from open meteo, containing Hourly Variables, Longitude, Latitude, etc.
         """
-        # Setup the Open-Meteo API client with cache and retry on error
-        cache_session = requests_cache.CachedSession('.cache', expire_after=-1)
-        retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-        openmeteo = openmeteo_requests.Client(session=retry_session)
+        return self.get_current_batch([coordinate], past_days=past_days, forecast_days=forecast_days, columns=columns)[0]
+
+    def get_current_batch(self,
+                          coordinates: List[Coordinate],
+                          past_days: int = 92,
+                          forecast_days: int = 10,
+                          columns: Optional[List[str]] = None) -> List[WeatherApiResponse]:
+        """Make a single GET request to the Open Meteo API for current/forecasted data of several locations.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for. At most max_current_batch_size.
+            past_days (int, optional): How many days into the past to fetch data for. Defaults to 92 (OpenMeteo max value).
+            forecast_days (int, optional): How many days into the future to fetch data for. Defaults to 10.
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            list[WeatherApiResponse]: One response per coordinate, in the same order as the coordinates.
+        """
+        _, openmeteo = self._clients()
 
         hourly_params = columns if columns is not None else self.forecast_hourly_parameters
 
-        url = "https://api.open-meteo.com/v1/ecmwf"
+        url = FORECAST_URL
         params = {
-            "latitude": coordinate.lat,
-            "longitude": coordinate.lon,
+            **coordinate_parameters(coordinates),
             "hourly": hourly_params,
             "past_days": past_days,
             "forecast_days": forecast_days
         }
-        return openmeteo.weather_api(url, params=params)[0]
+        return self._check_batch_responses(openmeteo.weather_api(url, params=params), len(coordinates))
+
+    def historical_request_weight(self, num_coordinates: int, start_date: str, end_date: str, columns: Optional[List[str]] = None) -> float:
+        """Number of API calls Open-Meteo counts a historical/archived data request as.
+
+        Args:
+            num_coordinates (int): Number of locations requested.
+            start_date (str): The starting date for the requested data. In the format "YYYY-MM-DD".
+            end_date (str): The ending date for the requested data. In the format "YYYY-MM-DD".
+            columns (list[str], optional): The subset of columns requested. None for all columns. Defaults to None.
+
+        Returns:
+            float: The weight, see request_weight.
+        """
+        num_variables = len(columns if columns is not None else self.archive_hourly_parameters)
+        return request_weight(num_coordinates, num_days_between(start_date, end_date), num_variables)
+
+    def current_request_weight(self, num_coordinates: int, past_days: int = 92, forecast_days: int = 10, columns: Optional[List[str]] = None) -> float:
+        """Number of API calls Open-Meteo counts a current/forecasted data request as.
+
+        Args:
+            num_coordinates (int): Number of locations requested.
+            past_days (int, optional): How many days into the past are requested. Defaults to 92.
+            forecast_days (int, optional): How many days into the future are requested. Defaults to 10.
+            columns (list[str], optional): The subset of columns requested. None for all columns. Defaults to None.
+
+        Returns:
+            float: The weight, see request_weight.
+        """
+        num_variables = len(columns if columns is not None else self.forecast_hourly_parameters)
+        return request_weight(num_coordinates, past_days + forecast_days, num_variables)
+
+    @staticmethod
+    def _check_batch_responses(responses: List[WeatherApiResponse], num_coordinates: int) -> List[WeatherApiResponse]:
+        """Check that a multi-location request was answered with one response per location.
+
+        Args:
+            responses (list[WeatherApiResponse]): The responses.
+            num_coordinates (int): Number of coordinates requested.
+
+        Raises:
+            RestInvokerException: If the number of responses does not match.
+
+        Returns:
+            list[WeatherApiResponse]: The responses, in the same order as the request.
+        """
+        if len(responses) != num_coordinates:
+            raise RestInvokerException(f"Expected {num_coordinates} locations in the response, got {len(responses)}")
+        return responses
 
     def get_index_parameter(self) -> str:
         """Temporal index parameter for OpenMeteo hourly data is "time".
@@ -1,12 +1,144 @@
-from typing import List, Optional
+from datetime import date
+import threading
+from typing import Dict, List, Optional
 
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
 from rlf.forecasting.data_fetching_utilities.weather_provider.api.base_api_adapter import BaseAPIAdapter
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.exceptions import RestInvokerException
 from rlf.forecasting.data_fetching_utilities.weather_provider.api.models import Response
-from rlf.forecasting.data_fetching_utilities.weather_provider.api.rest_invoker import RestInvoker
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.response_cache import ResponseCache
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.rest_invoker import DEFAULT_POOL_SIZE, DEFAULT_RETRY_POLICY, DEFAULT_TIMEOUT, RestInvoker, RetryPolicy, Timeout
 from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.parameters import get_hourly_parameters
 
 
+# Open-Meteo accepts comma separated lists of coordinates and answers with one result per location. Batches are kept small enough for reasonable URL lengths and response sizes.
+DEFAULT_MAX_BATCH_SIZE = 50
+
+# Maximum number of coordinates per request by host. Archive requests span months to years of data per location, and Open-Meteo weighs its quota by locations x days x variables, so large archive batches would spend minutes of quota in a single request and risk read timeouts.
+DEFAULT_MAX_BATCH_SIZES: Dict[str, int] = {
+    "archive-api.open-meteo.com": 2,
+    "api.open-meteo.com": DEFAULT_MAX_BATCH_SIZE,
+}
+
+# Open-Meteo counts a request as several API calls per location once it asks for more than these
+WEIGHT_FREE_VARIABLES = 10
+WEIGHT_FREE_DAYS = 14
+
+# (connect, read) timeouts per host. Archive queries read years of data and answer much more slowly than forecast queries.
+DEFAULT_TIMEOUTS: Dict[str, Timeout] = {
+    "archive-api.open-meteo.com": (5.0, 120.0),
+    "api.open-meteo.com": (5.0, 30.0),
+}
+
+
+def coordinate_parameters(coordinates: List[Coordinate]) -> Dict[str, str]:
+    """Build the Open-Meteo location query parameters for one or more coordinates.
+
+    Args:
+        coordinates (list[Coordinate]): The locations to query.
+
+    Returns:
+        dict[str, str]: Comma separated "longitude" and "latitude" parameters.
+    """
+    return {
+        "longitude": ",".join(str(coordinate.lon) for coordinate in coordinates),
+        "latitude": ",".join(str(coordinate.lat) for coordinate in coordinates)
+    }
+
+
+def request_weight(num_coordinates: int, num_days: int, num_variables: int) -> float:
+    """Number of API calls Open-Meteo counts a request as against its quota (its "weighted" or fractional API calls).
+
+    Args:
+        num_coordinates (int): Number of locations requested.
+        num_days (int): Number of days of data requested per location.
+        num_variables (int): Number of hourly variables requested.
+
+    Returns:
+        float: The weight. 1.0 per location for up to WEIGHT_FREE_VARIABLES variables and WEIGHT_FREE_DAYS days, growing linearly beyond.
+    """
+    return num_coordinates * max(1.0, num_variables / WEIGHT_FREE_VARIABLES) * max(1.0, num_days / WEIGHT_FREE_DAYS)
+
+
+def num_days_between(start_date: str, end_date: str) -> int:
+    """Number of days in an inclusive date range.
+
+    Args:
+        start_date (str): The first day. In the format "YYYY-MM-DD".
+        end_date (str): The last day. In the format "YYYY-MM-DD".
+
+    Returns:
+        int: The number of days, at least 1.
+    """
+    return max(1, (date.fromisoformat(end_date) - date.fromisoformat(start_date)).days + 1)
+
+
+def historical_query_parameters(coordinates: List[Coordinate], start_date: str, end_date: str, hourly: List[str]) -> dict:
+    """Build the query parameters of a historical/archived data request.
+
+    Args:
+        coordinates (list[Coordinate]): The locations to query.
+        start_date (str): The starting date for the requested data. In the format "YYYY-MM-DD".
+        end_date (str): The ending date for the requested data. In the format "YYYY-MM-DD".
+        hourly (list[str]): The hourly parameters to fetch.
+
+    Returns:
+        dict: The query parameters.
+    """
+    return {
+        **coordinate_parameters(coordinates),
+        "elevation": ",".join(["nan"] * len(coordinates)),
+        "start_date": start_date,
+        "end_date": end_date,
+        "hourly": hourly,
+        "cell_selection": "nearest",
+        "timeformat": "unixtime",
+    }
+
+
+def current_query_parameters(coordinates: List[Coordinate], past_days: int, forecast_days: int, hourly: List[str]) -> dict:
+    """Build the query parameters of a current/forecasted data request.
+
+    Args:
+        coordinates (list[Coordinate]): The locations to query.
+        past_days (int): How many days into the past to fetch data for.
+        forecast_days (int): How many days into the future to fetch data for.
+        hourly (list[str]): The hourly parameters to fetch.
+
+    Returns:
+        dict: The query parameters.
+    """
+    return {
+        **coordinate_parameters(coordinates),
+        "elevation": ",".join(["nan"] * len(coordinates)),
+        "past_days": past_days,
+        "forecast_days": forecast_days,
+        "hourly": hourly,
+        "cell_selection": "nearest",
+        "timeformat": "unixtime",
+    }
+
+
+def split_batch_response(response: Response, num_coordinates: int) -> List[Response]:
+    """Split the response to a multi-location request into one response per location.
+
+    Args:
+        response (Response): The response. Its data is a list of results for several locations, or a single result for one location.
+        num_coordinates (int): Number of coordinates requested.
+
+    Raises:
+        RestInvokerException: If the response does not hold exactly one result per coordinate.
+
+    Returns:
+        list[Response]: One response per coordinate, in the same order as the request.
+    """
+    results = response.data if isinstance(response.data, list) else [response.data]
+    if len(results) != num_coordinates:
+        raise RestInvokerException(f"Expected {num_coordinates} locations in the response, got {len(results)}")
+    return [Response(status_code=response.status_code, url=response.url, message=response.message, headers=response.headers, data=result)
+            for result in results]
+
+
 class OpenMeteoAdapter(BaseAPIAdapter):
     """Adapts the OpenMeteo API to be used by the RequestBuilder"""
 
@@ -18,7 +150,12 @@ class OpenMeteoAdapter(BaseAPIAdapter):
                  archive_path: str = "era5",
                  forecast_path: str = "gfs",
                  archive_hourly_parameters: Optional[List[str]] = None,
-                 forecast_hourly_parameters: Optional[List[str]] = None) -> None:
+                 forecast_hourly_parameters: Optional[List[str]] = None,
+                 max_batch_sizes: Optional[Dict[str, int]] = None,
+                 timeouts: Optional[Dict[str, Timeout]] = None,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+                 response_cache: Optional[ResponseCache] = None) -> None:
         """
         Adapts the OpenMeteo API to be used by the RequestBuilder
 
@@ -31,6 +168,11 @@ class OpenMeteoAdapter(BaseAPIAdapter):
             forecast_path (str, optional): The path to use for current/forecasted data. Defaults to "gfs".
             archive_hourly_parameters (list[str], optional): Which parameters to fetch for archived/historical queries. Defaults to None.
             forecast_hourly_parameters (list[str], optional): Which parameters to fetch for current/forecasted queries. Defaults to None.
+            max_batch_sizes (dict[str, int], optional): Maximum number of coordinates per request by hostname, overriding DEFAULT_MAX_BATCH_SIZES. Hosts which are not listed allow DEFAULT_MAX_BATCH_SIZE. Defaults to None.
+            timeouts (dict[str, Timeout], optional): (connect, read) timeouts by hostname, overriding DEFAULT_TIMEOUTS. Defaults to None.
+            pool_size (int, optional): Maximum number of connections kept open to each host. Defaults to DEFAULT_POOL_SIZE.
+            retry_policy (RetryPolicy, optional): How throttled and failed requests are retried. Defaults to DEFAULT_RETRY_POLICY.
+            response_cache (ResponseCache, optional): Cache for current/forecasted responses, refreshed with each model run. Defaults to None (no caching).
         """
         self.protocol = protocol
         self.archive_hostname = archive_hostname
@@ -40,6 +182,42 @@ class OpenMeteoAdapter(BaseAPIAdapter):
         self.forecast_path = forecast_path
         self.archive_hourly_parameters = archive_hourly_parameters if archive_hourly_parameters is not None else get_hourly_parameters(archive_path)
         self.forecast_hourly_parameters = forecast_hourly_parameters if forecast_hourly_parameters is not None else get_hourly_parameters(forecast_path)
+        self.max_batch_sizes = {**DEFAULT_MAX_BATCH_SIZES, **(max_batch_sizes or {})}
+        self.max_historical_batch_size = self.max_batch_sizes.get(archive_hostname, DEFAULT_MAX_BATCH_SIZE)
+        self.max_current_batch_size = self.max_batch_sizes.get(forecast_hostname, DEFAULT_MAX_BATCH_SIZE)
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.pool_size = pool_size
+        self.retry_policy = retry_policy
+        self.response_cache = response_cache
+        self._invokers: Dict[str, RestInvoker] = {}
+        self._invokers_lock = threading.Lock()
+
+    def invoker(self, hostname: str) -> RestInvoker:
+        """Get the invoker for a host, creating it on first use. Every request to the host shares its pooled connections. Only the forecast host's invoker uses the response cache.
+
+        Args:
+            hostname (str): The host.
+
+        Returns:
+            RestInvoker: The invoker.
+        """
+        with self._invokers_lock:
+            if hostname not in self._invokers:
+                self._invokers[hostname] = RestInvoker(protocol=self.protocol,
+                                                       hostname=hostname,
+                                                       version=self.version,
+                                                       timeout=self.timeouts.get(hostname, DEFAULT_TIMEOUT),
+                                                       pool_size=self.pool_size,
+                                                       retry_policy=self.retry_policy,
+                                                       cache=self.response_cache if hostname == self.forecast_hostname else None)
+            return self._invokers[hostname]
+
+    def close(self) -> None:
+        """Close the connections of all invokers."""
+        with self._invokers_lock:
+            for invoker in self._invokers.values():
+                invoker.close()
+            self._invokers.clear()
 
     def get_historical(self,
                        coordinate: Coordinate,
@@ -57,22 +235,30 @@ class OpenMeteoAdapter(BaseAPIAdapter):
         Returns:
             Response: The response object from the REST API containing response body, headers, status code
         """
-        invoker = RestInvoker(protocol=self.protocol,
-                              hostname=self.archive_hostname, version=self.version)
+        return self.get_historical_batch([coordinate], start_date=start_date, end_date=end_date, columns=columns)[0]
 
-        hourly_params = columns if columns is not None else self.archive_hourly_parameters
+    def get_historical_batch(self,
+                             coordinates: List[Coordinate],
+                             start_date: str,
+                             end_date: str,
+                             columns: Optional[List[str]] = None) -> List[Response]:
+        """Make a single GET request to the Open Meteo API for historical/archived data of several locations.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for. At most max_historical_batch_size.
+            start_date (str): The starting date for the requested data. In the format "YYYY-MM-DD".
+            end_date (str): The ending date for the requested data. In the format "YYYY-MM-DD".
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            list[Response]: One response per coordinate, in the same order as the coordinates.
+        """
+        invoker = self.invoker(self.archive_hostname)
 
-        parameters = {
-            "longitude": coordinate.lon,
-            "latitude": coordinate.lat,
-            "elevation": "nan",
-            "start_date": start_date,
-            "end_date": end_date,
-            "hourly": hourly_params,
-            "cell_selection": "nearest",
-        }
+        hourly_params = columns if columns is not None else self.archive_hourly_parameters
+        parameters = historical_query_parameters(coordinates, start_date, end_date, hourly_params)
 
-        return invoker.get(path=self.archive_path, parameters=parameters)
+        return split_batch_response(invoker.get(path=self.archive_path, parameters=parameters), len(coordinates))
 
     def get_current(self,
                     coordinate: Coordinate,
@@ -90,21 +276,60 @@ class OpenMeteoAdapter(BaseAPIAdapter):
         Returns:
             Response: The response object from the REST API containing response body, headers, status code
         """
-        invoker = RestInvoker(protocol=self.protocol,
-                              hostname=self.forecast_hostname, version=self.version)
+        return self.get_current_batch([coordinate], past_days=past_days, forecast_days=forecast_days, columns=columns)[0]
+
+    def get_current_batch(self,
+                          coordinates: List[Coordinate],
+                          past_days: int = 92,
+                          forecast_days: int = 16,
+                          columns: Optional[List[str]] = None) -> List[Response]:
+        """Make a single GET request to the Open Meteo API for current/forecasted data of several locations.
+
+        Args:
+            coordinates (list[Coordinate]): The locations to fetch data for. At most max_current_batch_size.
+            past_days (int, optional): How many days into the past to fetch data for. Defaults to 92 (OpenMeteo max value).
+            forecast_days (int, optional): How many days into the future to fetch data for. Defaults to 16 (OpenMeteo max value).
+            columns (list[str], optional): The subset of columns to fetch. If set to None, all columns will be fetched. Defaults to None.
+
+        Returns:
+            list[Response]: One response per coordinate, in the same order as the coordinates.
+        """
+        invoker = self.invoker(self.forecast_hostname)
 
         hourly_params = columns if columns is not None else self.forecast_hourly_parameters
-        parameters = {
-            "longitude": coordinate.lon,
-            "latitude": coordinate.lat,
-            "elevation": "nan",
-            "past_days": past_days,
-            "forecast_days": forecast_days,
-            "hourly": hourly_params,
-            "cell_selection": "nearest",
-        }
-
-        return invoker.get(path=self.forecast_path, parameters=parameters)
+        parameters = current_query_parameters(coordinates, past_days, forecast_days, hourly_params)
+
+        return split_batch_response(invoker.get(path=self.forecast_path, parameters=parameters), len(coordinates))
+
+    def historical_request_weight(self, num_coordinates: int, start_date: str, end_date: str, columns: Optional[List[str]] = None) -> float:
+        """Number of API calls Open-Meteo counts a historical/archived data request as.
+
+        Args:
+            num_coordinates (int): Number of locations requested.
+            start_date (str): The starting date for the requested data. In the format "YYYY-MM-DD".
+            end_date (str): The ending date for the requested data. In the format "YYYY-MM-DD".
+            columns (list[str], optional): The subset of columns requested. None for all columns. Defaults to None.
+
+        Returns:
+            float: The weight, see request_weight.
+        """
+        num_variables = len(columns if columns is not None else self.archive_hourly_parameters)
+        return request_weight(num_coordinates, num_days_between(start_date, end_date), num_variables)
+
+    def current_request_weight(self, num_coordinates: int, past_days: int = 92, forecast_days: int = 16, columns: Optional[List[str]] = None) -> float:
+        """Number of API calls Open-Meteo counts a current/forecasted data request as.
+
+        Args:
+            num_coordinates (int): Number of locations requested.
+            past_days (int, optional): How many days into the past are requested. Defaults to 92.
+            forecast_days (int, optional): How many days into the future are requested. Defaults to 16.
+            columns (list[str], optional): The subset of columns requested. None for all columns. Defaults to None.
+
+        Returns:
+            float: The weight, see request_weight.
+        """
+        num_variables = len(columns if columns is not None else self.forecast_hourly_parameters)
+        return request_weight(num_coordinates, past_days + forecast_days, num_variables)
 
     def get_index_parameter(self) -> str:
         """Temporal index parameter for OpenMeteo hourly data is "time".
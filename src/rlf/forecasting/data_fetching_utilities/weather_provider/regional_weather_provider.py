@@ -0,0 +1,126 @@
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.response_cache import next_forecast_update
+from rlf.forecasting.data_fetching_utilities.weather_provider.base_weather_provider import (
+    DEFAULT_END_DATE, DEFAULT_START_DATE, BaseWeatherProvider
+)
+from rlf.forecasting.data_fetching_utilities.weather_provider.grid.grid_slab import BoundingBox, GridSlab
+from rlf.forecasting.data_fetching_utilities.weather_provider.grid.grid_source import BaseGridSource
+from rlf.forecasting.data_fetching_utilities.weather_provider.grid.grid_store import GridStore
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import (
+    WeatherDatum
+)
+
+
+class RegionalWeatherProvider(BaseWeatherProvider):
+    """Provides a historical of forecasted weather for a given set of locations by fetching the gridded model output of the region around them in bulk.
+
+    A single query fetches the slab of every grid cell in the bounding box of the coordinates, so fetch cost scales with the area rather than the number of points (ie the dense grids generated by LocationGenerator). The datum of each coordinate is then looked up in the slab, from its nearest cell. With a store, slabs are kept on local disk: current slabs until the next model run is published, and historical slabs until the store prunes them for being unused.
+    """
+
+    def __init__(self, coordinates: List[Coordinate], grid_source: BaseGridSource, grid_store: Optional[GridStore] = None) -> None:
+        """Create a RegionalWeatherProvider for the given list of coordinates.
+
+        Args:
+            coordinates (list[Coordinate(longitude: float, latitude: float)]): Named tuple WSG84 coordinates: (longitude, latitude).
+            grid_source (BaseGridSource): The source of gridded model output.
+            grid_store (GridStore, optional): Local store of fetched slabs. Defaults to None (slabs are fetched on every call).
+        """
+        super().__init__(coordinates)
+        self.grid_source = grid_source
+        self.grid_store = grid_store
+
+    @property
+    def bounding_box(self) -> BoundingBox:
+        """The region fetched: the bounding box of the coordinates, padded by half a grid cell so that the cells nearest to the outermost coordinates are included.
+
+        Returns:
+            BoundingBox: The region.
+        """
+        return BoundingBox.around(self.coordinates, padding=self.grid_source.grid.resolution / 2)
+
+    def _fetch_slab(self, fetch: Callable[[], GridSlab], *request: object, expires: Optional[datetime] = None) -> GridSlab:
+        """Get a slab from the store, fetching and storing it if it is not stored yet.
+
+        Args:
+            fetch (Callable[[], GridSlab]): Fetches the slab from the grid source.
+            *request (object): JSON serializable description of the request.
+            expires (datetime, optional): When a newly stored slab stops being served. Defaults to None (never).
+
+        Returns:
+            GridSlab: The slab.
+        """
+        if self.grid_store is None:
+            return fetch()
+
+        key = self.grid_store.key(type(self.grid_source).__name__, self.grid_source.grid.name, *request)
+        slab = self.grid_store.get(key)
+        if slab is None:
+            self.grid_store.put(key, fetch(), expires=expires)
+            # read back, so that the slab is memory mapped rather than held in memory
+            slab = self.grid_store.get(key)
+            assert slab is not None
+        return slab
+
+    def fetch_historical(self,
+                         columns: Optional[List[str]] = None,
+                         start_date: str = DEFAULT_START_DATE,
+                         end_date: str = DEFAULT_END_DATE,
+                         sleep_duration: float = 0.0) -> List[WeatherDatum]:
+        """Fetch historical weather for all coordinates with a single query for their region.
+
+        Args:
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+            start_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_START_DATE.
+            end_date (str, optional): iso8601 format YYYY-MM-DD. Defaults to DEFAULT_END_DATE.
+            sleep_duration (float, optional): Not supported, a single query is made per call. Defaults to 0.0.
+
+        Raises:
+            ValueError: If sleep_duration is not 0.0.
+
+        Returns:
+            list[WeatherDatum]: A list of WeatherDatum objects containing the weather data and metadata about the locations.
+        """
+        if sleep_duration != 0.0:
+            raise ValueError("sleep_duration is not supported (and generally not needed) for regional_weather_provider")
+
+        adapter_columns = self._remap_historical_parameters_to_adapter(columns) if columns else None
+        bounding_box = self.bounding_box
+        slab = self._fetch_slab(lambda: self.grid_source.fetch_historical(bounding_box, start_date, end_date, adapter_columns),
+                                "historical", bounding_box, adapter_columns, start_date, end_date)
+
+        # datums are keyed by the requested coordinate, so duplicate coordinates are only looked up once
+        datums = [slab.datum_at(coordinate) for coordinate in dict.fromkeys(self.coordinates)]
+        for datum in datums:
+            datum.hourly_parameters.columns = self._remap_historical_parameters_from_adapter(datum.hourly_parameters.columns)
+        return datums
+
+    def fetch_current(self, columns: Optional[List[str]] = None, sleep_duration: float = 0.0) -> List[WeatherDatum]:
+        """Fetch current weather for all coordinates with a single query for their region.
+
+        Args:
+            columns (list[str], optional): The columns/parameters to fetch. All available will be fetched if left equal to None. Defaults to None.
+            sleep_duration (float, optional): Not supported, a single query is made per call. Defaults to 0.0.
+
+        Raises:
+            ValueError: If sleep_duration is not 0.0.
+
+        Returns:
+            list[WeatherDatum]: A list of WeatherDatums containing the weather data about the location.
+        """
+        if sleep_duration != 0.0:
+            raise ValueError("sleep_duration is not supported (and generally not needed) for regional_weather_provider")
+
+        adapter_columns = self._remap_current_parameters_to_adapter(columns) if columns else None
+        bounding_box = self.bounding_box
+        # current slabs only change once each model run is published, hours after its nominal time
+        next_update = next_forecast_update(datetime.now(timezone.utc))
+        slab = self._fetch_slab(lambda: self.grid_source.fetch_current(bounding_box, adapter_columns),
+                                "current", bounding_box, adapter_columns, next_update, expires=next_update)
+
+        datums = [slab.datum_at(coordinate) for coordinate in self.coordinates]
+        for datum in datums:
+            datum.hourly_parameters.columns = self._remap_current_parameters_from_adapter(datum.hourly_parameters.columns)
+        return datums
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Tuple
 
 import pandas as pd
 
@@ -42,3 +43,12 @@ class WeatherDatum:
                 "elevation": self.elevation,
                 "utc_offset_seconds": self.utc_offset_seconds,
                 "timezone": self.timezone}
+
+    @property
+    def api_cell(self) -> Tuple[float, float, float]:
+        """The model cell the API answered the request with, as reported by the API. Datums of requests answered with equal cells hold equal data, as the API only downscales by the reported elevation.
+
+        Returns:
+            tuple[float, float, float]: The API response longitude, latitude and elevation.
+        """
+        return (self.api_response_longitude, self.api_response_latitude, self.elevation)
@@ -21,7 +21,8 @@ except ImportError as e:
     exit(1)
 
 try:
-    from rlf.aws_dispatcher import AWSDispatcher
+    from rlf.aws_dispatcher import AWSDispatcher, get_dispatcher
+    from rlf.current_manifest import CURRENT_TIMESTAMP_FORMAT
     from rlf.forecasting.catchment_data import CatchmentData
     from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
     from rlf.forecasting.data_fetching_utilities.level_provider.level_provider_nwis import LevelProviderNWIS
@@ -29,6 +30,7 @@ try:
     from rlf.forecasting.training_dataset import TrainingDataset
     from rlf.models.contributing_model import ContributingModel
     from rlf.models.ensemble import Ensemble
+    from rlf.storage_backend import StorageBackend
 except ImportError as e:
     print("Import error on rlf packages. Ensure rlf and its dependencies have been installed into the local environment.")
     print(e)
@@ -42,6 +44,9 @@ MODEL_VARIATIONS = {
     "NHiTS": NHiTSModel,
 }
 
+# Number of weather datums to download from AWS at once when building datasets.
+MAX_CONCURRENT_DOWNLOADS = 16
+
 # Default parameters for the RNN model.
 DEFAULT_RNN_PARAMS = {
     "input_chunk_length": 128,
@@ -121,21 +126,33 @@ def get_coordinates_for_catchment(filename: str, gauge_id: str, center_only: boo
     return None
 
 
-def get_recent_available_timestamps(aws_dispatcher: AWSDispatcher, num_timestamps: int) -> List[str]:
+def get_recent_available_timestamps(aws_dispatcher: AWSDispatcher, num_timestamps: int, coordinates: Optional[List[Coordinate]] = None) -> List[str]:
     """Get a list of recent timestamps available in AWS.
 
+    Timestamps are read from the current manifest, skipping those for which an upload did not complete. Only if no manifest has been written yet is the "current" directory listed instead.
+
     Args:
-        aws_dispatcher (AWSDispatcher): AWSDispatcher to use to list files.
+        aws_dispatcher (AWSDispatcher): AWSDispatcher to use to read the manifest.
         num_timestamps (int): Number of timestamps to fetch.
+        coordinates (List[Coordinate], optional): Only check these coordinates for completeness. Defaults to None (all coordinates of each upload).
 
     Returns:
-        List[str]: List of timestamps available in AWS.
+        List[str]: List of timestamps available in AWS, oldest first.
     """
-    files = aws_dispatcher.list_files("current")
-    timestamps = list(map(lambda x: x.split("/")[-1], files))
-    timestamps = timestamps[-num_timestamps:]
+    manifest = aws_dispatcher.download_current_manifest()
+    if len(manifest) > 0:
+        return manifest.timestamps(coordinates)[-num_timestamps:]
+
+    timestamps = []
+    for file in aws_dispatcher.list_files("current"):
+        timestamp = file.split("/")[-1]
+        try:
+            timestamps.append((datetime.strptime(timestamp, CURRENT_TIMESTAMP_FORMAT), timestamp))
+        except ValueError:
+            continue
+    timestamps.sort()
 
-    return timestamps
+    return [timestamp for _, timestamp in timestamps[-num_timestamps:]]
 
 
 def get_level_true(starting_timestamps: List[str], inference_level_provider: LevelProviderNWIS, window_size: int) -> pd.DataFrame:
@@ -170,7 +187,8 @@ def get_training_data(
     columns: List[str],
     rolling_sum_columns: Optional[List[str]] = None,
     rolling_mean_columns: Optional[List[str]] = None,
-    rolling_window_sizes: Sequence[int] = (10 * 24, 30 * 24)
+    rolling_window_sizes: Sequence[int] = (10 * 24, 30 * 24),
+    storage_path: Optional[str] = None
 ) -> TrainingDataset:
     """Generate the TrainingDataset for the given gauge ID, coordinates, and columns.
 
@@ -181,13 +199,19 @@ def get_training_data(
         rolling_sum_columns (Optional[List[str]], optional): Columns to generate rolling sums for. Defaults to None.
         rolling_mean_columns (Optional[List[str]], optional): Columns to generate rolling means for. Defaults to None.
         rolling_window_sizes (Sequence[int], optional): Window sizes to use for rolling sums and means. Defaults to (10 * 24, 30 * 24).
+        storage_path (Optional[str], optional): Local copy of the weather directory in AWS to read from instead of S3. Defaults to None.
 
     Returns:
         TrainingDataset: A TrainingDataset instance for the specified gauge ID, coordinates and columns.
     """
+    if storage_path is None:
+        aws_dispatcher = get_dispatcher("all-weather-data", "open-meteo", use_cache=True, as_float32=True)
+    else:
+        aws_dispatcher = AWSDispatcher(backend=StorageBackend.local(storage_path), as_float32=True)
     weather_provider = AWSWeatherProvider(
         coordinates,
-        AWSDispatcher("all-weather-data", "open-meteo")
+        aws_dispatcher,
+        max_concurrent_downloads=MAX_CONCURRENT_DOWNLOADS
     )
     level_provider = LevelProviderNWIS(gauge_id)
     catchment_data = CatchmentData(
@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+import uuid
+
+from fsspec import AbstractFileSystem
+from fsspec.implementations.local import LocalFileSystem
+from fsspec.implementations.memory import MemoryFileSystem
+import s3fs
+
+
+# Connection settings of the shared S3 filesystem. Pools are sized for the concurrent downloads and uploads of providers and uploaders.
+DEFAULT_MAX_POOL_CONNECTIONS = 64
+DEFAULT_KEEPALIVE_SECONDS = 60.0
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Process wide registry of S3 filesystems. Keyed by process id as well, since connection pools must not be shared with forked processes.
+_s3_filesystems: Dict[Tuple[int, "S3ConnectionConfig"], s3fs.S3FileSystem] = {}
+_s3_filesystems_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class S3ConnectionConfig:
+    """Connection settings of an S3 filesystem.
+
+    Args:
+        max_pool_connections (int): Maximum number of pooled connections, ie the number of requests which can be in flight at once.
+        keepalive_seconds (float): How long idle pooled connections are kept open for reuse. TCP keep-alive probes are enabled as well.
+        max_attempts (int): Maximum number of attempts per request, including the first.
+        retry_mode (str): botocore retry mode. "adaptive" additionally rate limits the client when S3 throttles.
+        connect_timeout (float): Seconds to wait for a connection to be established.
+        read_timeout (float): Seconds to wait for data on an established connection.
+    """
+    max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS
+    keepalive_seconds: float = DEFAULT_KEEPALIVE_SECONDS
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    retry_mode: str = "adaptive"
+    connect_timeout: float = 10.0
+    read_timeout: float = 60.0
+
+    def config_kwargs(self) -> Dict[str, Any]:
+        """Translate the settings into the botocore client config used by s3fs.
+
+        Returns:
+            Dict[str, Any]: Keyword arguments for the client config.
+        """
+        return {
+            "max_pool_connections": self.max_pool_connections,
+            "tcp_keepalive": True,
+            "connector_args": {"keepalive_timeout": self.keepalive_seconds},
+            "retries": {"max_attempts": self.max_attempts, "mode": self.retry_mode},
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.read_timeout
+        }
+
+
+def get_s3_filesystem(config: Optional[S3ConnectionConfig] = None) -> s3fs.S3FileSystem:
+    """Get the S3 filesystem shared by everything in this process using the same connection settings.
+
+    Credentials are resolved and connections are established once, so later users (ie warm lambda invocations) only pay for data transfer.
+
+    Args:
+        config (S3ConnectionConfig, optional): Connection settings. Defaults to None (S3ConnectionConfig()).
+
+    Returns:
+        s3fs.S3FileSystem: The shared filesystem.
+    """
+    if config is None:
+        config = S3ConnectionConfig()
+    key = (os.getpid(), config)
+    with _s3_filesystems_lock:
+        s3 = _s3_filesystems.get(key)
+        if s3 is None:
+            s3 = s3fs.S3FileSystem(anon=False, skip_instance_cache=True, config_kwargs=config.config_kwargs())
+            _s3_filesystems[key] = s3
+    return s3
+
+
+def clear_s3_filesystems() -> None:
+    """Forget all shared S3 filesystems, ie after credentials changed. Users holding on to them are unaffected."""
+    with _s3_filesystems_lock:
+        _s3_filesystems.clear()
+
+
+@dataclass(frozen=True)
+class StorageBackend:
+    """Storage holding the data of an AWSDispatcher: a directory on an fsspec filesystem.
+
+    Every backend behaves the same for the dispatcher, so pipelines and benchmarks can run against local disk or memory instead of S3.
+
+    Args:
+        filesystem (AbstractFileSystem): The filesystem.
+        root (str): The directory on the filesystem all data is stored in.
+    """
+    filesystem: AbstractFileSystem
+    root: str
+
+    @classmethod
+    def s3(cls, bucket_name: str, directory_name: str, connection_config: Optional[S3ConnectionConfig] = None) -> "StorageBackend":
+        """Storage in an S3 bucket, using the shared S3 filesystem (see get_s3_filesystem).
+
+        Args:
+            bucket_name (str): The bucket. MUST already exist in AWS.
+            directory_name (str): Directory name within the bucket. Does not need to already exist.
+            connection_config (S3ConnectionConfig, optional): Connection settings. Defaults to None (S3ConnectionConfig()).
+
+        Returns:
+            StorageBackend: The backend.
+        """
+        return cls(get_s3_filesystem(connection_config), f's3://{bucket_name}/{directory_name}')
+
+    @classmethod
+    def local(cls, path: str) -> "StorageBackend":
+        """Storage in a local directory, ie a copy of an S3 directory for offline runs.
+
+        Args:
+            path (str): The directory. Created on first write if it does not exist.
+
+        Returns:
+            StorageBackend: The backend.
+        """
+        return cls(LocalFileSystem(auto_mkdir=True), os.path.abspath(path))
+
+    @classmethod
+    def memory(cls, name: Optional[str] = None) -> "StorageBackend":
+        """Storage in memory. Contents are lost when the process exits.
+
+        Args:
+            name (str, optional): Name of the in-memory directory. Backends with the same name share their contents within the process. Defaults to None (a new, empty directory).
+
+        Returns:
+            StorageBackend: The backend.
+        """
+        if name is None:
+            name = uuid.uuid4().hex
+        return cls(MemoryFileSystem(), f'/{name}')
@@ -0,0 +1,126 @@
+import asyncio
+from typing import List
+
+import aiohttp
+import pytest
+
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.async_rest_invoker import AsyncRestInvoker
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.exceptions import RestInvokerException
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.response_cache import ResponseCache
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.rest_invoker import RetryPolicy
+
+
+class FakeClientResponse:
+    def __init__(self, status: int, body=None, headers=None) -> None:
+        self.status = status
+        self.reason = "OK" if status == 200 else "Error"
+        self.url = "https://fake.host/v1/path"
+        self.headers = headers if headers is not None else {}
+        self._body = body if body is not None else {}
+
+    async def json(self, content_type=None):
+        return self._body
+
+    async def text(self):
+        return str(self._body)
+
+
+class FakeRequest:
+    def __init__(self, session: "FakeClientSession", response) -> None:
+        self.session = session
+        self.response = response
+
+    async def __aenter__(self):
+        self.session.in_flight += 1
+        self.session.max_in_flight = max(self.session.max_in_flight, self.session.in_flight)
+        try:
+            await asyncio.sleep(self.session.latency)
+        finally:
+            self.session.in_flight -= 1
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakeClientSession:
+    """Stands in for aiohttp.ClientSession. Records the requests made and how many were in flight at once."""
+
+    def __init__(self, responses, latency: float = 0.0) -> None:
+        self.responses = list(responses)
+        self.latency = latency
+        self.requests: List[dict] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def request(self, method, url, **kwargs):
+        self.requests.append({"method": method, "url": url, **kwargs})
+        return FakeRequest(self, self.responses.pop(0))
+
+
+def fake_invoker(responses, latency: float = 0.0, **kwargs):
+    session = FakeClientSession(responses, latency=latency)
+    invoker = AsyncRestInvoker(protocol="https", hostname="fake.host", version="v1", session=session, **kwargs)
+    return invoker, session
+
+
+def test_get_encodes_parameters_like_requests():
+    invoker, session = fake_invoker([FakeClientResponse(200, {"a": 1})])
+
+    response = asyncio.run(invoker.get("path", parameters={"hourly": ["a", "b"], "past_days": 2}))
+
+    assert response.data == {"a": 1}
+    assert session.requests[0]["url"] == "https://fake.host/v1/path"
+    assert session.requests[0]["params"] == [("hourly", "a"), ("hourly", "b"), ("past_days", "2")]
+
+
+def test_get_retries_throttled_and_connection_errors():
+    retry_policy = RetryPolicy(backoff_factor=0.001)
+    invoker, session = fake_invoker([FakeClientResponse(429, headers={"Retry-After": "0"}),
+                                     aiohttp.ClientConnectionError("reset"),
+                                     FakeClientResponse(200, {"a": 1})], retry_policy=retry_policy)
+
+    assert asyncio.run(invoker.get("path")).data == {"a": 1}
+    assert len(session.requests) == 3
+
+
+def test_get_raises_after_max_attempts():
+    invoker, _ = fake_invoker([FakeClientResponse(503)] * 2, retry_policy=RetryPolicy(max_attempts=2, backoff_factor=0.001))
+
+    with pytest.raises(RestInvokerException):
+        asyncio.run(invoker.get("path"))
+
+
+def test_get_raises_client_error_without_retry():
+    invoker, session = fake_invoker([FakeClientResponse(400, {"reason": "bad"})])
+
+    with pytest.raises(RestInvokerException, match="bad"):
+        asyncio.run(invoker.get("path"))
+    assert len(session.requests) == 1
+
+
+def test_get_bounds_requests_in_flight():
+    invoker, session = fake_invoker([FakeClientResponse(200)] * 20, latency=0.01, max_concurrent_requests=4)
+
+    async def get_all():
+        await asyncio.gather(*(invoker.get("path") for _ in range(20)))
+
+    asyncio.run(get_all())
+    assert session.max_in_flight == 4
+
+
+def test_get_serves_cached_responses(tmp_path):
+    invoker, session = fake_invoker([FakeClientResponse(200, {"a": 1})], cache=ResponseCache(str(tmp_path)))
+
+    async def get_twice():
+        return [await invoker.get("path", parameters={"a": 1}) for _ in range(2)]
+
+    assert [response.data for response in asyncio.run(get_twice())] == [{"a": 1}] * 2
+    assert len(session.requests) == 1
+
+
+def test_invalid_max_concurrent_requests():
+    with pytest.raises(ValueError):
+        AsyncRestInvoker(protocol="https", hostname="fake.host", max_concurrent_requests=0)
@@ -0,0 +1,54 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import pytest
+
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.rate_limiter import RateLimiter
+
+
+def test_rate_limiter_burst_is_immediate():
+    rate_limiter = RateLimiter(rate=1, burst=5)
+    start = time.monotonic()
+    for _ in range(5):
+        rate_limiter.acquire()
+    assert time.monotonic() - start < 0.5
+
+
+def test_rate_limiter_limits_rate_across_threads():
+    rate_limiter = RateLimiter(rate=50)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: rate_limiter.acquire(), range(11)))
+    # the first token is available immediately, the other 10 arrive at 50 per second
+    assert time.monotonic() - start >= 0.19
+
+
+def test_rate_limiter_per_minute():
+    assert RateLimiter.per_minute(600, burst=10).rate == 10
+
+
+@pytest.mark.parametrize("rate, burst", [(0, 1), (1, 0)])
+def test_rate_limiter_invalid(rate, burst):
+    with pytest.raises(ValueError):
+        RateLimiter(rate=rate, burst=burst)
+
+
+def test_rate_limiter_acquire_async():
+    rate_limiter = RateLimiter(rate=50)
+
+    async def acquire_all():
+        await asyncio.gather(*(rate_limiter.acquire_async() for _ in range(11)))
+
+    start = time.monotonic()
+    asyncio.run(acquire_all())
+    assert time.monotonic() - start >= 0.19
+
+
+def test_rate_limiter_charges_weight():
+    rate_limiter = RateLimiter(rate=50, burst=2)
+    start = time.monotonic()
+    # runs at once from the full bucket, then its excess of 8 tokens is paid off before the next operation
+    rate_limiter.acquire(weight=10)
+    rate_limiter.acquire()
+    assert time.monotonic() - start >= 0.17
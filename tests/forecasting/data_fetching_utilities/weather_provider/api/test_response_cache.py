@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+import os
+
+import pytest
+
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.models import Response
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.response_cache import ResponseCache, next_forecast_update
+
+
+@pytest.fixture
+def response_cache(tmp_path) -> ResponseCache:
+    return ResponseCache(str(tmp_path / "responses"))
+
+
+def fake_response(headers=None) -> Response:
+    return Response(status_code=200, url="https://fake.host/v1/gfs", message="OK", headers=headers or {}, data={"hourly": {"time": [0, 3600]}})
+
+
+def test_next_forecast_update():
+    no_delay = timedelta(0)
+    assert next_forecast_update(datetime(2023, 1, 31, 7, 42, tzinfo=timezone.utc), publication_delay=no_delay) == datetime(2023, 1, 31, 12, tzinfo=timezone.utc)
+    assert next_forecast_update(datetime(2023, 1, 31, 18, tzinfo=timezone.utc), publication_delay=no_delay) == datetime(2023, 2, 1, 0, tzinfo=timezone.utc)
+    assert next_forecast_update(datetime(2023, 1, 31, 23, 59), update_interval=timedelta(hours=12), publication_delay=no_delay) == datetime(2023, 2, 1, tzinfo=timezone.utc)
+
+
+def test_next_forecast_update_waits_for_publication():
+    # the 06 UTC run is only served from 10 UTC, so responses fetched before then still belong to the 00 UTC run
+    assert next_forecast_update(datetime(2023, 1, 31, 7, 42, tzinfo=timezone.utc)) == datetime(2023, 1, 31, 10, tzinfo=timezone.utc)
+    assert next_forecast_update(datetime(2023, 1, 31, 10, tzinfo=timezone.utc)) == datetime(2023, 1, 31, 16, tzinfo=timezone.utc)
+    # the 18 UTC run is published after midnight
+    assert next_forecast_update(datetime(2023, 1, 31, 23, tzinfo=timezone.utc)) == datetime(2023, 2, 1, 4, tzinfo=timezone.utc)
+    assert next_forecast_update(datetime(2023, 1, 31, 23, tzinfo=timezone.utc), publication_delay=timedelta(hours=8)) == datetime(2023, 2, 1, 2, tzinfo=timezone.utc)
+
+
+def test_key_depends_on_request():
+    key = ResponseCache.key("https://fake.host/v1/gfs", {"latitude": "1.0", "hourly": ["rain"]})
+    assert key == ResponseCache.key("https://fake.host/v1/gfs", {"hourly": ["rain"], "latitude": "1.0"})
+    assert key != ResponseCache.key("https://fake.host/v1/gfs", {"latitude": "2.0", "hourly": ["rain"]})
+    assert key != ResponseCache.key("https://fake.host/v1/gfs", {"latitude": "1.0", "hourly": ["rain", "snowfall"]})
+
+
+def test_put_get_roundtrip(response_cache):
+    now = datetime(2023, 1, 31, 7, 42, tzinfo=timezone.utc)
+    response_cache.put("key", fake_response({"ETag": '"abc"', "Last-Modified": "Tue, 31 Jan 2023 06:00:00 GMT"}), now=now)
+
+    cached = response_cache.get("key")
+    assert cached is not None
+    assert cached.response.data == {"hourly": {"time": [0, 3600]}}
+    assert cached.fresh_until == datetime(2023, 1, 31, 10, tzinfo=timezone.utc)
+    assert cached.is_fresh(now) and not cached.is_fresh(cached.fresh_until)
+    assert cached.conditional_headers() == {"If-None-Match": '"abc"', "If-Modified-Since": "Tue, 31 Jan 2023 06:00:00 GMT"}
+    assert response_cache.get("missing") is None
+
+
+def test_hit_revalidated_extends_freshness(response_cache):
+    cached = response_cache.put("key", fake_response(), now=datetime(2023, 1, 31, 7, 42, tzinfo=timezone.utc))
+
+    response = response_cache.hit("key", cached, revalidated=True, now=datetime(2023, 1, 31, 13, tzinfo=timezone.utc))
+
+    assert response.data == cached.response.data
+    assert response_cache.get("key").fresh_until == datetime(2023, 1, 31, 16, tzinfo=timezone.utc)
+    assert (response_cache.stats.hits, response_cache.stats.misses) == (1, 1)
+
+
+def test_clear(response_cache):
+    response_cache.put("key", fake_response())
+    response_cache.clear()
+    assert response_cache.get("key") is None
+
+
+def test_put_prunes_outdated_responses(response_cache):
+    now = datetime.now(timezone.utc)
+    response_cache.put("outdated", fake_response(), now=now - timedelta(hours=13))
+    response_cache.put("stale", fake_response(), now=now - timedelta(hours=7))
+    for key, hours in (("outdated", 13), ("stale", 7)):
+        written = (now - timedelta(hours=hours)).timestamp()
+        os.utime(response_cache._path(key), (written, written))
+
+    response_cache.put("fresh", fake_response(), now=now)
+
+    assert response_cache.get("outdated") is None
+    # stale responses may still be revalidated
+    assert response_cache.get("stale") is not None
+    assert response_cache.get("fresh") is not None
+
+
+def test_prune_at_most_once_per_update_interval(response_cache):
+    now = datetime.now(timezone.utc)
+    response_cache.put("key", fake_response(), now=now)
+    outdated = (now - timedelta(hours=13)).timestamp()
+    os.utime(response_cache._path("key"), (outdated, outdated))
+
+    assert response_cache.prune(now) == 0
+    assert response_cache.prune(now + timedelta(hours=6)) == 1
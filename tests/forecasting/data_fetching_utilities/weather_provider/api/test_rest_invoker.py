@@ -1,8 +1,13 @@
+from datetime import datetime, timezone
+from typing import List
+
 import pytest
+import requests
 
 from rlf.forecasting.data_fetching_utilities.weather_provider.api.exceptions import RestInvokerException
 from rlf.forecasting.data_fetching_utilities.weather_provider.api.models import Response
-from rlf.forecasting.data_fetching_utilities.weather_provider.api.rest_invoker import RestInvoker
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.response_cache import ResponseCache
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.rest_invoker import RestInvoker, RetryPolicy
 
 
 @pytest.fixture
@@ -28,3 +33,126 @@ def test_get():
     assert isinstance(res, Response)
     assert res.status_code == 200
     assert res.url == "https://jsonplaceholder.typicode.com/posts"
+
+
+class FakeHTTPResponse:
+    def __init__(self, status_code: int, body=None, headers=None) -> None:
+        self.status_code = status_code
+        self.reason = "OK" if status_code == 200 else "Error"
+        self.url = "https://fake.host/v1/path"
+        self.headers = headers if headers is not None else {}
+        self._body = body if body is not None else {}
+        self.text = str(self._body)
+
+    def json(self):
+        return self._body
+
+
+class FakeSession:
+    def __init__(self, responses) -> None:
+        self.responses = list(responses)
+        self.requests: List[dict] = []
+
+    def request(self, **kwargs):
+        self.requests.append(kwargs)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def fake_invoker(responses, retry_policy=RetryPolicy()):
+    session = FakeSession(responses)
+    sleeps: List[float] = []
+    invoker = RestInvoker(protocol="https", hostname="fake.host", version="v1", timeout=(1.0, 2.0),
+                          retry_policy=retry_policy, session=session, sleep=sleeps.append)  # type: ignore[arg-type]
+    return invoker, session, sleeps
+
+
+def test_get_reuses_session_with_timeout():
+    invoker, session, sleeps = fake_invoker([FakeHTTPResponse(200, {"a": 1}), FakeHTTPResponse(200, {"a": 2})])
+
+    assert invoker.get("path").data == {"a": 1}
+    assert invoker.get("path").data == {"a": 2}
+    assert [request["url"] for request in session.requests] == ["https://fake.host/v1/path"] * 2
+    assert all(request["timeout"] == (1.0, 2.0) for request in session.requests)
+    assert sleeps == []
+
+
+def test_get_retries_throttled_honoring_retry_after():
+    invoker, session, sleeps = fake_invoker([FakeHTTPResponse(429, headers={"Retry-After": "7"}),
+                                             FakeHTTPResponse(503),
+                                             FakeHTTPResponse(200, {"a": 1})],
+                                            retry_policy=RetryPolicy(backoff_factor=0.5))
+
+    assert invoker.get("path").data == {"a": 1}
+    assert sleeps == [7.0, 1.0]
+
+
+def test_get_retries_connection_errors():
+    invoker, session, sleeps = fake_invoker([requests.exceptions.ConnectionError("reset"), FakeHTTPResponse(200, {"a": 1})])
+
+    assert invoker.get("path").data == {"a": 1}
+    assert len(sleeps) == 1
+
+
+def test_get_gives_up_after_max_attempts():
+    invoker, session, sleeps = fake_invoker([FakeHTTPResponse(500)] * 3, retry_policy=RetryPolicy(max_attempts=3))
+
+    with pytest.raises(RestInvokerException):
+        invoker.get("path")
+    assert len(session.requests) == 3
+
+
+def test_get_does_not_retry_client_errors():
+    invoker, session, sleeps = fake_invoker([FakeHTTPResponse(400, {"reason": "bad request"})])
+
+    with pytest.raises(RestInvokerException, match="bad request"):
+        invoker.get("path")
+    assert len(session.requests) == 1
+
+
+def test_retry_policy_delay():
+    policy = RetryPolicy(backoff_factor=1.0, max_backoff=10.0)
+    assert [policy.delay(attempt) for attempt in range(1, 6)] == [1.0, 2.0, 4.0, 8.0, 10.0]
+    assert policy.delay(1, retry_after="3") == 3.0
+    assert policy.delay(1, retry_after="3600") == 10.0
+    assert policy.delay(1, retry_after="not a date") == 1.0
+
+
+def test_parse_retry_after_http_date():
+    now = datetime(2023, 1, 31, 7, 42, 0, tzinfo=timezone.utc)
+    assert RetryPolicy.parse_retry_after("Tue, 31 Jan 2023 07:42:30 GMT", now=now) == 30.0
+    assert RetryPolicy.parse_retry_after(None) is None
+
+
+def test_get_serves_fresh_cached_responses(tmp_path):
+    invoker, session, _ = fake_invoker([FakeHTTPResponse(200, {"a": 1})])
+    invoker.cache = ResponseCache(str(tmp_path))
+
+    assert invoker.get("path", {"latitude": 1.0}).data == {"a": 1}
+    assert invoker.get("path", {"latitude": 1.0}).data == {"a": 1}
+    assert len(session.requests) == 1
+    assert (invoker.cache.stats.hits, invoker.cache.stats.misses) == (1, 1)
+
+
+def test_get_revalidates_stale_cached_responses(tmp_path):
+    invoker, session, _ = fake_invoker([FakeHTTPResponse(200, {"a": 1}, headers={"ETag": '"v1"'}),
+                                        FakeHTTPResponse(304),
+                                        FakeHTTPResponse(200, {"a": 2}, headers={"ETag": '"v2"'})])
+    invoker.cache = ResponseCache(str(tmp_path))
+    invoker.get("path")
+    key = invoker.cache.key("https://fake.host/v1/path")
+
+    def expire():
+        cached = invoker.cache.get(key)
+        cached.fresh_until = datetime(2000, 1, 1, tzinfo=timezone.utc)
+        invoker.cache._write(key, cached)
+
+    expire()
+    assert invoker.get("path").data == {"a": 1}
+    assert session.requests[1]["headers"] == {"If-None-Match": '"v1"'}
+
+    expire()
+    assert invoker.get("path").data == {"a": 2}
+    assert invoker.cache.get(key).etag == '"v2"'
@@ -0,0 +1,182 @@
+from datetime import datetime, timedelta, timezone
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.grid.grid_slab import BoundingBox, GridSlab
+from rlf.forecasting.data_fetching_utilities.weather_provider.grid.grid_store import GridStore, read_slab, write_slab
+
+
+@pytest.fixture
+def slab() -> GridSlab:
+    lons = np.arange(-121.0, -119.75, 0.25)
+    lats = np.arange(44.0, 45.0, 0.25)
+    times = pd.date_range("2023-01-01", periods=48, freq="H", tz="UTC")
+    shape = (len(times), len(lats), len(lons))
+    temperature = np.arange(np.prod(shape), dtype=np.float32).reshape(shape)
+    return GridSlab.from_grid(lons=lons, lats=lats, times=times,
+                              variables={"temperature_2m": temperature, "precipitation": -temperature},
+                              units={"temperature_2m": "°C", "precipitation": "mm"},
+                              elevation=np.zeros((len(lats), len(lons)), dtype=np.float32))
+
+
+@pytest.fixture
+def skewed_slab() -> GridSlab:
+    # a 10x10 grid whose rows and columns drift, as where Open-Meteo answers with a projected model (ie HRRR over CONUS)
+    rows, columns = np.meshgrid(np.arange(10), np.arange(10), indexing="ij")
+    lons = (-121.0 + 0.03 * columns + 0.004 * rows).ravel()
+    lats = (44.0 + 0.03 * rows + 0.003 * columns).ravel()
+    times = pd.date_range("2023-01-01", periods=2, freq="H", tz="UTC")
+    temperature = np.broadcast_to(np.arange(len(lons), dtype=np.float32), (len(times), len(lons)))
+    return GridSlab(lons=lons, lats=lats, times=times, variables={"temperature_2m": temperature})
+
+
+def test_rejects_misshaped_variables(slab):
+    with pytest.raises(ValueError):
+        GridSlab(lons=slab.lons, lats=slab.lats, times=slab.times, variables={"temperature_2m": np.zeros((1, 2, 3), dtype=np.float32)})
+
+
+def test_from_grid(slab):
+    assert slab.lons.shape == slab.lats.shape == (20,)
+    assert (slab.lons[6], slab.lats[6]) == (-120.75, 44.25)
+    np.testing.assert_array_equal(slab.variables["temperature_2m"][:, 6], np.arange(48, dtype=np.float32) * 20 + 6)
+
+
+@pytest.mark.parametrize("coordinate, index", [
+    (Coordinate(lon=-121.0, lat=44.0), 0),
+    (Coordinate(lon=-120.87, lat=44.13), 6),
+    (Coordinate(lon=-119.9, lat=44.8), 19),
+    # within half a cell of the edge
+    (Coordinate(lon=-121.12, lat=43.88), 0),
+])
+def test_index_of(slab, coordinate, index):
+    assert slab.index_of(coordinate) == index
+
+
+def test_index_of_outside(slab):
+    with pytest.raises(ValueError):
+        slab.index_of(Coordinate(lon=-121.2, lat=44.0))
+
+
+def test_datum_at(slab):
+    datum = slab.datum_at(Coordinate(lon=-120.87, lat=44.13))
+
+    assert (datum.longitude, datum.latitude) == (-120.87, 44.13)
+    assert (datum.api_response_longitude, datum.api_response_latitude) == (-120.75, 44.25)
+    assert datum.hourly_units == {"temperature_2m": "°C", "precipitation": "mm"}
+    assert datum.hourly_parameters.index.equals(slab.times)
+    assert (datum.hourly_parameters.dtypes == np.float32).all()
+    np.testing.assert_array_equal(datum.hourly_parameters["temperature_2m"], slab.variables["temperature_2m"][:, 6])
+
+
+def test_skewed_index_of(skewed_slab):
+    # every cell is found from a point near it, including interior points far from any grid row or column of the bounding rectangle
+    for index, (lon, lat) in enumerate(zip(skewed_slab.lons, skewed_slab.lats)):
+        assert skewed_slab.index_of(Coordinate(lon=lon + 0.01, lat=lat - 0.01)) == index
+
+
+def test_skewed_datum_at(skewed_slab):
+    datum = skewed_slab.datum_at(Coordinate(lon=float(skewed_slab.lons[55]) - 0.01, lat=float(skewed_slab.lats[55]) + 0.01))
+
+    assert (datum.api_response_longitude, datum.api_response_latitude) == (skewed_slab.lons[55], skewed_slab.lats[55])
+    assert not datum.hourly_parameters["temperature_2m"].isna().any()
+    assert (datum.hourly_parameters["temperature_2m"] == 55).all()
+
+
+def test_skewed_index_of_outside(skewed_slab):
+    with pytest.raises(ValueError):
+        skewed_slab.index_of(Coordinate(lon=-121.1, lat=44.1))
+
+
+def test_select(slab):
+    selected = slab.select(BoundingBox(lon_min=-120.8, lat_min=44.2, lon_max=-120.2, lat_max=44.5),
+                           columns=["precipitation"],
+                           start=pd.Timestamp("2023-01-01 12:00", tz="UTC"),
+                           end=pd.Timestamp("2023-01-02", tz="UTC"))
+
+    cells = [6, 7, 8, 11, 12, 13]
+    np.testing.assert_array_equal(selected.lons, slab.lons[cells])
+    np.testing.assert_array_equal(selected.lats, [44.25] * 3 + [44.5] * 3)
+    assert len(selected.times) == 12
+    assert list(selected.variables) == ["precipitation"]
+    assert selected.units == {"precipitation": "mm"}
+    np.testing.assert_array_equal(selected.variables["precipitation"], slab.variables["precipitation"][12:24, cells])
+
+
+def test_select_outside(slab):
+    with pytest.raises(ValueError):
+        slab.select(BoundingBox(lon_min=-100.0, lat_min=44.0, lon_max=-99.0, lat_max=45.0))
+
+
+def test_write_read_round_trip(slab, tmp_path):
+    write_slab(slab, str(tmp_path / "slab"))
+
+    read = read_slab(str(tmp_path / "slab"))
+
+    np.testing.assert_array_equal(read.lons, slab.lons)
+    np.testing.assert_array_equal(read.lats, slab.lats)
+    assert read.times.equals(slab.times)
+    assert read.units == slab.units
+    for name, values in slab.variables.items():
+        np.testing.assert_array_equal(read.variables[name], values)
+    np.testing.assert_array_equal(read.elevation, slab.elevation)
+
+
+def test_grid_store(slab, tmp_path):
+    store = GridStore(str(tmp_path / "store"))
+    key = store.key("historical", (-121.0, 44.0, -120.0, 45.0), ["temperature_2m"], "2023-01-01", "2023-01-02")
+
+    assert store.get(key) is None
+    store.put(key, slab)
+    # a concurrent put of the same request is ignored
+    store.put(key, slab)
+    assert store.get(key).variables.keys() == slab.variables.keys()
+    assert store.key("historical", (-121.0, 44.0, -120.0, 45.0), ["temperature_2m"], "2023-01-01", "2023-01-03") != key
+
+    store.clear()
+    assert store.get(key) is None
+
+
+def test_grid_store_expires_slabs(slab, tmp_path):
+    store = GridStore(str(tmp_path / "store"))
+    now = datetime(2023, 1, 1, 6, tzinfo=timezone.utc)
+    key = store.key("current", (-121.0, 44.0, -120.0, 45.0), None, now)
+
+    store.put(key, slab, expires=now + timedelta(hours=4), now=now)
+
+    assert store.get(key, now=now + timedelta(hours=3)) is not None
+    assert store.get(key, now=now + timedelta(hours=4)) is None
+    # an expired slab left over under the same key is replaced
+    store.put(key, slab, expires=now + timedelta(hours=10), now=now + timedelta(hours=5))
+    assert store.get(key, now=now + timedelta(hours=5)) is not None
+
+
+def test_grid_store_prunes_expired_and_idle_slabs(slab, tmp_path):
+    store = GridStore(str(tmp_path / "store"), max_idle=timedelta(days=1))
+    now = datetime.now(timezone.utc)
+    current_key, historical_key, used_key = (store.key(name) for name in ("current", "historical", "used"))
+    store.put(historical_key, slab, now=now)
+    store.put(used_key, slab, now=now)
+    store.put(current_key, slab, expires=now - timedelta(hours=1), now=now)
+    two_days_ago = (now - timedelta(days=2)).timestamp()
+    for key in (historical_key, used_key):
+        os.utime(tmp_path / "store" / key, (two_days_ago, two_days_ago))
+    store.get(used_key)
+
+    # pruned at most once per prune interval, unless forced
+    assert store.prune(now) == 0
+    assert store.prune(now, force=True) == 2
+    assert sorted(os.listdir(tmp_path / "store")) == [used_key]
+
+
+def test_grid_store_put_prunes(slab, tmp_path):
+    store = GridStore(str(tmp_path / "store"))
+    now = datetime(2023, 1, 1, 6, tzinfo=timezone.utc)
+    for hours in range(0, 24, 6):
+        store.put(store.key("current", hours), slab, expires=now + timedelta(hours=hours + 6), now=now + timedelta(hours=hours))
+
+    # each model run replaces the slabs of the previous one
+    assert len(os.listdir(tmp_path / "store")) == 1
@@ -1,7 +1,19 @@
+from datetime import datetime, timedelta, timezone
+import io
+import threading
+
 import pytest
+import requests
+from requests.adapters import BaseAdapter
+import requests_cache
+from urllib3 import HTTPResponse
+from requests_cache import NEVER_EXPIRE
+
+from rlf.disk_cache import CacheStats
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
 
-from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.ecmwf_adapter import OpenMeteoECMWFAdapter
+from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.ecmwf_adapter import (ARCHIVE_URL, FORECAST_URL, ExpiringCacheSession,
+                                                                                               OpenMeteoECMWFAdapter)
 
 REAL_LATITUDE = 44.2
 REAL_LONGITUDE = -119.3
@@ -56,3 +68,68 @@ def test_get_current_columns_subset(fake_coordinate):
     assert pytest.approx(REAL_LONGITUDE, rel=1e-2) == response.Longitude()
     assert pytest.approx(REAL_LATITUDE, rel=1e-2) == response.Latitude()
     assert response.Hourly().VariablesLength() == len(REAL_COLUMNS)
+
+
+class FakeTransport(BaseAdapter):
+    """Answers every request locally, counting the requests which reach the network."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.sent = 0
+
+    def send(self, request, **kwargs):
+        self.sent += 1
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response.raw = HTTPResponse(body=io.BytesIO(b"data"), status=200, preload_content=False, request_url=request.url)
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def cached_session():
+    session = requests_cache.CachedSession(backend="memory")
+    transport = FakeTransport()
+    session.mount("https://", transport)
+    return session, transport
+
+
+def test_expiring_cache_session_counts_hits(cached_session):
+    session, transport = cached_session
+    stats = CacheStats()
+    archive = ExpiringCacheSession(session, lambda: NEVER_EXPIRE, stats, threading.Lock())
+
+    archive.get(ARCHIVE_URL, params={"latitude": 1.0})
+    archive.get(ARCHIVE_URL, params={"latitude": 1.0})
+    archive.get(ARCHIVE_URL, params={"latitude": 2.0})
+
+    assert transport.sent == 2
+    assert (stats.hits, stats.misses) == (1, 2)
+    assert stats.bytes_from_cache == 4
+
+
+def test_expiring_cache_session_refetches_expired_forecasts(cached_session):
+    session, transport = cached_session
+    stats = CacheStats()
+    expired = datetime.now(timezone.utc) - timedelta(minutes=1)
+    forecast = ExpiringCacheSession(session, lambda: expired, stats, threading.Lock())
+
+    forecast.get(FORECAST_URL, params={"latitude": 1.0})
+    forecast.get(FORECAST_URL, params={"latitude": 1.0})
+
+    assert transport.sent == 2
+    assert stats.hits == 0
+
+
+def test_adapter_reuses_clients(cached_session):
+    session, _ = cached_session
+    adapter = OpenMeteoECMWFAdapter(session=session)
+    archive_client, forecast_client = adapter._clients()
+
+    assert adapter._clients() == (archive_client, forecast_client)
+    assert archive_client is not forecast_client
+    assert archive_client.session.session is forecast_client.session.session is session
@@ -1,7 +1,11 @@
 import pytest
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
 
-from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.open_meteo_adapter import OpenMeteoAdapter
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.exceptions import RestInvokerException
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.models import Response
+from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.open_meteo_adapter import (
+    DEFAULT_TIMEOUTS, OpenMeteoAdapter, coordinate_parameters, request_weight, split_batch_response
+)
 
 
 @pytest.fixture
@@ -54,3 +58,59 @@ def test_get_current_columns_subset(fake_coordinate):
     assert pytest.approx(30.0, rel=1e-2) == response.data["latitude"]
     assert len(response.data["hourly"]) == 2  # Time column and 'temperature_2m' column
     assert len(response.data["hourly_units"]) == 2
+
+
+def test_coordinate_parameters():
+    parameters = coordinate_parameters([Coordinate(lon=110.0, lat=30.0), Coordinate(lon=-120.5, lat=44.25)])
+    assert parameters == {"longitude": "110.0,-120.5", "latitude": "30.0,44.25"}
+
+
+def test_split_batch_response():
+    response = Response(status_code=200, url="fake url", message="OK", headers={}, data=[{"longitude": 110.0}, {"longitude": -120.5}])
+    responses = split_batch_response(response, 2)
+    assert [r.data["longitude"] for r in responses] == [110.0, -120.5]
+    assert all(r.status_code == 200 for r in responses)
+
+
+def test_split_batch_response_single_location():
+    response = Response(status_code=200, url="fake url", message="OK", headers={}, data={"longitude": 110.0})
+    assert split_batch_response(response, 1)[0].data == {"longitude": 110.0}
+
+
+def test_split_batch_response_count_mismatch():
+    response = Response(status_code=200, url="fake url", message="OK", headers={}, data=[{"longitude": 110.0}])
+    with pytest.raises(RestInvokerException):
+        split_batch_response(response, 2)
+
+
+def test_invoker_reused_per_host():
+    adapter = OpenMeteoAdapter(timeouts={"api.open-meteo.com": (1.0, 2.0)})
+    forecast_invoker = adapter.invoker(adapter.forecast_hostname)
+    archive_invoker = adapter.invoker(adapter.archive_hostname)
+
+    assert adapter.invoker(adapter.forecast_hostname) is forecast_invoker
+    assert archive_invoker is not forecast_invoker
+    assert forecast_invoker.timeout == (1.0, 2.0)
+    assert archive_invoker.timeout == DEFAULT_TIMEOUTS["archive-api.open-meteo.com"]
+    adapter.close()
+
+
+def test_max_batch_sizes_per_host():
+    adapter = OpenMeteoAdapter(max_batch_sizes={"api.open-meteo.com": 20})
+
+    # archive queries span years, so far fewer locations fit in one
+    assert adapter.max_historical_batch_size == 2
+    assert adapter.max_current_batch_size == 20
+
+
+def test_request_weight():
+    assert request_weight(1, num_days=14, num_variables=10) == 1.0
+    assert request_weight(3, num_days=1, num_variables=1) == 3.0
+    assert request_weight(2, num_days=28, num_variables=25) == 2 * 2.5 * 2
+
+
+def test_historical_request_weight():
+    adapter = OpenMeteoAdapter()
+
+    # a year of 10 variables for 2 locations
+    assert adapter.historical_request_weight(2, "2022-01-01", "2022-12-31", columns=[f"variable_{i}" for i in range(10)]) == 2 * 365 / 14
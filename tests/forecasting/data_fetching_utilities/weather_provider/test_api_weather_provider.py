@@ -1,11 +1,18 @@
+from datetime import datetime, timezone
+import threading
+import time
 from typing import Dict, List, Optional, Union
 
+import numpy as np
+import pandas as pd
 import pytest
 
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
 from rlf.forecasting.data_fetching_utilities.weather_provider.api.base_api_adapter import BaseAPIAdapter
 from rlf.forecasting.data_fetching_utilities.weather_provider.api.models import Response
-from rlf.forecasting.data_fetching_utilities.weather_provider.api_weather_provider import APIWeatherProvider
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.rate_limiter import RateLimiter
+from rlf.forecasting.data_fetching_utilities.weather_provider.api_weather_provider import APIWeatherProvider, parse_time_index
+from rlf.forecasting.data_fetching_utilities.weather_provider.current_weather_buffer import CurrentWeatherBuffer
 
 
 def fake_response(coordinate, columns: List[str]):
@@ -240,3 +247,211 @@ def test_fetch_current_passed_columns_are_remapped():
     ]
 
     assert expected_columns == actual_columns
+
+
+class SlowWeatherAPIAdapter(FakeWeatherAPIAdapter):
+    """Fake adapter with a fixed latency per query, recording how many queries are in flight at once."""
+
+    def __init__(self, latency: float = 0.02) -> None:
+        super().__init__()
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.queried: List[Coordinate] = []
+        self._lock = threading.Lock()
+
+    def _query(self, coordinate: Coordinate) -> None:
+        with self._lock:
+            self.queried.append(coordinate)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # later coordinates answer faster, so responses arrive out of order
+        time.sleep(self.latency / (1 + coordinate.lon))
+        with self._lock:
+            self.in_flight -= 1
+
+    def get_current(self, coordinate: Coordinate, **kwargs) -> Response:  # type: ignore[override]
+        self._query(coordinate)
+        return super().get_current(coordinate, **kwargs)
+
+    def get_historical(self, coordinate: Coordinate, **kwargs) -> Response:  # type: ignore[override]
+        self._query(coordinate)
+        return super().get_historical(coordinate, **kwargs)
+
+
+@pytest.fixture
+def many_coordinates() -> List[Coordinate]:
+    return [Coordinate(lon=float(i), lat=2.0) for i in range(8)]
+
+
+def test_fetch_current_concurrent_preserves_order(many_coordinates):
+    adapter = SlowWeatherAPIAdapter()
+    weather_provider = APIWeatherProvider(coordinates=many_coordinates, api_adapter=adapter, max_concurrent_requests=4)
+
+    weather_datums = weather_provider.fetch_current()
+
+    assert [(datum.longitude, datum.latitude) for datum in weather_datums] == list(many_coordinates)
+    assert 1 < adapter.max_in_flight <= 4
+
+
+def test_fetch_historical_concurrent_fetches_duplicates_once(many_coordinates):
+    adapter = SlowWeatherAPIAdapter()
+    weather_provider = APIWeatherProvider(coordinates=many_coordinates + many_coordinates[:3], api_adapter=adapter, max_concurrent_requests=4)
+
+    weather_datums = weather_provider.fetch_historical()
+
+    assert [(datum.longitude, datum.latitude) for datum in weather_datums] == list(many_coordinates)
+    assert len(adapter.queried) == len(many_coordinates)
+
+
+def test_fetch_current_rate_limited(many_coordinates):
+    weather_provider = APIWeatherProvider(coordinates=many_coordinates, api_adapter=SlowWeatherAPIAdapter(latency=0.0),
+                                          max_concurrent_requests=4, rate_limiter=RateLimiter(rate=50, burst=4))
+    start = time.monotonic()
+    weather_provider.fetch_current()
+    # the burst covers the first 4 queries, the other 4 arrive at 50 per second
+    assert time.monotonic() - start >= 0.07
+
+
+def test_invalid_max_concurrent_requests():
+    with pytest.raises(ValueError):
+        APIWeatherProvider(coordinates=[], api_adapter=FakeWeatherAPIAdapter(), max_concurrent_requests=0)
+
+
+class BatchWeatherAPIAdapter(FakeWeatherAPIAdapter):
+    """Fake adapter answering several coordinates per query, recording the batches it was asked for."""
+
+    def __init__(self, max_batch_size: int, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.max_historical_batch_size = max_batch_size
+        self.max_current_batch_size = max_batch_size
+        self.batches: List[List[Coordinate]] = []
+
+    def get_current_batch(self, coordinates: List[Coordinate], **kwargs) -> List[Response]:  # type: ignore[override]
+        assert len(coordinates) <= self.max_current_batch_size
+        self.batches.append(list(coordinates))
+        return [super(BatchWeatherAPIAdapter, self).get_current(coordinate, **kwargs) for coordinate in coordinates]
+
+    def get_historical_batch(self, coordinates: List[Coordinate], **kwargs) -> List[Response]:  # type: ignore[override]
+        assert len(coordinates) <= self.max_historical_batch_size
+        self.batches.append(list(coordinates))
+        return [super(BatchWeatherAPIAdapter, self).get_historical(coordinate, **kwargs) for coordinate in coordinates]
+
+
+def test_fetch_current_batched(many_coordinates):
+    adapter = BatchWeatherAPIAdapter(max_batch_size=3)
+    weather_provider = APIWeatherProvider(coordinates=many_coordinates, api_adapter=adapter, max_concurrent_requests=2)
+
+    weather_datums = weather_provider.fetch_current()
+
+    assert weather_provider.max_current_batch_size == 3
+    assert [(datum.longitude, datum.latitude) for datum in weather_datums] == list(many_coordinates)
+    assert sorted(len(batch) for batch in adapter.batches) == [2, 3, 3]
+
+
+def test_fetch_historical_batched_remaps_columns(many_coordinates):
+    adapter = BatchWeatherAPIAdapter(max_batch_size=5, columns=["soil_temperature_0_to_7cm"], expected_request_columns=["soil_temperature_0_to_7cm"])
+    weather_provider = APIWeatherProvider(coordinates=many_coordinates, api_adapter=adapter)
+
+    weather_datums = weather_provider.fetch_historical(columns=["soil_temperature_level_1"])
+
+    assert len(adapter.batches) == 2
+    assert [(datum.longitude, datum.latitude) for datum in weather_datums] == list(many_coordinates)
+    assert all(list(datum.hourly_parameters.columns) == ["soil_temperature_level_1"] for datum in weather_datums)
+
+
+class RecordingRateLimiter:
+    """Records the weight of every query instead of limiting them."""
+
+    def __init__(self) -> None:
+        self.weights: List[float] = []
+
+    def acquire(self, weight: float = 1.0) -> None:
+        self.weights.append(weight)
+
+
+class WeightedWeatherAPIAdapter(BatchWeatherAPIAdapter):
+    def historical_request_weight(self, num_coordinates, start_date, end_date, columns=None):
+        return num_coordinates * 10.0
+
+
+def test_fetch_historical_charges_request_weight(many_coordinates):
+    rate_limiter = RecordingRateLimiter()
+    weather_provider = APIWeatherProvider(coordinates=many_coordinates, api_adapter=WeightedWeatherAPIAdapter(max_batch_size=5), rate_limiter=rate_limiter)  # type: ignore[arg-type]
+
+    weather_provider.fetch_historical()
+
+    assert rate_limiter.weights == [len(batch) * 10.0 for batch in weather_provider.api_adapter.batches]  # type: ignore[attr-defined]
+
+
+def test_parse_time_index_unixtime():
+    index = parse_time_index([946684800, 946688400], "America/Los_Angeles")
+    assert list(index) == [pd.Timestamp("2000-01-01T00:00", tz="UTC"), pd.Timestamp("2000-01-01T01:00", tz="UTC")]
+
+
+def test_parse_time_index_local_iso8601():
+    index = parse_time_index(["2000-01-01T00:00", "2000-07-01T00:00"], "America/Los_Angeles")
+    # standard time in winter, daylight saving time in summer
+    assert list(index) == [pd.Timestamp("2000-01-01T08:00", tz="UTC"), pd.Timestamp("2000-07-01T07:00", tz="UTC")]
+
+
+def test_hourly_parameters_single_float32_block(weather_provider):
+    hourly = {"time": [946684800, 946688400, 946692000], "temperature_2m": [1.0, None, 3.0], "rain": [0, 1, 2]}
+    df = weather_provider._build_hourly_parameters_from_response(hourly, "GMT")
+
+    assert list(df.columns) == ["temperature_2m", "rain"]
+    assert df.index.name == "time" and df.index.dtype == "datetime64[ns, UTC]"
+    assert (df.dtypes == np.float32).all()
+    assert df._mgr.nblocks == 1
+    assert np.isnan(df["temperature_2m"].iloc[1])
+
+
+class WindowWeatherAPIAdapter(FakeWeatherAPIAdapter):
+    """Fake adapter answering current queries with the requested window around today, recording the past days requested."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.max_current_batch_size = 2
+        self.past_days: List[int] = []
+
+    def get_current_batch(self, coordinates: List[Coordinate], past_days: int = 92, forecast_days: int = 16, **kwargs) -> List[Response]:  # type: ignore[override]
+        self.past_days.append(past_days)
+        today = pd.Timestamp.now(tz="UTC").floor("D")
+        times = pd.date_range(today - pd.Timedelta(days=past_days), today + pd.Timedelta(days=forecast_days), freq="H", inclusive="left")
+        responses = []
+        for coordinate in coordinates:
+            response = fake_response(coordinate, [])
+            response.data["hourly"] = {"time": [int(t.timestamp()) for t in times], "temperature_2m": [float(len(self.past_days))] * len(times)}
+            responses.append(response)
+        return responses
+
+
+def test_fetch_current_incremental(tmp_path, many_coordinates):
+    adapter = WindowWeatherAPIAdapter()
+    weather_provider = APIWeatherProvider(coordinates=many_coordinates[:2], api_adapter=adapter,
+                                          current_buffer=CurrentWeatherBuffer(str(tmp_path), delta_past_days=2))
+
+    full = weather_provider.fetch_current()
+    incremental = weather_provider.fetch_current()
+
+    assert adapter.past_days == [92, 2]
+    today = pd.Timestamp.now(tz="UTC").floor("D")
+    for full_datum, incremental_datum in zip(full, incremental):
+        assert incremental_datum.hourly_parameters.index.equals(full_datum.hourly_parameters.index)
+        values = incremental_datum.hourly_parameters["temperature_2m"]
+        assert (values[values.index < today - pd.Timedelta(days=2)] == 1.0).all()
+        assert (values[values.index >= today - pd.Timedelta(days=2)] == 2.0).all()
+
+
+def test_fetch_current_incremental_refetches_stale_buffer(tmp_path, many_coordinates):
+    adapter = WindowWeatherAPIAdapter()
+    buffer = CurrentWeatherBuffer(str(tmp_path), delta_past_days=2)
+    weather_provider = APIWeatherProvider(coordinates=many_coordinates[:2], api_adapter=adapter, current_buffer=buffer)
+
+    weather_provider.fetch_current()
+    datum, _ = buffer.load(many_coordinates[0])
+    buffer.save(datum, datetime(2000, 1, 1, tzinfo=timezone.utc))
+    weather_provider.fetch_current()
+
+    # the stale coordinate is fetched in full, the other one incrementally
+    assert adapter.past_days == [92, 92, 2]
@@ -1,7 +1,13 @@
+from typing import List
+
+import flatbuffers
+import numpy as np
+from openmeteo_sdk import Unit, WeatherApiResponse
+import pandas as pd
 import pytest
 
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
-from rlf.forecasting.data_fetching_utilities.weather_provider.api_weather_provider_ecmwf import APIWeatherProviderECMWF
+from rlf.forecasting.data_fetching_utilities.weather_provider.api_weather_provider_ecmwf import APIWeatherProviderECMWF, UNIT_NAMES, decode_hourly_values
 
 
 @ pytest.fixture
@@ -48,3 +54,76 @@ def test_fetch_historical_equivalence(weather_provider_ecmwf):
     test_list_2 = weather_provider_ecmwf.fetch_historical(["temperature_2m", "rain"])
 
     assert test_list_1[0].hourly_parameters.iloc[0, 0] == test_list_2[0].hourly_parameters.iloc[0, 0]
+
+
+def build_response(lon: float, lat: float, values: List[List[float]], units: List[int], start: int = 946684800, interval: int = 3600) -> WeatherApiResponse:
+    """Serialize a WeatherApiResponse flatbuffer with hourly variables, as sent by the API."""
+    builder = flatbuffers.Builder(1024)
+    variables = []
+    for variable_values, unit in zip(values, units):
+        vector = builder.CreateNumpyVector(np.array(variable_values, dtype=np.float32))
+        builder.StartObject(4)
+        builder.PrependUint8Slot(1, unit, 0)
+        builder.PrependUOffsetTRelativeSlot(3, vector, 0)
+        variables.append(builder.EndObject())
+    builder.StartVector(4, len(variables), 4)
+    for variable in reversed(variables):
+        builder.PrependUOffsetTRelative(variable)
+    variables_vector = builder.EndVector()
+
+    builder.StartObject(4)
+    builder.PrependInt64Slot(0, start, 0)
+    builder.PrependInt64Slot(1, start + interval * len(values[0]), 0)
+    builder.PrependInt32Slot(2, interval, 0)
+    builder.PrependUOffsetTRelativeSlot(3, variables_vector, 0)
+    hourly = builder.EndObject()
+
+    timezone = builder.CreateString("GMT")
+    builder.StartObject(12)
+    builder.PrependFloat32Slot(0, lat, 0.0)
+    builder.PrependFloat32Slot(1, lon, 0.0)
+    builder.PrependFloat32Slot(2, 100.0, 0.0)
+    builder.PrependUOffsetTRelativeSlot(7, timezone, 0)
+    builder.PrependUOffsetTRelativeSlot(11, hourly, 0)
+    builder.Finish(builder.EndObject())
+    return WeatherApiResponse.WeatherApiResponse.GetRootAs(builder.Output(), 0)
+
+
+def test_build_datums_from_responses():
+    provider = APIWeatherProviderECMWF(coordinates=[])
+    coordinates = [Coordinate(lon=-121.5, lat=47.25), Coordinate(lon=-121.25, lat=47.5)]
+    responses = [build_response(-121.5, 47.25, [[1.0, 2.0, 3.0], [0.0, 0.5, 0.0]], [Unit.Unit.celsius, Unit.Unit.millimetre]),
+                 build_response(-121.25, 47.5, [[4.0, 5.0, 6.0], [1.0, 1.5, 1.0]], [Unit.Unit.celsius, Unit.Unit.millimetre])]
+
+    datums = provider.build_datums_from_responses(responses, coordinates, columns=["temperature_2m", "rain"])
+
+    assert [(datum.longitude, datum.latitude) for datum in datums] == coordinates
+    assert datums[0].hourly_units == {"temperature_2m": "celsius", "rain": "millimetre"}
+    assert datums[1].hourly_parameters["temperature_2m"].tolist() == [4.0, 5.0, 6.0]
+    assert datums[1].hourly_parameters["rain"].tolist() == [1.0, 1.5, 1.0]
+    assert list(datums[0].hourly_parameters.index) == list(pd.date_range("2000-01-01", periods=3, freq="H", tz="UTC"))
+    assert datums[0].hourly_parameters.index.name == "time"
+    assert (datums[0].hourly_parameters.dtypes == np.float32).all()
+    assert datums[0].hourly_parameters._mgr.nblocks == 1
+
+
+def test_build_datums_from_responses_with_different_times():
+    provider = APIWeatherProviderECMWF(coordinates=[])
+    responses = [build_response(0.0, 0.0, [[1.0, 2.0]], [Unit.Unit.celsius]),
+                 build_response(1.0, 1.0, [[1.0, 2.0, 3.0]], [Unit.Unit.celsius])]
+
+    datums = provider.build_datums_from_responses(responses, [Coordinate(0.0, 0.0), Coordinate(1.0, 1.0)], columns=["temperature_2m"])
+
+    assert [len(datum.hourly_parameters) for datum in datums] == [2, 3]
+
+
+def test_decode_hourly_values_checks_shape():
+    hourly = build_response(0.0, 0.0, [[1.0, 2.0]], [Unit.Unit.celsius]).Hourly()
+    assert decode_hourly_values(hourly).tolist() == [[1.0, 2.0]]
+    with pytest.raises(ValueError):
+        decode_hourly_values(hourly, out=np.empty((1, 3), dtype=np.float32))
+
+
+def test_unit_names():
+    assert UNIT_NAMES[Unit.Unit.celsius] == "celsius"
+    assert UNIT_NAMES[Unit.Unit.undefined] == "undefined"
@@ -0,0 +1,157 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from typing import List, Optional
+
+from aiohttp import web
+import pytest
+
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.base_async_api_adapter import BaseAsyncAPIAdapter
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.models import Response
+from rlf.forecasting.data_fetching_utilities.weather_provider.async_api_weather_provider import AsyncAPIWeatherProvider
+from rlf.forecasting.data_fetching_utilities.weather_provider.async_base_weather_provider import SyncWeatherProvider, fetch_current_for_all
+from rlf.forecasting.data_fetching_utilities.weather_provider.open_meteo.async_open_meteo_adapter import AsyncOpenMeteoAdapter
+
+
+def fake_response(coordinate: Coordinate, columns: List[str]) -> Response:
+    hourly = {"time": [946684800, 946688400, 946692000], **{column: [1.0, 2.0, 3.0] for column in columns}}
+    return Response(status_code=200, url="fake url", message="fake message", headers={},
+                    data={"latitude": coordinate.lat, "longitude": coordinate.lon, "utc_offset_seconds": 0, "timezone": "GMT",
+                          "elevation": 123.4, "hourly_units": {}, "hourly": hourly})
+
+
+class FakeAsyncWeatherAPIAdapter(BaseAsyncAPIAdapter):
+    """Answers every query after a short delay. Records the batches queried, how many queries were in flight at once and whether it was closed."""
+
+    def __init__(self, max_batch_size: int = 1, latency: float = 0.01) -> None:
+        self.max_historical_batch_size = max_batch_size
+        self.max_current_batch_size = max_batch_size
+        self.latency = latency
+        self.batches: List[List[Coordinate]] = []
+        self.requested_columns: List[Optional[List[str]]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.closed = False
+
+    async def _respond(self, coordinates: List[Coordinate], columns: Optional[List[str]]) -> List[Response]:
+        self.batches.append(coordinates)
+        self.requested_columns.append(columns)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.latency)
+        self.in_flight -= 1
+        return [fake_response(coordinate, columns or ["temperature_2m"]) for coordinate in coordinates]
+
+    async def get_historical_batch(self, coordinates, start_date, end_date, columns=None):
+        return await self._respond(coordinates, columns)
+
+    async def get_current_batch(self, coordinates, past_days=92, forecast_days=16, columns=None):
+        return await self._respond(coordinates, columns)
+
+    def get_index_parameter(self) -> str:
+        return "time"
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def many_coordinates() -> List[Coordinate]:
+    return [Coordinate(lon=-120.0 - i * 0.1, lat=44.0 + i * 0.1) for i in range(12)]
+
+
+def test_fetch_current_queries_all_batches_at_once(many_coordinates):
+    adapter = FakeAsyncWeatherAPIAdapter(max_batch_size=5)
+    weather_provider = AsyncAPIWeatherProvider(many_coordinates, api_adapter=adapter)
+
+    datums = asyncio.run(weather_provider.fetch_current())
+
+    assert [len(batch) for batch in adapter.batches] == [5, 5, 2]
+    assert adapter.max_in_flight == 3
+    assert [(datum.longitude, datum.latitude) for datum in datums] == [tuple(coordinate) for coordinate in many_coordinates]
+
+
+def test_fetch_historical_remaps_columns(many_coordinates):
+    adapter = FakeAsyncWeatherAPIAdapter(max_batch_size=50)
+    weather_provider = AsyncAPIWeatherProvider(many_coordinates + many_coordinates[:2], api_adapter=adapter)
+
+    datums = asyncio.run(weather_provider.fetch_historical(columns=["soil_moisture_level_1"], start_date="2000-01-01", end_date="2000-01-01"))
+
+    assert adapter.requested_columns == [["soil_moisture_0_to_7cm"]]
+    # duplicate coordinates are only fetched once
+    assert len(datums) == len(many_coordinates)
+    assert list(datums[0].hourly_parameters.columns) == ["soil_moisture_level_1"]
+
+
+def test_fetch_current_for_all_shares_one_event_loop(many_coordinates):
+    adapter = FakeAsyncWeatherAPIAdapter()
+    providers = [AsyncAPIWeatherProvider(many_coordinates[i:i + 4], api_adapter=adapter) for i in range(0, 12, 4)]
+
+    results = asyncio.run(fetch_current_for_all(providers))
+
+    assert adapter.max_in_flight == 12
+    assert [len(datums) for datums in results] == [4, 4, 4]
+
+
+def test_sync_facade_runs_and_closes_provider(many_coordinates):
+    adapter = FakeAsyncWeatherAPIAdapter(max_batch_size=5)
+    weather_provider = SyncWeatherProvider(AsyncAPIWeatherProvider(many_coordinates, api_adapter=adapter))
+
+    datums = weather_provider.fetch_current(columns=["temperature_2m"])
+
+    assert len(datums) == len(many_coordinates)
+    assert adapter.closed
+    with pytest.raises(ValueError):
+        weather_provider.fetch_historical(sleep_duration=1.0)
+
+
+def test_sync_facade_fetches_batches(many_coordinates):
+    adapter = FakeAsyncWeatherAPIAdapter(max_batch_size=5)
+    weather_provider = SyncWeatherProvider(AsyncAPIWeatherProvider(many_coordinates, api_adapter=adapter))
+
+    datums = weather_provider.fetch_current_datums(many_coordinates[:3] + many_coordinates[:1])
+
+    assert adapter.batches == [many_coordinates[:3]]
+    assert [(datum.longitude, datum.latitude) for datum in datums] == [tuple(coordinate) for coordinate in many_coordinates[:3] + many_coordinates[:1]]
+    assert weather_provider.async_provider.coordinates == many_coordinates
+
+
+@pytest.fixture
+def local_open_meteo():
+    """Serves multi-location forecast queries from a local aiohttp server, running its own event loop in a thread. Yields the host."""
+    async def forecast(request):
+        lats = request.query["latitude"].split(",")
+        lons = request.query["longitude"].split(",")
+        # hold the request open long enough for fetches from several threads to overlap
+        await asyncio.sleep(0.01)
+        return web.json_response([fake_response(Coordinate(lon=float(lon), lat=float(lat)), request.query.getall("hourly")).data for lon, lat in zip(lons, lats)])
+
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.router.add_get("/v1/gfs", forecast)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = runner.addresses[0][1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield f"127.0.0.1:{port}"
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def test_sync_facade_is_thread_safe(local_open_meteo, many_coordinates):
+    # threads share the adapter's invokers, as AWSWeatherUploader.upload_current does with max_concurrent_fetches > 1
+    adapter = AsyncOpenMeteoAdapter(protocol="http", forecast_hostname=local_open_meteo, max_batch_sizes={local_open_meteo: 2})
+    weather_provider = SyncWeatherProvider(AsyncAPIWeatherProvider(many_coordinates, api_adapter=adapter))
+    batches = [many_coordinates[i % 12:i % 12 + 2] for i in range(0, 48, 2)]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda batch: weather_provider.fetch_current_datums(batch, columns=["temperature_2m"]), batches))
+
+    for batch, datums in zip(batches, results):
+        assert [(datum.longitude, datum.latitude) for datum in datums] == [tuple(coordinate) for coordinate in batch]
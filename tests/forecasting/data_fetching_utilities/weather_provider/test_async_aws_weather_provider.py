@@ -0,0 +1,60 @@
+import asyncio
+import threading
+import time
+from typing import List, Set
+
+import pandas as pd
+import pytest
+
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.async_aws_weather_provider import AsyncAWSWeatherProvider
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import WeatherDatum
+
+
+class FakeDispatcher:
+    """Stands in for AWSDispatcher. Blocks for a short time per download."""
+
+    def __init__(self, latency: float = 0.05) -> None:
+        self.latency = latency
+        self.threads: Set[int] = set()
+
+    def download_datum(self, coordinate, columns=None, dir_path=None, start=None, end=None, ignore_missing_columns=False):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.latency)
+        return WeatherDatum(longitude=coordinate.lon, latitude=coordinate.lat,
+                            api_response_longitude=coordinate.lon, api_response_latitude=coordinate.lat,
+                            elevation=0.0, utc_offset_seconds=0.0, timezone="GMT",
+                            hourly_units={}, hourly_parameters=pd.DataFrame({"temperature_2m": [1.0]}))
+
+
+@pytest.fixture
+def coordinates() -> List[Coordinate]:
+    return [Coordinate(lon=-120.8, lat=44.2), Coordinate(lon=-121.8, lat=44.3)]
+
+
+def test_fetch_current_does_not_block_event_loop(coordinates):
+    dispatcher = FakeDispatcher()
+    weather_provider = AsyncAWSWeatherProvider(coordinates, aws_dispatcher=dispatcher, current_timestamp="23-01-31_07-42")  # type: ignore[arg-type]
+    ticks: List[float] = []
+
+    async def tick():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def fetch_while_ticking():
+        datums, _ = await asyncio.gather(weather_provider.fetch_current(), tick())
+        return datums
+
+    datums = asyncio.run(fetch_while_ticking())
+
+    assert [(datum.longitude, datum.latitude) for datum in datums] == [tuple(coordinate) for coordinate in coordinates]
+    # the loop kept running while the downloads were blocking
+    assert ticks[-1] - ticks[0] < 2 * dispatcher.latency * len(coordinates)
+    assert threading.get_ident() not in dispatcher.threads
+
+
+def test_fetch_current_without_timestamp(coordinates):
+    weather_provider = AsyncAWSWeatherProvider(coordinates, aws_dispatcher=FakeDispatcher())  # type: ignore[arg-type]
+    with pytest.raises(ValueError):
+        asyncio.run(weather_provider.fetch_current())
@@ -1,10 +1,16 @@
+import threading
+import time
 from typing import List
 
+from fsspec.implementations.local import LocalFileSystem
+import numpy as np
+import pandas as pd
 import pytest
 
 from rlf.aws_dispatcher import AWSDispatcher
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
 from rlf.forecasting.data_fetching_utilities.weather_provider.aws_weather_provider import AWSWeatherProvider
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import WeatherDatum
 
 # It is expected that datums will be stored for this timestamp in the bucket specified for the coordinates specified.
 CURRENT_TESTING_TIMESTAMP = "23-01-31_07-42"
@@ -26,6 +32,132 @@ def weather_provider(aws_dispatcher, coordinates) -> AWSWeatherProvider:
         coordinates=coordinates, aws_dispatcher=aws_dispatcher)
 
 
+class FakeDispatcher:
+    """Stands in for AWSDispatcher. Records how many downloads are in flight at once."""
+
+    def __init__(self, latency: float = 0.01) -> None:
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def download_datum(self, coordinate, columns=None, dir_path=None, start=None, end=None, ignore_missing_columns=False):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        return WeatherDatum(longitude=coordinate.lon, latitude=coordinate.lat,
+                            api_response_longitude=coordinate.lon, api_response_latitude=coordinate.lat,
+                            elevation=0.0, utc_offset_seconds=0.0, timezone="GMT",
+                            hourly_units={}, hourly_parameters=None)
+
+
+@pytest.fixture
+def many_coordinates() -> List[Coordinate]:
+    return [Coordinate(lon=-120.0 - i * 0.1, lat=44.0 + i * 0.1) for i in range(12)]
+
+
+def test_download_datums_serial_by_default(many_coordinates):
+    dispatcher = FakeDispatcher()
+    weather_provider = AWSWeatherProvider(coordinates=many_coordinates, aws_dispatcher=dispatcher)
+    datums = weather_provider.download_datums_from_aws(dir_path="historical")
+    assert dispatcher.max_in_flight == 1
+    assert [(datum.longitude, datum.latitude) for datum in datums] == [tuple(coordinate) for coordinate in many_coordinates]
+
+
+def test_download_datums_concurrent_preserves_order(many_coordinates):
+    dispatcher = FakeDispatcher()
+    weather_provider = AWSWeatherProvider(coordinates=many_coordinates, aws_dispatcher=dispatcher, max_concurrent_downloads=4)
+    datums = weather_provider.download_datums_from_aws(dir_path="historical")
+    assert 1 < dispatcher.max_in_flight <= 4
+    assert [(datum.longitude, datum.latitude) for datum in datums] == [tuple(coordinate) for coordinate in many_coordinates]
+
+
+def test_download_datums_concurrent_raises_missing_datum(many_coordinates):
+    class MissingDispatcher(FakeDispatcher):
+        def download_datum(self, coordinate, columns=None, dir_path=None, start=None, end=None, ignore_missing_columns=False):
+            if coordinate == many_coordinates[5]:
+                raise FileNotFoundError("missing")
+            return super().download_datum(coordinate, columns=columns, dir_path=dir_path)
+
+    weather_provider = AWSWeatherProvider(coordinates=many_coordinates, aws_dispatcher=MissingDispatcher(), max_concurrent_downloads=4)
+    with pytest.raises(FileNotFoundError):
+        weather_provider.download_datums_from_aws(dir_path="historical")
+
+
+def test_invalid_max_concurrent_downloads(coordinates):
+    with pytest.raises(ValueError):
+        AWSWeatherProvider(coordinates=coordinates, aws_dispatcher=FakeDispatcher(), max_concurrent_downloads=0)
+
+
+@pytest.fixture
+def local_dispatcher(tmp_path) -> AWSDispatcher:
+    dispatcher = AWSDispatcher("fake-bucket", "fake-directory")
+    dispatcher.s3 = LocalFileSystem(auto_mkdir=True)
+    dispatcher.working_dir = str(tmp_path)
+    return dispatcher
+
+
+def stored_datum(coordinate: Coordinate, num_samples: int) -> WeatherDatum:
+    index = pd.date_range("2021-06-01", periods=num_samples, freq="H", tz="UTC", name="time")
+    hourly_parameters = pd.DataFrame({"temperature_2m": np.arange(num_samples, dtype=float),
+                                      "soil_moisture_0_to_7cm": np.arange(num_samples, dtype=float)}, index=index)
+    return WeatherDatum(longitude=coordinate.lon, latitude=coordinate.lat,
+                        api_response_longitude=coordinate.lon, api_response_latitude=coordinate.lat,
+                        elevation=0.0, utc_offset_seconds=0.0, timezone="GMT",
+                        hourly_units={"temperature_2m": "°C", "soil_moisture_0_to_7cm": "m³/m³"},
+                        hourly_parameters=hourly_parameters)
+
+
+def test_fetch_historical_from_store(local_dispatcher, coordinates):
+    for coordinate in coordinates:
+        local_dispatcher.upload_datum_to_store(stored_datum(coordinate, num_samples=24 * 365))
+
+    weather_provider = AWSWeatherProvider(coordinates=coordinates, aws_dispatcher=local_dispatcher, use_historical_store=True)
+    weather_datums = weather_provider.fetch_historical(columns=["soil_moisture_level_1"], start_date="2022-01-01", end_date="2022-01-31")
+
+    assert [(datum.longitude, datum.latitude) for datum in weather_datums] == [tuple(coordinate) for coordinate in coordinates]
+    for weather_datum in weather_datums:
+        assert list(weather_datum.hourly_parameters.columns) == ["soil_moisture_level_1"]
+        assert weather_datum.hourly_parameters.index[0] == pd.Timestamp("2022-01-01", tz="UTC")
+        assert weather_datum.hourly_parameters.index[-1] == pd.Timestamp("2022-01-31", tz="UTC")
+
+
+class RecordingDispatcher(FakeDispatcher):
+    """Records the columns requested from AWS."""
+
+    def __init__(self) -> None:
+        super().__init__(latency=0.0)
+        self.requested_columns: List[tuple] = []
+
+    def download_datum(self, coordinate, columns=None, dir_path=None, start=None, end=None, ignore_missing_columns=False):
+        self.requested_columns.append((columns, ignore_missing_columns))
+        return stored_datum(coordinate, num_samples=48)
+
+
+def test_fetch_historical_projects_remapped_columns(coordinates):
+    dispatcher = RecordingDispatcher()
+    weather_provider = AWSWeatherProvider(coordinates=coordinates, aws_dispatcher=dispatcher)
+    weather_datums = weather_provider.fetch_historical(columns=["soil_moisture_level_1"], start_date="2021-06-01", end_date="2021-06-02")
+
+    assert dispatcher.requested_columns == [(["soil_moisture_level_1", "soil_moisture_0_to_7cm"], True)] * len(coordinates)
+    for weather_datum in weather_datums:
+        assert list(weather_datum.hourly_parameters.columns) == ["soil_moisture_level_1"]
+
+
+def test_fetch_historical_reads_only_requested_columns(local_dispatcher, coordinates):
+    for coordinate in coordinates:
+        local_dispatcher.upload_datum(stored_datum(coordinate, num_samples=48), "historical", packed=True)
+
+    weather_provider = AWSWeatherProvider(coordinates=coordinates, aws_dispatcher=local_dispatcher)
+    weather_datums = weather_provider.fetch_historical(columns=["soil_moisture_level_1"])
+
+    for weather_datum in weather_datums:
+        assert list(weather_datum.hourly_parameters.columns) == ["soil_moisture_level_1"]
+
+
 @pytest.mark.aws
 @pytest.mark.slow
 def test_fetch_historical(weather_provider):
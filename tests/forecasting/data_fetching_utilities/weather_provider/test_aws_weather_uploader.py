@@ -1,15 +1,22 @@
 from datetime import datetime, timedelta
+import threading
+import time
 from typing import List
 
+from fsspec.implementations.local import LocalFileSystem
+import numpy as np
 import pandas as pd
 import pytest
 import pytz
 
 from rlf.aws_dispatcher import AWSDispatcher
+from rlf.current_manifest import CurrentManifest
 from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
 from rlf.forecasting.data_fetching_utilities.weather_provider.aws_weather_provider import AWSWeatherProvider
 from rlf.forecasting.data_fetching_utilities.weather_provider.api_weather_provider import APIWeatherProvider
-from rlf.forecasting.data_fetching_utilities.weather_provider.aws_weather_uploader import AWSWeatherUploader
+from rlf.forecasting.data_fetching_utilities.weather_provider.base_weather_provider import BaseWeatherProvider
+from rlf.forecasting.data_fetching_utilities.weather_provider.aws_weather_uploader import AWSWeatherUploader, BackfillCheckpoint
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import WeatherDatum
 
 DEFAULT_START_DATE = "2020-01-01"
 END_DATE = "2020-02-01"
@@ -42,6 +49,246 @@ def weather_provider(coordinates, aws_dispatcher) -> AWSWeatherProvider:
     return weather_provider
 
 
+class ConcurrencyRecorder:
+    """Records how many calls are in flight at once, and when each call started and ended."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.intervals: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def run(self) -> None:
+        start = time.monotonic()
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+            self.intervals.append((start, time.monotonic()))
+
+
+class FakeCurrentProvider(ConcurrencyRecorder):
+    def __init__(self, coordinates: List[Coordinate], latency: float = 0.02, failing_coordinate=None, max_batch_size: int = 1) -> None:
+        super().__init__(latency)
+        self.coordinates = coordinates
+        self.failing_coordinate = failing_coordinate
+        self.max_current_batch_size = max_batch_size
+        self.batches: List[List[Coordinate]] = []
+
+    def fetch_current_datums(self, coordinates, columns=None):
+        self.run()
+        with self._lock:
+            self.batches.append(list(coordinates))
+        if self.failing_coordinate in coordinates:
+            raise ValueError("fetch failed")
+        return [WeatherDatum(longitude=coordinate.lon, latitude=coordinate.lat,
+                             api_response_longitude=coordinate.lon, api_response_latitude=coordinate.lat,
+                             elevation=0.0, utc_offset_seconds=0.0, timezone="GMT",
+                             hourly_units={}, hourly_parameters=None) for coordinate in coordinates]
+
+
+class FakeUploadDispatcher(ConcurrencyRecorder):
+    def __init__(self, latency: float = 0.02) -> None:
+        super().__init__(latency)
+        self.uploaded: List[tuple] = []
+        self.manifest = CurrentManifest()
+
+    def upload_datum(self, datum, dir_path=None):
+        self.run()
+        with self._lock:
+            self.uploaded.append(((datum.longitude, datum.latitude), dir_path))
+
+    def record_current_timestamp(self, timestamp, coordinates, uploaded_coordinates):
+        self.manifest.add_timestamp(timestamp, coordinates, uploaded_coordinates)
+
+
+@pytest.fixture
+def many_coordinates() -> List[Coordinate]:
+    return [Coordinate(lon=-120.0 - i * 0.1, lat=44.0 + i * 0.1) for i in range(12)]
+
+
+def test_upload_current_pipelined(many_coordinates):
+    provider = FakeCurrentProvider(many_coordinates)
+    dispatcher = FakeUploadDispatcher()
+    uploader = AWSWeatherUploader(weather_provider=provider, aws_dispatcher=dispatcher)
+
+    stats = uploader.upload_current(dir_path="23-01-31_07-42", max_concurrent_fetches=3, max_concurrent_uploads=2, queue_size=2)
+
+    assert sorted(dispatcher.uploaded) == sorted(((c.lon, c.lat), "current/23-01-31_07-42") for c in many_coordinates)
+    assert 1 < provider.max_in_flight <= 3
+    assert 1 < dispatcher.max_in_flight <= 2
+    # uploading starts before fetching is done
+    assert min(start for start, _ in dispatcher.intervals) < max(end for _, end in provider.intervals)
+    assert stats.fetch.items == stats.upload.items == len(many_coordinates)
+    assert stats.fetch.throughput > 0 and stats.upload.throughput > 0
+    assert dispatcher.manifest.timestamps() == ["23-01-31_07-42"]
+
+
+def test_upload_current_batched(many_coordinates):
+    provider = FakeCurrentProvider(many_coordinates, max_batch_size=5)
+    dispatcher = FakeUploadDispatcher()
+    uploader = AWSWeatherUploader(weather_provider=provider, aws_dispatcher=dispatcher)
+
+    stats = uploader.upload_current(dir_path="23-01-31_07-42", max_concurrent_fetches=2, max_concurrent_uploads=2)
+
+    assert sorted(len(batch) for batch in provider.batches) == [2, 5, 5]
+    assert sorted(dispatcher.uploaded) == sorted(((c.lon, c.lat), "current/23-01-31_07-42") for c in many_coordinates)
+    assert stats.fetch.items == stats.upload.items == len(many_coordinates)
+    assert dispatcher.manifest.is_complete("23-01-31_07-42", many_coordinates)
+
+
+def test_upload_current_raises_fetch_failure(many_coordinates):
+    provider = FakeCurrentProvider(many_coordinates, failing_coordinate=many_coordinates[3])
+    dispatcher = FakeUploadDispatcher()
+    uploader = AWSWeatherUploader(weather_provider=provider, aws_dispatcher=dispatcher)
+    with pytest.raises(ValueError):
+        uploader.upload_current(dir_path="23-01-31_07-42", max_concurrent_fetches=2, max_concurrent_uploads=2)
+
+    # the failed upload is recorded as incomplete
+    assert dispatcher.manifest.timestamps(complete_only=False) == ["23-01-31_07-42"]
+    assert not dispatcher.manifest.is_complete("23-01-31_07-42")
+    assert not dispatcher.manifest.is_complete("23-01-31_07-42", [many_coordinates[3]])
+
+
+class FetchAllProvider(BaseWeatherProvider):
+    """Only fetches all of its coordinates at once, like most providers. Records the coordinates of every fetch."""
+
+    def __init__(self, coordinates: List[Coordinate], fetches: List[List[Coordinate]]) -> None:
+        super().__init__(coordinates)
+        self.fetches = fetches
+
+    def _datums(self, index: pd.DatetimeIndex) -> List[WeatherDatum]:
+        self.fetches.append(list(self.coordinates))
+        return [WeatherDatum(longitude=coordinate.lon, latitude=coordinate.lat,
+                             api_response_longitude=coordinate.lon, api_response_latitude=coordinate.lat,
+                             elevation=0.0, utc_offset_seconds=0.0, timezone="GMT", hourly_units={"temperature_2m": "°C"},
+                             hourly_parameters=pd.DataFrame({"temperature_2m": np.arange(len(index), dtype=float)}, index=index))
+                for coordinate in self.coordinates]
+
+    def fetch_historical(self, columns=None, start_date=DEFAULT_START_DATE, end_date=END_DATE, sleep_duration=0.0):
+        return self._datums(pd.date_range(start_date, pd.Timestamp(end_date) + pd.Timedelta(hours=23), freq="H", tz="UTC", name="time"))
+
+    def fetch_current(self, columns=None, sleep_duration=0.0):
+        return self._datums(pd.date_range("2023-01-31", periods=3, freq="H", tz="UTC", name="time"))
+
+
+def test_upload_current_from_provider_without_batches(many_coordinates):
+    fetches: List[List[Coordinate]] = []
+    dispatcher = FakeUploadDispatcher(latency=0.0)
+    uploader = AWSWeatherUploader(weather_provider=FetchAllProvider(many_coordinates, fetches), aws_dispatcher=dispatcher)
+
+    uploader.upload_current(dir_path="23-01-31_07-42", max_concurrent_fetches=2)
+
+    # each batch is fetched by a provider for just its coordinates
+    assert sorted(fetches) == sorted([coordinate] for coordinate in many_coordinates)
+    assert dispatcher.manifest.is_complete("23-01-31_07-42", many_coordinates)
+
+
+def test_upload_current_invalid_concurrency(many_coordinates):
+    uploader = AWSWeatherUploader(weather_provider=FakeCurrentProvider(many_coordinates), aws_dispatcher=FakeUploadDispatcher())
+    with pytest.raises(ValueError):
+        uploader.upload_current(max_concurrent_uploads=0)
+
+
+class FakeHistoricalProvider:
+    def __init__(self, coordinates: List[Coordinate], failing_chunk_start=None, published_until=None) -> None:
+        self.coordinates = coordinates
+        self.failing_chunk_start = failing_chunk_start
+        self.published_until = published_until
+        self.queries: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def historical_request_weight(self, num_coordinates, start_date, end_date, columns=None):
+        return float(num_coordinates)
+
+    def fetch_historical_datum(self, coordinate, start_date, end_date, columns=None):
+        with self._lock:
+            self.queries.append((coordinate, start_date, end_date))
+        if start_date == self.failing_chunk_start:
+            raise ValueError("fetch failed")
+        index = pd.date_range(start_date, pd.Timestamp(end_date) + pd.Timedelta(hours=23), freq="H", tz="UTC", name="time")
+        hourly_parameters = pd.DataFrame({"temperature_2m": np.arange(len(index), dtype=float)}, index=index)
+        if self.published_until is not None:
+            hourly_parameters[hourly_parameters.index > self.published_until] = np.nan
+        return WeatherDatum(longitude=coordinate.lon, latitude=coordinate.lat,
+                            api_response_longitude=coordinate.lon, api_response_latitude=coordinate.lat,
+                            elevation=0.0, utc_offset_seconds=0.0, timezone="GMT",
+                            hourly_units={"temperature_2m": "°C"}, hourly_parameters=hourly_parameters)
+
+
+@pytest.fixture
+def local_dispatcher(tmp_path) -> AWSDispatcher:
+    dispatcher = AWSDispatcher("fake-bucket", "fake-directory")
+    dispatcher.s3 = LocalFileSystem(auto_mkdir=True)
+    dispatcher.working_dir = str(tmp_path)
+    return dispatcher
+
+
+def test_historical_chunks():
+    assert AWSWeatherUploader._historical_chunks("2020-03-01", "2023-06-30", years_per_query=2) == [
+        ("2020-03-01", "2022-02-28"), ("2022-03-01", "2023-06-30")]
+    assert AWSWeatherUploader._historical_chunks("2020-01-01", "2020-01-01", years_per_query=1) == [("2020-01-01", "2020-01-01")]
+
+
+def test_backfill_historical(local_dispatcher, coordinates):
+    provider = FakeHistoricalProvider(coordinates)
+    uploader = AWSWeatherUploader(weather_provider=provider, aws_dispatcher=local_dispatcher)
+
+    stats = uploader.backfill_historical(start_date="2020-03-01", end_date="2023-06-30", years_per_query=1, max_concurrent_chunks=3, requests_per_second=1000)
+
+    assert stats.fetch.items == stats.upload.items == len(coordinates) * 4
+    expected_index = pd.date_range("2020-03-01", "2023-06-30 23:00", freq="H", tz="UTC")
+    for datum in local_dispatcher.download_datums_from_store(coordinates):
+        assert datum.hourly_parameters.index.equals(expected_index)
+
+
+def test_backfill_historical_resumes(local_dispatcher, coordinates, tmp_path):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    failing_provider = FakeHistoricalProvider(coordinates, failing_chunk_start="2021-01-01")
+    with pytest.raises(ValueError):
+        AWSWeatherUploader(weather_provider=failing_provider, aws_dispatcher=local_dispatcher).backfill_historical(
+            start_date="2020-01-01", end_date="2022-12-31", years_per_query=1, checkpoint=BackfillCheckpoint(checkpoint_path))
+
+    provider = FakeHistoricalProvider(coordinates)
+    AWSWeatherUploader(weather_provider=provider, aws_dispatcher=local_dispatcher).backfill_historical(
+        start_date="2020-01-01", end_date="2022-12-31", years_per_query=1, checkpoint=BackfillCheckpoint(checkpoint_path))
+
+    # the failure stopped the serial backfill at the first coordinate's second chunk, everything before it is not refetched
+    assert (coordinates[0], "2020-01-01", "2020-12-31") not in provider.queries
+    assert len(provider.queries) == len(coordinates) * 3 - 1
+    expected_index = pd.date_range("2020-01-01", "2022-12-31 23:00", freq="H", tz="UTC")
+    for datum in local_dispatcher.download_datums_from_store(coordinates):
+        assert datum.hourly_parameters.index.equals(expected_index)
+
+
+def test_append_historical(local_dispatcher, coordinates):
+    AWSWeatherUploader(weather_provider=FakeHistoricalProvider(coordinates), aws_dispatcher=local_dispatcher).backfill_historical(
+        start_date="2020-01-01", end_date="2021-06-30")
+
+    # the archive has only published part of the last day
+    provider = FakeHistoricalProvider(coordinates, published_until=pd.Timestamp("2021-12-30 11:00", tz="UTC"))
+    AWSWeatherUploader(weather_provider=provider, aws_dispatcher=local_dispatcher).append_historical(end_date="2021-12-31")
+    assert sorted(provider.queries) == sorted((coordinate, "2021-06-30", "2021-12-31") for coordinate in coordinates)
+
+    provider = FakeHistoricalProvider(coordinates)
+    AWSWeatherUploader(weather_provider=provider, aws_dispatcher=local_dispatcher).append_historical(end_date="2022-01-10")
+    assert sorted(provider.queries) == sorted((coordinate, "2021-12-30", "2022-01-10") for coordinate in coordinates)
+
+    expected_index = pd.date_range("2020-01-01", "2022-01-10 23:00", freq="H", tz="UTC")
+    for datum in local_dispatcher.download_datums_from_store(coordinates):
+        assert datum.hourly_parameters.index.equals(expected_index)
+        assert datum.hourly_parameters["temperature_2m"].notna().all()
+
+
+def test_upload_historical_incremental_requires_store(local_dispatcher, coordinates):
+    uploader = AWSWeatherUploader(weather_provider=FakeHistoricalProvider(coordinates), aws_dispatcher=local_dispatcher)
+    with pytest.raises(ValueError):
+        uploader.upload_historical(incremental=True)
+
+
 @pytest.mark.aws
 @pytest.mark.slow
 def test_upload_historical(aws_weather_uploader, weather_provider):
@@ -93,3 +340,16 @@ def test_upload_current(aws_weather_uploader, weather_provider):
         assert (expected_end_date.year == actual_end_date.year)
         assert (expected_end_date.month == actual_end_date.month)
         assert (expected_end_date.day == actual_end_date.day)
+
+
+def test_backfill_historical_from_provider_without_single_coordinate_fetches(local_dispatcher, coordinates):
+    fetches: List[List[Coordinate]] = []
+    uploader = AWSWeatherUploader(weather_provider=FetchAllProvider(coordinates, fetches), aws_dispatcher=local_dispatcher)
+
+    uploader.backfill_historical(start_date="2020-03-01", end_date="2021-06-30", years_per_query=1)
+
+    # each chunk is fetched by a provider for just its coordinate
+    assert sorted(fetches) == sorted([coordinate] for coordinate in coordinates for _ in range(2))
+    expected_index = pd.date_range("2020-03-01", "2021-06-30 23:00", freq="H", tz="UTC")
+    for datum in local_dispatcher.download_datums_from_store(coordinates):
+        assert datum.hourly_parameters.index.equals(expected_index)
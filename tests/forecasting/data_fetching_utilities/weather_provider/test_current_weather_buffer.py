@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.current_weather_buffer import CurrentWeatherBuffer
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import WeatherDatum
+
+
+NOW = datetime(2023, 1, 31, 7, 42, tzinfo=timezone.utc)
+
+
+def make_datum(start: str, end: str, value: float) -> WeatherDatum:
+    index = pd.date_range(start, end, freq="H", tz="UTC", inclusive="left", name="time")
+    hourly_parameters = pd.DataFrame({"temperature_2m": np.full(len(index), value, dtype=np.float32)}, index=index)
+    return WeatherDatum(longitude=-120.0, latitude=44.0, api_response_longitude=-120.0, api_response_latitude=44.0,
+                        elevation=100.0, utc_offset_seconds=0, timezone="GMT",
+                        hourly_units={"temperature_2m": "°C"}, hourly_parameters=hourly_parameters)
+
+
+@pytest.fixture
+def buffer(tmp_path) -> CurrentWeatherBuffer:
+    return CurrentWeatherBuffer(str(tmp_path), past_days=5, delta_past_days=2)
+
+
+def test_save_load_roundtrip(buffer):
+    datum = make_datum("2023-01-26", "2023-02-03", 1.0)
+    buffer.save(datum, NOW, columns=["temperature_2m"])
+
+    loaded = buffer.load(Coordinate(-120.0, 44.0), columns=["temperature_2m"])
+
+    assert loaded is not None
+    loaded_datum, fetched_at = loaded
+    assert fetched_at == NOW
+    pd.testing.assert_frame_equal(loaded_datum.hourly_parameters, datum.hourly_parameters, check_freq=False)
+    assert buffer.load(Coordinate(-120.0, 44.0)) is None
+    assert buffer.load(Coordinate(-121.0, 44.0), columns=["temperature_2m"]) is None
+
+
+def test_is_stale(buffer):
+    assert not buffer.is_stale(datetime(2023, 1, 30, 7, 42, tzinfo=timezone.utc), NOW)
+    assert buffer.is_stale(datetime(2023, 1, 29, 7, 0, tzinfo=timezone.utc), NOW)
+
+
+def test_merge_replaces_covered_hours_and_drops_old(buffer):
+    buffered = make_datum("2023-01-20", "2023-02-03", 1.0)
+    delta = make_datum("2023-01-29", "2023-02-04", 2.0)
+
+    merged = buffer.merge(buffered, delta, NOW).hourly_parameters
+
+    assert merged.index.min() == pd.Timestamp("2023-01-26", tz="UTC")
+    assert merged.index.max() == pd.Timestamp("2023-02-03T23:00", tz="UTC")
+    assert merged.index.is_unique and merged.index.is_monotonic_increasing
+    assert (merged.loc[:"2023-01-28T23:00", "temperature_2m"] == 1.0).all()
+    assert (merged.loc["2023-01-29":, "temperature_2m"] == 2.0).all()
+    assert merged["temperature_2m"].dtype == np.float32
+
+
+def test_invalid_delta_past_days(tmp_path):
+    with pytest.raises(ValueError):
+        CurrentWeatherBuffer(str(tmp_path), past_days=5, delta_past_days=6)
+
+
+def test_api_cell(buffer):
+    buffer.save(make_datum("2023-01-26", "2023-02-03", 1.0), NOW, columns=["temperature_2m"])
+
+    assert buffer.api_cell(Coordinate(-120.0, 44.0), columns=["temperature_2m"]) == (-120.0, 44.0, 100.0)
+    assert buffer.api_cell(Coordinate(-121.0, 44.0), columns=["temperature_2m"]) is None
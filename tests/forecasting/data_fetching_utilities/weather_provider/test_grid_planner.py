@@ -0,0 +1,137 @@
+from typing import List, Optional
+
+import pandas as pd
+import pytest
+
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.base_weather_provider import BaseWeatherProvider
+from rlf.forecasting.data_fetching_utilities.weather_provider.grid_planner import GridPlanner
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import WeatherDatum
+
+
+def api_cell_of(coordinate: Coordinate, resolution: float = 0.03) -> Coordinate:
+    # a fine, HRRR like grid: much finer than the 0.25 degree GFS grid
+    return Coordinate(lon=round(round(coordinate.lon / resolution) * resolution, 6), lat=round(round(coordinate.lat / resolution) * resolution, 6))
+
+
+class RecordingWeatherProvider(BaseWeatherProvider):
+    """Answers each coordinate with the data of its API cell and records the coordinates of every fetch."""
+
+    def __init__(self, coordinates: List[Coordinate], fetches: List[List[Coordinate]]) -> None:
+        super().__init__(coordinates)
+        self.fetches = fetches
+
+    def _datums(self, columns: Optional[List[str]]) -> List[WeatherDatum]:
+        self.fetches.append(list(self.coordinates))
+        index = pd.date_range("2023-01-01", periods=3, freq="H", tz="UTC", name="time")
+        datums = []
+        for coordinate in self.coordinates:
+            cell = api_cell_of(coordinate)
+            datums.append(WeatherDatum(longitude=coordinate.lon, latitude=coordinate.lat,
+                                       api_response_longitude=cell.lon, api_response_latitude=cell.lat,
+                                       elevation=0.0, utc_offset_seconds=0.0, timezone="GMT", hourly_units={},
+                                       hourly_parameters=pd.DataFrame({column: [cell.lon] * 3 for column in columns or ["temperature_2m"]}, index=index)))
+        return datums
+
+    def fetch_historical(self, columns=None, start_date="2022-01-01", end_date="2022-01-02", sleep_duration=0.0):
+        return self._datums(columns)
+
+    def fetch_current(self, columns=None, sleep_duration=0.0):
+        return self._datums(columns)
+
+
+@pytest.fixture
+def fetches() -> List[List[Coordinate]]:
+    return []
+
+
+@pytest.fixture
+def planner(fetches) -> GridPlanner:
+    return GridPlanner(lambda coordinates: RecordingWeatherProvider(coordinates, fetches))
+
+
+def test_never_merges_distinct_api_cells(planner, fetches):
+    # all within a single 0.25 degree GFS cell, but answered with distinct cells by the API
+    coordinates = [Coordinate(lon=-120.0 - i * 0.04, lat=44.0) for i in range(5)]
+
+    datums = planner.provider(coordinates).fetch_current(columns=["temperature_2m"])
+    # the cells are known once fetched, so a fetch with other dates requests each cell once, yet still never merges them
+    planner.fetch_historical(coordinates, start_date="2022-01-01", end_date="2022-01-02")
+    historical = planner.fetch_historical(coordinates, start_date="2022-01-03", end_date="2022-01-04")
+
+    assert fetches == [coordinates] * 3
+    for datum, coordinate in zip(datums + historical, coordinates * 2):
+        assert (datum.longitude, datum.latitude) == tuple(coordinate)
+        assert (datum.api_response_longitude, datum.api_response_latitude) == tuple(api_cell_of(coordinate))
+        assert (datum.hourly_parameters["temperature_2m"] == api_cell_of(coordinate).lon).all()
+
+
+def test_fetches_each_api_cell_once_across_catchments(planner, fetches):
+    catchment_a = [Coordinate(lon=-120.0 - i * 0.01, lat=44.0) for i in range(4)]
+    catchment_b = [Coordinate(lon=-120.02 - i * 0.01, lat=44.0) for i in range(4)]
+    provider_a = planner.provider(catchment_a)
+    provider_b = planner.provider(catchment_b)
+
+    provider_a.fetch_historical(columns=["temperature_2m"], start_date="2022-01-01", end_date="2022-01-02")
+    datums_a = provider_a.fetch_historical(columns=["temperature_2m"], start_date="2022-01-03", end_date="2022-01-04")
+    datums_b = provider_b.fetch_historical(columns=["temperature_2m"], start_date="2022-01-03", end_date="2022-01-04")
+
+    # the first fetch learns the cells of the 6 unique coordinates, the second only requests one per cell
+    assert fetches[0] == planner.coordinates
+    assert len(fetches) == 2
+    assert len(fetches[1]) == len({api_cell_of(coordinate) for coordinate in planner.coordinates}) == 3
+    assert [(datum.longitude, datum.latitude) for datum in datums_a] == [tuple(coordinate) for coordinate in catchment_a]
+    assert [(datum.longitude, datum.latitude) for datum in datums_b] == [tuple(coordinate) for coordinate in catchment_b]
+    # coordinates answered with the same cell share its data
+    assert datums_a[2].hourly_parameters.equals(datums_b[0].hourly_parameters)
+
+
+def test_uses_cells_of_earlier_runs(fetches):
+    coordinates = [Coordinate(lon=-120.0 - i * 0.01, lat=44.0) for i in range(6)]
+    earlier = {coordinate: (api_cell_of(coordinate).lon, api_cell_of(coordinate).lat, 0.0) for coordinate in coordinates}
+    planner = GridPlanner(lambda cells: RecordingWeatherProvider(cells, fetches), cell_lookup=lambda coordinate, columns: earlier.get(coordinate))
+
+    datums = planner.provider(coordinates).fetch_current()
+
+    assert len(fetches) == 1
+    assert len(fetches[0]) == len(set(earlier.values()))
+    assert [datum.api_response_longitude for datum in datums] == [api_cell_of(coordinate).lon for coordinate in coordinates]
+
+
+def test_refetches_coordinates_with_outdated_cells(fetches):
+    coordinates = [Coordinate(lon=-120.0, lat=44.0), Coordinate(lon=-120.1, lat=44.0)]
+    # an earlier run reported both in one cell, which the API no longer answers with
+    planner = GridPlanner(lambda cells: RecordingWeatherProvider(cells, fetches), cell_lookup=lambda coordinate, columns: (-120.05, 44.0, 0.0))
+
+    datums = planner.provider(coordinates).fetch_current()
+
+    assert fetches == [[coordinates[0]], [coordinates[1]]]
+    assert [datum.api_response_longitude for datum in datums] == [api_cell_of(coordinate).lon for coordinate in coordinates]
+
+
+def test_fanned_out_datums_are_independent(planner):
+    coordinates = [Coordinate(lon=-120.0, lat=44.0), Coordinate(lon=-120.005, lat=44.0)]
+    planner.provider(coordinates).fetch_current()
+    first, second = planner.provider(coordinates).fetch_historical()
+
+    first.hourly_parameters.columns = ["renamed"]
+
+    assert list(second.hourly_parameters.columns) == ["temperature_2m"]
+
+
+def test_refetches_for_other_arguments(planner, fetches):
+    provider = planner.provider([Coordinate(lon=-120.0, lat=44.0)])
+
+    provider.fetch_current(columns=["temperature_2m"])
+    provider.fetch_current(columns=["temperature_2m"])
+    provider.fetch_current(columns=["precipitation"])
+    provider.fetch_historical(columns=["temperature_2m"], start_date="2022-01-01", end_date="2022-01-02")
+
+    assert len(fetches) == 3
+
+
+def test_fetches_coordinates_registered_late(planner, fetches):
+    planner.provider([Coordinate(lon=-120.0, lat=44.0)]).fetch_current()
+    planner.provider([Coordinate(lon=-121.0, lat=44.0)]).fetch_current()
+
+    assert fetches == [[Coordinate(lon=-120.0, lat=44.0)], [Coordinate(lon=-121.0, lat=44.0)]]
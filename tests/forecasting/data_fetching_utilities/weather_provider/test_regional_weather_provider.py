@@ -0,0 +1,126 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.location_generator import LocationGenerator
+from rlf.forecasting.data_fetching_utilities.weather_provider.api.models import Response
+from rlf.forecasting.data_fetching_utilities.weather_provider.grid.grid_slab import BoundingBox, GridSlab
+from rlf.forecasting.data_fetching_utilities.weather_provider.grid.grid_source import LocalGridSource, OpenMeteoGridSource
+from rlf.forecasting.data_fetching_utilities.weather_provider.grid.grid_store import GridStore, write_slab
+from rlf.forecasting.data_fetching_utilities.weather_provider.regional_weather_provider import RegionalWeatherProvider
+
+
+@pytest.fixture
+def grid_source(tmp_path) -> LocalGridSource:
+    # a 0.25 degree fixture slab covering more than the region queried, standing in for the remote grid source
+    lons = np.arange(-122.0, -118.75, 0.25)
+    lats = np.arange(43.0, 46.25, 0.25)
+    times = pd.date_range("2023-01-01", "2023-01-31 23:00", freq="H", tz="UTC")
+    shape = (len(times), len(lats), len(lons))
+    temperature = np.broadcast_to(lons[np.newaxis, np.newaxis, :], shape).astype(np.float32)
+    soil_moisture = np.broadcast_to(lats[np.newaxis, :, np.newaxis], shape).astype(np.float32)
+    write_slab(GridSlab.from_grid(lons=lons, lats=lats, times=times,
+                                  variables={"temperature_2m": temperature, "soil_moisture_0_to_7cm": soil_moisture},
+                                  units={"temperature_2m": "°C", "soil_moisture_0_to_7cm": "m³/m³"}),
+               str(tmp_path / "fixture"))
+    return LocalGridSource(str(tmp_path / "fixture"))
+
+
+@pytest.fixture
+def coordinates():
+    return LocationGenerator(Coordinate(lon=-121.0, lat=44.0), Coordinate(lon=-120.0, lat=45.0)).coordinates
+
+
+def test_fetch_historical(grid_source, coordinates):
+    provider = RegionalWeatherProvider(coordinates, grid_source)
+
+    datums = provider.fetch_historical(columns=["temperature_2m", "soil_moisture_level_1"], start_date="2023-01-02", end_date="2023-01-03")
+
+    # a single read for the whole 0.1 degree grid
+    assert grid_source.num_reads == 1
+    assert len(datums) == len(coordinates)
+    for datum, coordinate in zip(datums, coordinates):
+        assert (datum.longitude, datum.latitude) == tuple(coordinate)
+        assert abs(datum.api_response_longitude - coordinate.lon) <= 0.125 + 1e-6
+        assert abs(datum.api_response_latitude - coordinate.lat) <= 0.125 + 1e-6
+        # the historical soil moisture layer is remapped to the consistent name
+        assert list(datum.hourly_parameters.columns) == ["temperature_2m", "soil_moisture_level_1"]
+        assert len(datum.hourly_parameters) == 48
+        assert (datum.hourly_parameters["temperature_2m"] == datum.api_response_longitude).all()
+        assert (datum.hourly_parameters["soil_moisture_level_1"] == datum.api_response_latitude).all()
+
+
+def test_fetch_historical_deduplicates_coordinates(grid_source):
+    coordinate = Coordinate(lon=-120.5, lat=44.5)
+
+    datums = RegionalWeatherProvider([coordinate, coordinate], grid_source).fetch_historical(start_date="2023-01-01", end_date="2023-01-01")
+
+    assert len(datums) == 1
+
+
+def test_fetch_current_reuses_store(grid_source, coordinates, tmp_path):
+    store = GridStore(str(tmp_path / "store"))
+
+    first = RegionalWeatherProvider(coordinates, grid_source, store).fetch_current(columns=["temperature_2m"])
+    second = RegionalWeatherProvider(coordinates, grid_source, store).fetch_current(columns=["temperature_2m"])
+
+    assert grid_source.num_reads == 1
+    assert len(first) == len(second) == len(coordinates)
+    assert first[7].hourly_parameters.equals(second[7].hourly_parameters)
+
+
+def test_sleep_duration_not_supported(grid_source, coordinates):
+    with pytest.raises(ValueError):
+        RegionalWeatherProvider(coordinates, grid_source).fetch_current(sleep_duration=1.0)
+
+
+class FakeInvoker:
+    """Records the query and returns the results of a region's cells."""
+
+    def __init__(self, cells) -> None:
+        self.cells = cells
+        self.queries: List[tuple] = []
+
+    def get(self, path, parameters=None):
+        self.queries.append((path, parameters))
+        return Response(status_code=200, url="", message="OK", headers={}, data=[
+            {"longitude": lon, "latitude": lat, "elevation": 100.0, "timezone": "GMT",
+             "hourly_units": {"time": "unixtime", "temperature_2m": "°C"},
+             "hourly": {"time": [1672531200, 1672534800], "temperature_2m": [lon, None]}}
+            for lon, lat in self.cells
+        ])
+
+
+def test_open_meteo_grid_source_queries_bounding_box():
+    source = OpenMeteoGridSource()
+    invoker = FakeInvoker([(lon, lat) for lat in (44.0, 44.25) for lon in (-120.25, -120.0)])
+    source.api_adapter.invoker = lambda hostname: invoker
+
+    slab = source.fetch_current(BoundingBox(lon_min=-120.3, lat_min=43.9, lon_max=-119.9, lat_max=44.3), columns=["temperature_2m"])
+
+    assert len(invoker.queries) == 1
+    assert invoker.queries[0][1]["bounding_box"] == "43.9,-120.3,44.3,-119.9"
+    np.testing.assert_array_equal(slab.lons, [-120.25, -120.0, -120.25, -120.0])
+    np.testing.assert_array_equal(slab.lats, [44.0, 44.0, 44.25, 44.25])
+    assert slab.units == {"temperature_2m": "°C"}
+    np.testing.assert_array_equal(slab.variables["temperature_2m"][0], [-120.25, -120.0, -120.25, -120.0])
+    assert np.isnan(slab.variables["temperature_2m"][1]).all()
+
+
+def test_open_meteo_grid_source_irregular_cells():
+    # a 10x10 region of drifting rows and columns, as Open-Meteo answers where HRRR is blended in over CONUS
+    cells = [(round(-121.0 + 0.03 * column + 0.004 * row, 4), round(44.0 + 0.03 * row + 0.003 * column, 4)) for row in range(10) for column in range(10)]
+    source = OpenMeteoGridSource()
+    source.api_adapter.invoker = lambda hostname: FakeInvoker(cells)
+
+    slab = source.fetch_current(BoundingBox(lon_min=-121.0, lat_min=44.0, lon_max=-120.7, lat_max=44.3), columns=["temperature_2m"])
+
+    assert slab.variables["temperature_2m"].shape == (2, 100)
+    assert not np.isnan(slab.variables["temperature_2m"][0]).any()
+    for lon, lat in cells:
+        datum = slab.datum_at(Coordinate(lon=lon + 0.005, lat=lat - 0.005))
+        assert (datum.api_response_longitude, datum.api_response_latitude) == (lon, lat)
+        assert datum.hourly_parameters["temperature_2m"].iloc[0] == np.float32(lon)
@@ -43,6 +43,23 @@ def weather_df(num_samples):
     return df
 
 
+DATUM_UNITS = {"temperature_2m": "°C", "precipitation": "mm"}
+
+
+def hourly_weather_df(num_samples, columns=tuple(DATUM_UNITS)):
+    index = pd.date_range("2021-01-01", periods=num_samples, freq="H", tz="UTC", name="time")
+    np.random.seed(seed=1)
+    return pd.DataFrame({column: np.random.rand(num_samples) for column in columns}, index=index)
+
+
+def build_datum(lon=-120.8, lat=44.2, num_samples=48, columns=tuple(DATUM_UNITS)):
+    """A datum as fetched from a weather API and stored by an AWSDispatcher: float64 columns with a UTC "time" index."""
+    return WeatherDatum(longitude=lon, latitude=lat, api_response_longitude=lon + 0.01,
+                        api_response_latitude=lat - 0.01, elevation=1000.0, utc_offset_seconds=0,
+                        timezone="GMT", hourly_units={column: DATUM_UNITS.get(column, "unit") for column in columns},
+                        hourly_parameters=hourly_weather_df(num_samples, columns))
+
+
 def weather_datums(num_samples, num_dfs):
     datums = []
     for i in range(num_dfs):
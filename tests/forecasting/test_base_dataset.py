@@ -51,3 +51,37 @@ def test_base_dataset_process_datum_with_leading_nans():
     result_df = dataset._process_datum(datum, pd.Timestamp(datetime(2022, 1, 1, 2)), None).pd_dataframe()
 
     assert list(result_df["1.00_2.00_c"]) == [1.0, 1.0, 2.0, 3.0]
+
+
+def test_base_dataset_process_datum_matches_dataframe_processing():
+    dataset = BaseDataset(FakeCatchmentData(), rolling_sum_columns=["c"], rolling_mean_columns=["d"], rolling_window_sizes=[2, 3])
+    data = {
+        "c": [1.0, float("nan"), 3.0, 4.0, 5.0, 6.0, float("nan")],
+        "d": [float("nan"), 2.0, 4.0, float("nan"), 8.0, 10.0, float("nan")]
+    }
+    df = pd.DataFrame(data, index=[datetime(2022, 1, 1, h) for h in range(1, 8)])
+    datum = WeatherDatum(1.0, 2.0, 1.0, 2.0, 1.0, 0.0, "utc", {"c": "units", "d": "units"}, df.copy())
+
+    result_df = dataset._process_datum(datum, pd.Timestamp(datetime(2022, 1, 1, 3)), None).pd_dataframe()
+
+    expected_df = df.iloc[:-1].interpolate(limit_direction="both")
+    expected_df["day_of_year"] = expected_df.index.day_of_year
+    for window_size in [2, 3]:
+        expected_df[f"c_sum_{window_size}"] = expected_df["c"].rolling(window=window_size).sum()
+        expected_df[f"d_mean_{window_size}"] = expected_df["d"].rolling(window=window_size).mean()
+    expected_df = expected_df.dropna().astype(float)
+    expected_df.columns = ["1.00_2.00_" + c for c in expected_df.columns]
+    expected_df.index.name = "time"
+
+    pd.testing.assert_frame_equal(result_df, expected_df, check_names=False, check_freq=False)
+
+
+def test_base_dataset_process_datum_keeps_float32():
+    dataset = BaseDataset(FakeCatchmentData())
+    df = pd.DataFrame({"c": [1.0, 2.0, 3.0]}, index=[datetime(2022, 1, 1, h) for h in range(1, 4)], dtype="float32")
+    datum = WeatherDatum(1.0, 2.0, 1.0, 2.0, 1.0, 0.0, "utc", {"c": "units"}, df)
+
+    result = dataset._process_datum(datum, pd.Timestamp(datetime(2022, 1, 1, 1)), None)
+
+    assert result.dtype == "float32"
+    assert list(result.pd_dataframe()["1.00_2.00_c"]) == [1.0, 2.0, 3.0]
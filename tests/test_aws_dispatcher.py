@@ -0,0 +1,381 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from rlf.aws_dispatcher import AWSDispatcher, PACKED_DATUM_METADATA_KEY, PARQUET_ENCODING_METADATA_KEY, ParquetEncoding, clear_shared_connections, get_dispatcher, pack_datum, restore_types, unpack_datum
+from rlf.disk_cache import DiskCache
+from rlf.storage_backend import S3ConnectionConfig, StorageBackend, get_s3_filesystem
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.forecasting.data_fetching_utilities.weather_provider.weather_datum import WeatherDatum
+
+from fake_providers import build_datum
+
+
+@pytest.fixture
+def local_dispatcher(tmp_path) -> AWSDispatcher:
+    return AWSDispatcher(backend=StorageBackend.local(str(tmp_path)))
+
+
+@pytest.fixture
+def datum() -> WeatherDatum:
+    return build_datum()
+
+
+def assert_datums_equal(expected: WeatherDatum, actual: WeatherDatum):
+    assert expected.meta_data == actual.meta_data
+    assert expected.hourly_units == actual.hourly_units
+    pd.testing.assert_frame_equal(expected.hourly_parameters, actual.hourly_parameters, check_freq=False)
+
+
+def test_pack_unpack_round_trip(datum):
+    table = pq.read_table(pa.BufferReader(pack_datum(datum)))
+    assert_datums_equal(datum, unpack_datum(table))
+
+
+def test_unpack_rejects_plain_parquet(datum):
+    with pytest.raises(ValueError):
+        unpack_datum(pa.Table.from_pandas(datum.hourly_parameters))
+
+
+def test_unpack_rejects_newer_format(datum):
+    table = pa.Table.from_pandas(datum.hourly_parameters)
+    table = table.replace_schema_metadata({**table.schema.metadata, PACKED_DATUM_METADATA_KEY: b'{"format_version": 999}'})
+    with pytest.raises(ValueError):
+        unpack_datum(table)
+
+
+@pytest.mark.parametrize("packed", [True, False])
+def test_download_datum_does_not_mutate_columns(local_dispatcher, datum, packed):
+    local_dispatcher.upload_datum(datum, "historical", packed=packed)
+    columns = ["precipitation"]
+    downloaded = local_dispatcher.download_datum(Coordinate(lon=-120.8, lat=44.2), columns=columns, dir_path="historical")
+    assert columns == ["precipitation"]
+    assert list(downloaded.hourly_parameters.columns) == ["precipitation"]
+
+
+@pytest.mark.parametrize("packed", [True, False])
+def test_download_datum_ignore_missing_columns(local_dispatcher, datum, packed):
+    local_dispatcher.upload_datum(datum, "historical", packed=packed)
+    coordinate = Coordinate(lon=-120.8, lat=44.2)
+    downloaded = local_dispatcher.download_datum(coordinate, columns=["precipitation", "snowfall"], dir_path="historical", ignore_missing_columns=True)
+    assert list(downloaded.hourly_parameters.columns) == ["precipitation"]
+    assert downloaded.hourly_units == {"precipitation": "mm"}
+
+    with pytest.raises(ValueError):
+        local_dispatcher.download_datum(coordinate, columns=["precipitation", "snowfall"], dir_path="historical")
+
+
+@pytest.mark.parametrize("packed", [True, False])
+def test_download_datum_as_float32(local_dispatcher, datum, packed):
+    local_dispatcher.upload_datum(datum, "historical", packed=packed)
+    local_dispatcher.as_float32 = True
+    downloaded = local_dispatcher.download_datum(Coordinate(lon=-120.8, lat=44.2), dir_path="historical")
+    assert list(downloaded.hourly_parameters.dtypes) == ["float32", "float32"]
+    assert downloaded.hourly_parameters._mgr.nblocks == 1
+    pd.testing.assert_frame_equal(datum.hourly_parameters.astype("float32"), downloaded.hourly_parameters, check_freq=False)
+
+
+def test_migrate_rejects_float32_dispatcher(local_dispatcher):
+    local_dispatcher.as_float32 = True
+    with pytest.raises(ValueError):
+        local_dispatcher.migrate_to_packed("historical")
+
+
+def test_upload_packed_writes_single_object(local_dispatcher, datum, tmp_path):
+    local_dispatcher.upload_datum(datum, "historical", packed=True)
+    assert [p.name for p in (tmp_path / "historical" / "lon_-120.80_lat_44.20").iterdir()] == ["datum.parquet"]
+
+
+@pytest.mark.parametrize("packed", [True, False])
+def test_download_datum(local_dispatcher, datum, packed):
+    local_dispatcher.upload_datum(datum, "historical", packed=packed)
+    downloaded = local_dispatcher.download_datum(Coordinate(lon=-120.8, lat=44.2), dir_path="historical")
+    assert_datums_equal(datum, downloaded)
+
+
+@pytest.mark.parametrize("pack_datums, uploaded_packed, expected_reads", [
+    (False, False, ["legacy"]),
+    (True, True, ["packed"]),
+    # datums not migrated yet are read from the other layout
+    (True, False, ["packed", "legacy"]),
+    (False, True, ["legacy", "packed"]),
+])
+def test_download_datum_reads_uploaded_layout_first(tmp_path, datum, monkeypatch, pack_datums, uploaded_packed, expected_reads):
+    dispatcher = AWSDispatcher(backend=StorageBackend.local(str(tmp_path)), pack_datums=pack_datums)
+    dispatcher.upload_datum(datum, "historical", packed=uploaded_packed)
+    reads = []
+    for layout in ("packed", "legacy"):
+        download = getattr(dispatcher, f"_download_{layout}_datum")
+        monkeypatch.setattr(dispatcher, f"_download_{layout}_datum", lambda *args, layout=layout, download=download, **kwargs: reads.append(layout) or download(*args, **kwargs))
+
+    downloaded = dispatcher.download_datum(Coordinate(lon=-120.8, lat=44.2), dir_path="historical")
+
+    assert reads == expected_reads
+    assert_datums_equal(datum, downloaded)
+
+
+def test_read_packed_first_overrides_upload_layout(tmp_path):
+    assert AWSDispatcher(backend=StorageBackend.local(str(tmp_path)), read_packed_first=True).read_packed_first
+    assert not AWSDispatcher(backend=StorageBackend.local(str(tmp_path)), pack_datums=True, read_packed_first=False).read_packed_first
+
+
+def test_download_packed_datum_columns(local_dispatcher, datum):
+    local_dispatcher.upload_datum(datum, "historical", packed=True)
+    downloaded = local_dispatcher.download_datum(Coordinate(lon=-120.8, lat=44.2), columns=["precipitation"], dir_path="historical")
+    assert list(downloaded.hourly_parameters.columns) == ["precipitation"]
+    assert downloaded.hourly_units == {"precipitation": "mm"}
+    assert downloaded.hourly_parameters.index.name == "time"
+
+
+def test_download_missing_datum(local_dispatcher):
+    with pytest.raises(FileNotFoundError):
+        local_dispatcher.download_datum(Coordinate(lon=-120.8, lat=44.2), dir_path="historical")
+
+
+def test_migrate_to_packed(local_dispatcher, tmp_path):
+    datums = [build_datum(lon=-120.8), build_datum(lon=-121.8)]
+    for datum in datums:
+        local_dispatcher.upload_datum(datum, "historical")
+        local_dispatcher.upload_datum(datum, "current/23-01-31_07-42")
+        local_dispatcher.upload_datum(datum, "current/23-01-31_08-42")
+
+    assert local_dispatcher.migrate_to_packed("historical", remove_legacy=True) == 2
+    assert local_dispatcher.migrate_to_packed("current") == 4
+    assert local_dispatcher.migrate_to_packed("current") == 0
+
+    assert [p.name for p in (tmp_path / "historical" / "lon_-120.80_lat_44.20").iterdir()] == ["datum.parquet"]
+    assert (tmp_path / "current" / "23-01-31_08-42" / "lon_-121.80_lat_44.20" / "datum.parquet").exists()
+    for datum in datums:
+        downloaded = local_dispatcher.download_datum(Coordinate(lon=datum.longitude, lat=datum.latitude), dir_path="historical")
+        assert_datums_equal(datum, downloaded)
+
+
+def test_upload_datum_to_store_partitions_by_year(local_dispatcher, tmp_path):
+    local_dispatcher.upload_datum_to_store(build_datum(num_samples=24 * 400))
+    coordinate_dir = tmp_path / "historical_store" / "coordinate=lon_-120.80_lat_44.20"
+    assert sorted(p.name for p in coordinate_dir.iterdir()) == ["year=2021", "year=2022"]
+
+
+def test_download_datums_from_store(local_dispatcher):
+    datums = [build_datum(lon=-120.8, num_samples=24 * 400), build_datum(lon=-121.8, num_samples=24 * 400)]
+    for datum in datums:
+        local_dispatcher.upload_datum_to_store(datum)
+
+    coordinates = [Coordinate(lon=-121.8, lat=44.2), Coordinate(lon=-120.8, lat=44.2)]
+    downloaded = local_dispatcher.download_datums_from_store(coordinates)
+
+    assert_datums_equal(datums[1], downloaded[0])
+    assert_datums_equal(datums[0], downloaded[1])
+
+
+def test_download_datums_from_store_time_range_and_columns(local_dispatcher):
+    datum = build_datum(num_samples=24 * 400)
+    local_dispatcher.upload_datum_to_store(datum)
+
+    start = pd.Timestamp("2021-12-31 12:00", tz="UTC")
+    end = pd.Timestamp("2022-01-01 12:00", tz="UTC")
+    downloaded = local_dispatcher.download_datums_from_store([Coordinate(lon=-120.8, lat=44.2)], columns=["precipitation"], start=start, end=end)[0]
+
+    pd.testing.assert_frame_equal(datum.hourly_parameters.loc[start:end, ["precipitation"]], downloaded.hourly_parameters, check_freq=False)
+    assert downloaded.hourly_units == {"precipitation": "mm"}
+
+
+def test_download_datums_from_store_missing_coordinate(local_dispatcher):
+    local_dispatcher.upload_datum_to_store(build_datum())
+    with pytest.raises(FileNotFoundError):
+        local_dispatcher.download_datums_from_store([Coordinate(lon=-120.8, lat=44.2), Coordinate(lon=-1.0, lat=1.0)])
+
+
+@pytest.mark.parametrize("packed", [True, False])
+def test_upload_datum_is_row_grouped_by_time(local_dispatcher, tmp_path, packed):
+    datum = build_datum(num_samples=24 * 365)
+    datum.hourly_parameters = datum.hourly_parameters.iloc[::-1]
+    local_dispatcher.upload_datum(datum, "historical", packed=packed)
+
+    filename = "datum.parquet" if packed else "data.parquet"
+    metadata = pq.ParquetFile(tmp_path / "historical" / "lon_-120.80_lat_44.20" / filename).metadata
+    assert metadata.num_row_groups > 1
+
+    time_index = metadata.schema.names.index("time")
+    maxes = [metadata.row_group(i).column(time_index).statistics.max for i in range(metadata.num_row_groups)]
+    assert maxes == sorted(maxes)
+
+
+@pytest.mark.parametrize("packed", [True, False])
+def test_download_datum_time_range(local_dispatcher, packed):
+    datum = build_datum(num_samples=24 * 365)
+    local_dispatcher.upload_datum(datum, "historical", packed=packed)
+
+    start = pd.Timestamp("2021-06-01", tz="UTC")
+    end = pd.Timestamp("2021-06-03", tz="UTC")
+    downloaded = local_dispatcher.download_datum(Coordinate(lon=-120.8, lat=44.2), dir_path="historical", start=start, end=end)
+
+    pd.testing.assert_frame_equal(datum.hourly_parameters.loc[start:end], downloaded.hourly_parameters, check_freq=False)
+
+
+@pytest.fixture
+def cached_dispatcher(local_dispatcher, tmp_path) -> AWSDispatcher:
+    local_dispatcher.use_cache = True
+    local_dispatcher._cache = DiskCache(str(tmp_path / "cache"))
+    return local_dispatcher
+
+
+@pytest.mark.parametrize("packed", [True, False])
+def test_download_datum_through_cache(cached_dispatcher, datum, packed):
+    cached_dispatcher.upload_datum(datum, "historical", packed=packed)
+    coordinate = Coordinate(lon=-120.8, lat=44.2)
+
+    assert_datums_equal(datum, cached_dispatcher.download_datum(coordinate, dir_path="historical"))
+    misses = cached_dispatcher.cache.stats.misses
+    assert_datums_equal(datum, cached_dispatcher.download_datum(coordinate, dir_path="historical"))
+
+    assert cached_dispatcher.cache.stats.misses == misses
+    assert cached_dispatcher.cache.stats.hits == misses
+
+
+def test_download_datums_from_store_through_cache(cached_dispatcher):
+    datum = build_datum(num_samples=24 * 400)
+    cached_dispatcher.upload_datum_to_store(datum)
+    coordinates = [Coordinate(lon=-120.8, lat=44.2)]
+
+    assert_datums_equal(datum, cached_dispatcher.download_datums_from_store(coordinates)[0])
+    assert_datums_equal(datum, cached_dispatcher.download_datums_from_store(coordinates)[0])
+    assert (cached_dispatcher.cache.stats.hits, cached_dispatcher.cache.stats.misses) == (2, 2)
+
+
+def test_cache_disabled_by_default(local_dispatcher, datum, tmp_path):
+    local_dispatcher._cache = DiskCache(str(tmp_path / "cache"))
+    local_dispatcher.upload_datum(datum, "historical", packed=True)
+    local_dispatcher.download_datum(Coordinate(lon=-120.8, lat=44.2), dir_path="historical")
+    assert local_dispatcher.cache.stats.misses == 0
+
+
+def test_latest_time_in_store(local_dispatcher):
+    coordinate = Coordinate(lon=-120.8, lat=44.2)
+    assert local_dispatcher.latest_time_in_store(coordinate) is None
+
+    local_dispatcher.upload_datum_to_store(build_datum(num_samples=24 * 400))
+    assert local_dispatcher.latest_time_in_store(coordinate) == pd.Timestamp("2022-02-04 23:00", tz="UTC")
+
+
+def test_current_manifest_round_trip(local_dispatcher):
+    coordinates = [Coordinate(-120.8, 44.2), Coordinate(-121.8, 44.3)]
+    assert len(local_dispatcher.download_current_manifest()) == 0
+
+    local_dispatcher.record_current_timestamp("23-01-31_07-42", coordinates, coordinates)
+    local_dispatcher.record_current_timestamp("23-01-31_19-42", coordinates, coordinates[:1])
+
+    manifest = local_dispatcher.download_current_manifest()
+    assert manifest.timestamps() == ["23-01-31_07-42"]
+    assert manifest.timestamps(coordinates[:1]) == ["23-01-31_07-42", "23-01-31_19-42"]
+    # the manifest is not a timestamp within "current"
+    assert not local_dispatcher.s3.exists(f'{local_dispatcher.working_dir}/current')
+
+
+def test_rebuild_current_manifest(local_dispatcher, datum):
+    local_dispatcher.upload_datum(datum, dir_path="current/23-01-31_07-42")
+    local_dispatcher.upload_datum(build_datum(lon=-121.8, lat=44.3), dir_path="current/23-01-31_07-42")
+    local_dispatcher.upload_datum(datum, dir_path="current/23-01-31_19-42")
+    local_dispatcher.upload_datum(build_datum(lon=-121.8, lat=44.3), dir_path="current/23-01-31_19-42")
+    local_dispatcher.s3.rm(f'{local_dispatcher.working_dir}/current/23-01-31_19-42/lon_-121.80_lat_44.30/data.parquet')
+
+    manifest = local_dispatcher.rebuild_current_manifest()
+
+    assert manifest.timestamps() == ["23-01-31_07-42"]
+    assert manifest.timestamps([Coordinate(-120.8, 44.2)]) == ["23-01-31_07-42", "23-01-31_19-42"]
+    assert local_dispatcher.download_current_manifest().timestamps() == ["23-01-31_07-42"]
+
+
+def test_shared_s3_filesystem():
+    clear_shared_connections()
+    s3 = get_s3_filesystem()
+    assert get_s3_filesystem() is s3
+    assert get_s3_filesystem(S3ConnectionConfig()) is s3
+    assert s3.config_kwargs["max_pool_connections"] == S3ConnectionConfig().max_pool_connections
+
+    tuned = get_s3_filesystem(S3ConnectionConfig(max_pool_connections=8, max_attempts=2))
+    assert tuned is not s3
+    assert tuned.config_kwargs["retries"]["max_attempts"] == 2
+
+
+def test_shared_dispatcher():
+    clear_shared_connections()
+    dispatcher = get_dispatcher("fake-bucket", "fake-directory", use_cache=True)
+    assert get_dispatcher("fake-bucket", "fake-directory", use_cache=True) is dispatcher
+    assert get_dispatcher("fake-bucket", "fake-directory") is not dispatcher
+    assert get_dispatcher("fake-bucket", "other-directory").s3 is dispatcher.s3
+    assert AWSDispatcher("fake-bucket", "fake-directory").s3 is dispatcher.s3
+
+    clear_shared_connections()
+    assert get_dispatcher("fake-bucket", "fake-directory", use_cache=True) is not dispatcher
+
+
+@pytest.fixture
+def compact_dispatcher(tmp_path) -> AWSDispatcher:
+    return AWSDispatcher(backend=StorageBackend.local(str(tmp_path)), encoding=ParquetEncoding())
+
+
+@pytest.mark.parametrize("packed", [True, False])
+def test_compact_encoding_round_trip(compact_dispatcher, datum, tmp_path, packed):
+    compact_dispatcher.upload_datum(datum, "historical", packed=packed)
+    path = next(tmp_path.glob("historical/*/*.parquet"))
+    parquet_file = pq.ParquetFile(path)
+
+    time_column = parquet_file.metadata.row_group(0).column(parquet_file.schema_arrow.get_field_index("time"))
+    assert time_column.compression == "ZSTD"
+    assert "DELTA_BINARY_PACKED" in time_column.encodings
+    assert parquet_file.schema_arrow.field("temperature_2m").type == pa.float32()
+    assert PARQUET_ENCODING_METADATA_KEY in parquet_file.schema_arrow.metadata
+
+    downloaded = compact_dispatcher.download_datum(Coordinate(lon=-120.8, lat=44.2), dir_path="historical")
+    assert (downloaded.hourly_parameters.dtypes == np.float64).all()
+    assert downloaded.hourly_units == datum.hourly_units
+    pd.testing.assert_frame_equal(downloaded.hourly_parameters, datum.hourly_parameters, check_freq=False, rtol=1e-6)
+
+
+def test_compact_encoding_keeps_float32_datums(compact_dispatcher, datum):
+    # as emitted by the weather providers
+    datum.hourly_parameters = datum.hourly_parameters.astype(np.float32)
+    compact_dispatcher.upload_datum(datum, "historical")
+
+    downloaded = compact_dispatcher.download_datum(Coordinate(lon=-120.8, lat=44.2), dir_path="historical")
+
+    assert (downloaded.hourly_parameters.dtypes == np.float32).all()
+
+
+def test_compact_encoding_is_smaller(compact_dispatcher, local_dispatcher):
+    # hourly measurements with a single decimal, like the weather APIs return
+    datum = build_datum(num_samples=24 * 365)
+    datum.hourly_parameters[:] = np.round(datum.hourly_parameters.values * 30, 1)
+    sizes = []
+    for dispatcher in (local_dispatcher, compact_dispatcher):
+        dispatcher.upload_datum(datum, "historical", packed=True)
+        sizes.append(dispatcher.s3.size(f'{dispatcher.working_dir}/historical/lon_-120.80_lat_44.20/datum.parquet'))
+
+    assert sizes[1] * 3 < sizes[0]
+
+
+def test_store_with_mixed_encodings(compact_dispatcher, datum):
+    compact_dispatcher.upload_datum_to_store(datum, "store", part_name="part-0")
+    compact_dispatcher.encoding = None
+    later_datum = build_datum(num_samples=24 * 3)
+    later_datum.hourly_parameters = later_datum.hourly_parameters.iloc[48:]
+    compact_dispatcher.upload_datum_to_store(later_datum, "store", part_name="part-1")
+
+    stored = compact_dispatcher.download_datums_from_store([Coordinate(lon=-120.8, lat=44.2)], "store")[0]
+    assert len(stored.hourly_parameters) == 24 * 3
+    assert (stored.hourly_parameters.dtypes == np.float64).all()
+
+    compact_dispatcher.as_float32 = True
+    stored = compact_dispatcher.download_datums_from_store([Coordinate(lon=-120.8, lat=44.2)], "store")[0]
+    assert (stored.hourly_parameters.dtypes == np.float32).all()
+
+
+def test_restore_types_newer_version(datum):
+    table = ParquetEncoding().encode(pa.Table.from_pandas(datum.hourly_parameters))
+    schema_metadata = dict(table.schema.metadata)
+    schema_metadata[PARQUET_ENCODING_METADATA_KEY] = b'{"version": 2, "types": {}}'
+    with pytest.raises(ValueError):
+        restore_types(table.replace_schema_metadata(schema_metadata))
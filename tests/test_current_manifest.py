@@ -0,0 +1,48 @@
+import pytest
+
+from rlf.current_manifest import CurrentManifest
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+
+COORDINATES = [Coordinate(-120.8, 44.2), Coordinate(-121.8, 44.3), Coordinate(-122.8, 44.4)]
+
+
+@pytest.fixture
+def manifest() -> CurrentManifest:
+    manifest = CurrentManifest()
+    manifest.add_timestamp("23-02-01_07-42", COORDINATES, COORDINATES)
+    manifest.add_timestamp("22-12-31_19-42", COORDINATES, COORDINATES[:2])
+    manifest.add_timestamp("23-01-31_19-42", COORDINATES[:2], COORDINATES[:2])
+    return manifest
+
+
+def test_timestamps_are_chronological(manifest):
+    assert manifest.timestamps(complete_only=False) == ["22-12-31_19-42", "23-01-31_19-42", "23-02-01_07-42"]
+
+
+def test_completeness(manifest):
+    assert manifest.timestamps() == ["23-01-31_19-42", "23-02-01_07-42"]
+    assert manifest.timestamps(COORDINATES[:2]) == ["22-12-31_19-42", "23-01-31_19-42", "23-02-01_07-42"]
+    # a coordinate that was never part of the upload is not available
+    assert manifest.timestamps(COORDINATES[2:]) == ["23-02-01_07-42"]
+    assert not manifest.is_complete("23-02-02_07-42")
+
+
+def test_round_trip(manifest):
+    restored = CurrentManifest.from_dict(manifest.to_dict())
+    assert len(restored) == 3
+    assert restored.timestamps() == manifest.timestamps()
+    assert restored.timestamps(COORDINATES[:1]) == manifest.timestamps(COORDINATES[:1])
+    # uploads for the same coordinates share a single coordinate set
+    assert len(manifest.to_dict()["coordinate_sets"]) == 2
+
+
+def test_invalid_timestamp():
+    with pytest.raises(ValueError):
+        CurrentManifest().add_timestamp("latest", COORDINATES, COORDINATES)
+
+
+def test_newer_format_version(manifest):
+    data = manifest.to_dict()
+    data["format_version"] += 1
+    with pytest.raises(ValueError):
+        CurrentManifest.from_dict(data)
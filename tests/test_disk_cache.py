@@ -0,0 +1,76 @@
+import os
+
+from fsspec.implementations.local import LocalFileSystem
+import pytest
+
+from rlf.disk_cache import DiskCache
+
+
+@pytest.fixture
+def cache(tmp_path) -> DiskCache:
+    return DiskCache(str(tmp_path / "cache"), max_bytes=25)
+
+
+@pytest.fixture
+def remote_file(tmp_path) -> str:
+    path = tmp_path / "remote" / "data.parquet"
+    path.parent.mkdir()
+    path.write_bytes(b"0123456789")
+    return str(path)
+
+
+def test_fetch_miss_then_hit(cache, remote_file):
+    filesystem = LocalFileSystem()
+    first = cache.fetch(filesystem, remote_file)
+    second = cache.fetch(filesystem, remote_file)
+
+    assert first == second
+    assert open(first, "rb").read() == b"0123456789"
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+    assert cache.stats.bytes_downloaded == 10
+    assert cache.stats.bytes_from_cache == 10
+    assert cache.stats.hit_rate == 0.5
+
+
+def test_fetch_changed_remote_file_is_refetched(cache, remote_file):
+    filesystem = LocalFileSystem()
+    first = cache.fetch(filesystem, remote_file)
+    with open(remote_file, "wb") as f:
+        f.write(b"new contents!")
+    os.utime(remote_file, (0, 0))
+    second = cache.fetch(filesystem, remote_file)
+
+    assert first != second
+    assert open(second, "rb").read() == b"new contents!"
+    assert cache.stats.misses == 2
+
+
+def test_fetch_missing_remote_file(cache, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        cache.fetch(LocalFileSystem(), str(tmp_path / "missing.parquet"))
+
+
+def test_version_of_prefers_etag():
+    assert DiskCache.version_of({"ETag": '"abc"', "size": 1, "mtime": 2}) == "abc"
+    assert DiskCache.version_of({"size": 1, "mtime": 2}) == "1-2"
+
+
+def test_put_evicts_least_recently_used(cache):
+    oldest = cache.put("s3://bucket/a", "1", b"a" * 10)
+    newest = cache.put("s3://bucket/b", "1", b"b" * 10)
+    os.utime(oldest, (1, 1))
+    os.utime(newest, (2, 2))
+    assert cache.get("s3://bucket/a", "1") == oldest  # marks a as most recently used
+
+    cache.put("s3://bucket/c", "1", b"c" * 10)
+
+    assert cache.stats.evictions == 1
+    assert cache.get("s3://bucket/b", "1") is None
+    assert cache.get("s3://bucket/a", "1") is not None
+    assert cache.get("s3://bucket/c", "1") is not None
+
+
+def test_clear(cache):
+    cache.put("s3://bucket/a", "1", b"a")
+    cache.clear()
+    assert cache.get("s3://bucket/a", "1") is None
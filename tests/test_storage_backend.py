@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from rlf.aws_dispatcher import AWSDispatcher
+from rlf.forecasting.data_fetching_utilities.coordinate import Coordinate
+from rlf.storage_backend import StorageBackend
+
+from fake_providers import build_datum
+
+
+@pytest.fixture(params=["local", "memory"])
+def backend(request, tmp_path) -> StorageBackend:
+    if request.param == "local":
+        return StorageBackend.local(str(tmp_path))
+    return StorageBackend.memory()
+
+
+@pytest.mark.parametrize("packed", [False, True])
+def test_datum_round_trip(backend, packed):
+    dispatcher = AWSDispatcher(backend=backend, pack_datums=packed)
+    datum = build_datum(-120.8, 44.2)
+    dispatcher.upload_datum(datum, "historical")
+    dispatcher.upload_datum(build_datum(-121.8, 44.3), "historical")
+
+    downloaded = dispatcher.download_datum(Coordinate(-120.8, 44.2), dir_path="historical")
+
+    pd.testing.assert_frame_equal(downloaded.hourly_parameters, datum.hourly_parameters, check_freq=False)
+    assert sorted(path.split("/")[-1] for path in dispatcher.list_files("historical")) == ["lon_-120.80_lat_44.20", "lon_-121.80_lat_44.30"]
+
+
+def test_store_and_manifest(backend):
+    dispatcher = AWSDispatcher(backend=backend)
+    coordinates = [Coordinate(-120.8, 44.2)]
+    dispatcher.upload_datum_to_store(build_datum(-120.8, 44.2), "store")
+    dispatcher.record_current_timestamp("23-01-31_07-42", coordinates, coordinates)
+
+    datums = dispatcher.download_datums_from_store(coordinates, "store")
+
+    assert len(datums[0].hourly_parameters) == 48
+    assert dispatcher.latest_time_in_store(coordinates[0], "store") == pd.Timestamp("2021-01-02 23:00", tz="UTC")
+    assert dispatcher.download_current_manifest().timestamps() == ["23-01-31_07-42"]
+
+
+def test_memory_backends_are_isolated():
+    dispatcher = AWSDispatcher(backend=StorageBackend.memory())
+    dispatcher.upload_datum(build_datum(-120.8, 44.2), "historical")
+
+    with pytest.raises(FileNotFoundError):
+        AWSDispatcher(backend=StorageBackend.memory()).list_files("historical")
+    assert len(AWSDispatcher(backend=StorageBackend(dispatcher.s3, dispatcher.working_dir)).list_files("historical")) == 1
+
+
+def test_dispatcher_requires_location():
+    with pytest.raises(ValueError):
+        AWSDispatcher()